@@ -0,0 +1,25 @@
+"""Processo dedicado aos jobs agendados.
+
+Com vários processos servindo a API (`uvicorn --workers`, `gunicorn -w`),
+cada um iniciaria o próprio scheduler e os jobs rodariam em dobro. Suba a
+API com SCHEDULER_ENABLED=false e um único processo com:
+
+    python -m backend.agendador
+"""
+import os
+import time
+
+os.environ['SCHEDULER_ENABLED'] = 'true'
+os.environ['APP_INIT_ON_IMPORT'] = 'true'
+
+# Importar o app cria as tabelas e inicia o scheduler (ver backend/app.py).
+import backend.app
+
+
+if __name__ == '__main__':
+    print("Scheduler em execução. Ctrl+C para encerrar.")
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        pass
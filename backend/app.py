@@ -1,7 +1,12 @@
 from flask import Flask, jsonify, request
 from flask_cors import CORS
-from backend.models.database import db
+from backend.models.database import db, configurar_replicas
 from backend.models.usuario import Usuario
+from backend.models.migracoes import atualizar_esquema
+from backend.services.manutencao_sqlite import configurar_sqlite
+from backend.services.compressao import configurar_compressao
+from backend.services.busca import criar_indices_busca
+from backend.services.deduplicacao_clientes import preencher_telefones_normalizados
 import os
 import secrets
 from datetime import timedelta
@@ -15,13 +20,20 @@ from backend.controllers.pedidos import pedidos_bp
 from backend.controllers.pagamentos import pagamentos_bp
 from backend.controllers.relatorios import relatorios_bp
 from backend.controllers.auth import auth_bp
+from backend.controllers.eventos import eventos_bp
+from backend.controllers.sincronizacao import sync_bp
+from backend.controllers.jobs import jobs_bp
+from backend.controllers.diagnostico import diagnostico_bp
+from backend.controllers.dashboard import dashboard_bp
 from backend.services.scheduler import start_scheduler, stop_scheduler
 from backend.config import Config
 
-def create_app():
+def create_app(config=None):
     app = Flask(__name__)
     
     app.config.from_object(Config)
+    if config:
+        app.config.update(config)
 
     app.debug = True 
 
@@ -30,6 +42,8 @@ def create_app():
         print("SECRET_KEY gerada (apenas para desenvolvimento):", app.config['SECRET_KEY'])
     
     db.init_app(app)
+    configurar_replicas(app)
+    configurar_sqlite(app)
    
     CORS(app, supports_credentials=True) 
 
@@ -38,23 +52,40 @@ def create_app():
     app.register_blueprint(pagamentos_bp, url_prefix='/api/pagamentos')
     app.register_blueprint(relatorios_bp, url_prefix='/api/relatorios')
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
+    app.register_blueprint(eventos_bp, url_prefix='/api/events')
+    app.register_blueprint(sync_bp, url_prefix='/api/sync')
+    app.register_blueprint(jobs_bp, url_prefix='/api/jobs')
+    app.register_blueprint(diagnostico_bp, url_prefix='/api/diagnostico')
+    app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
+
+    configurar_compressao(app)
 
     return app
 
+def inicializar_banco(app):
+    with app.app_context():
+        db.create_all() 
+        atualizar_esquema()
+        criar_indices_busca()
+        preencher_telefones_normalizados()
+        if Usuario.query.count() == 0:
+            print("Nenhum usuário encontrado. Criando usuário admin padrão.")
+            admin_user = Usuario(nome="Admin", email="admin@example.com", senha_texto_claro="admin123")
+            db.session.add(admin_user)
+            db.session.commit()
+            print("Usuário admin 'admin@example.com' com senha 'admin123' criado. POR FAVOR, MUDE A SENHA EM PRODUÇÃO!")
+
 app = create_app()
 
-with app.app_context():
-    db.create_all() 
-    if Usuario.query.count() == 0:
-        print("Nenhum usuário encontrado. Criando usuário admin padrão.")
-        admin_user = Usuario(nome="Admin", email="admin@example.com", senha_texto_claro="admin123")
-        db.session.add(admin_user)
-        db.session.commit()
-        print("Usuário admin 'admin@example.com' com senha 'admin123' criado. POR FAVOR, MUDE A SENHA EM PRODUÇÃO!")
-
-with app.app_context():
-    start_scheduler(app)
-    atexit.register(lambda: stop_scheduler())
+# Com APP_INIT_ON_IMPORT=false (testes, benchmarks) importar o módulo não toca no banco nem inicia o scheduler.
+if app.config['INICIALIZAR_AO_IMPORTAR']:
+    inicializar_banco(app)
+
+    # Com SCHEDULER_ENABLED=false (CLI, workers extras da API) os jobs ficam com o processo de `backend.agendador`.
+    if app.config['SCHEDULER_ENABLED']:
+        with app.app_context():
+            start_scheduler(app)
+            atexit.register(lambda: stop_scheduler())
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,262 @@
+"""Modo assíncrono da API (ASGI).
+
+As leituras mais frequentes (listagens e detalhes de clientes e pedidos,
+prazos) são atendidas por views assíncronas do Quart sobre um engine
+`sqlalchemy.ext.asyncio` (aiosqlite ou asyncpg), sem prender uma thread
+durante as idas ao banco. As demais rotas (escritas, relatórios, SSE,
+sincronização) seguem para o app Flask de sempre numa pool de threads,
+então a estrutura de URLs, os contratos JSON e os listeners de escrita
+(outbox, tombstones, índice de busca) não mudam.
+
+    SCHEDULER_ENABLED=false uvicorn backend.asgi:app --workers 4
+
+Os jobs agendados rodam num processo à parte (`python -m backend.agendador`).
+"""
+from quart import Quart, Response, jsonify, request
+from a2wsgi import WSGIMiddleware
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from werkzeug.exceptions import HTTPException
+from werkzeug.routing import RequestRedirect
+from backend.app import app as flask_app
+from backend.models.database import db
+from backend.models.cliente import Cliente, AnotacaoCliente, normalizar_telefone
+from backend.models.pedido import Pedido
+from backend.models.pagamento import Pagamento
+from backend.controllers.clientes import ORDENACOES_CLIENTES, filtrar_clientes, cliente_resumo_dict, cliente_por_telefone_dict, cliente_detalhe_dict
+from backend.controllers.pedidos import filtrar_pedidos, consulta_prazos, pedido_dict, prazo_dict
+from backend.services.arquivamento import arquivo_necessario_pedidos
+from backend.services.concorrencia import etag_registro
+from datetime import datetime, timedelta
+import asyncio
+import math
+
+DRIVERS_ASSINCRONOS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+}
+
+api = Quart(__name__)
+api.config.from_mapping(flask_app.config)
+
+_sessoes = {}
+
+
+def url_assincrona(url):
+    driver = DRIVERS_ASSINCRONOS.get(url.get_backend_name())
+    if driver is None:
+        raise ValueError(f"Banco '{url.get_backend_name()}' sem driver assíncrono configurado.")
+    return url.set(drivername=driver)
+
+
+@api.before_serving
+async def _criar_engine():
+    # A URL já resolvida pelo Flask-SQLAlchemy (caminhos relativos do SQLite apontam para instance/).
+    with flask_app.app_context():
+        url = db.engine.url
+    if url.get_backend_name() == 'sqlite':
+        # O padrão do aiosqlite (NullPool) abre uma conexão, e uma thread, por requisição.
+        opcoes = {'poolclass': AsyncAdaptedQueuePool, 'pool_size': api.config['ASYNC_SQLITE_POOL_SIZE'], 'max_overflow': 0}
+    else:
+        opcoes = {'pool_size': api.config['ASYNC_DB_POOL_SIZE'], 'max_overflow': api.config['ASYNC_DB_MAX_OVERFLOW']}
+    engine = create_async_engine(url_assincrona(url), **opcoes)
+    _sessoes['engine'] = engine
+    _sessoes['fabrica'] = async_sessionmaker(engine, expire_on_commit=False)
+
+
+@api.after_serving
+async def _fechar_engine():
+    await _sessoes.pop('engine').dispose()
+
+
+def _sessao():
+    return _sessoes['fabrica']()
+
+
+@api.after_request
+async def _cabecalhos(resposta):
+    # Os mesmos do app Flask: CORS com credenciais e ETag fraca nas respostas JSON de GET que ainda não têm uma.
+    origem = request.headers.get('Origin')
+    if origem:
+        resposta.headers['Access-Control-Allow-Origin'] = origem
+        resposta.headers['Access-Control-Allow-Credentials'] = 'true'
+        resposta.vary.add('Origin')
+    if request.method == 'GET' and resposta.status_code == 200 and resposta.mimetype == 'application/json':
+        await resposta.add_etag(weak=True)
+        await resposta.make_conditional(request)
+    return resposta
+
+
+def _no_contexto_flask(funcao, *args, **kwargs):
+    with flask_app.app_context():
+        return funcao(*args, **kwargs)
+
+
+async def _resposta_sincrona():
+    """Atende a requisição atual pela view síncrona do Flask numa thread (casos raros, como o arquivo)."""
+    dados = {
+        'path': request.path,
+        'method': request.method,
+        'query_string': request.query_string,
+        'headers': list(request.headers.items()),
+    }
+
+    def atender():
+        with flask_app.test_request_context(**dados):
+            resposta = flask_app.full_dispatch_request()
+            return resposta.get_data(), resposta.status_code, list(resposta.headers.items())
+
+    corpo, status, cabecalhos = await asyncio.to_thread(atender)
+    return Response(corpo, status=status, headers=cabecalhos)
+
+
+async def _paginar(sessao, consulta, page, per_page):
+    # Mesmas regras do paginate(error_out=False) do Flask-SQLAlchemy.
+    page = page if page and page > 0 else 1
+    per_page = per_page if per_page and per_page > 0 else 20
+    total = await sessao.scalar(select(func.count()).select_from(consulta.order_by(None).subquery()))
+    itens = (await sessao.execute(consulta.limit(per_page).offset((page - 1) * per_page))).all()
+    return itens, total, math.ceil(total / per_page) if total else 0, page
+
+
+@api.route('/api/clientes/', methods=['GET'])
+async def listar_clientes():
+    search_term = request.args.get('search', '').lower()
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 10, type=int)
+    ordenar = request.args.get('ordenar')
+    ordem = request.args.get('ordem', 'asc')
+    min_pedidos = request.args.get('min_pedidos', type=int)
+    min_gasto = request.args.get('min_gasto', type=float)
+
+    if ordenar and ordenar not in ORDENACOES_CLIENTES:
+        return jsonify({'error': 'Ordenação inválida. Use nome, total_pedidos, total_gasto ou ultimo_pedido.'}), 400
+
+    async with _sessao() as sessao:
+        consulta = filtrar_clientes(select(Cliente), search_term, min_pedidos, min_gasto, ordenar, ordem)
+        linhas, total, paginas, page = await _paginar(sessao, consulta, page, per_page)
+
+    return jsonify({
+        'clientes': [cliente_resumo_dict(linha[0]) for linha in linhas],
+        'total_pages': paginas,
+        'current_page': page,
+        'total_items': total
+    }), 200
+
+
+@api.route('/api/clientes/por-telefone/<string:telefone>', methods=['GET'])
+async def obter_cliente_por_telefone(telefone):
+    telefone_normalizado = normalizar_telefone(telefone)
+    if not telefone_normalizado:
+        return jsonify({'error': 'Telefone inválido. Informe o DDD e o número.'}), 400
+
+    async with _sessao() as sessao:
+        clientes = (await sessao.scalars(
+            select(Cliente).where(Cliente.telefone_normalizado == telefone_normalizado, Cliente.excluido_em.is_(None)).order_by(Cliente.id.asc())
+        )).all()
+    if not clientes:
+        return jsonify({'error': 'Cliente não encontrado.'}), 404
+    return jsonify(cliente_por_telefone_dict(clientes[0], clientes[1:])), 200
+
+
+@api.route('/api/clientes/<int:cliente_id>', methods=['GET'])
+async def obter_cliente(cliente_id):
+    async with _sessao() as sessao:
+        cliente = await sessao.get(Cliente, cliente_id)
+        if not cliente or cliente.excluido_em:
+            return jsonify({'error': 'Cliente não encontrado.'}), 404
+        pedidos = (await sessao.scalars(select(Pedido).where(Pedido.cliente_id == cliente_id).order_by(Pedido.data_pedido.desc()))).all()
+        anotacoes = (await sessao.scalars(
+            select(AnotacaoCliente).where(AnotacaoCliente.cliente_id == cliente_id).order_by(AnotacaoCliente.data_criacao.desc())
+        )).all()
+
+    dados = cliente_detalhe_dict(cliente, pedidos, anotacoes)
+    resposta = jsonify(dados)
+    resposta.set_etag(etag_registro(cliente.versao, dados))
+    return resposta, 200
+
+
+@api.route('/api/pedidos/', methods=['GET'])
+async def listar_pedidos():
+    status_filter = request.args.get('status')
+    cliente_id_filter = request.args.get('cliente_id', type=int)
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 10, type=int)
+
+    # O limite do arquivo fica em cache; com arquivo na consulta, a view síncrona junta as duas fontes.
+    if await asyncio.to_thread(_no_contexto_flask, arquivo_necessario_pedidos, status=status_filter):
+        return await _resposta_sincrona()
+
+    async with _sessao() as sessao:
+        consulta = filtrar_pedidos(select(Pedido, Cliente.nome).outerjoin(Cliente, Cliente.id == Pedido.cliente_id), status_filter, cliente_id_filter)
+        linhas, total, paginas, page = await _paginar(sessao, consulta, page, per_page)
+
+    hoje = datetime.now().date()
+    return jsonify({
+        'pedidos': [pedido_dict(pedido, nome or 'N/A', hoje) for pedido, nome in linhas],
+        'total_pages': paginas,
+        'current_page': page,
+        'total_items': total
+    }), 200
+
+
+@api.route('/api/pedidos/<int:pedido_id>', methods=['GET'])
+async def obter_pedido(pedido_id):
+    async with _sessao() as sessao:
+        linha = (await sessao.execute(
+            select(Pedido, Cliente.nome, Pagamento.id)
+            .outerjoin(Cliente, Cliente.id == Pedido.cliente_id)
+            .outerjoin(Pagamento, Pagamento.pedido_id == Pedido.id)
+            .where(Pedido.id == pedido_id)
+        )).first()
+    if linha is None:
+        # Pode estar no arquivo.
+        return await _resposta_sincrona()
+
+    pedido, cliente_nome, pagamento_id = linha
+    dados = pedido_dict(pedido, cliente_nome or 'N/A', datetime.now().date())
+    dados['pagamento_registrado'] = pagamento_id is not None
+    resposta = jsonify(dados)
+    resposta.set_etag(etag_registro(pedido.versao, dados))
+    return resposta, 200
+
+
+@api.route('/api/pedidos/prazos', methods=['GET'])
+async def verificar_prazos():
+    dias_futuros = request.args.get('dias_futuros', 7, type=int)
+    hoje = datetime.now().date()
+    data_limite = hoje + timedelta(days=dias_futuros)
+
+    async with _sessao() as sessao:
+        linhas = (await sessao.execute(
+            consulta_prazos(select(Pedido, Cliente.nome).outerjoin(Cliente, Cliente.id == Pedido.cliente_id), hoje, data_limite)
+        )).all()
+    return jsonify([prazo_dict(pedido, nome or 'N/A', hoje) for pedido, nome in linhas]), 200
+
+
+class AplicacaoHibrida:
+    """Aplicação ASGI: rotas com view assíncrona vão para o Quart, as demais para o Flask (WSGI)."""
+
+    def __init__(self, assincrona, wsgi, threads):
+        self.assincrona = assincrona
+        self.wsgi = WSGIMiddleware(wsgi, workers=threads)
+        self._rotas = assincrona.url_map.bind('localhost')
+
+    def _assincrona_atende(self, scope):
+        # Preflight de CORS fica com o Flask-CORS.
+        if scope['method'] == 'OPTIONS':
+            return False
+        try:
+            self._rotas.match(scope['path'], method=scope['method'])
+            return True
+        except (HTTPException, RequestRedirect):
+            return False
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or self._assincrona_atende(scope):
+            return await self.assincrona(scope, receive, send)
+        return await self.wsgi(scope, receive, send)
+
+
+app = AplicacaoHibrida(api, flask_app, flask_app.config['ASYNC_WSGI_THREADS'])
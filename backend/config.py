@@ -7,6 +7,109 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///assistente.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Réplicas de leitura: DATABASE_REPLICA_URLS='postgresql://replica1/db,postgresql://replica2/db'
+    REPLICA_URLS = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+    SQLALCHEMY_BINDS = {f'replica_{i}': url for i, url in enumerate(REPLICA_URLS, start=1)}
+    # Pedidos encerrados antigos; sem ARCHIVE_DATABASE_URL as tabelas de arquivo ficam no banco principal.
+    SQLALCHEMY_BINDS['arquivo'] = os.environ.get('ARCHIVE_DATABASE_URL') or SQLALCHEMY_DATABASE_URI
+    ARCHIVE_ENABLED = os.environ.get('ARCHIVE_ENABLED', 'false').lower() == 'true'
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 365))
+    ARCHIVE_BATCH_SIZE = 500
+    REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 5))
+    REPLICA_HEALTH_TTL = int(os.environ.get('REPLICA_HEALTH_TTL', 30))
+
+    SSE_POLL_INTERVAL = float(os.environ.get('SSE_POLL_INTERVAL', 1.0))
+    SSE_KEEPALIVE_SECONDS = 15
+    SSE_BATCH_SIZE = 200
+    # Tempo máximo de uma conexão SSE; depois o cliente reconecta a partir do Last-Event-ID.
+    SSE_MAX_CONNECTION_SECONDS = int(os.environ.get('SSE_MAX_CONNECTION_SECONDS', 300))
+    # Quanto o feed espera por um id do outbox ainda não confirmado antes de dá-lo como perdido.
+    SSE_VISIBILITY_LAG_SECONDS = 5
+    OUTBOX_RETENTION_DAYS = int(os.environ.get('OUTBOX_RETENTION_DAYS', 7))
+
+    SYNC_BATCH_SIZE = 500
+    SYNC_SAFETY_SECONDS = 2
+
+    ANALYTICS_EXPORT_ENABLED = os.environ.get('ANALYTICS_EXPORT_ENABLED', 'false').lower() == 'true'
+    ANALYTICS_EXPORT_FORMAT = os.environ.get('ANALYTICS_EXPORT_FORMAT', 'parquet')
+
+    LTV_HORIZONTE_ANOS = 3
+    RFM_INTERVALO_MINUTOS = 15
+
+    RECIBOS_WORKERS = int(os.environ.get('RECIBOS_WORKERS', os.cpu_count() or 2))
+    RECIBOS_MINIMO_POOL = 16
+    # Máximo de recibos num ZIP de /api/pagamentos/recibos/zip (o período é obrigatório).
+    RECIBOS_ZIP_MAXIMO = int(os.environ.get('RECIBOS_ZIP_MAXIMO', 1000))
+
+    # Notificações: sem SMTP_HOST/WHATSAPP_API_URL as mensagens vão para o console.
+    SMTP_HOST = os.environ.get('SMTP_HOST')
+    SMTP_PORT = int(os.environ.get('SMTP_PORT', 587))
+    SMTP_USER = os.environ.get('SMTP_USER')
+    SMTP_PASSWORD = os.environ.get('SMTP_PASSWORD')
+    SMTP_FROM = os.environ.get('SMTP_FROM')
+    SMTP_USE_TLS = os.environ.get('SMTP_USE_TLS', 'true').lower() == 'true'
+    WHATSAPP_API_URL = os.environ.get('WHATSAPP_API_URL')
+    WHATSAPP_API_TOKEN = os.environ.get('WHATSAPP_API_TOKEN')
+    NOTIFICACOES_CONCORRENCIA = 50
+    NOTIFICACOES_TAXA_POR_SEGUNDO = {'email': 20, 'whatsapp': 50}
+    NOTIFICACOES_MAX_TENTATIVAS = 5
+    NOTIFICACOES_BACKOFF_SEGUNDOS = 30
+    NOTIFICACOES_LOTE = 5000
+    # Notificação reservada ('enviando') há mais tempo que isso volta a ser enviada (processo caiu no meio do envio).
+    NOTIFICACOES_PRAZO_ENVIO_SEGUNDOS = 600
+
+    # Job store do APScheduler; por padrão usa o banco principal.
+    SCHEDULER_JOBSTORE_URL = os.environ.get('SCHEDULER_JOBSTORE_URL')
+    # Só um processo deve rodar o scheduler: desligue nos workers da API e use `python -m backend.agendador`.
+    SCHEDULER_ENABLED = os.environ.get('SCHEDULER_ENABLED', 'true').lower() == 'true'
+    SCHEDULER_MISFIRE_GRACE_SECONDS = 3600
+    JOB_RUNS_RETENTION_DAYS = 30
+
+    # Manutenção dos bancos SQLite (ignorada para outros bancos).
+    SQLITE_MAINTENANCE_ENABLED = os.environ.get('SQLITE_MAINTENANCE_ENABLED', 'true').lower() == 'true'
+    SQLITE_VACUUM_MAX_PAGES = 2000
+    SQLITE_BACKUP_DIR = os.environ.get('SQLITE_BACKUP_DIR')
+    SQLITE_BACKUP_INTERVAL_HOURS = 6
+    SQLITE_BACKUP_PAGES_PER_STEP = 256
+    SQLITE_BACKUP_STEP_PAUSE = 0.005
+    SQLITE_BACKUPS_KEEP = 7
+
+    # Travas de arquivo das execuções coalescidas entre processos (padrão: instance/locks).
+    COALESCENCIA_LOCK_DIR = os.environ.get('COALESCENCIA_LOCK_DIR')
+
+    # Compressão das respostas (br/zstd exigem os pacotes brotli/zstandard; gzip é sempre suportado).
+    COMPRESSAO_ENABLED = os.environ.get('COMPRESSAO_ENABLED', 'true').lower() == 'true'
+    COMPRESSAO_MINIMO_BYTES = 1024
+    COMPRESSAO_NIVEL_GZIP = 6
+    COMPRESSAO_NIVEL_BROTLI = 4
+    COMPRESSAO_NIVEL_ZSTD = 3
+
+    # Conciliação de extratos: quantos dias antes do crédito um pedido pendente ainda é candidato.
+    CONCILIACAO_JANELA_DIAS = 30
+
+    # Cache analítico: pedidos e pagamentos em arrays NumPy, atualizados incrementalmente, para os relatórios.
+    ANALYTICS_CACHE_ENABLED = os.environ.get('ANALYTICS_CACHE_ENABLED', 'false').lower() == 'true'
+    ANALYTICS_CACHE_MAX_MB = int(os.environ.get('ANALYTICS_CACHE_MAX_MB', 256))
+    ANALYTICS_CACHE_REFRESH_SECONDS = 30
+
+    # PUT de pedidos e clientes sem If-Match recebe 428 (por padrão é aceito, ainda condicionado à versão lida).
+    OPTIMISTIC_LOCK_REQUIRED = os.environ.get('OPTIMISTIC_LOCK_REQUIRED', 'false').lower() == 'true'
+
+    # Por quantos segundos o resumo de /api/dashboard é reaproveitado (0 desliga o cache).
+    DASHBOARD_CACHE_SECONDS = int(os.environ.get('DASHBOARD_CACHE_SECONDS', 5))
+
+    # Modo assíncrono (backend/asgi.py): conexões do engine assíncrono e threads para as rotas síncronas.
+    ASYNC_DB_POOL_SIZE = int(os.environ.get('ASYNC_DB_POOL_SIZE', 20))
+    ASYNC_DB_MAX_OVERFLOW = int(os.environ.get('ASYNC_DB_MAX_OVERFLOW', 30))
+    # No SQLite cada conexão do aiosqlite tem uma thread própria; poucas conexões fixas rendem mais.
+    ASYNC_SQLITE_POOL_SIZE = int(os.environ.get('ASYNC_SQLITE_POOL_SIZE', 5))
+    ASYNC_WSGI_THREADS = int(os.environ.get('ASYNC_WSGI_THREADS', 32))
+
+    # Falso em testes e benchmarks: importar backend.app não cria tabelas nem inicia o scheduler.
+    INICIALIZAR_AO_IMPORTAR = os.environ.get('APP_INIT_ON_IMPORT', 'true').lower() == 'true'
+    # Pasta dos bancos modelo usados por testes e benchmarks (padrão: instance/modelos).
+    BANCO_MODELO_DIR = os.environ.get('BANCO_MODELO_DIR')
+
     DEBUG = True 
 
     SCHEDULER_API_ENABLED = True
@@ -1,11 +1,95 @@
 from flask import Blueprint, request, jsonify
 from backend.models.database import db
-from backend.models.cliente import Cliente, AnotacaoCliente
+from backend.models.cliente import Cliente, AnotacaoCliente, normalizar_telefone
 from backend.models.pedido import Pedido
+from backend.services.exclusao_clientes import excluir_cliente
+from backend.services.deduplicacao_clientes import mesclar_clientes_duplicados
+from backend.services.busca import buscar_anotacoes, parametros_busca, termo_valido
+from backend.services.concorrencia import etag_registro, verificar_if_match, resposta_conflito
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
 
 clientes_bp = Blueprint('clientes', __name__)
 
+ORDENACOES_CLIENTES = {
+    'nome': Cliente.nome,
+    'total_pedidos': Cliente.total_pedidos,
+    'total_gasto': Cliente.total_gasto,
+    'ultimo_pedido': Cliente.ultimo_pedido_em,
+}
+
+def filtrar_clientes(consulta, search_term='', min_pedidos=None, min_gasto=None, ordenar=None, ordem='asc'):
+    """Busca, filtros e ordenação da listagem; serve para `Cliente.query` e para `select(Cliente)`."""
+    consulta = consulta.filter(Cliente.excluido_em.is_(None))
+    if search_term:
+        # Um telefone completo é buscado pelo índice da forma normalizada, não por varredura.
+        telefone_normalizado = normalizar_telefone(search_term)
+        filtro_telefone = (Cliente.telefone_normalizado == telefone_normalizado) if telefone_normalizado else Cliente.telefone.ilike(f'%{search_term}%')
+        consulta = consulta.filter(
+            (Cliente.nome.ilike(f'%{search_term}%')) |
+            filtro_telefone |
+            (Cliente.email.ilike(f'%{search_term}%'))
+        )
+    if min_pedidos is not None:
+        consulta = consulta.filter(Cliente.total_pedidos >= min_pedidos)
+    if min_gasto is not None:
+        consulta = consulta.filter(Cliente.total_gasto >= min_gasto)
+    if ordenar:
+        coluna = ORDENACOES_CLIENTES[ordenar]
+        consulta = consulta.order_by(coluna.desc() if ordem == 'desc' else coluna.asc(), Cliente.id.asc())
+    return consulta
+
+def cliente_resumo_dict(cliente):
+    return {
+        'id': cliente.id,
+        'nome': cliente.nome,
+        'telefone': cliente.telefone,
+        'email': cliente.email,
+        'endereco': cliente.endereco,
+        'preferencias': cliente.preferencias,
+        'total_pedidos': cliente.total_pedidos or 0,
+        'total_gasto': f"{cliente.total_gasto or 0:.2f}",
+        'ultimo_pedido_em': cliente.ultimo_pedido_em.isoformat() if cliente.ultimo_pedido_em else None
+    }
+
+def cliente_por_telefone_dict(cliente, duplicados):
+    return {
+        'id': cliente.id,
+        'nome': cliente.nome,
+        'telefone': cliente.telefone,
+        'telefone_normalizado': cliente.telefone_normalizado,
+        'email': cliente.email,
+        'endereco': cliente.endereco,
+        'preferencias': cliente.preferencias,
+        'total_pedidos': cliente.total_pedidos or 0,
+        'total_gasto': f"{cliente.total_gasto or 0:.2f}",
+        'duplicados': [duplicado.id for duplicado in duplicados]
+    }
+
+def cliente_detalhe_dict(cliente, pedidos, anotacoes):
+    return {
+        'id': cliente.id,
+        'nome': cliente.nome,
+        'telefone': cliente.telefone,
+        'email': cliente.email,
+        'endereco': cliente.endereco,
+        'preferencias': cliente.preferencias,
+        'versao': cliente.versao,
+        'historico_pedidos': [{
+            'id': pedido.id,
+            'servicos': pedido.servicos,
+            'valor_total': str(pedido.valor_total),
+            'status': pedido.status,
+            'data_pedido': pedido.data_pedido.isoformat() if pedido.data_pedido else None,
+            'data_entrega': pedido.data_entrega.isoformat() if pedido.data_entrega else None
+        } for pedido in pedidos],
+        'anotacoes': [{
+            'id': anotacao.id,
+            'texto': anotacao.texto,
+            'data_criacao': anotacao.data_criacao.isoformat() if anotacao.data_criacao else None
+        } for anotacao in anotacoes]
+    }
+
 @clientes_bp.route('/', methods=['POST'])
 def criar_cliente():
     data = request.get_json()
@@ -18,6 +102,10 @@ def criar_cliente():
     if not nome or not telefone:
         return jsonify({'error': 'Nome e telefone são campos obrigatórios.'}), 400
 
+    existente = Cliente.telefone_em_uso(telefone)
+    if existente:
+        return jsonify({'error': 'Telefone já cadastrado.', 'cliente_id': existente.id}), 409
+
     try:
         novo_cliente = Cliente(
             nome=nome,
@@ -48,82 +136,80 @@ def listar_clientes():
     search_term = request.args.get('search', '').lower()
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
+    ordenar = request.args.get('ordenar')
+    ordem = request.args.get('ordem', 'asc')
+    min_pedidos = request.args.get('min_pedidos', type=int)
+    min_gasto = request.args.get('min_gasto', type=float)
 
-    clientes_query = Cliente.query
-
-    if search_term:
-        clientes_query = clientes_query.filter(
-            (Cliente.nome.ilike(f'%{search_term}%')) |
-            (Cliente.telefone.ilike(f'%{search_term}%')) |
-            (Cliente.email.ilike(f'%{search_term}%'))
-        )
+    if ordenar and ordenar not in ORDENACOES_CLIENTES:
+        return jsonify({'error': 'Ordenação inválida. Use nome, total_pedidos, total_gasto ou ultimo_pedido.'}), 400
 
+    clientes_query = filtrar_clientes(Cliente.query, search_term, min_pedidos, min_gasto, ordenar, ordem)
     clientes_pagination = clientes_query.paginate(page=page, per_page=per_page, error_out=False)
-    clientes = clientes_pagination.items
-
-    clientes_data = []
-    for cliente in clientes:
-        clientes_data.append({
-            'id': cliente.id,
-            'nome': cliente.nome,
-            'telefone': cliente.telefone,
-            'email': cliente.email,
-            'endereco': cliente.endereco,
-            'preferencias': cliente.preferencias
-        })
 
     return jsonify({
-        'clientes': clientes_data,
+        'clientes': [cliente_resumo_dict(cliente) for cliente in clientes_pagination.items],
         'total_pages': clientes_pagination.pages,
         'current_page': clientes_pagination.page,
         'total_items': clientes_pagination.total
     }), 200
 
+@clientes_bp.route('/por-telefone/<string:telefone>', methods=['GET'])
+def obter_cliente_por_telefone(telefone):
+    telefone_normalizado = normalizar_telefone(telefone)
+    if not telefone_normalizado:
+        return jsonify({'error': 'Telefone inválido. Informe o DDD e o número.'}), 400
+
+    clientes = Cliente.query.filter(
+        Cliente.telefone_normalizado == telefone_normalizado,
+        Cliente.excluido_em.is_(None)
+    ).order_by(Cliente.id.asc()).all()
+    if not clientes:
+        return jsonify({'error': 'Cliente não encontrado.'}), 404
+
+    return jsonify(cliente_por_telefone_dict(clientes[0], clientes[1:])), 200
+
+@clientes_bp.route('/duplicados/mesclar', methods=['POST'])
+def mesclar_duplicados():
+    simular = request.args.get('simular', 'false').lower() == 'true'
+    try:
+        grupos = mesclar_clientes_duplicados(simular=simular)
+        return jsonify({
+            'message': f"{sum(len(duplicados) for duplicados in grupos.values())} cliente(s) duplicado(s) {'encontrado(s)' if simular else 'mesclado(s)'}.",
+            'grupos': [{'cliente_id': mantido, 'duplicados': duplicados} for mantido, duplicados in grupos.items()]
+        }), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Erro ao mesclar clientes duplicados: {str(e)}'}), 500
+
 @clientes_bp.route('/<int:cliente_id>', methods=['GET'])
 def obter_cliente(cliente_id):
     cliente = Cliente.query.get(cliente_id)
-    if not cliente:
+    if not cliente or cliente.excluido_em:
         return jsonify({'error': 'Cliente não encontrado.'}), 404
 
-    historico_pedidos = []
-    for pedido in cliente.pedidos.order_by(Pedido.data_pedido.desc()).all():
-        historico_pedidos.append({
-            'id': pedido.id,
-            'servicos': pedido.servicos,
-            'valor_total': str(pedido.valor_total),
-            'status': pedido.status,
-            'data_pedido': pedido.data_pedido.isoformat() if pedido.data_pedido else None,
-            'data_entrega': pedido.data_entrega.isoformat() if pedido.data_entrega else None
-        })
-
-    anotacoes_cliente = []
-    if hasattr(cliente, 'anotacoes'):
-        for anotacao in cliente.anotacoes.order_by(AnotacaoCliente.data_criacao.desc()).all():
-            anotacoes_cliente.append({
-                'id': anotacao.id,
-                'texto': anotacao.texto,
-                'data_criacao': anotacao.data_criacao.isoformat() if anotacao.data_criacao else None
-            })
+    historico_pedidos = cliente.pedidos.order_by(Pedido.data_pedido.desc()).all()
+    anotacoes_cliente = cliente.anotacoes.order_by(AnotacaoCliente.data_criacao.desc()).all() if hasattr(cliente, 'anotacoes') else []
 
-
-    return jsonify({
-        'id': cliente.id,
-        'nome': cliente.nome,
-        'telefone': cliente.telefone,
-        'email': cliente.email,
-        'endereco': cliente.endereco,
-        'preferencias': cliente.preferencias,
-        'historico_pedidos': historico_pedidos,
-        'anotacoes': anotacoes_cliente
-    }), 200
+    dados = cliente_detalhe_dict(cliente, historico_pedidos, anotacoes_cliente)
+    resposta = jsonify(dados)
+    resposta.set_etag(etag_registro(cliente.versao, dados))
+    return resposta, 200
 
 @clientes_bp.route('/<int:cliente_id>', methods=['PUT'])
 def atualizar_cliente(cliente_id):
     cliente = Cliente.query.get(cliente_id)
-    if not cliente:
+    if not cliente or cliente.excluido_em:
         return jsonify({'error': 'Cliente não encontrado.'}), 404
 
+    erro_versao = verificar_if_match(cliente)
+    if erro_versao:
+        return erro_versao
+
     data = request.get_json()
+
+    if data.get('telefone') and Cliente.telefone_em_uso(data['telefone'], ignorar_id=cliente.id):
+        return jsonify({'error': 'Telefone já cadastrado para outro cliente.'}), 409
     
     cliente.nome = data.get('nome', cliente.nome)
     cliente.telefone = data.get('telefone', cliente.telefone)
@@ -133,14 +219,22 @@ def atualizar_cliente(cliente_id):
 
     try:
         db.session.commit()
-        return jsonify({'message': 'Cliente atualizado com sucesso!', 'cliente': {
+        dados = {
             'id': cliente.id,
             'nome': cliente.nome,
             'telefone': cliente.telefone,
             'email': cliente.email,
             'endereco': cliente.endereco,
-            'preferencias': cliente.preferencias
-        }}), 200
+            'preferencias': cliente.preferencias,
+            'versao': cliente.versao
+        }
+        resposta = jsonify({'message': 'Cliente atualizado com sucesso!', 'cliente': dados})
+        resposta.set_etag(etag_registro(cliente.versao, dados))
+        return resposta, 200
+    except StaleDataError:
+        # Outra requisição gravou entre a leitura e o commit.
+        db.session.rollback()
+        return resposta_conflito(db.session.query(Cliente.versao).filter_by(id=cliente_id).scalar())
     except IntegrityError:
         db.session.rollback()
         return jsonify({'error': 'Telefone ou e-mail já cadastrado para outro cliente.'}), 409
@@ -150,18 +244,35 @@ def atualizar_cliente(cliente_id):
 
 @clientes_bp.route('/<int:cliente_id>', methods=['DELETE'])
 def deletar_cliente(cliente_id):
-    cliente = Cliente.query.get(cliente_id)
-    if not cliente:
+    soft = request.args.get('soft', 'false').lower() == 'true'
+    if not db.session.query(Cliente.id).filter_by(id=cliente_id).first():
         return jsonify({'error': 'Cliente não encontrado.'}), 404
 
     try:
-        db.session.delete(cliente)
-        db.session.commit()
-        return jsonify({'message': 'Cliente deletado com sucesso!'}), 200
+        removidos = excluir_cliente(cliente_id, soft=soft)
+        if soft:
+            return jsonify({'message': 'Cliente marcado como excluído com sucesso!'}), 200
+        return jsonify({'message': 'Cliente deletado com sucesso!', 'removidos': removidos}), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@clientes_bp.route('/anotacoes/busca', methods=['GET'])
+def buscar_anotacoes_por_texto():
+    try:
+        parametros = parametros_busca(request.args)
+    except ValueError:
+        return jsonify({'error': 'Formato de data inválido. Use YYYY-MM-DD.'}), 400
+
+    if not termo_valido(parametros['termo']):
+        return jsonify({'error': 'Informe o termo de busca no parâmetro q.'}), 400
+
+    try:
+        resultados = buscar_anotacoes(cliente_id=request.args.get('cliente_id', type=int), **parametros)
+        return jsonify(resultados), 200
+    except Exception as e:
+        return jsonify({'error': f'Erro ao buscar anotações: {str(e)}'}), 500
+
 @clientes_bp.route('/<int:cliente_id>/anotacoes', methods=['POST'])
 def adicionar_anotacao_cliente(cliente_id):
     cliente = Cliente.query.get(cliente_id)
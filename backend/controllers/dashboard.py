@@ -0,0 +1,145 @@
+from flask import Blueprint, jsonify, current_app
+from backend.models.database import db
+from backend.models.pedido import Pedido
+from backend.models.cliente import Cliente
+from backend.models.pagamento import Pagamento
+from backend.models.arquivo import PedidoArquivado
+from backend.services.arquivamento import arquivo_necessario_pedidos
+from backend.services.coalescencia import coalescer
+from sqlalchemy import select, func, case, or_, and_
+from datetime import datetime, timedelta
+import copy
+import decimal
+import threading
+import time
+import weakref
+
+dashboard_bp = Blueprint('dashboard', __name__)
+
+STATUS_RECEITA = ('pago', 'entregue')
+STATUS_EM_ABERTO = ('pendente', 'pago')
+DIAS_PRAZO = 7
+LIMITE_SERVICOS = 5
+LIMITE_PAGAMENTOS = 5
+
+_trava = threading.Lock()
+# Por app: apps no mesmo processo (ex.: bancos clonados nos testes) não compartilham o resumo.
+_caches = weakref.WeakKeyDictionary()
+
+
+def _valor(valor):
+    return str(decimal.Decimal(str(valor or 0)).quantize(decimal.Decimal('0.01')))
+
+
+def _contar(condicao):
+    return func.count(case((condicao, Pedido.id)))
+
+
+def _somar(condicao, coluna):
+    return func.sum(case((condicao, coluna), else_=0))
+
+
+@coalescer()
+def calcular_resumo_dashboard():
+    """Números da tela inicial: contadores de pedidos, receita do mês, serviços mais vendidos e últimos pagamentos.
+
+    Os contadores e totais saem de uma única consulta com agregações
+    condicionais (CASE) sobre os pedidos, com os recebimentos do mês numa
+    subconsulta escalar; as listas, de duas consultas pequenas com LIMIT.
+    Os critérios de prazo são os de `/api/pedidos/prazos`.
+    """
+    agora = datetime.now()
+    hoje = agora.date()
+    data_limite = hoje + timedelta(days=DIAS_PRAZO)
+    inicio_mes = datetime(agora.year, agora.month, 1)
+
+    em_aberto = Pedido.status.in_(STATUS_EM_ABERTO)
+    com_entrega = Pedido.data_entrega.isnot(None)
+    receita_mes = and_(Pedido.status.in_(STATUS_RECEITA), Pedido.data_pedido >= inicio_mes)
+    recebido_mes = select(func.coalesce(func.sum(Pagamento.valor_pago), 0)).where(Pagamento.data_pagamento >= inicio_mes).scalar_subquery()
+
+    totais = db.session.execute(
+        select(
+            _contar(Pedido.status == 'pendente').label('pendentes'),
+            _somar(Pedido.status == 'pendente', Pedido.valor_total).label('valor_pendente'),
+            _contar(and_(em_aberto, com_entrega, Pedido.data_entrega < hoje)).label('atrasados'),
+            _contar(and_(em_aberto, com_entrega, Pedido.data_entrega >= hoje, Pedido.data_entrega <= data_limite)).label('vencem_na_semana'),
+            _contar(receita_mes).label('pedidos_mes'),
+            _somar(receita_mes, Pedido.valor_total).label('receita_mes'),
+            recebido_mes.label('recebido_mes')
+        ).where(or_(em_aberto, Pedido.data_pedido >= inicio_mes))
+    ).one()
+
+    receita = decimal.Decimal(str(totais.receita_mes or 0))
+    pedidos_mes = totais.pedidos_mes
+    # Só quando o arquivamento já alcançou o mês corrente (corte muito curto).
+    if arquivo_necessario_pedidos(data_inicio=inicio_mes):
+        with db.engines['arquivo'].connect() as conn:
+            arquivados = conn.execute(
+                select(func.count(PedidoArquivado.id), func.coalesce(func.sum(PedidoArquivado.valor_total), 0))
+                .where(PedidoArquivado.status.in_(STATUS_RECEITA), PedidoArquivado.data_pedido >= inicio_mes)
+            ).one()
+        pedidos_mes += arquivados[0]
+        receita += decimal.Decimal(str(arquivados[1]))
+
+    servicos = db.session.execute(
+        select(Pedido.servicos, func.count(Pedido.id).label('quantidade'), func.sum(Pedido.valor_total).label('receita'))
+        .where(receita_mes)
+        .group_by(Pedido.servicos)
+        .order_by(func.count(Pedido.id).desc(), Pedido.servicos)
+        .limit(LIMITE_SERVICOS)
+    ).all()
+
+    pagamentos = db.session.execute(
+        select(Pagamento.id, Pagamento.pedido_id, Cliente.nome, Pagamento.valor_pago, Pagamento.forma_pagamento, Pagamento.data_pagamento)
+        .outerjoin(Pedido, Pedido.id == Pagamento.pedido_id)
+        .outerjoin(Cliente, Cliente.id == Pedido.cliente_id)
+        .order_by(Pagamento.data_pagamento.desc(), Pagamento.id.desc())
+        .limit(LIMITE_PAGAMENTOS)
+    ).all()
+
+    return {
+        'pedidos_pendentes': totais.pendentes,
+        'valor_pendente': _valor(totais.valor_pendente),
+        'pedidos_atrasados': totais.atrasados,
+        'pedidos_vencendo_na_semana': totais.vencem_na_semana,
+        'pedidos_mes': pedidos_mes,
+        'receita_mes': _valor(receita),
+        'recebido_mes': _valor(totais.recebido_mes),
+        'servicos_mais_vendidos': [{
+            'servicos': linha.servicos,
+            'quantidade': linha.quantidade,
+            'receita': _valor(linha.receita)
+        } for linha in servicos],
+        'pagamentos_recentes': [{
+            'id': linha.id,
+            'pedido_id': linha.pedido_id,
+            'cliente_nome': linha.nome or 'N/A',
+            'valor_pago': str(linha.valor_pago),
+            'forma_pagamento': linha.forma_pagamento,
+            'data_pagamento': linha.data_pagamento.isoformat()
+        } for linha in pagamentos],
+        'inicio_mes': inicio_mes.date().isoformat(),
+        'gerado_em': agora.isoformat()
+    }
+
+
+def resumo_dashboard():
+    """Resumo guardado por DASHBOARD_CACHE_SECONDS; 0 desliga o cache."""
+    validade = current_app.config.get('DASHBOARD_CACHE_SECONDS', 5)
+    app = current_app._get_current_object()
+    with _trava:
+        cache = _caches.setdefault(app, {'resumo': None, 'calculado_em': 0.0})
+        if cache['resumo'] is not None and time.monotonic() - cache['calculado_em'] < validade:
+            return copy.deepcopy(cache['resumo'])
+
+    # Requisições simultâneas com o cache vencido compartilham um único cálculo.
+    resumo = calcular_resumo_dashboard()
+    with _trava:
+        cache.update(resumo=resumo, calculado_em=time.monotonic())
+    return copy.deepcopy(resumo)
+
+
+@dashboard_bp.route('/', methods=['GET'])
+def obter_dashboard():
+    return jsonify(resumo_dashboard()), 200
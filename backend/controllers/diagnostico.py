@@ -0,0 +1,26 @@
+from flask import Blueprint, jsonify
+from backend.services.compressao import estatisticas_compressao, codificacoes_disponiveis
+from backend.services.coalescencia import estatisticas_coalescencia
+from backend.services.cache_analitico import cache_analitico, estatisticas_cache_analitico
+
+diagnostico_bp = Blueprint('diagnostico', __name__)
+
+
+@diagnostico_bp.route('/compressao', methods=['GET'])
+def obter_estatisticas_compressao():
+    return jsonify({
+        'codificacoes_disponiveis': codificacoes_disponiveis(),
+        'por_codificacao': estatisticas_compressao()
+    }), 200
+
+
+@diagnostico_bp.route('/coalescencia', methods=['GET'])
+def obter_estatisticas_coalescencia():
+    return jsonify(estatisticas_coalescencia()), 200
+
+
+@diagnostico_bp.route('/cache-analitico', methods=['GET'])
+def obter_estatisticas_cache_analitico():
+    # Consultar já dispara a atualização, se estiver vencida.
+    cache_analitico()
+    return jsonify(estatisticas_cache_analitico()), 200
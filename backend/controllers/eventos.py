@@ -0,0 +1,163 @@
+from flask import Blueprint, request, jsonify, Response, stream_with_context, current_app
+from backend.models.database import db
+from backend.models.evento import EventoOutbox
+from datetime import datetime, timedelta
+import threading
+import time
+import weakref
+
+eventos_bp = Blueprint('eventos', __name__)
+
+_trava = threading.Lock()
+# Por app, como o cache do dashboard: apps no mesmo processo não compartilham o notificador.
+_notificadores = weakref.WeakKeyDictionary()
+
+
+class _Notificador:
+    """Uma thread por app consulta o maior id do outbox e acorda as conexões abertas quando ele muda.
+
+    As conexões só vão ao banco quando há evento novo (ou no keepalive);
+    a thread termina quando a última conexão fecha.
+    """
+
+    def __init__(self, app, intervalo):
+        self._app = weakref.ref(app)
+        self._intervalo = intervalo
+        self._condicao = threading.Condition()
+        self._assinantes = 0
+        self._thread = None
+        self.maior_id = None
+
+    def assinar(self):
+        with self._condicao:
+            self._assinantes += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._consultar, name='sse-notificador', daemon=True)
+                self._thread.start()
+
+    def cancelar(self):
+        with self._condicao:
+            self._assinantes -= 1
+
+    def aguardar(self, visto, timeout):
+        """Espera o maior id do outbox passar de `visto`; devolve o maior id conhecido (None antes da 1ª consulta)."""
+        with self._condicao:
+            self._condicao.wait_for(lambda: self.maior_id is not None and self.maior_id != visto, timeout)
+            return self.maior_id
+
+    def _consultar(self):
+        while True:
+            with self._condicao:
+                app = self._app()
+                if self._assinantes == 0 or app is None:
+                    self._thread = None
+                    return
+            with app.app_context():
+                maior_id = db.session.query(db.func.max(EventoOutbox.id)).scalar() or 0
+            del app
+            with self._condicao:
+                if maior_id != self.maior_id:
+                    self.maior_id = maior_id
+                    self._condicao.notify_all()
+            time.sleep(self._intervalo)
+
+
+def _notificador(config):
+    app = current_app._get_current_object()
+    with _trava:
+        notificador = _notificadores.get(app)
+        if notificador is None:
+            notificador = _notificadores[app] = _Notificador(app, config.get('SSE_POLL_INTERVAL', 1.0))
+        return notificador
+
+
+def _buscar_eventos(ultimo_id, limite, carencia):
+    """Próximos eventos depois de `ultimo_id` que já podem ser enviados, e se a lista foi cortada num buraco.
+
+    Ids são atribuídos no INSERT, mas só ficam visíveis no commit: uma
+    transação mais lenta pode confirmar um id menor depois de outra. Um buraco
+    na sequência segura os eventos seguintes até que o evento logo depois dele
+    tenha mais de `carencia` segundos; passado isso, o id é dado como perdido
+    (rollback ou limpeza do outbox) e o cursor avança.
+    """
+    eventos = db.session.query(
+        EventoOutbox.id,
+        EventoOutbox.entidade,
+        EventoOutbox.operacao,
+        EventoOutbox.payload,
+        EventoOutbox.criado_em
+    ).filter(EventoOutbox.id > ultimo_id).order_by(EventoOutbox.id.asc()).limit(limite).all()
+    # Encerra a transação de leitura para que a próxima consulta enxergue eventos novos.
+    db.session.rollback()
+
+    limite_criacao = datetime.now() - timedelta(seconds=carencia)
+    esperado = ultimo_id + 1
+    for posicao, evento in enumerate(eventos):
+        if evento.id != esperado and evento.criado_em > limite_criacao:
+            return eventos[:posicao], True
+        esperado = evento.id + 1
+    return eventos, False
+
+
+def _gerar_stream(notificador, ultimo_id, entidades, config):
+    intervalo = config.get('SSE_POLL_INTERVAL', 1.0)
+    keepalive = config.get('SSE_KEEPALIVE_SECONDS', 15)
+    limite = config.get('SSE_BATCH_SIZE', 200)
+    carencia = config.get('SSE_VISIBILITY_LAG_SECONDS', 5)
+    yield f"retry: {int(intervalo * 1000)}\n\n"
+    fim = time.monotonic() + config.get('SSE_MAX_CONNECTION_SECONDS', 300)
+    visto = None
+    notificador.assinar()
+    try:
+        while True:
+            eventos, em_espera = _buscar_eventos(ultimo_id, limite, carencia)
+            for evento_id, entidade, operacao, payload, criado_em in eventos:
+                # O filtro de entidades fica aqui: os buracos só aparecem olhando a sequência inteira.
+                ultimo_id = evento_id
+                if not entidades or entidade in entidades:
+                    yield f"id: {evento_id}\nevent: {entidade}.{operacao}\ndata: {payload}\n\n"
+            if len(eventos) == limite:
+                continue
+
+            restante = fim - time.monotonic()
+            if restante <= 0:
+                break
+            if em_espera:
+                # Um commit atrasado não muda o maior id: consulta de novo a cada intervalo.
+                notificador.aguardar(visto, min(intervalo, restante))
+                continue
+            maior_id = notificador.aguardar(visto, min(keepalive, restante))
+            if maior_id == visto:
+                if time.monotonic() < fim:
+                    yield ": keepalive\n\n"
+                continue
+            visto = maior_id
+    finally:
+        notificador.cancelar()
+
+    # Conexão com prazo: o cliente reconecta com o Last-Event-ID, que esta linha atualiza mesmo sem eventos enviados.
+    yield f"id: {ultimo_id}\n\n"
+
+
+@eventos_bp.route('/', methods=['GET'])
+def stream_eventos():
+    ultimo_id_str = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        ultimo_id = int(ultimo_id_str) if ultimo_id_str else None
+    except ValueError:
+        return jsonify({'error': 'Last-Event-ID inválido.'}), 400
+
+    entidades_str = request.args.get('entidades')
+    entidades = [e.strip() for e in entidades_str.split(',') if e.strip()] if entidades_str else None
+
+    if ultimo_id is None:
+        # Sem ponto de retomada: começa a partir do evento mais recente.
+        ultimo_id = db.session.query(db.func.max(EventoOutbox.id)).scalar() or 0
+        db.session.rollback()
+
+    config = current_app.config
+    stream = _gerar_stream(_notificador(config), ultimo_id, entidades, config)
+    return Response(stream_with_context(stream), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
@@ -0,0 +1,89 @@
+from flask import Blueprint, request, jsonify
+from backend.models.database import db
+from backend.models.execucao_job import ExecucaoJob
+from backend.models.manutencao import ManutencaoBanco
+from backend.services.scheduler import listar_jobs
+
+jobs_bp = Blueprint('jobs', __name__)
+
+LIMITE_MAXIMO_EXECUCOES = 500
+
+
+def listar_execucoes(job_id=None, status=None, duracao_minima_ms=None, limite=50):
+    query = ExecucaoJob.query
+    if job_id:
+        query = query.filter(ExecucaoJob.job_id == job_id)
+    if status:
+        query = query.filter(ExecucaoJob.status.in_(status if isinstance(status, (list, tuple)) else [status]))
+    if duracao_minima_ms is not None:
+        query = query.filter(ExecucaoJob.duracao_ms >= duracao_minima_ms)
+
+    execucoes = query.order_by(ExecucaoJob.inicio.desc()).limit(min(limite, LIMITE_MAXIMO_EXECUCOES)).all()
+    return [{
+        'id': execucao.id,
+        'job_id': execucao.job_id,
+        'status': execucao.status,
+        'agendado_para': execucao.agendado_para.isoformat() if execucao.agendado_para else None,
+        'inicio': execucao.inicio.isoformat(),
+        'fim': execucao.fim.isoformat() if execucao.fim else None,
+        'duracao_ms': execucao.duracao_ms,
+        'linhas_processadas': execucao.linhas_processadas,
+        'erro': execucao.erro
+    } for execucao in execucoes]
+
+
+def listar_manutencoes(operacao=None, banco=None, limite=50):
+    query = ManutencaoBanco.query
+    if operacao:
+        query = query.filter(ManutencaoBanco.operacao == operacao)
+    if banco:
+        query = query.filter(ManutencaoBanco.banco == banco)
+
+    manutencoes = query.order_by(ManutencaoBanco.inicio.desc()).limit(min(limite, LIMITE_MAXIMO_EXECUCOES)).all()
+    return [{
+        'id': manutencao.id,
+        'banco': manutencao.banco,
+        'operacao': manutencao.operacao,
+        'inicio': manutencao.inicio.isoformat(),
+        'duracao_ms': manutencao.duracao_ms,
+        'tamanho_antes_bytes': manutencao.tamanho_antes_bytes,
+        'tamanho_depois_bytes': manutencao.tamanho_depois_bytes,
+        'paginas_livres_antes': manutencao.paginas_livres_antes,
+        'paginas_livres_depois': manutencao.paginas_livres_depois,
+        'arquivo': manutencao.arquivo,
+        'erro': manutencao.erro
+    } for manutencao in manutencoes]
+
+
+@jobs_bp.route('', methods=['GET'])
+def obter_jobs():
+    return jsonify(listar_jobs()), 200
+
+
+@jobs_bp.route('/execucoes', methods=['GET'])
+def obter_execucoes():
+    try:
+        duracao_minima_ms = request.args.get('duracao_minima_ms', type=int)
+        limite = request.args.get('limite', 50, type=int)
+        execucoes = listar_execucoes(
+            job_id=request.args.get('job_id'),
+            status=request.args.getlist('status'),
+            duracao_minima_ms=duracao_minima_ms,
+            limite=limite
+        )
+        return jsonify(execucoes), 200
+    except Exception as e:
+        return jsonify({'error': f'Erro ao listar execuções de jobs: {str(e)}'}), 500
+
+
+@jobs_bp.route('/manutencao', methods=['GET'])
+def obter_manutencoes():
+    try:
+        manutencoes = listar_manutencoes(
+            operacao=request.args.get('operacao'),
+            banco=request.args.get('banco'),
+            limite=request.args.get('limite', 50, type=int)
+        )
+        return jsonify(manutencoes), 200
+    except Exception as e:
+        return jsonify({'error': f'Erro ao listar manutenções do banco: {str(e)}'}), 500
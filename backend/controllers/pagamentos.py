@@ -1,13 +1,23 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, send_file, current_app
 from backend.models.database import db
 from backend.models.pagamento import Pagamento
 from backend.models.pedido import Pedido
 from backend.models.cliente import Cliente
+from backend.services.exportacao_colunar import exportar_analytics
+from backend.services.contadores import atualizar_contadores_clientes
+from backend.services.arquivamento import arquivo_necessario_pagamentos, nomes_clientes
+from backend.models.arquivo import PedidoArquivado, PagamentoArquivado
+from backend.services.recibos import dados_recibo, renderizar_recibos, recibos_do_periodo, FORMATOS as FORMATOS_RECIBO
+from backend.services.conciliacao import conciliar_extrato, aplicar_conciliacao
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
 import os
 from datetime import datetime, timedelta
 import decimal
 import csv
+import io
+import tempfile
+import zipfile
 
 pagamentos_bp = Blueprint('pagamentos', __name__)
 
@@ -46,6 +56,7 @@ def registrar_pagamento():
         db.session.add(new_pagamento)
 
         pedido.status = 'pago'
+        atualizar_contadores_clientes(pedido.cliente_id)
         db.session.commit()
 
         return jsonify({'message': 'Pagamento registrado com sucesso!', 'pagamento': {
@@ -58,47 +69,97 @@ def registrar_pagamento():
     except IntegrityError:
         db.session.rollback()
         return jsonify({'error': 'Este pedido já possui um pagamento registrado.'}), 409
+    except StaleDataError:
+        db.session.rollback()
+        return jsonify({'error': 'O pedido foi alterado por outra pessoa durante o registro. Confira e tente novamente.'}), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 @pagamentos_bp.route('/<int:pagamento_id>/recibo', methods=['GET'])
 def gerar_recibo(pagamento_id):
-    pagamento = Pagamento.query.get(pagamento_id)
-    if not pagamento:
+    formato = request.args.get('formato')
+    if formato and formato not in FORMATOS_RECIBO:
+        return jsonify({'error': 'Formato inválido. Use pdf ou html.'}), 400
+
+    recibo = dados_recibo(pagamento_id)
+    if not recibo:
         return jsonify({'error': 'Pagamento não encontrado.'}), 404
 
-    pedido = Pedido.query.get(pagamento.pedido_id)
-    if not pedido:
-        return jsonify({'error': 'Pedido associado ao pagamento não encontrado.'}), 404
+    if not formato:
+        pagamento = db.session.get(Pagamento, pagamento_id)
+        # Mantém as chaves e os formatos da resposta original; os campos novos do recibo vêm junto.
+        recibo_data = {
+            **recibo,
+            'id_pagamento': pagamento.id,
+            'valor_pago': str(pagamento.valor_pago),
+            'data_pagamento': pagamento.data_pagamento.isoformat() if pagamento.data_pagamento else None,
+            'servico_descricao': recibo['servicos']
+        }
+        return jsonify({'message': 'Informações do recibo (use ?formato=pdf ou ?formato=html para o arquivo):', 'recibo_data': recibo_data}), 200
+
+    try:
+        [(_, caminho)] = renderizar_recibos([recibo], formato)
+    except Exception as e:
+        return jsonify({'error': f'Erro ao gerar recibo: {str(e)}'}), 500
+
+    return send_file(os.path.abspath(caminho), mimetype='application/pdf' if formato == 'pdf' else 'text/html',
+                     as_attachment=formato == 'pdf', download_name=f"{recibo['numero']}.{formato}")
 
-    cliente = Cliente.query.get(pedido.cliente_id)
-    if not cliente:
-        return jsonify({'error': 'Cliente associado ao pedido não encontrado.'}), 404
+@pagamentos_bp.route('/recibos/zip', methods=['GET'])
+def baixar_recibos_zip():
+    start_date_str = request.args.get('start_date')
+    end_date_str = request.args.get('end_date')
+    formato = request.args.get('formato', 'pdf')
+    if formato not in FORMATOS_RECIBO:
+        return jsonify({'error': 'Formato inválido. Use pdf ou html.'}), 400
+    if not start_date_str or not end_date_str:
+        return jsonify({'error': 'Informe o período com start_date e end_date (YYYY-MM-DD).'}), 400
+
+    try:
+        start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
+        end_date = datetime.strptime(end_date_str, '%Y-%m-%d') + timedelta(days=1)
+    except ValueError:
+        return jsonify({'error': 'Formato de data inválido. Use YYYY-MM-DD.'}), 400
 
+    maximo = current_app.config.get('RECIBOS_ZIP_MAXIMO', 1000)
+    recibos = recibos_do_periodo(start_date, end_date, limite=maximo + 1)
+    if not recibos:
+        return jsonify({'error': 'Nenhum pagamento encontrado no período.'}), 404
+    if len(recibos) > maximo:
+        return jsonify({'error': f'O período tem mais de {maximo} recibos. Divida o download em períodos menores.'}), 400
 
-    recibo_info = {
-        'id_pagamento': pagamento.id,
-        'valor_pago': str(pagamento.valor_pago),
-        'forma_pagamento': pagamento.forma_pagamento,
-        'data_pagamento': pagamento.data_pagamento.isoformat(),
-        'cliente_nome': cliente.nome,
-        'servico_descricao': pedido.servicos
-    }
-    return jsonify({'message': 'Geração de recibo em PDF foi desativada. Informações do recibo:', 'recibo_data': recibo_info}), 200
+    try:
+        arquivos = renderizar_recibos(recibos, formato)
+    except Exception as e:
+        return jsonify({'error': f'Erro ao gerar recibos: {str(e)}'}), 500
+
+    # PDFs já são comprimidos; só o HTML ganha com DEFLATE.
+    compressao = zipfile.ZIP_STORED if formato == 'pdf' else zipfile.ZIP_DEFLATED
+    pacote = tempfile.SpooledTemporaryFile(max_size=16 * 1024 * 1024)
+    with zipfile.ZipFile(pacote, 'w', compression=compressao) as zip_file:
+        for recibo, caminho in arquivos:
+            zip_file.write(caminho, arcname=f"{recibo['numero']}.{formato}")
+    pacote.seek(0)
+
+    return send_file(pacote, mimetype='application/zip', as_attachment=True,
+                     download_name=f"recibos_{start_date_str}_{end_date_str}.zip")
 
 @pagamentos_bp.route('/historico', methods=['GET'])
 def historico_financeiro():
     start_date_str = request.args.get('start_date')
     end_date_str = request.args.get('end_date')
     forma_pagamento = request.args.get('forma_pagamento')
+    start_date = None
     
     query = Pagamento.query.order_by(Pagamento.data_pagamento.desc())
+    query_arquivo = PagamentoArquivado.query.order_by(PagamentoArquivado.data_pagamento.desc())
 
     if start_date_str:
         try:
             start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
             query = query.filter(Pagamento.data_pagamento >= start_date)
+            query_arquivo = query_arquivo.filter(PagamentoArquivado.data_pagamento >= start_date)
         except ValueError:
             return jsonify({'error': 'Formato de data inicial inválido. Use<ctrl42>-MM-DD.'}), 400
 
@@ -106,11 +167,13 @@ def historico_financeiro():
         try:
             end_date = datetime.strptime(end_date_str, '%Y-%m-%d') + timedelta(days=1)
             query = query.filter(Pagamento.data_pagamento < end_date)
+            query_arquivo = query_arquivo.filter(PagamentoArquivado.data_pagamento < end_date)
         except ValueError:
             return jsonify({'error': 'Formato de data final inválido. Use<ctrl42>-MM-DD.'}), 400
     
     if forma_pagamento:
         query = query.filter(Pagamento.forma_pagamento.ilike(f'%{forma_pagamento}%'))
+        query_arquivo = query_arquivo.filter(PagamentoArquivado.forma_pagamento.ilike(f'%{forma_pagamento}%'))
 
     pagamentos = query.all()
 
@@ -126,20 +189,45 @@ def historico_financeiro():
             'forma_pagamento': pgto.forma_pagamento,
             'data_pagamento': pgto.data_pagamento.isoformat()
         })
+
+    if arquivo_necessario_pagamentos(start_date):
+        historico.extend(_historico_arquivado(query_arquivo.all()))
+        historico.sort(key=lambda item: item['data_pagamento'], reverse=True)
+
     return jsonify(historico), 200
 
+def _historico_arquivado(pagamentos_arquivados):
+    pedido_ids = [pgto.pedido_id for pgto in pagamentos_arquivados]
+    clientes_por_pedido = dict(
+        db.session.query(PedidoArquivado.id, PedidoArquivado.cliente_id).filter(PedidoArquivado.id.in_(pedido_ids)).all()
+    ) if pedido_ids else {}
+    nomes = nomes_clientes(clientes_por_pedido.values())
+
+    return [{
+        'id': pgto.id,
+        'pedido_id': pgto.pedido_id,
+        'cliente_nome': nomes.get(clientes_por_pedido.get(pgto.pedido_id), 'N/A'),
+        'valor_pago': str(pgto.valor_pago),
+        'forma_pagamento': pgto.forma_pagamento,
+        'data_pagamento': pgto.data_pagamento.isoformat(),
+        'arquivado': True
+    } for pgto in pagamentos_arquivados]
+
 @pagamentos_bp.route('/exportar', methods=['GET'])
 def exportar_historico_financeiro():
     start_date_str = request.args.get('start_date')
     end_date_str = request.args.get('end_date')
     forma_pagamento = request.args.get('forma_pagamento')
+    start_date = None
 
     query = Pagamento.query.order_by(Pagamento.data_pagamento.desc())
+    query_arquivo = PagamentoArquivado.query.order_by(PagamentoArquivado.data_pagamento.desc())
 
     if start_date_str:
         try:
             start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
             query = query.filter(Pagamento.data_pagamento >= start_date)
+            query_arquivo = query_arquivo.filter(PagamentoArquivado.data_pagamento >= start_date)
         except ValueError:
             return jsonify({'error': 'Formato de data inicial inválido. Use<ctrl42>-MM-DD.'}), 400
 
@@ -147,13 +235,30 @@ def exportar_historico_financeiro():
         try:
             end_date = datetime.strptime(end_date_str, '%Y-%m-%d') + timedelta(days=1)
             query = query.filter(Pagamento.data_pagamento < end_date)
+            query_arquivo = query_arquivo.filter(PagamentoArquivado.data_pagamento < end_date)
         except ValueError:
             return jsonify({'error': 'Formato de data final inválido. Use<ctrl42>-MM-DD.'}), 400
     
     if forma_pagamento:
         query = query.filter(Pagamento.forma_pagamento.ilike(f'%{forma_pagamento}%'))
+        query_arquivo = query_arquivo.filter(PagamentoArquivado.forma_pagamento.ilike(f'%{forma_pagamento}%'))
 
-    pagamentos = query.all()
+    linhas = []
+    for pgto in query.all():
+        pedido = Pedido.query.get(pgto.pedido_id)
+        cliente_nome = pedido.cliente.nome if pedido and pedido.cliente else 'N/A'
+        linhas.append({
+            'id': pgto.id,
+            'pedido_id': pgto.pedido_id,
+            'cliente_nome': cliente_nome,
+            'valor_pago': str(pgto.valor_pago),
+            'forma_pagamento': pgto.forma_pagamento,
+            'data_pagamento': pgto.data_pagamento.isoformat()
+        })
+
+    if arquivo_necessario_pagamentos(start_date):
+        linhas.extend(_historico_arquivado(query_arquivo.all()))
+        linhas.sort(key=lambda item: item['data_pagamento'], reverse=True)
 
     csv_filename = "historico_financeiro.csv"
     csv_path = os.path.join(OUTPUT_FOLDER, csv_filename) # Salva na pasta OUTPUT_FOLDER
@@ -161,16 +266,71 @@ def exportar_historico_financeiro():
     with open(csv_path, 'w', newline='', encoding='utf-8') as file:
         writer = csv.writer(file)
         writer.writerow(['ID Pagamento', 'ID Pedido', 'Nome Cliente', 'Valor Pago', 'Forma de Pagamento', 'Data Pagamento'])
-        for pgto in pagamentos:
-            pedido = Pedido.query.get(pgto.pedido_id)
-            cliente_nome = pedido.cliente.nome if pedido and pedido.cliente else 'N/A'
+        for linha in linhas:
             writer.writerow([
-                pgto.id,
-                pgto.pedido_id,
-                cliente_nome,
-                str(pgto.valor_pago),
-                pgto.forma_pagamento,
-                pgto.data_pagamento.isoformat()
+                linha['id'],
+                linha['pedido_id'],
+                linha['cliente_nome'],
+                linha['valor_pago'],
+                linha['forma_pagamento'],
+                linha['data_pagamento']
             ])
     
-    return jsonify({'message': f'Histórico financeiro exportado para: {csv_path}'}), 200
\ No newline at end of file
+    return jsonify({'message': f'Histórico financeiro exportado para: {csv_path}'}), 200
+
+@pagamentos_bp.route('/exportar/analytics', methods=['GET'])
+def exportar_analytics_colunar():
+    formato = request.args.get('formato', 'parquet').lower()
+    tabelas_str = request.args.get('tabelas')
+    tabelas = [t.strip() for t in tabelas_str.split(',') if t.strip()] if tabelas_str else None
+    completo = request.args.get('completo', 'false').lower() == 'true'
+
+    try:
+        arquivos = exportar_analytics(formato=formato, tabelas=tabelas, completo=completo)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Erro ao exportar dados analíticos: {str(e)}'}), 500
+
+    return jsonify({
+        'message': f'{len(arquivos)} arquivo(s) exportado(s) em formato {formato}.',
+        'arquivos': arquivos
+    }), 200
+
+@pagamentos_bp.route('/conciliacao', methods=['POST'])
+def conciliar_extrato_bancario():
+    arquivo = request.files.get('extrato')
+    if not arquivo:
+        return jsonify({'error': "Envie o arquivo do extrato no campo 'extrato' (multipart/form-data)."}), 400
+
+    formato = (request.form.get('formato') or os.path.splitext(arquivo.filename or '')[1].lstrip('.')).lower()
+    aplicar = request.form.get('aplicar', 'false').lower() == 'true'
+    janela_dias = request.form.get('janela_dias', type=int)
+    codificacao = request.form.get('codificacao', 'utf-8')
+
+    try:
+        texto = io.TextIOWrapper(arquivo.stream, encoding=codificacao, errors='replace', newline='')
+        resultado = conciliar_extrato(texto, formato, aplicar=aplicar, janela_dias=janela_dias)
+        return jsonify(resultado), 200
+    except (ValueError, decimal.InvalidOperation) as e:
+        return jsonify({'error': f'Extrato inválido: {str(e)}'}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Erro ao conciliar extrato: {str(e)}'}), 500
+
+@pagamentos_bp.route('/conciliacao/confirmar', methods=['POST'])
+def confirmar_conciliacao():
+    data = request.get_json()
+    correspondencias = data.get('correspondencias') if data else None
+    if not correspondencias:
+        return jsonify({'error': 'Informe a lista de correspondências (pedido_id, valor, data, referencia).'}), 400
+    if not all(item.get('pedido_id') and item.get('valor') and item.get('data') for item in correspondencias):
+        return jsonify({'error': 'Cada correspondência precisa de pedido_id, valor e data.'}), 400
+
+    try:
+        pagos = aplicar_conciliacao(correspondencias)
+        return jsonify({'message': f'{len(pagos)} pagamento(s) registrado(s).', 'pedidos_pagos': pagos}), 201
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Erro ao registrar pagamentos: {str(e)}'}), 500
@@ -2,12 +2,60 @@ from flask import Blueprint, request, jsonify
 from backend.models.database import db
 from backend.models.pedido import Pedido
 from backend.models.cliente import Cliente
+from backend.services.contadores import atualizar_contadores_clientes
+from backend.services.arquivamento import arquivo_necessario_pedidos, nomes_clientes
+from backend.services.busca import buscar_pedidos, parametros_busca, termo_valido
+from backend.models.arquivo import PedidoArquivado, PagamentoArquivado
+from backend.services.concorrencia import etag_registro, verificar_if_match, resposta_conflito
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
 from datetime import datetime, timedelta
 import decimal
 
 pedidos_bp = Blueprint('pedidos', __name__)
 
+def pedido_dict(pedido, cliente_nome, hoje):
+    return {
+        'id': pedido.id,
+        'cliente_id': pedido.cliente_id,
+        'cliente_nome': cliente_nome,
+        'servicos': pedido.servicos,
+        'valor_total': str(pedido.valor_total),
+        'status': pedido.status,
+        'data_pedido': pedido.data_pedido.isoformat(),
+        'data_entrega': pedido.data_entrega.isoformat() if pedido.data_entrega else None,
+        'dias_para_entrega': (pedido.data_entrega.date() - hoje).days if pedido.data_entrega and pedido.status != 'entregue' else None,
+        'versao': pedido.versao
+    }
+
+def prazo_dict(pedido, cliente_nome, hoje):
+    return {
+        'id': pedido.id,
+        'cliente_id': pedido.cliente_id,
+        'cliente_nome': cliente_nome,
+        'servicos': pedido.servicos,
+        'status': pedido.status,
+        'data_entrega': pedido.data_entrega.isoformat(),
+        'dias_restantes': (pedido.data_entrega.date() - hoje).days
+    }
+
+def filtrar_pedidos(consulta, status=None, cliente_id=None):
+    """Filtros e ordenação da listagem; serve para `Pedido.query` e para `select(Pedido)`."""
+    consulta = consulta.order_by(Pedido.data_pedido.desc())
+    if status:
+        consulta = consulta.filter(Pedido.status == status)
+    if cliente_id:
+        consulta = consulta.filter(Pedido.cliente_id == cliente_id)
+    return consulta
+
+def consulta_prazos(consulta, hoje, data_limite):
+    return consulta.filter(
+        Pedido.data_entrega.isnot(None),
+        Pedido.data_entrega >= hoje,
+        Pedido.data_entrega <= data_limite,
+        Pedido.status.in_(['pendente', 'pago'])
+    ).order_by(Pedido.data_entrega.asc())
+
 @pedidos_bp.route('/', methods=['POST'])
 def criar_pedido():
     data = request.get_json()
@@ -21,7 +69,7 @@ def criar_pedido():
         return jsonify({'error': 'ID do cliente, serviços e valor total são obrigatórios.'}), 400
 
     cliente = Cliente.query.get(cliente_id)
-    if not cliente:
+    if not cliente or cliente.excluido_em:
         return jsonify({'error': 'Cliente não encontrado.'}), 404
     
     data_entrega = None
@@ -40,6 +88,7 @@ def criar_pedido():
             data_entrega=data_entrega
         )
         db.session.add(novo_pedido)
+        atualizar_contadores_clientes(novo_pedido.cliente_id)
         db.session.commit()
         return jsonify({'message': 'Pedido criado com sucesso!', 'pedido': {
             'id': novo_pedido.id,
@@ -61,50 +110,22 @@ def listar_pedidos():
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
 
-    query = Pedido.query.order_by(Pedido.data_pedido.desc())
+    query = filtrar_pedidos(Pedido.query, status_filter, cliente_id_filter)
 
-    if status_filter:
-        query = query.filter_by(status=status_filter)
-    if cliente_id_filter:
-        query = query.filter_by(cliente_id=cliente_id_filter)
+    if arquivo_necessario_pedidos(status=status_filter):
+        return _listar_pedidos_com_arquivo(query, status_filter, cliente_id_filter, page, per_page)
 
     pedidos_pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-    pedidos = pedidos_pagination.items
-
-    pedidos_data = []
-    for pedido in pedidos:
-        cliente_nome = pedido.cliente.nome if pedido.cliente else 'N/A'
-        pedidos_data.append({
-            'id': pedido.id,
-            'cliente_id': pedido.cliente_id,
-            'cliente_nome': cliente_nome,
-            'servicos': pedido.servicos,
-            'valor_total': str(pedido.valor_total),
-            'status': pedido.status,
-            'data_pedido': pedido.data_pedido.isoformat(),
-            'data_entrega': pedido.data_entrega.isoformat() if pedido.data_entrega else None,
-            'dias_para_entrega': (pedido.data_entrega.date() - datetime.now().date()).days if pedido.data_entrega and pedido.status != 'entregue' else None
-        })
+    hoje = datetime.now().date()
     return jsonify({
-        'pedidos': pedidos_data,
+        'pedidos': [pedido_dict(pedido, pedido.cliente.nome if pedido.cliente else 'N/A', hoje) for pedido in pedidos_pagination.items],
         'total_pages': pedidos_pagination.pages,
         'current_page': pedidos_pagination.page,
         'total_items': pedidos_pagination.total
     }), 200
 
-@pedidos_bp.route('/<int:pedido_id>', methods=['GET'])
-def obter_pedido(pedido_id):
-    pedido = Pedido.query.get(pedido_id)
-    if not pedido:
-        return jsonify({'error': 'Pedido não encontrado.'}), 404
-
-    cliente_nome = pedido.cliente.nome if pedido.cliente else 'N/A'
-    
-    dias_para_entrega = None
-    if pedido.data_entrega and pedido.status != 'entregue':
-        dias_para_entrega = (pedido.data_entrega.date() - datetime.now().date()).days
-
-    return jsonify({
+def _pedido_arquivado_dict(pedido, cliente_nome):
+    return {
         'id': pedido.id,
         'cliente_id': pedido.cliente_id,
         'cliente_nome': cliente_nome,
@@ -113,17 +134,75 @@ def obter_pedido(pedido_id):
         'status': pedido.status,
         'data_pedido': pedido.data_pedido.isoformat(),
         'data_entrega': pedido.data_entrega.isoformat() if pedido.data_entrega else None,
-        'dias_para_entrega': dias_para_entrega,
-        'pagamento_registrado': bool(pedido.pagamento)
+        'dias_para_entrega': None,
+        'arquivado': True
+    }
+
+def _listar_pedidos_com_arquivo(query, status_filter, cliente_id_filter, page, per_page):
+    # Junta as duas fontes ordenadas por data: basta buscar as primeiras
+    # page * per_page linhas de cada uma para montar a página pedida.
+    query_arquivo = PedidoArquivado.query.order_by(PedidoArquivado.data_pedido.desc())
+    if status_filter:
+        query_arquivo = query_arquivo.filter_by(status=status_filter)
+    if cliente_id_filter:
+        query_arquivo = query_arquivo.filter_by(cliente_id=cliente_id_filter)
+
+    page = max(page, 1)
+    limite = page * per_page
+    ativos = query.limit(limite).all()
+    arquivados = query_arquivo.limit(limite).all()
+    total_items = query.order_by(None).count() + query_arquivo.order_by(None).count()
+
+    nomes = nomes_clientes(p.cliente_id for p in ativos + arquivados)
+    combinados = sorted(ativos + arquivados, key=lambda p: p.data_pedido, reverse=True)[limite - per_page:limite]
+
+    pedidos_data = []
+    hoje = datetime.now().date()
+    for pedido in combinados:
+        cliente_nome = nomes.get(pedido.cliente_id, 'N/A')
+        if isinstance(pedido, PedidoArquivado):
+            pedidos_data.append(_pedido_arquivado_dict(pedido, cliente_nome))
+            continue
+        pedidos_data.append(pedido_dict(pedido, cliente_nome, hoje))
+
+    return jsonify({
+        'pedidos': pedidos_data,
+        'total_pages': (total_items + per_page - 1) // per_page if per_page else 0,
+        'current_page': page,
+        'total_items': total_items
     }), 200
 
+@pedidos_bp.route('/<int:pedido_id>', methods=['GET'])
+def obter_pedido(pedido_id):
+    pedido = Pedido.query.get(pedido_id)
+    if not pedido:
+        pedido_arquivado = PedidoArquivado.query.get(pedido_id)
+        if pedido_arquivado:
+            nomes = nomes_clientes([pedido_arquivado.cliente_id])
+            dados = _pedido_arquivado_dict(pedido_arquivado, nomes.get(pedido_arquivado.cliente_id, 'N/A'))
+            dados['pagamento_registrado'] = PagamentoArquivado.query.filter_by(pedido_id=pedido_id).first() is not None
+            return jsonify(dados), 200
+        return jsonify({'error': 'Pedido não encontrado.'}), 404
+
+    cliente_nome = pedido.cliente.nome if pedido.cliente else 'N/A'
+    dados = pedido_dict(pedido, cliente_nome, datetime.now().date())
+    dados['pagamento_registrado'] = bool(pedido.pagamento)
+    resposta = jsonify(dados)
+    resposta.set_etag(etag_registro(pedido.versao, dados))
+    return resposta, 200
+
 @pedidos_bp.route('/<int:pedido_id>', methods=['PUT'])
 def atualizar_pedido(pedido_id):
     pedido = Pedido.query.get(pedido_id)
     if not pedido:
         return jsonify({'error': 'Pedido não encontrado.'}), 404
 
+    erro_versao = verificar_if_match(pedido)
+    if erro_versao:
+        return erro_versao
+
     data = request.get_json()
+    cliente_id_anterior = pedido.cliente_id
     
     if 'cliente_id' in data:
         cliente_id = data.get('cliente_id')
@@ -153,16 +232,25 @@ def atualizar_pedido(pedido_id):
             pedido.data_entrega = None
 
     try:
+        atualizar_contadores_clientes(cliente_id_anterior, pedido.cliente_id)
         db.session.commit()
-        return jsonify({'message': 'Pedido atualizado com sucesso!', 'pedido': {
+        dados = {
             'id': pedido.id,
             'cliente_id': pedido.cliente_id,
             'servicos': pedido.servicos,
             'valor_total': str(pedido.valor_total),
             'status': pedido.status,
             'data_pedido': pedido.data_pedido.isoformat(),
-            'data_entrega': pedido.data_entrega.isoformat() if pedido.data_entrega else None
-        }}), 200
+            'data_entrega': pedido.data_entrega.isoformat() if pedido.data_entrega else None,
+            'versao': pedido.versao
+        }
+        resposta = jsonify({'message': 'Pedido atualizado com sucesso!', 'pedido': dados})
+        resposta.set_etag(etag_registro(pedido.versao, dados))
+        return resposta, 200
+    except StaleDataError:
+        # Outra requisição gravou entre a leitura e o commit.
+        db.session.rollback()
+        return resposta_conflito(db.session.query(Pedido.versao).filter_by(id=pedido_id).scalar())
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -177,37 +265,40 @@ def deletar_pedido(pedido_id):
         if pedido.pagamento:
             db.session.delete(pedido.pagamento)
 
+        cliente_id = pedido.cliente_id
         db.session.delete(pedido)
+        atualizar_contadores_clientes(cliente_id)
         db.session.commit()
         return jsonify({'message': 'Pedido deletado com sucesso!'}), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@pedidos_bp.route('/busca', methods=['GET'])
+def buscar_pedidos_por_texto():
+    try:
+        parametros = parametros_busca(request.args)
+    except ValueError:
+        return jsonify({'error': 'Formato de data inválido. Use YYYY-MM-DD.'}), 400
+
+    if not termo_valido(parametros['termo']):
+        return jsonify({'error': 'Informe o termo de busca no parâmetro q.'}), 400
+
+    try:
+        resultados = buscar_pedidos(
+            status=request.args.get('status'),
+            cliente_id=request.args.get('cliente_id', type=int),
+            **parametros
+        )
+        return jsonify(resultados), 200
+    except Exception as e:
+        return jsonify({'error': f'Erro ao buscar pedidos: {str(e)}'}), 500
+
 @pedidos_bp.route('/prazos', methods=['GET'])
 def verificar_prazos():
     dias_futuros = request.args.get('dias_futuros', 7, type=int)
     hoje = datetime.now().date()
     data_limite = hoje + timedelta(days=dias_futuros)
 
-    pedidos_com_prazos = Pedido.query.filter(
-        Pedido.data_entrega.isnot(None),
-        Pedido.data_entrega >= hoje,
-        Pedido.data_entrega <= data_limite,
-        Pedido.status.in_(['pendente', 'pago'])
-    ).order_by(Pedido.data_entrega.asc()).all()
-
-    prazos_data = []
-    for pedido in pedidos_com_prazos:
-        cliente_nome = pedido.cliente.nome if pedido.cliente else 'N/A'
-        dias_restantes = (pedido.data_entrega.date() - hoje).days
-        prazos_data.append({
-            'id': pedido.id,
-            'cliente_id': pedido.cliente_id,
-            'cliente_nome': cliente_nome,
-            'servicos': pedido.servicos,
-            'status': pedido.status,
-            'data_entrega': pedido.data_entrega.isoformat(),
-            'dias_restantes': dias_restantes
-        })
-    return jsonify(prazos_data), 200 
\ No newline at end of file
+    pedidos_com_prazos = consulta_prazos(Pedido.query, hoje, data_limite).all()
+    return jsonify([prazo_dict(pedido, pedido.cliente.nome if pedido.cliente else 'N/A', hoje) for pedido in pedidos_com_prazos]), 200 
\ No newline at end of file
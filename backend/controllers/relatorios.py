@@ -1,17 +1,42 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response
 from backend.models.database import db
 from backend.models.pedido import Pedido
 from backend.models.cliente import Cliente
 from backend.models.pagamento import Pagamento
+from backend.models.metrica_cliente import MetricaCliente
+from backend.models.arquivo import PedidoArquivado, PagamentoArquivado
+from backend.services.arquivamento import arquivo_necessario_pedidos, arquivo_necessario_pagamentos
+from backend.services.coalescencia import coalescer
+from backend.services.cache_analitico import cache_analitico
 from backend.config import Config
 from flask_login import login_required, current_user
 from datetime import datetime, timedelta
 from collections import defaultdict
 import os
+import csv
+import io
 import decimal
+import numpy as np
+import pandas as pd
 
 relatorios_bp = Blueprint('relatorios', __name__)
 
+FAIXAS_ATRASO = [
+    ('0-7', 0, 7),
+    ('8-30', 8, 30),
+    ('31-60', 31, 60),
+    ('60+', 61, None),
+]
+
+STATUS_RECEITA = ('pago', 'entregue')
+
+GRANULARIDADES = {
+    'dia': 'D',
+    'semana': 'W-MON',
+    'mes': 'MS',
+}
+
+@coalescer()
 def calcular_metricas_semanais():
     hoje = datetime.now()
     dias_para_ultima_segunda = hoje.weekday() + 7
@@ -21,33 +46,298 @@ def calcular_metricas_semanais():
     data_inicio_periodo = datetime(data_inicio_semana.year, data_inicio_semana.month, data_inicio_semana.day, 0, 0, 0)
     data_fim_periodo = datetime(data_fim_semana.year, data_fim_semana.month, data_fim_semana.day, 23, 59, 59)
 
-    pedidos_semanais = Pedido.query.filter(
-        Pedido.data_pedido >= data_inicio_periodo,
-        Pedido.data_pedido <= data_fim_periodo,
-        Pedido.status.in_(['pago', 'entregue'])
-    ).all()
+    snapshot = cache_analitico()
+    if snapshot is not None:
+        pedidos = snapshot.filtrar('pedido', data_inicio_periodo, data_fim_periodo + timedelta(seconds=1), status=STATUS_RECEITA)
+        total_vendas = decimal.Decimal(int(pedidos['centavos'].sum())).scaleb(-2)
+        clientes_atendidos_count = len(np.unique(pedidos['cliente_id']))
+        codigos, contagens = np.unique(pedidos['servicos'], return_counts=True)
+        servicos_contagem = dict(zip(snapshot.decodificar('servicos', codigos), contagens.tolist()))
+    else:
+        pedidos_semanais = Pedido.query.filter(
+            Pedido.data_pedido >= data_inicio_periodo,
+            Pedido.data_pedido <= data_fim_periodo,
+            Pedido.status.in_(STATUS_RECEITA)
+        ).all()
+
+        total_vendas = decimal.Decimal('0.00')
+        clientes_atendidos = set()
+        servicos_contagem = defaultdict(int)
+
+        for pedido in pedidos_semanais:
+            total_vendas += decimal.Decimal(str(pedido.valor_total))
+            clientes_atendidos.add(pedido.cliente_id)
+            servicos_contagem[pedido.servicos] += 1
 
-    total_vendas = decimal.Decimal('0.00')
-    clientes_atendidos = set()
-    servicos_contagem = defaultdict(int)
+        clientes_atendidos_count = len(clientes_atendidos)
 
-    for pedido in pedidos_semanais:
-        total_vendas += decimal.Decimal(str(pedido.valor_total))
-        clientes_atendidos.add(pedido.cliente_id)
-        servicos_contagem[pedido.servicos] += 1
+    # Empates pelo nome do serviço: a ordem das linhas difere entre o banco e o cache analítico.
+    servicos_mais_vendidos = sorted(servicos_contagem.items(), key=lambda item: (-item[1], item[0]))[:5]
 
-    servicos_mais_vendidos = sorted(servicos_contagem.items(), key=lambda item: item[1], reverse=True)[:5]
     lucro_estimado = total_vendas * decimal.Decimal('0.70')
 
     return {
         'total_vendas': str(total_vendas.quantize(decimal.Decimal('0.01'))),
-        'clientes_atendidos_count': len(clientes_atendidos),
+        'clientes_atendidos_count': clientes_atendidos_count,
         'servicos_mais_vendidos': servicos_mais_vendidos,
         'lucro_estimado': str(lucro_estimado.quantize(decimal.Decimal('0.01'))),
         'data_inicio': data_inicio_periodo.strftime('%d/%m/%Y'),
         'data_fim': data_fim_periodo.strftime('%d/%m/%Y')
     }
 
+def _centavos(valores):
+    return np.rint(valores.astype(np.float64) * 100).astype(np.int64)
+
+
+def _formatar_centavos(centavos):
+    return f"{int(centavos) // 100}.{int(centavos) % 100:02d}"
+
+
+def _inicio_do_periodo(datas, granularidade):
+    if granularidade == 'mes':
+        return datas.dt.to_period('M').dt.start_time
+    if granularidade == 'semana':
+        return datas - pd.to_timedelta(datas.dt.weekday, unit='D')
+    return datas
+
+
+def _receita_diaria(modelo, data_inicio, fim_exclusivo, conexao):
+    dia = db.func.date(modelo.data_pedido)
+    return pd.read_sql(
+        db.select(
+            dia.label('dia'),
+            db.func.sum(modelo.valor_total).label('receita'),
+            db.func.count(modelo.id).label('pedidos')
+        ).where(
+            modelo.data_pedido >= data_inicio,
+            modelo.data_pedido < fim_exclusivo,
+            modelo.status.in_(STATUS_RECEITA)
+        ).group_by(dia),
+        conexao
+    )
+
+
+def _pagamentos_diarios(modelo, data_inicio, fim_exclusivo, conexao):
+    dia = db.func.date(modelo.data_pagamento)
+    return pd.read_sql(
+        db.select(
+            dia.label('dia'),
+            modelo.forma_pagamento,
+            db.func.sum(modelo.valor_pago).label('valor')
+        ).where(
+            modelo.data_pagamento >= data_inicio,
+            modelo.data_pagamento < fim_exclusivo
+        ).group_by(dia, modelo.forma_pagamento),
+        conexao
+    )
+
+
+def _receita_diaria_cache(snapshot, data_inicio, fim_exclusivo):
+    pedidos = snapshot.filtrar('pedido', data_inicio, fim_exclusivo, status=STATUS_RECEITA)
+    return pd.DataFrame({
+        'dia': pedidos['data'].astype('datetime64[D]'),
+        'receita': pedidos['centavos'],
+        'pedidos': 1
+    }).groupby('dia', as_index=False).sum()
+
+
+def _pagamentos_diarios_cache(snapshot, data_inicio, fim_exclusivo):
+    pagamentos = snapshot.filtrar('pagamento', data_inicio, fim_exclusivo)
+    por_dia = pd.DataFrame({
+        'dia': pagamentos['data'].astype('datetime64[D]'),
+        'forma_pagamento': pagamentos['forma_pagamento'],
+        'valor': pagamentos['centavos']
+    }).groupby(['dia', 'forma_pagamento'], as_index=False).sum()
+    por_dia['forma_pagamento'] = snapshot.decodificar('forma_pagamento', por_dia['forma_pagamento'])
+    return por_dia
+
+
+@coalescer()
+def calcular_serie_receita(data_inicio, data_fim, granularidade='dia'):
+    """Receita, número de pedidos, ticket médio e mix de formas de pagamento por período.
+
+    O banco agrega por dia (uma linha por dia, usando os índices de data) e o
+    agrupamento em semanas/meses e o preenchimento de lacunas são feitos de
+    forma vetorizada com pandas.
+    """
+    fim_exclusivo = data_fim + timedelta(days=1)
+    # Períodos antigos podem estar (também) nas tabelas de arquivo, que o cache analítico não cobre.
+    inclui_arquivo = arquivo_necessario_pedidos(data_inicio) or arquivo_necessario_pagamentos(data_inicio)
+    snapshot = None if inclui_arquivo else cache_analitico()
+
+    if snapshot is not None:
+        pedidos = _receita_diaria_cache(snapshot, data_inicio, fim_exclusivo)
+        pagamentos = _pagamentos_diarios_cache(snapshot, data_inicio, fim_exclusivo)
+    else:
+        pedidos = _receita_diaria(Pedido, data_inicio, fim_exclusivo, db.session.connection())
+        pagamentos = _pagamentos_diarios(Pagamento, data_inicio, fim_exclusivo, db.session.connection())
+
+        if inclui_arquivo:
+            with db.engines['arquivo'].connect() as conexao_arquivo:
+                pedidos = pd.concat([pedidos, _receita_diaria(PedidoArquivado, data_inicio, fim_exclusivo, conexao_arquivo)], ignore_index=True)
+                pagamentos = pd.concat([pagamentos, _pagamentos_diarios(PagamentoArquivado, data_inicio, fim_exclusivo, conexao_arquivo)], ignore_index=True)
+        pedidos['receita'] = _centavos(pedidos['receita'])
+        pagamentos['valor'] = _centavos(pagamentos['valor'])
+
+    periodos = pd.date_range(
+        _inicio_do_periodo(pd.Series([pd.Timestamp(data_inicio)]), granularidade).iloc[0],
+        pd.Timestamp(data_fim),
+        freq=GRANULARIDADES[granularidade]
+    )
+
+    pedidos['periodo'] = _inicio_do_periodo(pd.to_datetime(pedidos['dia']), granularidade)
+    por_periodo = pedidos.groupby('periodo')[['receita', 'pedidos']].sum().reindex(periodos, fill_value=0)
+
+    pagamentos['periodo'] = _inicio_do_periodo(pd.to_datetime(pagamentos['dia']), granularidade)
+    if pagamentos.empty:
+        mix = pd.DataFrame(index=periodos)
+    else:
+        mix = pagamentos.pivot_table(index='periodo', columns='forma_pagamento', values='valor', aggfunc='sum', fill_value=0)
+        mix = mix.reindex(periodos, fill_value=0)
+
+    receita = por_periodo['receita'].to_numpy()
+    quantidade = por_periodo['pedidos'].to_numpy()
+    ticket_medio = np.where(quantidade > 0, receita // np.maximum(quantidade, 1), 0)
+
+    serie = []
+    for i, periodo in enumerate(periodos):
+        serie.append({
+            'periodo': periodo.strftime('%Y-%m-%d'),
+            'receita': _formatar_centavos(receita[i]),
+            'pedidos': int(quantidade[i]),
+            'ticket_medio': _formatar_centavos(ticket_medio[i]),
+            'formas_pagamento': {forma: _formatar_centavos(valor) for forma, valor in mix.iloc[i].items() if valor}
+        })
+
+    return {
+        'granularidade': granularidade,
+        'data_inicio': data_inicio.strftime('%Y-%m-%d'),
+        'data_fim': data_fim.strftime('%Y-%m-%d'),
+        'total_receita': _formatar_centavos(receita.sum()),
+        'total_pedidos': int(quantidade.sum()),
+        'serie': serie
+    }
+
+def _limites_faixa(inicio_hoje, dias_min, dias_max):
+    """(data mínima inclusiva, data máxima exclusiva) dos pedidos de uma faixa de idade; None = sem limite."""
+    return (
+        inicio_hoje - timedelta(days=dias_max) if dias_max is not None else None,
+        inicio_hoje - timedelta(days=dias_min - 1) if dias_min else None
+    )
+
+
+def _contas_a_receber_sql(inicio_hoje):
+    colunas = []
+    for nome, dias_min, dias_max in FAIXAS_ATRASO:
+        minimo, maximo = _limites_faixa(inicio_hoje, dias_min, dias_max)
+        condicoes = [Pedido.data_pedido < maximo] if maximo else []
+        if minimo is not None:
+            condicoes.append(Pedido.data_pedido >= minimo)
+        condicao = db.and_(*condicoes) if condicoes else db.true()
+        colunas.append(db.func.sum(db.case((condicao, Pedido.valor_total), else_=0)).label(nome))
+
+    linhas = db.session.query(
+        Pedido.cliente_id,
+        Cliente.nome,
+        db.func.count(Pedido.id).label('pedidos'),
+        db.func.min(Pedido.data_pedido).label('pedido_mais_antigo'),
+        *colunas
+    ).outerjoin(Cliente, Cliente.id == Pedido.cliente_id).filter(
+        Pedido.status == 'pendente'
+    ).group_by(Pedido.cliente_id, Cliente.nome).all()
+
+    centavo = decimal.Decimal('0.01')
+    return [{
+        'cliente_id': linha.cliente_id,
+        'nome': linha.nome,
+        'pedidos': linha.pedidos,
+        'pedido_mais_antigo': linha.pedido_mais_antigo,
+        'faixas': {nome: decimal.Decimal(str(getattr(linha, nome) or 0)).quantize(centavo) for nome, _, _ in FAIXAS_ATRASO}
+    } for linha in linhas]
+
+
+def _contas_a_receber_cache(snapshot, inicio_hoje):
+    pendentes = snapshot.filtrar('pedido', status=('pendente',))
+    tabela = pd.DataFrame({'cliente_id': pendentes['cliente_id'], 'data': pendentes['data'], 'centavos': pendentes['centavos']})
+    for nome, dias_min, dias_max in FAIXAS_ATRASO:
+        minimo, maximo = _limites_faixa(inicio_hoje, dias_min, dias_max)
+        na_faixa = np.ones(len(tabela), dtype=bool)
+        if minimo is not None:
+            na_faixa &= pendentes['data'] >= np.datetime64(minimo, 'us')
+        if maximo is not None:
+            na_faixa &= pendentes['data'] < np.datetime64(maximo, 'us')
+        tabela[nome] = np.where(na_faixa, pendentes['centavos'], 0)
+
+    por_cliente = tabela.groupby('cliente_id').agg(
+        pedidos=('centavos', 'size'),
+        pedido_mais_antigo=('data', 'min'),
+        **{nome: (nome, 'sum') for nome, _, _ in FAIXAS_ATRASO}
+    )
+    nomes = dict(db.session.execute(
+        db.select(Cliente.id, Cliente.nome).where(Cliente.id.in_(db.select(Pedido.cliente_id).where(Pedido.status == 'pendente')))
+    ).all())
+
+    centavo = decimal.Decimal('0.01')
+    faixas = {nome: por_cliente[nome].tolist() for nome, _, _ in FAIXAS_ATRASO}
+    mais_antigos = por_cliente['pedido_mais_antigo'].to_numpy().astype('datetime64[us]').tolist()
+    return [{
+        'cliente_id': cliente_id,
+        'nome': nomes.get(cliente_id),
+        'pedidos': quantidade,
+        'pedido_mais_antigo': mais_antigos[i],
+        'faixas': {nome: decimal.Decimal(valores[i]).scaleb(-2).quantize(centavo) for nome, valores in faixas.items()}
+    } for i, (cliente_id, quantidade) in enumerate(zip(por_cliente.index.tolist(), por_cliente['pedidos'].tolist()))]
+
+
+@coalescer()
+def calcular_contas_a_receber():
+    """Pedidos pendentes agrupados por cliente e por faixa de idade (em dias).
+
+    Com o cache analítico ativo o agrupamento é feito sobre os arrays em
+    memória; sem ele, uma única consulta agrupada sobre o índice
+    (status, data_pedido), com os limites das faixas calculados aqui e
+    convertidos em somas condicionais no SQL.
+    """
+    hoje = datetime.now()
+    inicio_hoje = datetime(hoje.year, hoje.month, hoje.day)
+
+    snapshot = cache_analitico()
+    linhas = _contas_a_receber_cache(snapshot, inicio_hoje) if snapshot is not None else _contas_a_receber_sql(inicio_hoje)
+
+    total_geral = {nome: decimal.Decimal('0.00') for nome, _, _ in FAIXAS_ATRASO}
+    clientes = []
+    for linha in linhas:
+        faixas = linha['faixas']
+        for nome, valor in faixas.items():
+            total_geral[nome] += valor
+        clientes.append({
+            'cliente_id': linha['cliente_id'],
+            'cliente_nome': linha['nome'] or 'N/A',
+            'pedidos': linha['pedidos'],
+            'pedido_mais_antigo': linha['pedido_mais_antigo'].isoformat() if linha['pedido_mais_antigo'] else None,
+            'faixas': {nome: str(valor) for nome, valor in faixas.items()},
+            'total': str(sum(faixas.values()))
+        })
+
+    clientes.sort(key=lambda c: decimal.Decimal(c['total']), reverse=True)
+    return {
+        'data_referencia': inicio_hoje.strftime('%Y-%m-%d'),
+        'faixas': {nome: str(valor) for nome, valor in total_geral.items()},
+        'total': str(sum(total_geral.values())),
+        'clientes': clientes
+    }
+
+
+def contas_a_receber_csv(relatorio):
+    saida = io.StringIO()
+    writer = csv.writer(saida)
+    faixas = [nome for nome, _, _ in FAIXAS_ATRASO]
+    writer.writerow(['ID Cliente', 'Nome Cliente', 'Pedidos Pendentes'] + [f'{nome} dias' for nome in faixas] + ['Total'])
+    for cliente in relatorio['clientes']:
+        writer.writerow([cliente['cliente_id'], cliente['cliente_nome'], cliente['pedidos']] + [cliente['faixas'][nome] for nome in faixas] + [cliente['total']])
+    writer.writerow(['', 'TOTAL', sum(c['pedidos'] for c in relatorio['clientes'])] + [relatorio['faixas'][nome] for nome in faixas] + [relatorio['total']])
+    return saida.getvalue()
+
 @relatorios_bp.route('/semanal/metricas', methods=['GET'])
 @login_required
 def obter_metricas_semanais_json():
@@ -71,4 +361,73 @@ def enviar_relatorio_semanal_manual():
     try:
         return jsonify({'message': 'Envio de relatórios por e-mail foi desativado.'}), 200
     except Exception as e:
-        return jsonify({'error': f'Erro ao enviar relatório: {str(e)}'}), 500
\ No newline at end of file
+        return jsonify({'error': f'Erro ao enviar relatório: {str(e)}'}), 500
+
+@relatorios_bp.route('/serie', methods=['GET'])
+@login_required
+def obter_serie_receita():
+    granularidade = request.args.get('granularidade', 'dia')
+    if granularidade not in GRANULARIDADES:
+        return jsonify({'error': 'Granularidade inválida. Use dia, semana ou mes.'}), 400
+
+    hoje = datetime.now()
+    try:
+        data_fim = datetime.strptime(request.args['fim'], '%Y-%m-%d') if request.args.get('fim') else datetime(hoje.year, hoje.month, hoje.day)
+        data_inicio = datetime.strptime(request.args['inicio'], '%Y-%m-%d') if request.args.get('inicio') else data_fim - timedelta(days=29)
+    except ValueError:
+        return jsonify({'error': 'Formato de data inválido. Use YYYY-MM-DD.'}), 400
+
+    if data_inicio > data_fim:
+        return jsonify({'error': 'A data inicial deve ser anterior à data final.'}), 400
+
+    return jsonify(calcular_serie_receita(data_inicio, data_fim, granularidade)), 200
+
+@relatorios_bp.route('/clientes/segmentos', methods=['GET'])
+@login_required
+def obter_segmentos_clientes():
+    segmento = request.args.get('segmento')
+    limite = min(request.args.get('limite', 20, type=int), 200)
+
+    resumo = db.session.query(
+        MetricaCliente.segmento,
+        db.func.count(MetricaCliente.cliente_id),
+        db.func.sum(MetricaCliente.ltv)
+    ).group_by(MetricaCliente.segmento).all()
+
+    query = db.session.query(MetricaCliente, Cliente.nome).join(Cliente, Cliente.id == MetricaCliente.cliente_id)
+    if segmento:
+        query = query.filter(MetricaCliente.segmento == segmento)
+    clientes = query.order_by(MetricaCliente.ltv.desc()).limit(limite).all()
+
+    return jsonify({
+        'segmentos': [
+            {'segmento': nome, 'clientes': quantidade, 'ltv_total': f"{ltv_total or 0:.2f}"}
+            for nome, quantidade, ltv_total in resumo
+        ],
+        'clientes': [{
+            'cliente_id': metrica.cliente_id,
+            'nome': nome,
+            'segmento': metrica.segmento,
+            'recencia_dias': metrica.recencia_dias,
+            'frequencia': metrica.frequencia,
+            'valor_monetario': f"{metrica.valor_monetario:.2f}",
+            'ticket_medio': f"{metrica.ticket_medio:.2f}",
+            'ltv': f"{metrica.ltv:.2f}",
+            'rfm': f"{metrica.pontuacao_r}{metrica.pontuacao_f}{metrica.pontuacao_m}",
+            'ultima_compra': metrica.ultima_compra.isoformat() if metrica.ultima_compra else None,
+            'calculado_em': metrica.calculado_em.isoformat()
+        } for metrica, nome in clientes]
+    }), 200
+
+@relatorios_bp.route('/contas-a-receber', methods=['GET'])
+@login_required
+def obter_contas_a_receber():
+    relatorio = calcular_contas_a_receber()
+
+    if request.args.get('formato') == 'csv':
+        nome_arquivo = f"contas_a_receber_{relatorio['data_referencia']}.csv"
+        return Response(contas_a_receber_csv(relatorio), mimetype='text/csv', headers={
+            'Content-Disposition': f'attachment; filename={nome_arquivo}'
+        })
+
+    return jsonify(relatorio), 200
@@ -0,0 +1,131 @@
+from flask import Blueprint, request, jsonify, Response, stream_with_context, current_app
+from backend.models.database import db
+from backend.models.cliente import Cliente, AnotacaoCliente
+from backend.models.pedido import Pedido
+from backend.models.pagamento import Pagamento
+from backend.models.remocao import RegistroRemovido
+from sqlalchemy import select, or_, and_
+from datetime import datetime, timedelta
+import base64
+import binascii
+import decimal
+import json
+
+sync_bp = Blueprint('sincronizacao', __name__)
+
+# A ordem garante que o cliente recebe o registro pai antes dos filhos.
+MODELOS_SINCRONIZADOS = [
+    ('cliente', Cliente),
+    ('anotacao', AnotacaoCliente),
+    ('pedido', Pedido),
+    ('pagamento', Pagamento),
+]
+
+
+def _codificar_token(marcas):
+    return base64.urlsafe_b64encode(json.dumps(marcas, separators=(',', ':')).encode()).decode()
+
+
+def _decodificar_token(token):
+    marcas = json.loads(base64.urlsafe_b64decode(token.encode()))
+    if not isinstance(marcas, dict):
+        raise ValueError('token inválido')
+    return marcas
+
+
+def _valor_json(valor):
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    if isinstance(valor, decimal.Decimal):
+        return str(valor)
+    return valor
+
+
+def _linha(dados):
+    return json.dumps(dados, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+def _alteracoes(entidade, modelo, marcas, corte, lote):
+    tabela = modelo.__table__
+    marca = marcas.get(entidade)
+
+    while True:
+        query = select(tabela).where(modelo.atualizado_em <= corte)
+        if marca:
+            atualizado_em = datetime.fromisoformat(marca[0])
+            query = query.where(or_(
+                modelo.atualizado_em > atualizado_em,
+                and_(modelo.atualizado_em == atualizado_em, modelo.id > marca[1])
+            ))
+        query = query.order_by(modelo.atualizado_em.asc(), modelo.id.asc()).limit(lote)
+
+        linhas = db.session.execute(query).mappings().all()
+        for linha in linhas:
+            yield {'tipo': entidade, 'operacao': 'upsert', 'dados': {k: _valor_json(v) for k, v in linha.items()}}
+
+        if linhas:
+            marca = [linhas[-1]['atualizado_em'].isoformat(), linhas[-1]['id']]
+            marcas[entidade] = marca
+            yield None
+        if len(linhas) < lote:
+            return
+
+
+def _remocoes(marcas, lote):
+    ultimo_id = marcas.get('removidos', 0)
+
+    while True:
+        linhas = db.session.execute(
+            select(RegistroRemovido.id, RegistroRemovido.entidade, RegistroRemovido.entidade_id, RegistroRemovido.operacao)
+            .where(RegistroRemovido.id > ultimo_id)
+            .order_by(RegistroRemovido.id.asc())
+            .limit(lote)
+        ).all()
+        for registro_id, entidade, entidade_id, operacao in linhas:
+            yield {'tipo': entidade, 'operacao': operacao, 'id': entidade_id}
+
+        if linhas:
+            ultimo_id = linhas[-1][0]
+            marcas['removidos'] = ultimo_id
+            yield None
+        if len(linhas) < lote:
+            return
+
+
+def _gerar_ndjson(marcas, corte, lote):
+    # Cada None produzido pelos geradores marca o fim de um lote: emitimos um
+    # checkpoint para que o cliente possa retomar uma sincronização interrompida.
+    fontes = [_alteracoes(entidade, modelo, marcas, corte, lote) for entidade, modelo in MODELOS_SINCRONIZADOS]
+    fontes.append(_remocoes(marcas, lote))
+
+    for fonte in fontes:
+        for item in fonte:
+            if item is None:
+                yield _linha({'tipo': 'checkpoint', 'token': _codificar_token(marcas)})
+            else:
+                yield _linha(item)
+
+    yield _linha({'tipo': 'fim', 'token': _codificar_token(marcas)})
+
+
+@sync_bp.route('/', methods=['GET'])
+def sincronizar():
+    token = request.args.get('since')
+    try:
+        marcas = _decodificar_token(token) if token else {}
+    except (ValueError, binascii.Error):
+        return jsonify({'error': 'Token de sincronização inválido.'}), 400
+
+    lote_maximo = current_app.config.get('SYNC_BATCH_SIZE', 500)
+    lote = min(request.args.get('lote', lote_maximo, type=int), lote_maximo)
+    if lote <= 0:
+        return jsonify({'error': 'O tamanho do lote deve ser positivo.'}), 400
+
+    # Alterações muito recentes ficam para a próxima sincronização: transações
+    # ainda abertas podem confirmar registros com horário anterior ao atual.
+    corte = datetime.now() - timedelta(seconds=current_app.config.get('SYNC_SAFETY_SECONDS', 2))
+
+    return Response(
+        stream_with_context(_gerar_ndjson(marcas, corte, lote)),
+        mimetype='application/x-ndjson'
+    )
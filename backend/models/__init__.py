@@ -2,4 +2,11 @@ from .cliente import Cliente, AnotacaoCliente
 from .pedido import Pedido
 from .pagamento import Pagamento
 from .usuario import Usuario
-from .database import db
\ No newline at end of file
+from .database import db
+from .evento import EventoOutbox
+from .remocao import RegistroRemovido
+from .metrica_cliente import MetricaCliente
+from .arquivo import PedidoArquivado, PagamentoArquivado
+from .notificacao import Notificacao
+from .execucao_job import ExecucaoJob
+from .manutencao import ManutencaoBanco
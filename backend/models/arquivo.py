@@ -0,0 +1,46 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Index
+from backend.models.database import db
+from datetime import datetime
+
+# Pedidos encerrados (entregues/cancelados) e seus pagamentos, movidos de
+# `pedidos`/`pagamentos` pelo job de arquivamento. Ficam no bind 'arquivo',
+# que pode ser o próprio banco principal ou um banco separado.
+
+class PedidoArquivado(db.Model):
+    __tablename__ = 'pedidos_arquivo'
+    __bind_key__ = 'arquivo'
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    cliente_id = Column(Integer, nullable=False, index=True)
+    servicos = Column(Text, nullable=False)
+    valor_total = Column(Float, nullable=False)
+    status = Column(String(50), nullable=False)
+    data_pedido = Column(DateTime, nullable=False, index=True)
+    data_entrega = Column(DateTime, nullable=True)
+    criado_em = Column(DateTime, nullable=True)
+    atualizado_em = Column(DateTime, nullable=True)
+    arquivado_em = Column(DateTime, default=datetime.now, nullable=False)
+
+    __table_args__ = (
+        Index('ix_pedidos_arquivo_status_data_pedido', 'status', 'data_pedido'),
+    )
+
+    def __repr__(self):
+        return f'<PedidoArquivado {self.id} - Cliente {self.cliente_id} - Status: {self.status}>'
+
+
+class PagamentoArquivado(db.Model):
+    __tablename__ = 'pagamentos_arquivo'
+    __bind_key__ = 'arquivo'
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    pedido_id = Column(Integer, nullable=False, unique=True)
+    valor_pago = Column(Float, nullable=False)
+    forma_pagamento = Column(String(50), nullable=False)
+    data_pagamento = Column(DateTime, nullable=True, index=True)
+    criado_em = Column(DateTime, nullable=True)
+    atualizado_em = Column(DateTime, nullable=True)
+    arquivado_em = Column(DateTime, default=datetime.now, nullable=False)
+
+    def __repr__(self):
+        return f'<PagamentoArquivado {self.id} - Pedido {self.pedido_id} - R${self.valor_pago:.2f}>'
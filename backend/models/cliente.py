@@ -1,21 +1,110 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, DateTime, Float, Index, text, func, and_
+from sqlalchemy.orm import relationship, validates
 from backend.models.database import db
+from datetime import datetime
+import re
+
+PAIS_PADRAO = '55'
+# Maior caractere Unicode: `prefixo || FIM_PREFIXO` vem depois de todo texto que começa com o prefixo.
+FIM_PREFIXO = '\U0010ffff'
+
+
+def normalizar_telefone(telefone, pais=PAIS_PADRAO):
+    """Converte um telefone para E.164 ('+5511988887777'); devolve None se não for possível.
+
+    Aceita números nacionais com DDD (com ou sem o 0 de tronco e o código da
+    operadora) e números já com código do país ('+55...', '0055...').
+    """
+    if not telefone:
+        return None
+    internacional = telefone.strip().startswith('+')
+    digitos = re.sub(r'\D', '', telefone)
+
+    if digitos.startswith('00'):
+        digitos, internacional = digitos[2:], True
+    elif not internacional and digitos.startswith('0'):
+        digitos = digitos[1:]
+        # 0 + operadora (2 dígitos) + DDD + número.
+        if len(digitos) in (12, 13):
+            digitos = digitos[2:]
+
+    if not internacional:
+        if len(digitos) in (10, 11):
+            digitos = pais + digitos
+        elif not (digitos.startswith(pais) and len(digitos) in (12, 13)):
+            return None
+
+    if not 8 <= len(digitos) <= 15:
+        return None
+    return '+' + digitos
+
+
+def comeca_com(coluna, termo, ignorar_caixa=True):
+    """Condição "`coluna` começa com `termo`" que o banco resolve pelo índice.
+
+    `ilike` vira lower(coluna) LIKE lower(termo) e LIKE só usa índice no
+    SQLite em colunas NOCASE; já um intervalo sobre lower(coluna) usa os
+    índices de expressão de `clientes` (e um índice comum sem `ignorar_caixa`).
+    """
+    valor, prefixo = (func.lower(coluna, type_=String), func.lower(termo, type_=String)) if ignorar_caixa else (coluna, termo)
+    return and_(valor >= prefixo, valor < prefixo + FIM_PREFIXO)
 
 class Cliente(db.Model):
     __tablename__ = 'clientes'
 
     id = Column(Integer, primary_key=True)
-    nome = Column(String(100), nullable=False)
+    nome = Column(String(100), nullable=False, index=True)
     telefone = Column(String(20), unique=True, nullable=False)
+    # Telefone em E.164, preenchido a partir de `telefone`; chave de busca exata e de deduplicação.
+    telefone_normalizado = Column(String(20), nullable=True, index=True)
     email = Column(String(120), unique=True, nullable=True)
     endereco = Column(String(255), nullable=True)
     preferencias = Column(Text, nullable=True)
 
+    criado_em = Column(DateTime, default=datetime.now, index=True, info={'preencher_com': datetime.now})
+    atualizado_em = Column(DateTime, default=datetime.now, onupdate=datetime.now, index=True, info={'preencher_com': datetime.now})
+    # Controle de concorrência otimista: todo UPDATE/DELETE pelo ORM confere e incrementa a versão.
+    # Os UPDATEs em lote dos contadores não a alteram: não são edições do cadastro.
+    versao = Column(Integer, nullable=False, default=1, server_default=text('1'))
+
+    # Contadores desnormalizados, mantidos por backend.services.contadores.
+    total_pedidos = Column(Integer, default=0, index=True, info={'preencher_com': "(SELECT COUNT(*) FROM pedidos WHERE pedidos.cliente_id = clientes.id AND pedidos.status != 'cancelado')"})
+    total_gasto = Column(Float, default=0, index=True, info={'preencher_com': "(SELECT COALESCE(SUM(pagamentos.valor_pago), 0) FROM pagamentos JOIN pedidos ON pedidos.id = pagamentos.pedido_id WHERE pedidos.cliente_id = clientes.id AND pedidos.status != 'cancelado')"})
+    ultimo_pedido_em = Column(DateTime, nullable=True, index=True, info={'preencher_com': "(SELECT MAX(pedidos.data_pedido) FROM pedidos WHERE pedidos.cliente_id = clientes.id AND pedidos.status != 'cancelado')"})
+    # Parcela dos contadores que veio de pedidos já movidos para o arquivo.
+    pedidos_arquivados = Column(Integer, default=0)
+    gasto_arquivado = Column(Float, default=0)
+    ultimo_pedido_arquivado_em = Column(DateTime, nullable=True)
+
+    excluido_em = Column(DateTime, nullable=True, index=True)
+
+    __table_args__ = (
+        # Busca por prefixo sem diferenciar maiúsculas (ver `comeca_com`).
+        Index('ix_clientes_nome_minusculo', func.lower(nome)),
+        Index('ix_clientes_email_minusculo', func.lower(email)),
+    )
+    __mapper_args__ = {'version_id_col': versao}
+
     pedidos = relationship('Pedido', backref='cliente', lazy='dynamic', cascade="all, delete-orphan") 
 
     anotacoes = relationship('AnotacaoCliente', backref='cliente', lazy='dynamic', cascade="all, delete-orphan")
 
+    @validates('telefone')
+    def _normalizar_telefone(self, chave, telefone):
+        self.telefone_normalizado = normalizar_telefone(telefone)
+        return telefone
+
+    @classmethod
+    def telefone_em_uso(cls, telefone, ignorar_id=None):
+        """Outro cliente ativo com o mesmo telefone, ainda que digitado em outro formato."""
+        normalizado = normalizar_telefone(telefone)
+        if not normalizado:
+            return None
+        query = cls.query.filter(cls.telefone_normalizado == normalizado, cls.excluido_em.is_(None))
+        if ignorar_id:
+            query = query.filter(cls.id != ignorar_id)
+        return query.first()
+
     def __repr__(self):
         return f'<Cliente {self.nome} ({self.telefone})>'
 
@@ -24,9 +113,10 @@ class AnotacaoCliente(db.Model):
     __tablename__ = 'anotacoes_cliente'
 
     id = Column(Integer, primary_key=True)
-    cliente_id = Column(Integer, db.ForeignKey('clientes.id'), nullable=False)
+    cliente_id = Column(Integer, db.ForeignKey('clientes.id'), nullable=False, index=True)
     texto = Column(Text, nullable=False)
-    data_criacao = Column(db.DateTime, default=db.func.current_timestamp())
+    data_criacao = Column(db.DateTime, default=db.func.current_timestamp(), index=True)
+    atualizado_em = Column(DateTime, default=datetime.now, onupdate=datetime.now, index=True, info={'preencher_com': datetime.now})
 
     def __repr__(self):
         return f'<Anotacao Cliente {self.cliente_id}: {self.texto[:20]}...>'
\ No newline at end of file
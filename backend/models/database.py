@@ -1,4 +1,130 @@
+from flask import current_app, g, has_request_context, request, session as flask_session
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.sql.expression import Select
+import functools
+import itertools
+import time
+import weakref
 
-db = SQLAlchemy()
-   
\ No newline at end of file
+METODOS_LEITURA = ('GET', 'HEAD')
+
+# Por engine (não pelo nome do bind): cada app tem os seus, inclusive em testes no mesmo processo.
+_saude_replicas = weakref.WeakKeyDictionary()
+_rodizio_replicas = itertools.count()
+
+
+def _replica_disponivel(bind_key, engine, ttl):
+    disponivel, verificado_em = _saude_replicas.get(engine, (True, 0.0))
+    agora = time.monotonic()
+    if agora - verificado_em < ttl:
+        return disponivel
+
+    try:
+        with engine.connect() as conn:
+            conn.exec_driver_sql('SELECT 1')
+        disponivel = True
+    except Exception as e:
+        print(f"Réplica '{bind_key}' indisponível, usando o banco primário: {e}")
+        disponivel = False
+
+    _saude_replicas[engine] = (disponivel, agora)
+    return disponivel
+
+
+def marcar_replica_indisponivel(engine):
+    _saude_replicas[engine] = (False, time.monotonic())
+
+
+def configurar_replicas(app):
+    with app.app_context():
+        for bind_key, engine in db.engines.items():
+            if bind_key and bind_key.startswith('replica_'):
+                event.listen(engine, 'handle_error', functools.partial(_replica_com_erro, engine))
+
+
+def _replica_com_erro(engine, contexto):
+    # Conexão perdida ou erro operacional (ex.: réplica sem uma tabela ainda não
+    # replicada): esta leitura falha, e as próximas vão para o primário até a
+    # réplica passar de novo na verificação de REPLICA_HEALTH_TTL.
+    if contexto.is_disconnect or isinstance(contexto.sqlalchemy_exception, OperationalError):
+        marcar_replica_indisponivel(engine)
+
+
+def _leitura_fixada_no_primario():
+    # Só vale para quem guarda o cookie de sessão do Flask (navegador). Clientes
+    # de API sem cookies só têm read-your-writes dentro da mesma requisição.
+    if g.get('escreveu_no_primario'):
+        return True
+    return flask_session.get('_primario_ate', 0) > time.time()
+
+
+class RoutingSession(Session):
+    """Sessão que envia leituras de requisições GET para as réplicas configuradas.
+
+    Escritas, flushes e o restante da requisição depois de uma escrita
+    continuam no banco primário. Requisições seguintes do mesmo usuário ficam
+    no primário por REPLICA_STICKY_SECONDS só se o cliente devolver o cookie
+    de sessão do Flask; sem cookies (clientes de API) elas podem ler a réplica
+    atrasada. Fora de requisições (CLI, jobs) tudo vai para o primário.
+
+    A escolha é feita só em `get_bind`, entre réplicas que passaram na
+    verificação de saúde; uma leitura que falha na réplica não é repetida,
+    mas tira a réplica do rodízio (veja `_replica_com_erro`).
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        # Só o banco primário tem réplicas; modelos com __bind_key__ próprio ficam onde estão.
+        if bind is None and engine is self._db.engine and self._pode_usar_replica(clause):
+            replica = self._escolher_replica()
+            if replica is not None:
+                return replica
+        return engine
+
+    def _pode_usar_replica(self, clause):
+        if self._flushing or self.info.get('escreveu'):
+            return False
+        if clause is not None and not isinstance(clause, Select):
+            return False
+        if not has_request_context() or request.method not in METODOS_LEITURA:
+            return False
+        return not _leitura_fixada_no_primario()
+
+    def _escolher_replica(self):
+        replicas = [(key, engine) for key, engine in self._db.engines.items()
+                    if key and key.startswith('replica_')]
+        if not replicas:
+            return None
+
+        ttl = current_app.config.get('REPLICA_HEALTH_TTL', 30)
+        inicio = next(_rodizio_replicas)
+        for deslocamento in range(len(replicas)):
+            bind_key, engine = replicas[(inicio + deslocamento) % len(replicas)]
+            if _replica_disponivel(bind_key, engine, ttl):
+                return engine
+        return None
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _registrar_escrita(sessao, flush_context):
+    sessao.info['escreveu'] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _fixar_leituras_no_primario(sessao):
+    if not sessao.info.pop('escreveu', False) or not has_request_context():
+        return
+    g.escreveu_no_primario = True
+    segundos = current_app.config.get('REPLICA_STICKY_SECONDS', 5)
+    flask_session['_primario_ate'] = time.time() + segundos
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _descartar_escrita(sessao):
+    sessao.info.pop('escreveu', None)
+
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
@@ -0,0 +1,91 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, event, inspect, select
+from backend.models.database import db, RoutingSession
+from backend.models.cliente import Cliente
+from backend.models.pedido import Pedido
+from backend.models.pagamento import Pagamento
+from datetime import datetime
+import decimal
+import json
+
+ENTIDADES_MONITORADAS = {
+    Cliente: 'cliente',
+    Pedido: 'pedido',
+    Pagamento: 'pagamento',
+}
+
+
+class EventoOutbox(db.Model):
+    __tablename__ = 'eventos_outbox'
+
+    id = Column(Integer, primary_key=True)
+    entidade = Column(String(30), nullable=False)
+    entidade_id = Column(Integer, nullable=False)
+    operacao = Column(String(10), nullable=False)
+    payload = Column(Text, nullable=False)
+    criado_em = Column(DateTime, default=datetime.now, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<EventoOutbox {self.id} - {self.entidade}.{self.operacao} {self.entidade_id}>'
+
+
+def _valor_serializavel(valor):
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    if isinstance(valor, decimal.Decimal):
+        return str(valor)
+    return valor
+
+
+def _serializar(obj):
+    # Usa apenas o estado já carregado para não disparar SELECTs durante o flush.
+    estado = inspect(obj).dict
+    return {coluna.key: _valor_serializavel(estado.get(coluna.key)) for coluna in obj.__table__.columns}
+
+
+def _evento(obj, operacao):
+    dados = _serializar(obj) if operacao != 'delete' else {'id': obj.id}
+    return {
+        'entidade': ENTIDADES_MONITORADAS[type(obj)],
+        'entidade_id': obj.id,
+        'operacao': operacao,
+        'payload': json.dumps(dados, ensure_ascii=False),
+        'criado_em': datetime.now(),
+    }
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def registrar_eventos_outbox(sessao, flush_context):
+    eventos = []
+    for obj in sessao.new:
+        if type(obj) in ENTIDADES_MONITORADAS:
+            eventos.append(_evento(obj, 'insert'))
+    for obj in sessao.dirty:
+        if type(obj) in ENTIDADES_MONITORADAS and sessao.is_modified(obj, include_collections=False):
+            eventos.append(_evento(obj, 'update'))
+    for obj in sessao.deleted:
+        if type(obj) in ENTIDADES_MONITORADAS:
+            eventos.append(_evento(obj, 'delete'))
+
+    if eventos:
+        # Grava na mesma transação do flush: o evento só existe se a alteração for confirmada.
+        sessao.connection().execute(EventoOutbox.__table__.insert(), eventos)
+
+
+def registrar_atualizacoes(conexao, modelo, ids):
+    """Grava eventos 'update' para alterações feitas fora do ORM (ex.: UPDATE em lote).
+
+    Deve ser chamada depois do UPDATE, na mesma transação: relê as linhas
+    para que o payload traga o estado novo, como o do listener de flush.
+    """
+    ids = list(ids)
+    if not ids:
+        return
+    agora = datetime.now()
+    linhas = conexao.execute(select(modelo.__table__).where(modelo.id.in_(ids))).mappings().all()
+    conexao.execute(EventoOutbox.__table__.insert(), [{
+        'entidade': ENTIDADES_MONITORADAS[modelo],
+        'entidade_id': linha['id'],
+        'operacao': 'update',
+        'payload': json.dumps({chave: _valor_serializavel(valor) for chave, valor in linha.items()}, ensure_ascii=False),
+        'criado_em': agora,
+    } for linha in linhas])
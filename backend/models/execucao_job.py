@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+from backend.models.database import db
+from datetime import datetime
+
+class ExecucaoJob(db.Model):
+    __tablename__ = 'job_runs'
+
+    id = Column(Integer, primary_key=True)
+    job_id = Column(String(80), nullable=False)
+    # 'executando', 'sucesso', 'erro', 'perdido' (misfire) ou 'ignorado' (instância anterior ainda rodando).
+    status = Column(String(20), default='executando', nullable=False)
+    agendado_para = Column(DateTime, nullable=True)
+    inicio = Column(DateTime, default=datetime.now, nullable=False)
+    fim = Column(DateTime, nullable=True)
+    duracao_ms = Column(Integer, nullable=True)
+    linhas_processadas = Column(Integer, nullable=True)
+    erro = Column(Text, nullable=True)
+
+    __table_args__ = (
+        Index('ix_job_runs_job_id_inicio', 'job_id', 'inicio'),
+        Index('ix_job_runs_status', 'status'),
+    )
+
+    def __repr__(self):
+        return f'<ExecucaoJob {self.job_id} {self.inicio} ({self.status})>'
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, Index
+from backend.models.database import db
+from datetime import datetime
+
+class ManutencaoBanco(db.Model):
+    __tablename__ = 'manutencoes_banco'
+
+    id = Column(Integer, primary_key=True)
+    # Bind do Flask-SQLAlchemy ('principal' para o banco padrão).
+    banco = Column(String(40), nullable=False)
+    # 'otimizacao' (PRAGMA optimize/ANALYZE + incremental_vacuum), 'vacuum' ou 'backup'.
+    operacao = Column(String(20), nullable=False)
+    inicio = Column(DateTime, default=datetime.now, nullable=False)
+    duracao_ms = Column(Integer, nullable=True)
+    tamanho_antes_bytes = Column(BigInteger, nullable=True)
+    tamanho_depois_bytes = Column(BigInteger, nullable=True)
+    paginas_livres_antes = Column(Integer, nullable=True)
+    paginas_livres_depois = Column(Integer, nullable=True)
+    arquivo = Column(String(500), nullable=True)
+    erro = Column(Text, nullable=True)
+
+    __table_args__ = (
+        Index('ix_manutencoes_banco_operacao_inicio', 'operacao', 'inicio'),
+    )
+
+    def __repr__(self):
+        return f'<ManutencaoBanco {self.banco} {self.operacao} {self.inicio}>'
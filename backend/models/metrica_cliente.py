@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index
+from backend.models.database import db
+from datetime import datetime
+
+class MetricaCliente(db.Model):
+    __tablename__ = 'metricas_cliente'
+
+    cliente_id = Column(Integer, ForeignKey('clientes.id', ondelete='CASCADE'), primary_key=True)
+    recencia_dias = Column(Integer, nullable=True)
+    frequencia = Column(Integer, nullable=False, default=0)
+    valor_monetario = Column(Float, nullable=False, default=0)
+    ticket_medio = Column(Float, nullable=False, default=0)
+    ltv = Column(Float, nullable=False, default=0, index=True)
+    primeira_compra = Column(DateTime, nullable=True)
+    ultima_compra = Column(DateTime, nullable=True)
+    pontuacao_r = Column(Integer, nullable=False, default=0)
+    pontuacao_f = Column(Integer, nullable=False, default=0)
+    pontuacao_m = Column(Integer, nullable=False, default=0)
+    segmento = Column(String(30), nullable=False)
+    calculado_em = Column(DateTime, default=datetime.now, nullable=False, index=True)
+
+    __table_args__ = (
+        Index('ix_metricas_cliente_segmento_ltv', 'segmento', 'ltv'),
+    )
+
+    def __repr__(self):
+        return f'<MetricaCliente {self.cliente_id} - {self.segmento}>'
@@ -0,0 +1,56 @@
+from sqlalchemy import inspect, text, update
+from sqlalchemy.schema import CreateIndex
+from backend.models.database import db
+
+
+def atualizar_esquema():
+    """Adiciona colunas e índices novos a tabelas já existentes.
+
+    O `db.create_all()` só cria tabelas que ainda não existem; bancos criados
+    por versões anteriores recebem aqui as colunas adicionadas depois. Colunas
+    com `info={'preencher_com': <expressão SQL>}` têm as linhas antigas
+    preenchidas com esse valor; se for uma função (ex.: `datetime.now`), com o
+    valor que ela devolve, gravado como o ORM grava. Datas usam o relógio da
+    aplicação: CURRENT_TIMESTAMP do SQLite é UTC e desalinharia as marcas da sincronização.
+    """
+    engines = db.engines
+    for bind_key, metadata in db.metadatas.items():
+        # `db.metadatas` é do processo: ignora binds que só outros apps configuraram.
+        if bind_key in engines:
+            _atualizar_metadata(engines[bind_key], metadata)
+
+
+def _atualizar_metadata(engine, metadata):
+    with engine.begin() as conn:
+        # Inspetor na própria conexão: com uma conexão compartilhada (StaticPool), o de
+        # engine encerraria a transação do UPDATE de preenchimento a cada consulta.
+        inspetor = inspect(conn)
+        tabelas_existentes = set(inspetor.get_table_names())
+
+        for tabela in metadata.sorted_tables:
+            if tabela.name not in tabelas_existentes:
+                continue
+
+            colunas_existentes = {coluna['name'] for coluna in inspetor.get_columns(tabela.name)}
+            for coluna in tabela.columns:
+                if coluna.name in colunas_existentes:
+                    continue
+
+                tipo = coluna.type.compile(dialect=engine.dialect)
+                ddl = f'ALTER TABLE {tabela.name} ADD COLUMN {coluna.name} {tipo}'
+                if coluna.server_default is not None:
+                    padrao = coluna.server_default.arg
+                    padrao = f"'{padrao}'" if isinstance(padrao, str) else padrao.compile(dialect=engine.dialect)
+                    ddl += f' DEFAULT {padrao}'
+                conn.execute(text(ddl))
+
+                preencher_com = coluna.info.get('preencher_com')
+                if callable(preencher_com):
+                    conn.execute(update(tabela).where(coluna.is_(None)).values({coluna.name: preencher_com()}))
+                elif preencher_com:
+                    conn.execute(text(f'UPDATE {tabela.name} SET {coluna.name} = {preencher_com} WHERE {coluna.name} IS NULL'))
+                print(f"Coluna '{tabela.name}.{coluna.name}' adicionada ao banco de dados.")
+
+            for indice in tabela.indexes:
+                # IF NOT EXISTS em vez de checkfirst: a reflexão do SQLite ignora índices de expressão.
+                conn.execute(CreateIndex(indice, if_not_exists=True))
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+from backend.models.database import db
+from datetime import datetime
+
+class Notificacao(db.Model):
+    __tablename__ = 'notificacoes'
+
+    id = Column(Integer, primary_key=True)
+    canal = Column(String(20), nullable=False)
+    destino = Column(String(120), nullable=False)
+    assunto = Column(String(200), nullable=True)
+    conteudo = Column(Text, nullable=False)
+    # Evita enfileirar duas vezes o mesmo aviso (ex.: 'lembrete:<pedido>:<dia>').
+    chave = Column(String(120), unique=True, nullable=True)
+    status = Column(String(20), default='pendente', nullable=False)
+    tentativas = Column(Integer, default=0, nullable=False)
+    proxima_tentativa_em = Column(DateTime, default=datetime.now, nullable=False)
+    erro = Column(Text, nullable=True)
+    criado_em = Column(DateTime, default=datetime.now, nullable=False)
+    enviado_em = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index('ix_notificacoes_status_proxima_tentativa', 'status', 'proxima_tentativa_em'),
+    )
+
+    def __repr__(self):
+        return f'<Notificacao {self.id} - {self.canal} para {self.destino} ({self.status})>'
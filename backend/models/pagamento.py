@@ -10,7 +10,12 @@ class Pagamento(db.Model):
     pedido_id = Column(Integer, ForeignKey('pedidos.id'), nullable=False, unique=True) 
     valor_pago = Column(Float, nullable=False)
     forma_pagamento = Column(String(50), nullable=False) 
-    data_pagamento = Column(DateTime, default=db.func.current_timestamp())
+    data_pagamento = Column(DateTime, default=db.func.current_timestamp(), index=True)
+    # Identificador do lançamento no extrato bancário (conciliação); evita registrar o mesmo crédito duas vezes.
+    referencia_extrato = Column(String(120), nullable=True, index=True)
+
+    criado_em = Column(DateTime, default=datetime.now, index=True, info={'preencher_com': datetime.now})
+    atualizado_em = Column(DateTime, default=datetime.now, onupdate=datetime.now, index=True, info={'preencher_com': datetime.now})
 
     pedido = relationship('Pedido', back_populates='pagamento')
 
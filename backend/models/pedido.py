@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Index, text
 from sqlalchemy.orm import relationship
 from backend.models.database import db
 from datetime import datetime
@@ -7,14 +7,24 @@ class Pedido(db.Model):
     __tablename__ = 'pedidos'
 
     id = Column(Integer, primary_key=True)
-    cliente_id = Column(Integer, ForeignKey('clientes.id'), nullable=False)
+    cliente_id = Column(Integer, ForeignKey('clientes.id'), nullable=False, index=True)
     servicos = Column(Text, nullable=False)
     valor_total = Column(Float, nullable=False)
     status = Column(String(50), default='pendente', nullable=False) 
-    data_pedido = Column(DateTime, default=datetime.now(), nullable=False)
+    data_pedido = Column(DateTime, default=datetime.now, nullable=False, index=True)
     data_entrega = Column(DateTime, nullable=True) 
 
+    criado_em = Column(DateTime, default=datetime.now, index=True, info={'preencher_com': datetime.now})
+    atualizado_em = Column(DateTime, default=datetime.now, onupdate=datetime.now, index=True, info={'preencher_com': datetime.now})
+    # Controle de concorrência otimista: todo UPDATE/DELETE pelo ORM confere e incrementa a versão.
+    versao = Column(Integer, nullable=False, default=1, server_default=text('1'))
+
     pagamento = relationship('Pagamento', back_populates='pedido', uselist=False)
 
+    __table_args__ = (
+        Index('ix_pedidos_status_data_pedido', 'status', 'data_pedido'),
+    )
+    __mapper_args__ = {'version_id_col': versao}
+
     def __repr__(self):
         return f'<Pedido {self.id} - Cliente {self.cliente_id} - Status: {self.status}>'
\ No newline at end of file
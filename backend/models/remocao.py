@@ -0,0 +1,47 @@
+from sqlalchemy import Column, Integer, String, DateTime, event
+from backend.models.database import db, RoutingSession
+from backend.models.cliente import Cliente, AnotacaoCliente
+from backend.models.pedido import Pedido
+from backend.models.pagamento import Pagamento
+from datetime import datetime
+
+ENTIDADES_SINCRONIZADAS = {
+    Cliente: 'cliente',
+    Pedido: 'pedido',
+    Pagamento: 'pagamento',
+    AnotacaoCliente: 'anotacao',
+}
+
+
+class RegistroRemovido(db.Model):
+    __tablename__ = 'registros_removidos'
+
+    id = Column(Integer, primary_key=True)
+    entidade = Column(String(30), nullable=False)
+    entidade_id = Column(Integer, nullable=False)
+    # 'delete' para exclusões; 'arquivado' quando o registro só saiu do banco principal para o arquivo.
+    operacao = Column(String(10), nullable=False, default='delete', server_default='delete')
+    removido_em = Column(DateTime, default=datetime.now, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<RegistroRemovido {self.entidade} {self.entidade_id}>'
+
+
+def registrar_remocoes(conexao, entidade, ids, operacao='delete'):
+    """Grava tombstones para remoções feitas fora do ORM (ex.: DELETE em lote)."""
+    agora = datetime.now()
+    linhas = [{'entidade': entidade, 'entidade_id': entidade_id, 'operacao': operacao, 'removido_em': agora} for entidade_id in ids]
+    if linhas:
+        conexao.execute(RegistroRemovido.__table__.insert(), linhas)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def registrar_tombstones(sessao, flush_context):
+    agora = datetime.now()
+    linhas = [
+        {'entidade': ENTIDADES_SINCRONIZADAS[type(obj)], 'entidade_id': obj.id, 'operacao': 'delete', 'removido_em': agora}
+        for obj in sessao.deleted
+        if type(obj) in ENTIDADES_SINCRONIZADAS
+    ]
+    if linhas:
+        sessao.connection().execute(RegistroRemovido.__table__.insert(), linhas)
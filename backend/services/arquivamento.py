@@ -0,0 +1,157 @@
+from flask import current_app
+from backend.models.database import db
+from backend.models.cliente import Cliente
+from backend.models.pedido import Pedido
+from backend.models.pagamento import Pagamento
+from backend.models.arquivo import PedidoArquivado, PagamentoArquivado
+from backend.models.evento import EventoOutbox
+from backend.models.remocao import registrar_remocoes
+from backend.services.busca import remover_dos_indices_busca
+from sqlalchemy import select, update, delete, func, case
+from collections import defaultdict
+from datetime import datetime, timedelta
+import json
+import time
+import weakref
+
+STATUS_ARQUIVAVEIS = ('entregue', 'cancelado')
+CACHE_LIMITES_SEGUNDOS = 60
+
+# Por app, como os demais caches em memória: bancos diferentes no mesmo processo não se misturam.
+_limites_por_app = weakref.WeakKeyDictionary()
+
+
+def _limites_arquivo():
+    return _limites_por_app.setdefault(current_app._get_current_object(), {})
+
+
+def _colunas_copiadas(origem, destino):
+    return [coluna for coluna in origem.__table__.columns if coluna.name in destino.__table__.columns]
+
+
+def _acumular_contadores(pedidos, pagamentos):
+    valor_por_pedido = {pagamento['pedido_id']: pagamento['valor_pago'] for pagamento in pagamentos}
+    por_cliente = defaultdict(lambda: [0, 0.0, None])
+    for pedido in pedidos:
+        if pedido['status'] == 'cancelado':
+            continue
+        acumulado = por_cliente[pedido['cliente_id']]
+        acumulado[0] += 1
+        acumulado[1] += valor_por_pedido.get(pedido['id'], 0)
+        if acumulado[2] is None or pedido['data_pedido'] > acumulado[2]:
+            acumulado[2] = pedido['data_pedido']
+
+    for cliente_id, (quantidade, gasto, ultimo) in por_cliente.items():
+        atual = Cliente.ultimo_pedido_arquivado_em
+        db.session.execute(
+            update(Cliente).where(Cliente.id == cliente_id).values(
+                pedidos_arquivados=func.coalesce(Cliente.pedidos_arquivados, 0) + quantidade,
+                gasto_arquivado=func.coalesce(Cliente.gasto_arquivado, 0) + gasto,
+                ultimo_pedido_arquivado_em=case((atual.is_(None), ultimo), (atual < ultimo, ultimo), else_=atual)
+            ).execution_options(synchronize_session=False)
+        )
+
+
+def _registrar_saida(pedidos, pagamentos, agora):
+    # Os DELETEs em lote não passam pelos listeners da sessão: clientes da
+    # sincronização e do feed de eventos precisam ver os pedidos saindo do banco
+    # principal, como 'arquivado' e não 'delete', pois a API continua a servi-los.
+    conexao = db.session.connection()
+    registrar_remocoes(conexao, 'pagamento', [pagamento['id'] for pagamento in pagamentos], operacao='arquivado')
+    registrar_remocoes(conexao, 'pedido', [pedido['id'] for pedido in pedidos], operacao='arquivado')
+    eventos = [('pagamento', pagamento['id']) for pagamento in pagamentos] + [('pedido', pedido['id']) for pedido in pedidos]
+    db.session.execute(EventoOutbox.__table__.insert(), [{
+        'entidade': entidade,
+        'entidade_id': entidade_id,
+        'operacao': 'arquivado',
+        'payload': json.dumps({'id': entidade_id, 'arquivado_em': agora.isoformat()}),
+        'criado_em': agora
+    } for entidade, entidade_id in eventos])
+
+
+def arquivar_pedidos(dias=None, tamanho_lote=None):
+    """Move pedidos entregues/cancelados mais antigos que `dias` (e seus pagamentos) para o arquivo.
+
+    Trabalha em lotes: cada lote é primeiro copiado para o arquivo e depois
+    removido do banco principal. Se a execução for interrompida entre as duas
+    etapas, a próxima regrava a cópia antes de remover. Retorna a quantidade
+    de pedidos arquivados.
+    """
+    dias = dias or current_app.config.get('ARCHIVE_AFTER_DAYS', 365)
+    tamanho_lote = tamanho_lote or current_app.config.get('ARCHIVE_BATCH_SIZE', 500)
+    corte = datetime.now() - timedelta(days=dias)
+    engine_arquivo = db.engines['arquivo']
+    colunas_pedido = _colunas_copiadas(Pedido, PedidoArquivado)
+    colunas_pagamento = _colunas_copiadas(Pagamento, PagamentoArquivado)
+    total = 0
+
+    while True:
+        ids = db.session.execute(
+            select(Pedido.id)
+            .where(Pedido.status.in_(STATUS_ARQUIVAVEIS), Pedido.data_pedido < corte)
+            .order_by(Pedido.id)
+            .limit(tamanho_lote)
+        ).scalars().all()
+        if not ids:
+            break
+
+        pedidos = [dict(linha) for linha in db.session.execute(select(*colunas_pedido).where(Pedido.id.in_(ids))).mappings()]
+        pagamentos = [dict(linha) for linha in db.session.execute(select(*colunas_pagamento).where(Pagamento.pedido_id.in_(ids))).mappings()]
+        agora = datetime.now()
+
+        with engine_arquivo.begin() as conn:
+            conn.execute(delete(PagamentoArquivado).where(PagamentoArquivado.pedido_id.in_(ids)))
+            conn.execute(delete(PedidoArquivado).where(PedidoArquivado.id.in_(ids)))
+            conn.execute(PedidoArquivado.__table__.insert(), [dict(pedido, arquivado_em=agora) for pedido in pedidos])
+            if pagamentos:
+                conn.execute(PagamentoArquivado.__table__.insert(), [dict(pagamento, arquivado_em=agora) for pagamento in pagamentos])
+
+        try:
+            _acumular_contadores(pedidos, pagamentos)
+            _registrar_saida(pedidos, pagamentos, agora)
+            db.session.execute(delete(Pagamento).where(Pagamento.pedido_id.in_(ids)).execution_options(synchronize_session=False))
+            db.session.execute(delete(Pedido).where(Pedido.id.in_(ids)).execution_options(synchronize_session=False))
+            remover_dos_indices_busca('pedidos', ids)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        total += len(ids)
+
+    _limites_arquivo().clear()
+    return total
+
+
+def _maior_data_arquivada(coluna):
+    chave = str(coluna)
+    limites = _limites_arquivo()
+    valor, verificado_em = limites.get(chave, (None, 0.0))
+    if time.monotonic() - verificado_em < CACHE_LIMITES_SEGUNDOS:
+        return valor
+
+    with db.engines['arquivo'].connect() as conn:
+        valor = conn.execute(select(func.max(coluna))).scalar()
+    limites[chave] = (valor, time.monotonic())
+    return valor
+
+
+def arquivo_necessario_pedidos(data_inicio=None, status=None):
+    """Indica se uma consulta de pedidos precisa incluir o arquivo."""
+    if status and status not in STATUS_ARQUIVAVEIS:
+        return False
+    limite = _maior_data_arquivada(PedidoArquivado.data_pedido)
+    return limite is not None and (data_inicio is None or data_inicio <= limite)
+
+
+def arquivo_necessario_pagamentos(data_inicio=None):
+    """Indica se uma consulta de pagamentos precisa incluir o arquivo."""
+    limite = _maior_data_arquivada(PagamentoArquivado.data_pagamento)
+    return limite is not None and (data_inicio is None or data_inicio <= limite)
+
+
+def nomes_clientes(cliente_ids):
+    cliente_ids = set(cliente_ids)
+    if not cliente_ids:
+        return {}
+    return dict(db.session.execute(select(Cliente.id, Cliente.nome).where(Cliente.id.in_(cliente_ids))).all())
@@ -0,0 +1,223 @@
+from backend.config import Config
+from backend.models.database import db
+from backend.models.migracoes import atualizar_esquema
+from backend.models.cliente import Cliente, AnotacaoCliente
+from backend.models.pedido import Pedido
+from backend.models.pagamento import Pagamento
+from sqlalchemy import create_engine, insert, text, func, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import StaticPool
+from datetime import datetime, timedelta
+import hashlib
+import os
+import random
+import sqlite3
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+TAMANHO_LOTE = 5000
+SERVICOS_EXEMPLO = ('Corte de cabelo', 'Manicure', 'Pedicure', 'Escova', 'Coloração', 'Hidratação', 'Maquiagem', 'Design de sobrancelhas')
+FORMAS_PAGAMENTO_EXEMPLO = ('pix', 'dinheiro', 'cartao_credito', 'cartao_debito')
+# Proporção aproximada de pedidos em cada status nos dados de exemplo.
+STATUS_EXEMPLO = ('entregue',) * 6 + ('pago',) * 2 + ('pendente', 'cancelado')
+
+
+def assinatura_esquema():
+    """Hash curto das tabelas e colunas dos modelos: muda quando o esquema muda."""
+    partes = []
+    for tabela in sorted(db.metadata.tables.values(), key=lambda t: t.name):
+        partes.append(tabela.name)
+        partes.extend(f'{coluna.name}:{coluna.type}' for coluna in tabela.columns)
+        partes.extend(sorted(indice.name or '' for indice in tabela.indexes))
+    return hashlib.sha256('|'.join(partes).encode('utf-8')).hexdigest()[:12]
+
+
+def caminho_banco_modelo(nome='padrao'):
+    pasta = Config.BANCO_MODELO_DIR or os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'instance', 'modelos')
+    return os.path.join(pasta, f'modelo_{nome}_{assinatura_esquema()}.db')
+
+
+def config_banco(url):
+    """Configuração para `create_app` apontar o banco principal e o de arquivo para `url`, sem réplicas."""
+    return {
+        'SQLALCHEMY_DATABASE_URI': url,
+        'SQLALCHEMY_BINDS': {'arquivo': url},
+        'INICIALIZAR_AO_IMPORTAR': False,
+    }
+
+
+def gerar_dados_exemplo(clientes=1000, pedidos_por_cliente=10, semente=0):
+    """Insere clientes, pedidos, pagamentos e anotações sintéticos com INSERTs em lote.
+
+    Deve rodar dentro de um contexto de aplicação, antes de `inicializar_banco`:
+    os índices de busca e os telefones normalizados são preenchidos por ela a
+    partir das tabelas. Os contadores dos clientes já são gravados calculados.
+    """
+    aleatorio = random.Random(semente)
+    agora = datetime.now()
+    primeiro_cliente = (db.session.scalar(select(func.max(Cliente.id))) or 0) + 1
+    primeiro_pedido = (db.session.scalar(select(func.max(Pedido.id))) or 0) + 1
+
+    def inserir(modelo, linhas):
+        for inicio in range(0, len(linhas), TAMANHO_LOTE):
+            db.session.execute(insert(modelo), linhas[inicio:inicio + TAMANHO_LOTE])
+
+    linhas_clientes = [{
+        'id': cliente_id,
+        'nome': f'Cliente {cliente_id}',
+        'telefone': f'(11) 9{cliente_id:08d}',
+        'email': f'cliente{cliente_id}@example.com' if cliente_id % 3 else None,
+        'criado_em': agora - timedelta(days=aleatorio.randint(0, 730)),
+        'total_pedidos': 0,
+        'total_gasto': 0.0,
+        'ultimo_pedido_em': None,
+    } for cliente_id in range(primeiro_cliente, primeiro_cliente + clientes)]
+
+    pedidos, pagamentos, anotacoes = [], [], []
+    pedido_id = primeiro_pedido
+    for cliente in linhas_clientes:
+        if aleatorio.random() < 0.2:
+            anotacoes.append({'cliente_id': cliente['id'], 'texto': f"Prefere {aleatorio.choice(SERVICOS_EXEMPLO).lower()} no fim da tarde."})
+        for _ in range(aleatorio.randint(0, 2 * pedidos_por_cliente)):
+            data_pedido = agora - timedelta(days=aleatorio.randint(0, 730), minutes=aleatorio.randint(0, 1440))
+            status = aleatorio.choice(STATUS_EXEMPLO)
+            valor = round(aleatorio.uniform(30, 400), 2)
+            pedidos.append({
+                'id': pedido_id,
+                'cliente_id': cliente['id'],
+                'servicos': ', '.join(aleatorio.sample(SERVICOS_EXEMPLO, aleatorio.randint(1, 3))),
+                'valor_total': valor,
+                'status': status,
+                'data_pedido': data_pedido,
+                'data_entrega': data_pedido + timedelta(days=aleatorio.randint(0, 7)) if status == 'entregue' else None,
+            })
+            if status != 'cancelado':
+                cliente['total_pedidos'] += 1
+                cliente['ultimo_pedido_em'] = max(cliente['ultimo_pedido_em'] or data_pedido, data_pedido)
+            if status in ('pago', 'entregue'):
+                pagamentos.append({
+                    'pedido_id': pedido_id,
+                    'valor_pago': valor,
+                    'forma_pagamento': aleatorio.choice(FORMAS_PAGAMENTO_EXEMPLO),
+                    'data_pagamento': data_pedido + timedelta(hours=aleatorio.randint(0, 48)),
+                })
+                cliente['total_gasto'] += valor
+            pedido_id += 1
+
+    inserir(Cliente, linhas_clientes)
+    inserir(Pedido, pedidos)
+    inserir(Pagamento, pagamentos)
+    inserir(AnotacaoCliente, anotacoes)
+    db.session.commit()
+    print(f"Dados de exemplo: {len(linhas_clientes)} clientes, {len(pedidos)} pedidos, {len(pagamentos)} pagamentos.")
+
+
+def popular_banco(url, popular=None):
+    """Cria o esquema completo em `url`, roda `popular()` e finaliza como na subida da aplicação."""
+    from backend.app import create_app, inicializar_banco
+
+    app = create_app(config_banco(url))
+    with app.app_context():
+        db.create_all()
+        atualizar_esquema()
+        if popular is not None:
+            popular()
+    inicializar_banco(app)
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def criar_banco_modelo(caminho=None, popular=None, recriar=False):
+    """Cria, uma única vez, um banco SQLite modelo com o esquema e os dados de `popular()`.
+
+    O arquivo é gerado ao lado e renomeado no fim, sob uma trava de arquivo:
+    processos paralelos (ex.: workers do pytest-xdist) esperam o primeiro e
+    reaproveitam o modelo pronto. Como o nome padrão inclui a assinatura do
+    esquema, alterar os modelos gera um modelo novo. Retorna o caminho.
+    """
+    caminho = os.path.abspath(caminho or caminho_banco_modelo())
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+
+    with open(f'{caminho}.lock', 'w') as arquivo_trava:
+        if fcntl is not None:
+            fcntl.flock(arquivo_trava, fcntl.LOCK_EX)
+        try:
+            if os.path.exists(caminho) and not recriar:
+                return caminho
+
+            temporario = f'{caminho}.{os.getpid()}.tmp'
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            popular_banco(f'sqlite:///{temporario}', popular)
+            os.replace(temporario, caminho)
+            print(f"Banco modelo criado em {caminho}.")
+            return caminho
+        finally:
+            if fcntl is not None:
+                fcntl.flock(arquivo_trava, fcntl.LOCK_UN)
+
+
+def clonar_banco_modelo(caminho, destino=':memory:'):
+    """Copia o banco modelo para um banco novo em memória pela API de backup do SQLite.
+
+    A cópia é feita página a página, sem reexecutar DDL nem INSERTs, e cada
+    chamada devolve uma conexão independente. Com `destino` igual a um
+    caminho, a cópia vai para esse arquivo (testes com conexões concorrentes,
+    que o StaticPool não permite); feche a conexão devolvida e use `config_banco`.
+    """
+    origem = sqlite3.connect(f'file:{caminho}?mode=ro', uri=True)
+    destino = sqlite3.connect(destino, check_same_thread=False)
+    try:
+        origem.backup(destino)
+    finally:
+        origem.close()
+    return destino
+
+
+def config_banco_em_memoria(conexao):
+    """Configuração para `create_app` usar a conexão em memória de `clonar_banco_modelo`.
+
+    O StaticPool mantém a mesma conexão para o banco principal e o de
+    arquivo; o banco some quando ela é fechada.
+    """
+    opcoes = {'creator': lambda: conexao, 'poolclass': StaticPool}
+    return {
+        **config_banco('sqlite://'),
+        'SQLALCHEMY_ENGINE_OPTIONS': opcoes,
+        'SQLALCHEMY_BINDS': {'arquivo': {'url': 'sqlite://', **opcoes}},
+    }
+
+
+def _url_servidor_postgres(url):
+    return make_url(url).set(database='postgres')
+
+
+def clonar_banco_postgres(url_modelo, sufixo):
+    """Cria `<banco modelo>_<sufixo>` com `CREATE DATABASE ... TEMPLATE` e devolve a URL da cópia.
+
+    O PostgreSQL copia os arquivos do modelo sem reexecutar nada; o modelo
+    não pode ter conexões abertas durante a cópia.
+    """
+    url = make_url(url_modelo)
+    copia = f'{url.database}_{sufixo}'
+    engine = create_engine(_url_servidor_postgres(url_modelo), isolation_level='AUTOCOMMIT')
+    try:
+        with engine.connect() as conn:
+            conn.execute(text(f'DROP DATABASE IF EXISTS "{copia}"'))
+            conn.execute(text(f'CREATE DATABASE "{copia}" TEMPLATE "{url.database}"'))
+    finally:
+        engine.dispose()
+    return url.set(database=copia).render_as_string(hide_password=False)
+
+
+def remover_banco_postgres(url_copia):
+    engine = create_engine(_url_servidor_postgres(url_copia), isolation_level='AUTOCOMMIT')
+    try:
+        with engine.connect() as conn:
+            conn.execute(text(f'DROP DATABASE IF EXISTS "{make_url(url_copia).database}"'))
+    finally:
+        engine.dispose()
@@ -0,0 +1,260 @@
+from backend.models.database import db, RoutingSession
+from backend.models.cliente import Cliente, AnotacaoCliente
+from backend.models.pedido import Pedido
+from sqlalchemy import event, inspect, select, func, table, column, literal_column, text, delete
+from datetime import datetime, timedelta
+import html
+import re
+import unicodedata
+
+TAMANHO_TRECHO = 12
+LIMITE_MAXIMO_RESULTADOS = 100
+MARCA_INICIO = '<mark>'
+MARCA_FIM = '</mark>'
+# O banco delimita os termos com estes caracteres de uso privado; o trecho é escapado antes de virarem <mark>.
+_SENTINELA_INICIO = '\ue000'
+_SENTINELA_FIM = '\ue001'
+CONFIGURACAO_PG = literal_column("'portuguese'::regconfig")
+
+# nome do índice -> (modelo, coluna de texto, tabela FTS5 no SQLite)
+INDICES_BUSCA = {
+    'pedidos': (Pedido, Pedido.servicos, 'pedidos_fts'),
+    'anotacoes': (AnotacaoCliente, AnotacaoCliente.texto, 'anotacoes_cliente_fts'),
+}
+_INDICE_POR_MODELO = {modelo: nome for nome, (modelo, coluna, tabela_fts) in INDICES_BUSCA.items()}
+
+
+def _dialeto(conexao=None):
+    return (conexao or db.engine).dialect.name
+
+
+def _tabela_fts(nome):
+    modelo, coluna, tabela_fts = INDICES_BUSCA[nome]
+    return table(tabela_fts, column('rowid'), column(coluna.key))
+
+
+def criar_indices_busca():
+    """Cria os índices de texto completo que ainda não existem.
+
+    No SQLite são tabelas FTS5 com `remove_diacritics` (acentos ignorados) e
+    índice de prefixos, populadas na criação e mantidas pelo listener de
+    flush abaixo. No PostgreSQL são índices GIN sobre `to_tsvector('portuguese', ...)`,
+    que o próprio banco mantém (com radicalização em português).
+    """
+    with db.engine.begin() as conn:
+        dialeto = _dialeto(conn)
+        for nome, (modelo, coluna, tabela_fts) in INDICES_BUSCA.items():
+            tabela = modelo.__tablename__
+            if dialeto == 'sqlite':
+                existe = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = :nome"), {'nome': tabela_fts}).first()
+                if existe:
+                    continue
+                conn.execute(text(
+                    f"CREATE VIRTUAL TABLE {tabela_fts} USING fts5("
+                    f"{coluna.key}, tokenize = 'unicode61 remove_diacritics 2', prefix = '3')"
+                ))
+                conn.execute(text(f"INSERT INTO {tabela_fts}(rowid, {coluna.key}) SELECT id, {coluna.key} FROM {tabela}"))
+                print(f"Índice de busca '{tabela_fts}' criado e populado.")
+            elif dialeto == 'postgresql':
+                conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS ix_{tabela}_{coluna.key}_busca ON {tabela} "
+                    f"USING gin (to_tsvector('portuguese'::regconfig, {coluna.key}))"
+                ))
+
+
+def remover_dos_indices_busca(nome, ids):
+    """Remove do índice registros apagados fora do ORM (ex.: DELETE em lote).
+
+    `ids` pode ser uma lista ou um SELECT de ids; deve ser chamado antes do
+    DELETE quando for um SELECT sobre a própria tabela.
+    """
+    if _dialeto() != 'sqlite':
+        return
+    fts = _tabela_fts(nome)
+    db.session.execute(delete(fts).where(fts.c.rowid.in_(ids)))
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def sincronizar_indices_busca(sessao, flush_context):
+    alteracoes = {}
+    for obj in sessao.new:
+        if type(obj) in _INDICE_POR_MODELO:
+            alteracoes.setdefault(_INDICE_POR_MODELO[type(obj)], {})[obj.id] = obj
+    for obj in sessao.dirty:
+        nome = _INDICE_POR_MODELO.get(type(obj))
+        if nome and inspect(obj).attrs[INDICES_BUSCA[nome][1].key].history.has_changes():
+            alteracoes.setdefault(nome, {})[obj.id] = obj
+    for obj in sessao.deleted:
+        if type(obj) in _INDICE_POR_MODELO:
+            alteracoes.setdefault(_INDICE_POR_MODELO[type(obj)], {})[obj.id] = None
+
+    if not alteracoes:
+        return
+    conexao = sessao.connection()
+    if _dialeto(conexao) != 'sqlite':
+        return
+
+    for nome, objetos in alteracoes.items():
+        chave_texto = INDICES_BUSCA[nome][1].key
+        fts = _tabela_fts(nome)
+        conexao.execute(delete(fts).where(fts.c.rowid.in_(list(objetos))))
+        linhas = [{'rowid': obj_id, chave_texto: inspect(obj).dict.get(chave_texto)} for obj_id, obj in objetos.items() if obj is not None]
+        if linhas:
+            conexao.execute(fts.insert(), linhas)
+
+
+def termo_valido(termo):
+    return bool(termo and re.search(r'\w', termo))
+
+
+def parametros_busca(args):
+    """Lê `q`, `inicio`, `fim` (YYYY-MM-DD, inclusivos), `limite` e `pagina` da query string.
+
+    Levanta ValueError se alguma data estiver em formato inválido.
+    """
+    data_inicio = datetime.strptime(args['inicio'], '%Y-%m-%d') if args.get('inicio') else None
+    data_fim = datetime.strptime(args['fim'], '%Y-%m-%d') + timedelta(days=1) if args.get('fim') else None
+    limite = max(1, min(args.get('limite', 20, type=int), LIMITE_MAXIMO_RESULTADOS))
+    pagina = max(1, args.get('pagina', 1, type=int))
+    return {
+        'termo': args.get('q', '').strip(),
+        'data_inicio': data_inicio,
+        'data_fim': data_fim,
+        'limite': limite,
+        'deslocamento': (pagina - 1) * limite
+    }
+
+
+# Sufixos de plural e de -ção/-ções, do mais longo ao mais curto, com o que fica no lugar.
+_SUFIXOS = (
+    ('coes', ''), ('cao', ''), ('soes', ''), ('sao', ''),
+    ('oes', ''), ('aes', ''), ('aos', ''), ('ais', ''), ('eis', ''), ('ois', ''),
+    ('ns', ''), ('res', 'r'), ('les', 'l'), ('zes', 'z'), ('s', ''),
+)
+TAMANHO_MINIMO_RADICAL = 3
+
+
+def radical(palavra):
+    """Radical aproximado de uma palavra em português, sem acentos e em minúsculas.
+
+    Tira o plural, as terminações -ção/-ções e a vogal temática final:
+    'Pinturas' e 'pintura' viram 'pintur'; 'instalações' e 'instalação',
+    'instal'. Palavras curtas ficam como estão.
+    """
+    palavra = ''.join(c for c in unicodedata.normalize('NFKD', palavra.lower()) if not unicodedata.combining(c))
+    for sufixo, troca in _SUFIXOS:
+        if palavra.endswith(sufixo) and len(palavra) - len(sufixo) + len(troca) >= TAMANHO_MINIMO_RADICAL:
+            palavra = palavra[:-len(sufixo)] + troca
+            break
+    if palavra[-1:] in ('a', 'e', 'o') and len(palavra) > TAMANHO_MINIMO_RADICAL:
+        palavra = palavra[:-1]
+    return palavra
+
+
+def _consulta_fts5(termo):
+    # FTS5 não tem radicalizador para português: cada palavra vira o seu radical
+    # como prefixo entre aspas ('pinturas' -> "pintur"*, que encontra 'Pintura'),
+    # o que também evita erros de sintaxe do FTS5 com o texto digitado.
+    palavras = re.findall(r'\w+', termo)
+    return ' '.join(f'"{radical(palavra)}"*' for palavra in palavras)
+
+
+def _destacar(trecho):
+    """Escapa o trecho como HTML e só então troca os delimitadores do banco por <mark>."""
+    if trecho is None:
+        return None
+    return html.escape(trecho).replace(_SENTINELA_INICIO, MARCA_INICIO).replace(_SENTINELA_FIM, MARCA_FIM)
+
+
+def _busca_texto(nome, termo):
+    """Devolve (origem, condição, trecho, ordenação) da busca de texto completo para o banco atual."""
+    modelo, coluna, tabela_fts = INDICES_BUSCA[nome]
+    dialeto = _dialeto()
+
+    if dialeto == 'sqlite':
+        fts = _tabela_fts(nome)
+        referencia = literal_column(tabela_fts)
+        return (
+            fts.join(modelo.__table__, modelo.id == fts.c.rowid),
+            referencia.op('MATCH')(_consulta_fts5(termo)),
+            func.snippet(referencia, 0, _SENTINELA_INICIO, _SENTINELA_FIM, '…', TAMANHO_TRECHO),
+            func.bm25(referencia).asc()
+        )
+
+    if dialeto == 'postgresql':
+        consulta = func.websearch_to_tsquery(CONFIGURACAO_PG, termo)
+        documento = func.to_tsvector(CONFIGURACAO_PG, coluna)
+        opcoes = f'StartSel={_SENTINELA_INICIO}, StopSel={_SENTINELA_FIM}, MaxWords=20, MinWords=5, MaxFragments=2'
+        return (
+            modelo.__table__,
+            documento.op('@@')(consulta),
+            func.ts_headline(CONFIGURACAO_PG, coluna, consulta, opcoes),
+            func.ts_rank(documento, consulta).desc()
+        )
+
+    # Outros bancos: varredura simples, sem trecho destacado.
+    return modelo.__table__, coluna.ilike(f'%{termo}%'), coluna, modelo.id.desc()
+
+
+def buscar_pedidos(termo, status=None, data_inicio=None, data_fim=None, cliente_id=None, limite=20, deslocamento=0):
+    """Pedidos cujos serviços contêm as palavras de `termo`, dos mais relevantes aos menos.
+
+    `data_fim` é exclusiva. Cada resultado traz em `trecho` o texto, escapado
+    como HTML, com as palavras encontradas entre <mark></mark>.
+    """
+    if not termo_valido(termo):
+        return []
+    origem, condicao, trecho, ordenacao = _busca_texto('pedidos', termo)
+    consulta = select(
+        Pedido.id, Pedido.cliente_id, Cliente.nome, Pedido.servicos, Pedido.valor_total,
+        Pedido.status, Pedido.data_pedido, Pedido.data_entrega, trecho.label('trecho')
+    ).select_from(origem).join(Cliente, Cliente.id == Pedido.cliente_id).where(condicao, Cliente.excluido_em.is_(None))
+
+    if status:
+        consulta = consulta.where(Pedido.status == status)
+    if cliente_id:
+        consulta = consulta.where(Pedido.cliente_id == cliente_id)
+    if data_inicio:
+        consulta = consulta.where(Pedido.data_pedido >= data_inicio)
+    if data_fim:
+        consulta = consulta.where(Pedido.data_pedido < data_fim)
+
+    linhas = db.session.execute(consulta.order_by(ordenacao).limit(limite).offset(deslocamento)).all()
+    return [{
+        'id': linha.id,
+        'cliente_id': linha.cliente_id,
+        'cliente_nome': linha.nome,
+        'servicos': linha.servicos,
+        'valor_total': f"{linha.valor_total:.2f}",
+        'status': linha.status,
+        'data_pedido': linha.data_pedido.isoformat(),
+        'data_entrega': linha.data_entrega.isoformat() if linha.data_entrega else None,
+        'trecho': _destacar(linha.trecho)
+    } for linha in linhas]
+
+
+def buscar_anotacoes(termo, cliente_id=None, data_inicio=None, data_fim=None, limite=20, deslocamento=0):
+    if not termo_valido(termo):
+        return []
+    origem, condicao, trecho, ordenacao = _busca_texto('anotacoes', termo)
+    consulta = select(
+        AnotacaoCliente.id, AnotacaoCliente.cliente_id, Cliente.nome, AnotacaoCliente.texto,
+        AnotacaoCliente.data_criacao, trecho.label('trecho')
+    ).select_from(origem).join(Cliente, Cliente.id == AnotacaoCliente.cliente_id).where(condicao, Cliente.excluido_em.is_(None))
+
+    if cliente_id:
+        consulta = consulta.where(AnotacaoCliente.cliente_id == cliente_id)
+    if data_inicio:
+        consulta = consulta.where(AnotacaoCliente.data_criacao >= data_inicio)
+    if data_fim:
+        consulta = consulta.where(AnotacaoCliente.data_criacao < data_fim)
+
+    linhas = db.session.execute(consulta.order_by(ordenacao).limit(limite).offset(deslocamento)).all()
+    return [{
+        'id': linha.id,
+        'cliente_id': linha.cliente_id,
+        'cliente_nome': linha.nome,
+        'texto': linha.texto,
+        'data_criacao': linha.data_criacao.isoformat() if linha.data_criacao else None,
+        'trecho': _destacar(linha.trecho)
+    } for linha in linhas]
@@ -0,0 +1,300 @@
+from flask import current_app
+from backend.models.database import db
+from backend.models.pedido import Pedido
+from backend.models.pagamento import Pagamento
+from backend.models.remocao import RegistroRemovido
+from sqlalchemy import select, or_, and_, func
+from datetime import datetime, timedelta
+import numpy as np
+import sys
+import threading
+import time
+import weakref
+
+LOTE_LEITURA = 50000
+
+# Tipos das colunas do snapshot: ids em int32, valores em centavos (int64),
+# datas em datetime64[us] e textos repetitivos como códigos de uma tabela de categorias.
+TIPOS = {
+    'id': np.dtype(np.int32),
+    'centavos': np.dtype(np.int64),
+    'data': np.dtype('datetime64[us]'),
+    'categoria': np.dtype(np.int16),
+    'texto': np.dtype(np.int32),
+}
+
+# entidade (como nos tombstones) -> (modelo, [(coluna do snapshot, coluna do modelo, tipo)])
+TABELAS = {
+    'pedido': (Pedido, [
+        ('id', Pedido.id, 'id'),
+        ('cliente_id', Pedido.cliente_id, 'id'),
+        ('centavos', Pedido.valor_total, 'centavos'),
+        ('status', Pedido.status, 'categoria'),
+        ('servicos', Pedido.servicos, 'texto'),
+        ('data', Pedido.data_pedido, 'data'),
+    ]),
+    'pagamento': (Pagamento, [
+        ('id', Pagamento.id, 'id'),
+        ('pedido_id', Pagamento.pedido_id, 'id'),
+        ('centavos', Pagamento.valor_pago, 'centavos'),
+        ('forma_pagamento', Pagamento.forma_pagamento, 'categoria'),
+        ('data', Pagamento.data_pagamento, 'data'),
+    ]),
+}
+
+_trava = threading.Lock()
+# Estado por app: apps no mesmo processo (ex.: bancos clonados nos testes) têm snapshots separados.
+_estados = weakref.WeakKeyDictionary()
+
+
+def _estado_do_app():
+    app = current_app._get_current_object()
+    with _trava:
+        if app not in _estados:
+            _estados[app] = {
+                'trava': threading.Lock(),
+                'snapshot': None,
+                'verificado_em': 0.0,
+                'excedido': False,
+                'atualizacoes': 0,
+                'ultima_atualizacao': None,
+                'ultima_duracao_ms': None,
+                'erro': None,
+            }
+        return _estados[app]
+
+
+class Categorias:
+    """Tabela texto <-> código das colunas categóricas; só cresce, então códigos antigos continuam válidos."""
+
+    def __init__(self):
+        self.valores = []
+        self._codigos = {}
+
+    def codificar(self, textos, dtype):
+        codigos = np.empty(len(textos), dtype=dtype)
+        for i, texto in enumerate(textos):
+            codigo = self._codigos.get(texto)
+            if codigo is None:
+                codigo = self._codigos[texto] = len(self.valores)
+                self.valores.append(texto)
+            codigos[i] = codigo
+        return codigos
+
+    def codigos(self, textos):
+        return [self._codigos[texto] for texto in textos if texto in self._codigos]
+
+    def nbytes(self):
+        return sys.getsizeof(self.valores) + sys.getsizeof(self._codigos) + sum(sys.getsizeof(valor) for valor in self.valores)
+
+
+class SnapshotAnalitico:
+    """Cópia colunar e imutável de pedidos e pagamentos.
+
+    Cada atualização gera um novo snapshot (os arrays não são alterados no
+    lugar), então quem já pegou uma referência pode continuar lendo sem trava.
+    """
+
+    def __init__(self, colunas, categorias, marcas):
+        self.colunas = colunas
+        self.categorias = categorias
+        self.marcas = marcas
+
+    def __getitem__(self, entidade):
+        return self.colunas[entidade]
+
+    def linhas(self, entidade):
+        return len(self.colunas[entidade]['id'])
+
+    def nbytes(self):
+        arrays = sum(array.nbytes for colunas in self.colunas.values() for array in colunas.values())
+        return arrays + sum(categorias.nbytes() for categorias in self.categorias.values())
+
+    def filtrar(self, entidade, inicio=None, fim_exclusivo=None, **categorias):
+        """Colunas de `entidade` com data em [inicio, fim_exclusivo) e colunas categóricas nos valores dados.
+
+        Ex.: `filtrar('pedido', inicio, fim, status=('pago', 'entregue'))`.
+        """
+        colunas = self.colunas[entidade]
+        mascara = np.ones(len(colunas['id']), dtype=bool)
+        if inicio is not None:
+            mascara &= colunas['data'] >= np.datetime64(inicio, 'us')
+        if fim_exclusivo is not None:
+            mascara &= colunas['data'] < np.datetime64(fim_exclusivo, 'us')
+        for nome, valores in categorias.items():
+            mascara &= np.isin(colunas[nome], self.categorias[nome].codigos(valores))
+        return {nome: array[mascara] for nome, array in colunas.items()}
+
+    def decodificar(self, coluna, codigos):
+        valores = self.categorias[coluna].valores
+        return [valores[codigo] for codigo in codigos]
+
+
+def _bytes_por_linha(entidade):
+    return sum(TIPOS[tipo].itemsize for _, _, tipo in TABELAS[entidade][1])
+
+
+def _limite_bytes():
+    return current_app.config.get('ANALYTICS_CACHE_MAX_MB', 256) * 1024 * 1024
+
+
+def _converter(entidade, linhas, categorias):
+    colunas = {}
+    for indice, (nome, coluna, tipo) in enumerate(TABELAS[entidade][1]):
+        valores = [linha[indice] for linha in linhas]
+        if tipo == 'centavos':
+            colunas[nome] = np.rint(np.array(valores, dtype=np.float64) * 100).astype(TIPOS[tipo])
+        elif tipo in ('categoria', 'texto'):
+            colunas[nome] = categorias.setdefault(nome, Categorias()).codificar(valores, TIPOS[tipo])
+        else:
+            colunas[nome] = np.array(valores, dtype=TIPOS[tipo])
+    return colunas
+
+
+def _vazio(entidade):
+    return {nome: np.empty(0, dtype=TIPOS[tipo]) for nome, _, tipo in TABELAS[entidade][1]}
+
+
+def _ler_alteracoes(conexao, entidade, marca, corte, categorias):
+    """Linhas alteradas desde a marca (atualizado_em, id), em lotes, como na sincronização incremental."""
+    modelo, definicao = TABELAS[entidade]
+    partes = []
+    while True:
+        consulta = select(*(coluna for _, coluna, _ in definicao), modelo.atualizado_em).where(modelo.atualizado_em <= corte)
+        if marca:
+            consulta = consulta.where(or_(
+                modelo.atualizado_em > marca[0],
+                and_(modelo.atualizado_em == marca[0], modelo.id > marca[1])
+            ))
+        linhas = conexao.execute(consulta.order_by(modelo.atualizado_em, modelo.id).limit(LOTE_LEITURA)).all()
+        if linhas:
+            partes.append(_converter(entidade, linhas, categorias))
+            marca = (linhas[-1][-1], linhas[-1][0])
+        if len(linhas) < LOTE_LEITURA:
+            break
+
+    if not partes:
+        return _vazio(entidade), marca
+    return {nome: np.concatenate([parte[nome] for parte in partes]) for nome in partes[0]}, marca
+
+
+def _aplicar(atuais, alteradas, removidos):
+    # Versões antigas das linhas alteradas e as removidas saem; as novas entram no fim.
+    descartar = np.isin(atuais['id'], np.concatenate([alteradas['id'], removidos]))
+    return {nome: np.concatenate([array[~descartar], alteradas[nome]]) for nome, array in atuais.items()}
+
+
+def _estimativa_bytes(conexao):
+    total = 0
+    for entidade, (modelo, definicao) in TABELAS.items():
+        total += conexao.execute(select(func.count(modelo.id))).scalar() * _bytes_por_linha(entidade)
+    return total
+
+
+def atualizar_cache_analitico():
+    """Atualiza o snapshot com as alterações desde a última atualização e o devolve.
+
+    A primeira carga lê as tabelas inteiras em lotes; as seguintes leem só as
+    linhas com `atualizado_em` posterior à marca de cada tabela e os tombstones
+    novos. Se o snapshot passar de ANALYTICS_CACHE_MAX_MB ele é descartado e
+    os relatórios voltam a consultar o banco até que volte a caber.
+    """
+    # Sempre no primário, numa conexão própria: uma réplica atrasada faria a marca pular linhas.
+    with db.engine.connect() as conexao:
+        return _atualizar(conexao)
+
+
+def _atualizar(conexao):
+    estado = _estado_do_app()
+    inicio = time.monotonic()
+    anterior = estado['snapshot']
+    limite = _limite_bytes()
+
+    if anterior is None and _estimativa_bytes(conexao) > limite:
+        estado['excedido'] = True
+        return None
+
+    # Alterações muito recentes ficam para a próxima atualização: transações
+    # ainda abertas podem confirmar registros com horário anterior ao atual.
+    corte = datetime.now() - timedelta(seconds=current_app.config.get('SYNC_SAFETY_SECONDS', 2))
+    marcas = dict(anterior.marcas) if anterior else {}
+    categorias = anterior.categorias if anterior else {}
+
+    ultimo_removido = marcas.get('removidos', 0)
+    if anterior is None:
+        # Tombstones anteriores à primeira carga não interessam.
+        ultimo_removido = conexao.execute(select(func.max(RegistroRemovido.id))).scalar() or 0
+    removidos = conexao.execute(
+        select(RegistroRemovido.id, RegistroRemovido.entidade, RegistroRemovido.entidade_id)
+        .where(RegistroRemovido.id > ultimo_removido, RegistroRemovido.entidade.in_(TABELAS))
+        .order_by(RegistroRemovido.id)
+    ).all()
+    if removidos:
+        ultimo_removido = removidos[-1][0]
+    marcas['removidos'] = ultimo_removido
+
+    colunas = {}
+    for entidade in TABELAS:
+        alteradas, marcas[entidade] = _ler_alteracoes(conexao, entidade, marcas.get(entidade), corte, categorias)
+        ids_removidos = np.array([entidade_id for _, tipo, entidade_id in removidos if tipo == entidade], dtype=np.int32)
+        atuais = anterior[entidade] if anterior else _vazio(entidade)
+        if len(alteradas['id']) or len(ids_removidos):
+            colunas[entidade] = _aplicar(atuais, alteradas, ids_removidos)
+        else:
+            colunas[entidade] = atuais
+
+    snapshot = SnapshotAnalitico(colunas, categorias, marcas)
+    if snapshot.nbytes() > limite:
+        print(f"Cache analítico descartado: {snapshot.nbytes() / (1024 * 1024):.1f} MB excede o limite de {limite / (1024 * 1024):.0f} MB.")
+        estado.update(snapshot=None, excedido=True)
+        return None
+
+    estado.update(
+        snapshot=snapshot,
+        excedido=False,
+        atualizacoes=estado['atualizacoes'] + 1,
+        ultima_atualizacao=datetime.now(),
+        ultima_duracao_ms=int((time.monotonic() - inicio) * 1000),
+        erro=None
+    )
+    return snapshot
+
+
+def cache_analitico():
+    """Snapshot com no máximo ANALYTICS_CACHE_REFRESH_SECONDS de atraso, ou None.
+
+    None quando o cache está desativado, acima do limite de memória ou a
+    atualização falhou; nesses casos quem chama consulta o banco.
+    """
+    config = current_app.config
+    if not config.get('ANALYTICS_CACHE_ENABLED'):
+        return None
+
+    estado = _estado_do_app()
+    if time.monotonic() - estado['verificado_em'] >= config.get('ANALYTICS_CACHE_REFRESH_SECONDS', 30):
+        with estado['trava']:
+            if time.monotonic() - estado['verificado_em'] >= config.get('ANALYTICS_CACHE_REFRESH_SECONDS', 30):
+                try:
+                    atualizar_cache_analitico()
+                except Exception as e:
+                    print(f"Erro ao atualizar o cache analítico: {e}")
+                    estado.update(snapshot=None, erro=str(e))
+                estado['verificado_em'] = time.monotonic()
+    return estado['snapshot']
+
+
+def estatisticas_cache_analitico():
+    estado = _estado_do_app()
+    snapshot = estado['snapshot']
+    return {
+        'ativo': snapshot is not None,
+        'limite_bytes': _limite_bytes(),
+        'excedido': estado['excedido'],
+        'bytes': snapshot.nbytes() if snapshot else 0,
+        'linhas': {entidade: snapshot.linhas(entidade) for entidade in TABELAS} if snapshot else {},
+        'categorias': {nome: len(categorias.valores) for nome, categorias in snapshot.categorias.items()} if snapshot else {},
+        'atualizacoes': estado['atualizacoes'],
+        'ultima_atualizacao': estado['ultima_atualizacao'].isoformat() if estado['ultima_atualizacao'] else None,
+        'ultima_duracao_ms': estado['ultima_duracao_ms'],
+        'erro': estado['erro'],
+    }
@@ -0,0 +1,130 @@
+from flask import current_app, has_app_context
+import copy
+import functools
+import hashlib
+import os
+import pickle
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+_trava = threading.Lock()
+_em_andamento = {}
+_estatisticas = {'execucoes': 0, 'compartilhadas': 0}
+
+
+class _Execucao:
+    def __init__(self):
+        self.concluida = threading.Event()
+        self.resultado = None
+        self.erro = None
+
+
+def _chave(funcao, args, kwargs):
+    return (funcao.__module__, funcao.__qualname__, repr(args), repr(sorted(kwargs.items())))
+
+
+def _chave_no_processo(chave):
+    # Apps diferentes no mesmo processo (ex.: bancos clonados nos testes) não compartilham execuções.
+    return (id(current_app._get_current_object()) if has_app_context() else None,) + chave
+
+
+def estatisticas_coalescencia():
+    """Quantas vezes as funções coalescidas executaram de fato e quantas reaproveitaram uma execução em andamento."""
+    with _trava:
+        return dict(_estatisticas)
+
+
+def _pasta_travas():
+    if has_app_context():
+        return current_app.config.get('COALESCENCIA_LOCK_DIR') or os.path.join(current_app.instance_path, 'locks')
+    return None
+
+
+def _executar_entre_processos(chave, funcao, args, kwargs):
+    """Serializa a execução entre processos por uma trava de arquivo.
+
+    Quem esperou pela trava reaproveita o resultado gravado pelo processo que
+    a segurava, se ele terminou depois que a espera começou.
+    """
+    pasta = _pasta_travas()
+    if fcntl is None or pasta is None:
+        return funcao(*args, **kwargs), False
+
+    os.makedirs(pasta, exist_ok=True)
+    nome = hashlib.sha256(repr(chave).encode('utf-8')).hexdigest()[:32]
+    caminho_resultado = os.path.join(pasta, f'{nome}.resultado')
+    inicio_espera = time.time()
+
+    with open(os.path.join(pasta, f'{nome}.lock'), 'w') as arquivo_trava:
+        fcntl.flock(arquivo_trava, fcntl.LOCK_EX)
+        try:
+            if os.path.exists(caminho_resultado) and os.path.getmtime(caminho_resultado) >= inicio_espera:
+                with open(caminho_resultado, 'rb') as arquivo:
+                    return pickle.load(arquivo), True
+
+            resultado = funcao(*args, **kwargs)
+            temporario = f'{caminho_resultado}.{os.getpid()}'
+            with open(temporario, 'wb') as arquivo:
+                pickle.dump(resultado, arquivo)
+            os.replace(temporario, caminho_resultado)
+            return resultado, False
+        finally:
+            fcntl.flock(arquivo_trava, fcntl.LOCK_UN)
+
+
+def executar_coalescido(funcao, *args, entre_processos=False, **kwargs):
+    """Executa `funcao(*args, **kwargs)` uma única vez para chamadas simultâneas idênticas.
+
+    A primeira thread a chegar executa; as demais com a mesma função e os
+    mesmos parâmetros esperam e recebem uma cópia do mesmo resultado (ou a
+    mesma exceção). Nada é guardado depois que a execução termina: isto não
+    é um cache. Com `entre_processos=True` a execução também é serializada
+    entre processos por uma trava de arquivo (somente em sistemas com fcntl).
+    """
+    chave = _chave(funcao, args, kwargs)
+    chave_processo = _chave_no_processo(chave)
+
+    with _trava:
+        execucao = _em_andamento.get(chave_processo)
+        lider = execucao is None
+        if lider:
+            execucao = _em_andamento[chave_processo] = _Execucao()
+
+    if not lider:
+        execucao.concluida.wait()
+        with _trava:
+            _estatisticas['compartilhadas'] += 1
+        if execucao.erro is not None:
+            raise execucao.erro
+        return copy.deepcopy(execucao.resultado)
+
+    try:
+        if entre_processos:
+            execucao.resultado, reaproveitado = _executar_entre_processos(chave, funcao, args, kwargs)
+        else:
+            execucao.resultado, reaproveitado = funcao(*args, **kwargs), False
+        with _trava:
+            _estatisticas['compartilhadas' if reaproveitado else 'execucoes'] += 1
+        return copy.deepcopy(execucao.resultado)
+    except Exception as e:
+        execucao.erro = e
+        raise
+    finally:
+        with _trava:
+            _em_andamento.pop(chave_processo, None)
+        execucao.concluida.set()
+
+
+def coalescer(entre_processos=False):
+    """Decorador: chamadas simultâneas com os mesmos argumentos compartilham uma única execução."""
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def envoltorio(*args, **kwargs):
+            return executar_coalescido(funcao, *args, entre_processos=entre_processos, **kwargs)
+        return envoltorio
+    return decorador
@@ -0,0 +1,179 @@
+from flask import request
+from collections import defaultdict
+import threading
+import time
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# text/event-stream fica de fora: cada evento precisa chegar na hora, sem esperar o buffer do compressor.
+MIMETYPES_COMPRESSIVEIS = {
+    'application/json',
+    'application/x-ndjson',
+    'text/csv',
+    'text/html',
+    'text/plain',
+}
+# Ordem de preferência quando o cliente aceita mais de uma codificação com o mesmo peso.
+PREFERENCIA = ('zstd', 'br', 'gzip')
+TAMANHO_PEDACO = 64 * 1024
+
+_trava = threading.Lock()
+_estatisticas = defaultdict(lambda: {'respostas': 0, 'bytes_originais': 0, 'bytes_comprimidos': 0, 'cpu_segundos': 0.0})
+
+
+class _CompressorBrotli:
+    def __init__(self, qualidade):
+        self._compressor = brotli.Compressor(quality=qualidade)
+
+    def compress(self, dados):
+        return self._compressor.process(dados)
+
+    def descarregar(self):
+        return self._compressor.flush()
+
+    def flush(self):
+        return self._compressor.finish()
+
+
+def _criar_compressor(codificacao, config):
+    if codificacao == 'gzip':
+        # wbits=31: formato gzip (cabeçalho e CRC), não zlib puro.
+        return zlib.compressobj(config.get('COMPRESSAO_NIVEL_GZIP', 6), zlib.DEFLATED, 31)
+    if codificacao == 'br':
+        return _CompressorBrotli(config.get('COMPRESSAO_NIVEL_BROTLI', 4))
+    return zstandard.ZstdCompressor(level=config.get('COMPRESSAO_NIVEL_ZSTD', 3)).compressobj()
+
+
+def _descarregar(compressor, codificacao):
+    """Esvazia o buffer do compressor sem encerrar o fluxo: o cliente consegue descomprimir o que já chegou."""
+    if codificacao == 'gzip':
+        return compressor.flush(zlib.Z_SYNC_FLUSH)
+    if codificacao == 'br':
+        return compressor.descarregar()
+    return compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+
+def codificacoes_disponiveis():
+    disponiveis = ['gzip']
+    if brotli is not None:
+        disponiveis.insert(0, 'br')
+    if zstandard is not None:
+        disponiveis.insert(0, 'zstd')
+    return [codificacao for codificacao in PREFERENCIA if codificacao in disponiveis]
+
+
+def estatisticas_compressao():
+    """Bytes economizados e tempo de CPU gasto por codificação desde que o processo subiu."""
+    with _trava:
+        resumo = {}
+        for codificacao, dados in _estatisticas.items():
+            economizados = dados['bytes_originais'] - dados['bytes_comprimidos']
+            megabytes = dados['bytes_originais'] / (1024 * 1024)
+            resumo[codificacao] = {
+                **dados,
+                'bytes_economizados': economizados,
+                'taxa_compressao': round(dados['bytes_comprimidos'] / dados['bytes_originais'], 4) if dados['bytes_originais'] else None,
+                'cpu_ms_por_mb': round(dados['cpu_segundos'] * 1000 / megabytes, 2) if megabytes else None,
+            }
+        return resumo
+
+
+def _fatiar(corpo):
+    for inicio in range(0, len(corpo), TAMANHO_PEDACO):
+        yield corpo[inicio:inicio + TAMANHO_PEDACO]
+
+
+def _comprimir(pedacos, compressor, codificacao, iteravel_original, descarregar_cada_pedaco=False):
+    originais = comprimidos = 0
+    cpu = 0.0
+    try:
+        for pedaco in pedacos:
+            if isinstance(pedaco, str):
+                pedaco = pedaco.encode('utf-8')
+            inicio = time.thread_time()
+            saida = compressor.compress(pedaco)
+            if descarregar_cada_pedaco:
+                # Em streaming o gerador pode demorar até o próximo pedaço (ex.: lote da sincronização).
+                saida += _descarregar(compressor, codificacao)
+            cpu += time.thread_time() - inicio
+            originais += len(pedaco)
+            if saida:
+                comprimidos += len(saida)
+                yield saida
+
+        inicio = time.thread_time()
+        saida = compressor.flush()
+        cpu += time.thread_time() - inicio
+        comprimidos += len(saida)
+        yield saida
+    finally:
+        # Repassa o fechamento ao iterável original (ex.: stream_with_context libera o contexto da requisição).
+        fechar = getattr(iteravel_original, 'close', None)
+        if fechar is not None:
+            fechar()
+        with _trava:
+            estatisticas = _estatisticas[codificacao]
+            estatisticas['respostas'] += 1
+            estatisticas['bytes_originais'] += originais
+            estatisticas['bytes_comprimidos'] += comprimidos
+            estatisticas['cpu_segundos'] += cpu
+
+
+def _deve_comprimir(resposta, minimo_bytes):
+    if request.method == 'HEAD' or resposta.status_code < 200 or resposta.status_code in (204, 304):
+        return False
+    if resposta.direct_passthrough or 'Content-Encoding' in resposta.headers:
+        return False
+    if resposta.mimetype not in MIMETYPES_COMPRESSIVEIS:
+        return False
+    # Respostas em streaming (NDJSON, CSV) não têm tamanho conhecido e são sempre comprimidas.
+    return resposta.is_streamed or resposta.calculate_content_length() >= minimo_bytes
+
+
+def configurar_compressao(app):
+    """Comprime as respostas com a melhor codificação aceita pelo cliente (zstd, br ou gzip).
+
+    O corpo é entregue em pedaços por um compressor incremental, então nem
+    respostas em streaming nem a versão comprimida precisam ficar inteiras
+    em memória; em streaming, cada pedaço é descarregado assim que é gerado.
+    Respostas JSON de GET também ganham ETag, permitindo que o cliente receba
+    304 sem corpo quando nada mudou. Uma ETag forte vira fraca na resposta
+    comprimida: ela identifica os bytes da representação sem codificação.
+    """
+    if not app.config.get('COMPRESSAO_ENABLED', True):
+        return
+
+    @app.after_request
+    def _comprimir_resposta(resposta):
+        if request.method == 'GET' and resposta.status_code == 200 and resposta.mimetype == 'application/json' and not resposta.is_streamed:
+            resposta.add_etag(weak=True)
+            resposta.make_conditional(request)
+
+        if not _deve_comprimir(resposta, app.config.get('COMPRESSAO_MINIMO_BYTES', 1024)):
+            return resposta
+
+        resposta.vary.add('Accept-Encoding')
+        codificacao = request.accept_encodings.best_match(codificacoes_disponiveis())
+        if codificacao is None:
+            return resposta
+
+        etag, fraca = resposta.get_etag()
+        if etag and not fraca:
+            resposta.set_etag(etag, weak=True)
+
+        iteravel_original = resposta.response
+        em_streaming = resposta.is_streamed
+        pedacos = iteravel_original if em_streaming else _fatiar(resposta.get_data())
+        resposta.response = _comprimir(pedacos, _criar_compressor(codificacao, app.config), codificacao, iteravel_original, em_streaming)
+        resposta.headers['Content-Encoding'] = codificacao
+        resposta.headers.pop('Content-Length', None)
+        return resposta
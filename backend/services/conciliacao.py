@@ -0,0 +1,322 @@
+from flask import current_app
+from backend.models.database import db
+from backend.models.pedido import Pedido
+from backend.models.pagamento import Pagamento
+from backend.models.cliente import Cliente
+from backend.services.contadores import atualizar_contadores_clientes
+from sqlalchemy import select
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta
+import bisect
+import csv
+import decimal
+import hashlib
+import itertools
+import re
+import unicodedata
+
+LancamentoExtrato = namedtuple('LancamentoExtrato', ['referencia', 'data', 'valor', 'descricao'])
+
+FORMATOS_EXTRATO = ('ofx', 'csv')
+TAMANHO_BLOCO_LEITURA = 64 * 1024
+TAMANHO_LOTE_PEDIDOS = 500
+TAMANHO_LOTE_LANCAMENTOS = 1000
+FORMATOS_DATA_CSV = ('%d/%m/%Y', '%Y-%m-%d', '%d/%m/%y', '%d-%m-%Y')
+COLUNAS_CSV = {
+    'data': ('data', 'date', 'data lancamento', 'data do lancamento', 'dt'),
+    'valor': ('valor', 'amount', 'valor (r$)', 'quantia'),
+    'descricao': ('descricao', 'historico', 'description', 'memo', 'lancamento'),
+    'referencia': ('id', 'identificador', 'fitid', 'documento', 'referencia'),
+}
+
+_BLOCO_OFX = re.compile(r'<STMTTRN>(.*?)</STMTTRN>', re.IGNORECASE | re.DOTALL)
+_CAMPO_OFX = re.compile(r'<(\w+)>([^<\r\n]*)')
+
+
+def _sem_acentos(texto):
+    return ''.join(c for c in unicodedata.normalize('NFKD', texto or '') if not unicodedata.combining(c)).lower()
+
+
+def _valor_decimal(texto):
+    texto = texto.strip().replace('R$', '').replace(' ', '')
+    # Formato brasileiro (1.234,56) ou com ponto decimal (1234.56).
+    if ',' in texto:
+        texto = texto.replace('.', '').replace(',', '.')
+    return decimal.Decimal(texto)
+
+
+def _referencia_gerada(data, valor, descricao, ocorrencia):
+    # Extratos CSV nem sempre têm identificador; lançamentos idênticos no mesmo dia são diferenciados pela ordem.
+    base = f'{data:%Y-%m-%d}|{valor}|{descricao}|{ocorrencia}'
+    return 'csv:' + hashlib.sha1(base.encode('utf-8')).hexdigest()[:24]
+
+
+def ler_ofx(arquivo):
+    """Lê os lançamentos de um extrato OFX (SGML ou XML) bloco a bloco, sem carregar o arquivo inteiro."""
+    pendente = ''
+    while True:
+        bloco = arquivo.read(TAMANHO_BLOCO_LEITURA)
+        if not bloco:
+            break
+        pendente += bloco
+        fim = 0
+        for encontrado in _BLOCO_OFX.finditer(pendente):
+            campos = {nome.upper(): valor.strip() for nome, valor in _CAMPO_OFX.findall(encontrado.group(1))}
+            fim = encontrado.end()
+            if 'TRNAMT' not in campos or 'DTPOSTED' not in campos:
+                continue
+            yield LancamentoExtrato(
+                referencia='ofx:' + campos['FITID'] if campos.get('FITID') else None,
+                data=datetime.strptime(campos['DTPOSTED'][:8], '%Y%m%d'),
+                valor=_valor_decimal(campos['TRNAMT']),
+                descricao=' '.join(filter(None, [campos.get('NAME'), campos.get('MEMO')]))
+            )
+        pendente = pendente[fim:]
+
+
+def _coluna_csv(cabecalho, campo):
+    nomes = [_sem_acentos(nome).strip() for nome in cabecalho]
+    for alternativa in COLUNAS_CSV[campo]:
+        if alternativa in nomes:
+            return nomes.index(alternativa)
+    return None
+
+
+def _data_csv(texto):
+    for formato in FORMATOS_DATA_CSV:
+        try:
+            return datetime.strptime(texto.strip(), formato)
+        except ValueError:
+            continue
+    raise ValueError(f'Data inválida no extrato: {texto}')
+
+
+def _campo_opcional(linha, indice):
+    # Colunas opcionais vazias no fim da linha costumam ser omitidas pelo banco.
+    return linha[indice].strip() if indice is not None and indice < len(linha) else ''
+
+
+def ler_csv(arquivo):
+    """Lê os lançamentos de um extrato CSV (separador ';' ou ',') linha a linha.
+
+    O cabeçalho precisa ter as colunas de data e valor; descrição e
+    identificador do lançamento são opcionais.
+    """
+    primeira_linha = arquivo.readline()
+    separador = ';' if primeira_linha.count(';') >= primeira_linha.count(',') else ','
+    cabecalho = next(csv.reader([primeira_linha], delimiter=separador))
+    indice_data, indice_valor = _coluna_csv(cabecalho, 'data'), _coluna_csv(cabecalho, 'valor')
+    indice_descricao, indice_referencia = _coluna_csv(cabecalho, 'descricao'), _coluna_csv(cabecalho, 'referencia')
+    if indice_data is None or indice_valor is None:
+        raise ValueError('O CSV do extrato precisa das colunas de data e valor.')
+
+    ocorrencias = defaultdict(int)
+    colunas_obrigatorias = max(indice_data, indice_valor) + 1
+    leitor = csv.reader(arquivo, delimiter=separador)
+    for linha in leitor:
+        if not any(campo.strip() for campo in linha):
+            continue
+        if len(linha) < colunas_obrigatorias:
+            raise ValueError(f'Linha {leitor.line_num + 1} do extrato incompleta: esperadas ao menos {colunas_obrigatorias} colunas.')
+        if not linha[indice_data].strip():
+            continue
+        data = _data_csv(linha[indice_data])
+        valor = _valor_decimal(linha[indice_valor])
+        descricao = _campo_opcional(linha, indice_descricao)
+        referencia = _campo_opcional(linha, indice_referencia)
+        if referencia:
+            referencia = 'csv:' + referencia
+        else:
+            chave = (data, valor, descricao)
+            ocorrencias[chave] += 1
+            referencia = _referencia_gerada(data, valor, descricao, ocorrencias[chave])
+        yield LancamentoExtrato(referencia, data, valor, descricao)
+
+
+def ler_extrato(arquivo, formato):
+    if formato not in FORMATOS_EXTRATO:
+        raise ValueError(f"Formato de extrato inválido: {formato}. Use 'ofx' ou 'csv'.")
+    return ler_ofx(arquivo) if formato == 'ofx' else ler_csv(arquivo)
+
+
+class IndicePedidosPendentes:
+    """Pedidos pendentes agrupados por valor (em centavos) e ordenados por data.
+
+    Cada lançamento procura apenas os pedidos com o mesmo valor, e dentro
+    deles só a janela de datas, por busca binária.
+    """
+
+    def __init__(self, janela_dias):
+        self.janela = timedelta(days=janela_dias)
+        self._por_valor = defaultdict(list)
+        self._usados = set()
+        self.nomes_clientes = {}
+
+        consulta = select(Pedido.id, Pedido.cliente_id, Pedido.valor_total, Pedido.data_pedido, Cliente.nome).join(
+            Cliente, Cliente.id == Pedido.cliente_id
+        ).outerjoin(Pagamento, Pagamento.pedido_id == Pedido.id).where(
+            Pedido.status == 'pendente', Pagamento.id.is_(None)
+        )
+        for pedido_id, cliente_id, valor_total, data_pedido, nome in db.session.execute(consulta):
+            self._por_valor[round(valor_total * 100)].append((data_pedido, pedido_id, cliente_id))
+            self.nomes_clientes[cliente_id] = _sem_acentos(nome).split()
+        for pedidos in self._por_valor.values():
+            pedidos.sort()
+
+    def __len__(self):
+        return sum(len(pedidos) for pedidos in self._por_valor.values())
+
+    def candidatos(self, lancamento):
+        pedidos = self._por_valor.get(int((lancamento.valor * 100).to_integral_value()), [])
+        # O pedido vem antes do pagamento; tolera um dia de diferença de fuso/compensação.
+        inicio = bisect.bisect_left(pedidos, (lancamento.data - self.janela,))
+        fim = bisect.bisect_right(pedidos, (lancamento.data + timedelta(days=1), float('inf')))
+        return [pedido for pedido in pedidos[inicio:fim] if pedido[1] not in self._usados]
+
+    def escolher(self, lancamento):
+        """Devolve (pedido, candidatos): `pedido` só é definido quando a correspondência é inequívoca."""
+        candidatos = self.candidatos(lancamento)
+        if len(candidatos) > 1:
+            palavras = set(re.findall(r'\w+', _sem_acentos(lancamento.descricao)))
+            pelo_nome = [c for c in candidatos if any(len(parte) > 2 and parte in palavras for parte in self.nomes_clientes[c[2]])]
+            if len(pelo_nome) == 1:
+                return pelo_nome[0], candidatos
+            return None, candidatos
+        return (candidatos[0] if candidatos else None), candidatos
+
+    def reservar(self, pedido_id):
+        self._usados.add(pedido_id)
+
+
+def _forma_pagamento(lancamento):
+    return 'PIX' if 'pix' in _sem_acentos(lancamento.descricao) else 'Transferência'
+
+
+def _lancamento_dict(lancamento):
+    return {
+        'referencia': lancamento.referencia,
+        'data': lancamento.data.date().isoformat(),
+        'valor': f"{lancamento.valor:.2f}",
+        'descricao': lancamento.descricao
+    }
+
+
+def _referencias_ja_conciliadas(referencias):
+    existentes = set()
+    referencias = list(referencias)
+    for inicio in range(0, len(referencias), TAMANHO_LOTE_PEDIDOS):
+        lote = referencias[inicio:inicio + TAMANHO_LOTE_PEDIDOS]
+        existentes.update(db.session.execute(
+            select(Pagamento.referencia_extrato).where(Pagamento.referencia_extrato.in_(lote))
+        ).scalars())
+    return existentes
+
+
+def aplicar_conciliacao(correspondencias):
+    """Registra os pagamentos de uma lista de correspondências numa única transação.
+
+    Cada item tem `pedido_id`, `valor`, `data`, `referencia` e
+    `forma_pagamento`. Pedidos que deixaram de estar pendentes e referências
+    já conciliadas são ignorados. Retorna os ids dos pedidos pagos.
+    """
+    por_pedido = {int(item['pedido_id']): item for item in correspondencias}
+    ja_conciliadas = _referencias_ja_conciliadas(item['referencia'] for item in por_pedido.values() if item.get('referencia'))
+    pagos, clientes = [], set()
+
+    try:
+        ids = list(por_pedido)
+        for inicio in range(0, len(ids), TAMANHO_LOTE_PEDIDOS):
+            pedidos = Pedido.query.filter(
+                Pedido.id.in_(ids[inicio:inicio + TAMANHO_LOTE_PEDIDOS]),
+                Pedido.status == 'pendente'
+            ).all()
+            for pedido in pedidos:
+                item = por_pedido[pedido.id]
+                if item.get('referencia') in ja_conciliadas:
+                    continue
+                if decimal.Decimal(str(item['valor'])) < decimal.Decimal(str(pedido.valor_total)):
+                    continue
+                data_pagamento = item['data'] if isinstance(item['data'], datetime) else datetime.fromisoformat(item['data'])
+                db.session.add(Pagamento(
+                    pedido_id=pedido.id,
+                    valor_pago=float(item['valor']),
+                    forma_pagamento=item.get('forma_pagamento') or 'Transferência',
+                    data_pagamento=data_pagamento,
+                    referencia_extrato=item.get('referencia')
+                ))
+                pedido.status = 'pago'
+                pagos.append(pedido.id)
+                clientes.add(pedido.cliente_id)
+
+        atualizar_contadores_clientes(*clientes)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return pagos
+
+
+def conciliar_extrato(arquivo, formato, aplicar=False, janela_dias=None):
+    """Confronta um extrato bancário com os pedidos pendentes.
+
+    Só créditos são considerados. Um lançamento com exatamente um pedido
+    pendente de mesmo valor na janela de datas (ou um único cujo cliente
+    aparece na descrição) é uma correspondência automática; com vários
+    candidatos vira proposta para confirmação manual. Com `aplicar=True` as
+    correspondências automáticas são registradas numa única transação.
+    """
+    janela_dias = janela_dias or current_app.config.get('CONCILIACAO_JANELA_DIAS', 30)
+    indice = IndicePedidosPendentes(janela_dias)
+
+    creditos = (lancamento for lancamento in ler_extrato(arquivo, formato) if lancamento.valor > 0)
+
+    automaticas, propostas, sem_correspondencia = [], [], []
+    total_lancamentos = repetidos = 0
+    vistas = set()
+    while True:
+        lote = list(itertools.islice(creditos, TAMANHO_LOTE_LANCAMENTOS))
+        if not lote:
+            break
+        total_lancamentos += len(lote)
+        ja_conciliadas = _referencias_ja_conciliadas(lancamento.referencia for lancamento in lote if lancamento.referencia)
+
+        for lancamento in lote:
+            if lancamento.referencia in ja_conciliadas or lancamento.referencia in vistas:
+                repetidos += 1
+                continue
+            if lancamento.referencia:
+                vistas.add(lancamento.referencia)
+            _classificar(indice, lancamento, automaticas, propostas, sem_correspondencia)
+
+    aplicados = aplicar_conciliacao(automaticas) if aplicar and automaticas else []
+
+    return {
+        'pedidos_pendentes': len(indice),
+        'lancamentos': total_lancamentos,
+        'ja_conciliados': repetidos,
+        'automaticas': automaticas,
+        'propostas': propostas,
+        'sem_correspondencia': sem_correspondencia,
+        'aplicados': len(aplicados)
+    }
+
+
+def _classificar(indice, lancamento, automaticas, propostas, sem_correspondencia):
+    pedido, candidatos = indice.escolher(lancamento)
+    if pedido is not None:
+        indice.reservar(pedido[1])
+        automaticas.append({
+            **_lancamento_dict(lancamento),
+            'pedido_id': pedido[1],
+            'cliente_id': pedido[2],
+            'forma_pagamento': _forma_pagamento(lancamento)
+        })
+    elif candidatos:
+        propostas.append({
+            **_lancamento_dict(lancamento),
+            'forma_pagamento': _forma_pagamento(lancamento),
+            'candidatos': [{'pedido_id': c[1], 'cliente_id': c[2], 'data_pedido': c[0].isoformat()} for c in candidatos[:10]]
+        })
+    else:
+        sem_correspondencia.append(_lancamento_dict(lancamento))
@@ -0,0 +1,91 @@
+from flask import current_app, request, jsonify
+from backend.models.database import db
+from sqlalchemy.orm.exc import StaleDataError
+from werkzeug.http import parse_etags
+import hashlib
+import json
+import re
+
+TENTATIVAS_PADRAO = 3
+
+_ETAG_VERSAO = re.compile(r'v?(\d+)(?:-[0-9a-f]+)?')
+
+
+def etag_registro(versao, dados):
+    """ETag forte de um registro versionado: "v<versao>-<hash do corpo>".
+
+    O hash mantém o 304 do GET correto (o corpo também tem dados derivados e
+    de outras tabelas); o If-Match do PUT compara só a versão.
+    """
+    corpo = json.dumps(dados, sort_keys=True, default=str).encode('utf-8')
+    return f'v{versao}-{hashlib.sha1(corpo).hexdigest()[:16]}'
+
+
+def versoes_if_match(cabecalho):
+    """Versões aceitas pelo cabeçalho If-Match; None quando ausente ou '*'.
+
+    Aceita as ETags de `etag_registro` e também a versão pura ("3").
+    Etiquetas em outro formato não casam com versão nenhuma.
+    """
+    if not cabecalho:
+        return None
+    etags = parse_etags(cabecalho)
+    if etags.star_tag:
+        return None
+    versoes = set()
+    for etag in etags.as_set(include_weak=True):
+        correspondencia = _ETAG_VERSAO.fullmatch(etag)
+        if correspondencia:
+            versoes.add(int(correspondencia.group(1)))
+    return versoes
+
+
+def resposta_conflito(versao_atual):
+    return jsonify({
+        'error': 'O registro foi alterado por outra pessoa. Recarregue e tente novamente.',
+        'versao_atual': versao_atual
+    }), 409
+
+
+def verificar_if_match(registro):
+    """Confere o If-Match da requisição com `registro.versao`; devolve a resposta de erro ou None.
+
+    Sem If-Match a atualização segue (a não ser com OPTIMISTIC_LOCK_REQUIRED),
+    mas o UPDATE continua condicionado à versão lida nesta requisição.
+    """
+    versoes = versoes_if_match(request.headers.get('If-Match'))
+    if versoes is None:
+        if current_app.config.get('OPTIMISTIC_LOCK_REQUIRED') and 'If-Match' not in request.headers:
+            return jsonify({'error': 'Informe o cabeçalho If-Match com a ETag obtida no GET.'}), 428
+        return None
+    if registro.versao not in versoes:
+        return resposta_conflito(registro.versao)
+    return None
+
+
+def salvar_com_nova_tentativa(modelo, registro_id, aplicar, tentativas=TENTATIVAS_PADRAO):
+    """Carrega o registro, chama `aplicar(registro)` e faz commit, recomeçando em conflito de versão.
+
+    Feito para a CLI, em que o registro fica aberto enquanto o usuário
+    digita: `aplicar` deve reaplicar só os campos que o usuário alterou,
+    então o que outros mudaram nos demais campos nesse meio tempo é
+    preservado. Descarta a transação em aberto na sessão. Devolve o registro
+    salvo, ou None se ele não existe mais; esgotadas as tentativas, relança
+    o StaleDataError.
+    """
+    for tentativa in range(1, tentativas + 1):
+        # Transação nova a cada tentativa: a leitura feita antes dos prompts não deve fixar um snapshot antigo.
+        db.session.rollback()
+        registro = db.session.get(modelo, registro_id, populate_existing=True)
+        if registro is None:
+            return None
+        try:
+            # `aplicar` pode dar flush (ex.: atualizar_contadores_clientes), e o conflito aparece ali.
+            aplicar(registro)
+            db.session.commit()
+            return registro
+        except StaleDataError:
+            db.session.rollback()
+            if tentativa == tentativas:
+                raise
+            print(f"{modelo.__name__} {registro_id} alterado por outra sessão; tentando novamente ({tentativa}/{tentativas}).")
@@ -0,0 +1,93 @@
+from backend.models.database import db
+from backend.models.cliente import Cliente
+from backend.models.pedido import Pedido
+from backend.models.pagamento import Pagamento
+from backend.models.evento import registrar_atualizacoes
+from sqlalchemy import select, update, func, or_, and_, case
+
+STATUS_CONTABILIZADOS = Pedido.status != 'cancelado'
+
+
+# Cada contador soma os pedidos ainda em `pedidos` com a parcela já arquivada,
+# que o job de arquivamento acumula no próprio cliente.
+
+def _total_pedidos():
+    ativos = select(func.count(Pedido.id)).where(
+        Pedido.cliente_id == Cliente.id, STATUS_CONTABILIZADOS
+    ).correlate(Cliente).scalar_subquery()
+    return ativos + func.coalesce(Cliente.pedidos_arquivados, 0)
+
+
+def _total_gasto():
+    ativos = select(func.coalesce(func.sum(Pagamento.valor_pago), 0)).join(
+        Pedido, Pedido.id == Pagamento.pedido_id
+    ).where(
+        Pedido.cliente_id == Cliente.id, STATUS_CONTABILIZADOS
+    ).correlate(Cliente).scalar_subquery()
+    return ativos + func.coalesce(Cliente.gasto_arquivado, 0)
+
+
+def _ultimo_pedido_em():
+    ativos = select(func.max(Pedido.data_pedido)).where(
+        Pedido.cliente_id == Cliente.id, STATUS_CONTABILIZADOS
+    ).correlate(Cliente).scalar_subquery()
+    arquivado = Cliente.ultimo_pedido_arquivado_em
+    return case(
+        (arquivado.is_(None), ativos),
+        (ativos.is_(None), arquivado),
+        (ativos > arquivado, ativos),
+        else_=arquivado
+    )
+
+
+def atualizar_contadores_clientes(*cliente_ids):
+    """Recalcula os contadores desnormalizados dos clientes informados.
+
+    Deve ser chamada antes do commit de qualquer alteração em pedidos ou
+    pagamentos: o UPDATE roda na mesma transação, então os contadores nunca
+    ficam visíveis fora de sincronia com os dados. O UPDATE em lote não passa
+    pelo listener do outbox, então os eventos dos clientes são gravados aqui.
+    """
+    cliente_ids = {cliente_id for cliente_id in cliente_ids if cliente_id}
+    if not cliente_ids:
+        return
+
+    db.session.flush()
+    db.session.execute(
+        update(Cliente)
+        .where(Cliente.id.in_(cliente_ids))
+        .values(
+            total_pedidos=_total_pedidos(),
+            total_gasto=_total_gasto(),
+            ultimo_pedido_em=_ultimo_pedido_em()
+        )
+        .execution_options(synchronize_session='fetch')
+    )
+    registrar_atualizacoes(db.session.connection(), Cliente, cliente_ids)
+
+
+def verificar_contadores(reparar=True):
+    """Procura clientes cujos contadores divergem dos pedidos e pagamentos.
+
+    Retorna os ids com divergência; com `reparar=True` eles são recalculados.
+    """
+    total_pedidos = _total_pedidos()
+    total_gasto = _total_gasto()
+    ultimo_pedido_em = _ultimo_pedido_em()
+
+    divergentes = db.session.execute(
+        select(Cliente.id).where(or_(
+            Cliente.total_pedidos.is_(None),
+            Cliente.total_pedidos != total_pedidos,
+            Cliente.total_gasto.is_(None),
+            func.abs(Cliente.total_gasto - total_gasto) >= 0.005,
+            and_(Cliente.ultimo_pedido_em.is_(None), ultimo_pedido_em.isnot(None)),
+            and_(Cliente.ultimo_pedido_em.isnot(None), ultimo_pedido_em.is_(None)),
+            Cliente.ultimo_pedido_em != ultimo_pedido_em
+        ))
+    ).scalars().all()
+
+    if divergentes and reparar:
+        atualizar_contadores_clientes(*divergentes)
+        db.session.commit()
+    return divergentes
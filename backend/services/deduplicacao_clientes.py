@@ -0,0 +1,172 @@
+from backend.models.database import db
+from backend.models.cliente import Cliente, AnotacaoCliente, normalizar_telefone
+from backend.models.pedido import Pedido
+from backend.models.metrica_cliente import MetricaCliente
+from backend.models.remocao import registrar_remocoes
+from backend.models.evento import EventoOutbox, registrar_atualizacoes
+from backend.models.arquivo import PedidoArquivado
+from backend.services.contadores import atualizar_contadores_clientes
+from sqlalchemy import select, update, delete, func, case
+from datetime import datetime
+import json
+
+TAMANHO_LOTE = 500
+CAMPOS_COMPLEMENTARES = ('email', 'endereco', 'preferencias')
+
+
+def preencher_telefones_normalizados(tamanho_lote=TAMANHO_LOTE):
+    """Preenche `telefone_normalizado` dos clientes cadastrados antes da coluna existir."""
+    total = 0
+    ultimo_id = 0
+    while True:
+        linhas = db.session.execute(
+            select(Cliente.id, Cliente.telefone)
+            .where(Cliente.telefone_normalizado.is_(None), Cliente.id > ultimo_id)
+            .order_by(Cliente.id)
+            .limit(tamanho_lote)
+        ).all()
+        if not linhas:
+            break
+        ultimo_id = linhas[-1].id
+
+        valores = {cliente_id: normalizar_telefone(telefone) for cliente_id, telefone in linhas}
+        valores = {cliente_id: normalizado for cliente_id, normalizado in valores.items() if normalizado}
+        if valores:
+            db.session.execute(
+                update(Cliente)
+                .where(Cliente.id.in_(valores))
+                .values(telefone_normalizado=case(valores, value=Cliente.id))
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            total += len(valores)
+
+    if total:
+        print(f"Telefones normalizados para {total} cliente(s).")
+    return total
+
+
+def grupos_duplicados():
+    """{cliente mantido: [duplicados]} por telefone normalizado; mantém o cadastro mais antigo."""
+    linhas = db.session.execute(
+        select(Cliente.telefone_normalizado, Cliente.id)
+        .where(
+            Cliente.excluido_em.is_(None),
+            Cliente.telefone_normalizado.in_(
+                select(Cliente.telefone_normalizado)
+                .where(Cliente.excluido_em.is_(None), Cliente.telefone_normalizado.isnot(None))
+                .group_by(Cliente.telefone_normalizado)
+                .having(func.count() > 1)
+            )
+        )
+        .order_by(Cliente.telefone_normalizado, Cliente.id)
+    ).all()
+
+    grupos = {}
+    for telefone, cliente_id in linhas:
+        grupos.setdefault(telefone, []).append(cliente_id)
+    return {ids[0]: ids[1:] for ids in grupos.values()}
+
+
+def _mesclar_lote(destino_por_duplicado):
+    duplicados = list(destino_por_duplicado)
+    mantidos = set(destino_por_duplicado.values())
+    agora = datetime.now()
+    novo_dono = case(destino_por_duplicado, value=Pedido.cliente_id)
+    pedidos_movidos = db.session.execute(select(Pedido.id).where(Pedido.cliente_id.in_(duplicados))).scalars().all()
+
+    db.session.execute(
+        update(Pedido).where(Pedido.cliente_id.in_(duplicados))
+        .values(cliente_id=novo_dono, atualizado_em=agora, versao=Pedido.versao + 1)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.execute(
+        update(AnotacaoCliente).where(AnotacaoCliente.cliente_id.in_(duplicados))
+        .values(cliente_id=case(destino_por_duplicado, value=AnotacaoCliente.cliente_id), atualizado_em=agora)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.execute(delete(MetricaCliente).where(MetricaCliente.cliente_id.in_(duplicados)))
+
+    # Dados do cadastro que só o duplicado tinha, e a parcela dos contadores que veio do arquivo.
+    complementos = {}
+    for linha in db.session.execute(
+        select(Cliente.id, Cliente.pedidos_arquivados, Cliente.gasto_arquivado, Cliente.ultimo_pedido_arquivado_em,
+               *(getattr(Cliente, campo) for campo in CAMPOS_COMPLEMENTARES))
+        .where(Cliente.id.in_(duplicados)).order_by(Cliente.id)
+    ).mappings():
+        complemento = complementos.setdefault(destino_por_duplicado[linha['id']], {'pedidos_arquivados': 0, 'gasto_arquivado': 0.0, 'ultimo_pedido_arquivado_em': None})
+        complemento['pedidos_arquivados'] += linha['pedidos_arquivados'] or 0
+        complemento['gasto_arquivado'] += linha['gasto_arquivado'] or 0
+        if linha['ultimo_pedido_arquivado_em'] and (complemento['ultimo_pedido_arquivado_em'] is None or linha['ultimo_pedido_arquivado_em'] > complemento['ultimo_pedido_arquivado_em']):
+            complemento['ultimo_pedido_arquivado_em'] = linha['ultimo_pedido_arquivado_em']
+        for campo in CAMPOS_COMPLEMENTARES:
+            if linha[campo]:
+                complemento.setdefault(campo, linha[campo])
+
+    registrar_atualizacoes(db.session.connection(), Pedido, pedidos_movidos)
+    registrar_remocoes(db.session.connection(), 'cliente', duplicados)
+    db.session.execute(EventoOutbox.__table__.insert(), [{
+        'entidade': 'cliente',
+        'entidade_id': duplicado,
+        'operacao': 'delete',
+        'payload': json.dumps({'id': duplicado, 'mesclado_em': mantido}),
+        'criado_em': agora
+    } for duplicado, mantido in destino_por_duplicado.items()])
+    # Remove antes de complementar o cadastro mantido: e-mail é único.
+    db.session.execute(delete(Cliente).where(Cliente.id.in_(duplicados)).execution_options(synchronize_session=False))
+
+    for cliente_id, complemento in complementos.items():
+        atual = db.session.execute(
+            select(Cliente.ultimo_pedido_arquivado_em, *(getattr(Cliente, campo) for campo in CAMPOS_COMPLEMENTARES))
+            .where(Cliente.id == cliente_id)
+        ).mappings().one()
+        valores = {campo: complemento[campo] for campo in CAMPOS_COMPLEMENTARES if campo in complemento and not atual[campo]}
+        ultimo = complemento['ultimo_pedido_arquivado_em']
+        if ultimo and (atual['ultimo_pedido_arquivado_em'] is None or ultimo > atual['ultimo_pedido_arquivado_em']):
+            valores['ultimo_pedido_arquivado_em'] = ultimo
+        db.session.execute(
+            update(Cliente).where(Cliente.id == cliente_id).values(
+                pedidos_arquivados=func.coalesce(Cliente.pedidos_arquivados, 0) + complemento['pedidos_arquivados'],
+                gasto_arquivado=func.coalesce(Cliente.gasto_arquivado, 0) + complemento['gasto_arquivado'],
+                atualizado_em=agora,
+                versao=Cliente.versao + 1,
+                **valores
+            ).execution_options(synchronize_session=False)
+        )
+
+    atualizar_contadores_clientes(*mantidos)
+
+
+def mesclar_clientes_duplicados(simular=False):
+    """Encontra clientes com o mesmo telefone normalizado e mescla cada grupo no cadastro mais antigo.
+
+    Pedidos e anotações passam para o cliente mantido com UPDATEs em lote,
+    os duplicados são removidos (com tombstones e eventos no outbox) e os
+    contadores recalculados, com eventos 'update' para os pedidos movidos e
+    os clientes mantidos, tudo numa transação por lote. Com `simular=True`
+    apenas devolve os grupos. Retorna {cliente mantido: [duplicados]}.
+    """
+    grupos = grupos_duplicados()
+    if simular or not grupos:
+        return grupos
+
+    destino_por_duplicado = {duplicado: mantido for mantido, duplicados in grupos.items() for duplicado in duplicados}
+    duplicados = list(destino_por_duplicado)
+    for inicio in range(0, len(duplicados), TAMANHO_LOTE):
+        lote = {duplicado: destino_por_duplicado[duplicado] for duplicado in duplicados[inicio:inicio + TAMANHO_LOTE]}
+        try:
+            _mesclar_lote(lote)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        # O arquivo pode estar em outro banco; acompanha a mesclagem já confirmada.
+        with db.engines['arquivo'].begin() as conn:
+            conn.execute(
+                update(PedidoArquivado).where(PedidoArquivado.cliente_id.in_(list(lote)))
+                .values(cliente_id=case(lote, value=PedidoArquivado.cliente_id))
+            )
+
+    db.session.expunge_all()
+    return grupos
@@ -0,0 +1,104 @@
+from backend.models.database import db
+from backend.models.cliente import Cliente, AnotacaoCliente
+from backend.models.pedido import Pedido
+from backend.models.pagamento import Pagamento
+from backend.models.metrica_cliente import MetricaCliente
+from backend.models.remocao import RegistroRemovido
+from backend.models.evento import EventoOutbox
+from backend.models.arquivo import PedidoArquivado, PagamentoArquivado
+from backend.services.busca import remover_dos_indices_busca
+from sqlalchemy import select, delete, update, insert, literal
+from datetime import datetime
+import json
+
+
+def _tombstones(entidade, coluna_id, *condicoes):
+    agora = datetime.now()
+    return insert(RegistroRemovido).from_select(
+        ['entidade', 'entidade_id', 'removido_em'],
+        select(literal(entidade), coluna_id, literal(agora)).where(*condicoes)
+    )
+
+
+def excluir_cliente(cliente_id, soft=False):
+    """Remove um cliente e todo o seu histórico com DELETEs em lote.
+
+    Os DELETEs seguem a ordem das dependências (pagamentos, pedidos,
+    anotações, métricas, cliente) numa única transação, sem carregar nenhum
+    registro na sessão. Com `soft=True` o cliente só é marcado como excluído
+    (e sai das listagens), mas também recebe tombstone e evento de remoção.
+    Retorna a quantidade de registros removidos por tabela.
+    """
+    agora = datetime.now()
+
+    if soft:
+        db.session.execute(
+            update(Cliente).where(Cliente.id == cliente_id).values(excluido_em=agora, atualizado_em=agora, versao=Cliente.versao + 1)
+            .execution_options(synchronize_session=False)
+        )
+        # As listagens deixam de mostrar o cliente: para a sincronização e o feed de eventos ele foi removido.
+        db.session.execute(insert(RegistroRemovido).values(entidade='cliente', entidade_id=cliente_id, removido_em=agora))
+        db.session.execute(insert(EventoOutbox).values(
+            entidade='cliente',
+            entidade_id=cliente_id,
+            operacao='delete',
+            payload=json.dumps({'id': cliente_id, 'excluido_em': agora.isoformat()}),
+            criado_em=agora
+        ))
+        db.session.commit()
+        return {}
+
+    pedidos_do_cliente = select(Pedido.id).where(Pedido.cliente_id == cliente_id)
+    removidos = {}
+    try:
+        # Tombstones para a sincronização incremental, gerados por INSERT ... SELECT.
+        db.session.execute(_tombstones('pagamento', Pagamento.id, Pagamento.pedido_id.in_(pedidos_do_cliente)))
+        db.session.execute(_tombstones('pedido', Pedido.id, Pedido.cliente_id == cliente_id))
+        db.session.execute(_tombstones('anotacao', AnotacaoCliente.id, AnotacaoCliente.cliente_id == cliente_id))
+        remover_dos_indices_busca('pedidos', pedidos_do_cliente)
+        remover_dos_indices_busca('anotacoes', select(AnotacaoCliente.id).where(AnotacaoCliente.cliente_id == cliente_id))
+
+        removidos['pagamentos'] = db.session.execute(
+            delete(Pagamento).where(Pagamento.pedido_id.in_(pedidos_do_cliente))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        removidos['pedidos'] = db.session.execute(
+            delete(Pedido).where(Pedido.cliente_id == cliente_id)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        removidos['anotacoes'] = db.session.execute(
+            delete(AnotacaoCliente).where(AnotacaoCliente.cliente_id == cliente_id)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.execute(
+            delete(MetricaCliente).where(MetricaCliente.cliente_id == cliente_id)
+            .execution_options(synchronize_session=False)
+        )
+        removidos['clientes'] = db.session.execute(
+            delete(Cliente).where(Cliente.id == cliente_id)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+        db.session.execute(insert(RegistroRemovido).values(entidade='cliente', entidade_id=cliente_id, removido_em=agora))
+        db.session.execute(insert(EventoOutbox).values(
+            entidade='cliente',
+            entidade_id=cliente_id,
+            operacao='delete',
+            payload=json.dumps({'id': cliente_id, 'removidos': removidos}),
+            criado_em=agora
+        ))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    db.session.expunge_all()
+
+    # O arquivo pode estar em outro banco; é limpo depois que a exclusão principal foi confirmada.
+    with db.engines['arquivo'].begin() as conn:
+        conn.execute(delete(PagamentoArquivado).where(
+            PagamentoArquivado.pedido_id.in_(select(PedidoArquivado.id).where(PedidoArquivado.cliente_id == cliente_id))
+        ))
+        conn.execute(delete(PedidoArquivado).where(PedidoArquivado.cliente_id == cliente_id))
+
+    return removidos
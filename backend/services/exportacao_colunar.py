@@ -0,0 +1,260 @@
+from backend.models.database import db
+from backend.models.pedido import Pedido
+from backend.models.pagamento import Pagamento
+from backend.models.cliente import Cliente
+from backend.models.arquivo import PedidoArquivado, PagamentoArquivado
+from backend.services.arquivamento import arquivo_necessario_pedidos, arquivo_necessario_pagamentos
+from backend.services.coalescencia import coalescer
+from sqlalchemy import select, func
+from datetime import datetime
+import decimal
+import json
+import os
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import pyarrow.ipc as ipc
+except ImportError:
+    pa = None
+
+ANALYTICS_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'output', 'analytics')
+FORMATOS = {'parquet': '.parquet', 'arrow': '.arrow'}
+CENTAVO = decimal.Decimal('0.01')
+
+
+def _dinheiro(valor):
+    return decimal.Decimal(str(valor)).quantize(CENTAVO) if valor is not None else None
+
+
+def _tabelas():
+    dinheiro = pa.decimal128(12, 2)
+    data = pa.timestamp('us')
+    categoria = pa.dictionary(pa.int16(), pa.string())
+    return {
+        'pedidos': {
+            'modelo': Pedido,
+            'arquivo': PedidoArquivado,
+            'arquivo_necessario': arquivo_necessario_pedidos,
+            'coluna_data': Pedido.data_pedido,
+            'colunas': [
+                ('id', Pedido.id, pa.int32()),
+                ('cliente_id', Pedido.cliente_id, pa.int32()),
+                ('servicos', Pedido.servicos, pa.string()),
+                ('valor_total', Pedido.valor_total, dinheiro),
+                ('status', Pedido.status, categoria),
+                ('data_pedido', Pedido.data_pedido, data),
+                ('data_entrega', Pedido.data_entrega, data),
+                ('atualizado_em', Pedido.atualizado_em, data),
+            ],
+        },
+        'pagamentos': {
+            'modelo': Pagamento,
+            'arquivo': PagamentoArquivado,
+            'arquivo_necessario': arquivo_necessario_pagamentos,
+            'coluna_data': Pagamento.data_pagamento,
+            'colunas': [
+                ('id', Pagamento.id, pa.int32()),
+                ('pedido_id', Pagamento.pedido_id, pa.int32()),
+                ('valor_pago', Pagamento.valor_pago, dinheiro),
+                ('forma_pagamento', Pagamento.forma_pagamento, categoria),
+                ('data_pagamento', Pagamento.data_pagamento, data),
+                ('atualizado_em', Pagamento.atualizado_em, data),
+            ],
+        },
+        'clientes': {
+            'modelo': Cliente,
+            'coluna_data': None,
+            'colunas': [
+                ('id', Cliente.id, pa.int32()),
+                ('nome', Cliente.nome, pa.string()),
+                ('telefone', Cliente.telefone, pa.string()),
+                ('email', Cliente.email, pa.string()),
+                ('endereco', Cliente.endereco, pa.string()),
+                ('criado_em', Cliente.criado_em, data),
+                ('atualizado_em', Cliente.atualizado_em, data),
+            ],
+        },
+    }
+
+
+def _expressao_mes(coluna, engine=None):
+    if (engine or db.engine).dialect.name == 'sqlite':
+        return func.strftime('%Y-%m', coluna)
+    return func.to_char(coluna, 'YYYY-MM')
+
+
+def _definicao_arquivo(definicao):
+    """A mesma definição lida da tabela de arquivo (bind 'arquivo'), que tem as mesmas colunas."""
+    modelo = definicao['arquivo']
+    return {
+        'modelo': modelo,
+        'coluna_data': getattr(modelo, definicao['coluna_data'].key),
+        'colunas': [(nome, getattr(modelo, nome), tipo) for nome, _, tipo in definicao['colunas']],
+    }
+
+
+def _lotes(definicao, filtros, tamanho_lote, conexao=None, ids_vistos=None, ignorar_ids=()):
+    nomes = [nome for nome, _, _ in definicao['colunas']]
+    schema = pa.schema([(nome, tipo) for nome, _, tipo in definicao['colunas']])
+    query = select(*[coluna for _, coluna, _ in definicao['colunas']]).where(*filtros)
+    query = query.order_by(definicao['modelo'].id).execution_options(yield_per=tamanho_lote)
+
+    resultado = (conexao or db.session).execute(query)
+    for linhas in resultado.partitions(tamanho_lote):
+        colunas = {nome: [] for nome in nomes}
+        for linha in linhas:
+            # Um lote interrompido entre a cópia e a remoção fica nas duas tabelas: exporta só uma vez.
+            if linha[0] in ignorar_ids:
+                continue
+            if ids_vistos is not None:
+                ids_vistos.add(linha[0])
+            for nome, valor in zip(nomes, linha):
+                colunas[nome].append(valor)
+        for nome, _, tipo in definicao['colunas']:
+            if pa.types.is_decimal(tipo):
+                colunas[nome] = [_dinheiro(v) for v in colunas[nome]]
+        yield pa.RecordBatch.from_pydict(colunas, schema=schema)
+
+
+def _gravar(caminho, formato, schema, lotes, compressao):
+    temporario = caminho + '.tmp'
+    linhas = 0
+    if formato == 'parquet':
+        with pq.ParquetWriter(temporario, schema, compression=compressao) as writer:
+            for lote in lotes:
+                writer.write_batch(lote)
+                linhas += lote.num_rows
+    else:
+        opcoes = ipc.IpcWriteOptions(compression=compressao)
+        with pa.OSFile(temporario, 'wb') as arquivo, ipc.new_file(arquivo, schema, options=opcoes) as writer:
+            for lote in lotes:
+                writer.write_batch(lote)
+                linhas += lote.num_rows
+    os.replace(temporario, caminho)
+    return linhas
+
+
+def _ler_manifesto(pasta, formato):
+    caminho = os.path.join(pasta, f'_manifesto_{formato}.json')
+    if not os.path.exists(caminho):
+        return {}
+    with open(caminho, encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+
+def _salvar_manifesto(pasta, formato, manifesto):
+    caminho = os.path.join(pasta, f'_manifesto_{formato}.json')
+    with open(caminho + '.tmp', 'w', encoding='utf-8') as arquivo:
+        json.dump(manifesto, arquivo, indent=2, sort_keys=True)
+    os.replace(caminho + '.tmp', caminho)
+
+
+def _resumo_meses(definicao, conexao=None, engine=None):
+    modelo = definicao['modelo']
+    mes = _expressao_mes(definicao['coluna_data'], engine)
+    return (conexao or db.session).execute(
+        select(mes, func.count(modelo.id), func.max(modelo.atualizado_em))
+        .where(definicao['coluna_data'].isnot(None))
+        .group_by(mes)
+    ).all()
+
+
+def _lotes_do_mes(definicao, inicio, fim, tamanho_lote, incluir_arquivo):
+    filtros = [definicao['coluna_data'] >= inicio, definicao['coluna_data'] < fim]
+    if not incluir_arquivo:
+        yield from _lotes(definicao, filtros, tamanho_lote)
+        return
+
+    ids_vistos = set()
+    yield from _lotes(definicao, filtros, tamanho_lote, ids_vistos=ids_vistos)
+    arquivo = _definicao_arquivo(definicao)
+    filtros = [arquivo['coluna_data'] >= inicio, arquivo['coluna_data'] < fim]
+    with db.engines['arquivo'].connect() as conn:
+        yield from _lotes(arquivo, filtros, tamanho_lote, conexao=conn, ignorar_ids=ids_vistos)
+
+
+def _exportar_particionado(nome, definicao, pasta, formato, compressao, tamanho_lote, completo):
+    manifesto = {} if completo else _ler_manifesto(pasta, formato)
+    incluir_arquivo = definicao['arquivo_necessario']()
+
+    # Um GROUP BY por tabela diz quais meses têm dados novos ou alterados desde a
+    # última exportação. Os pedidos arquivados continuam no mês deles: mover um
+    # lote para o arquivo não muda o total nem a última alteração do mês.
+    meses = {}
+    resumos = [_resumo_meses(definicao)]
+    if incluir_arquivo:
+        with db.engines['arquivo'].connect() as conn:
+            resumos.append(_resumo_meses(_definicao_arquivo(definicao), conn, db.engines['arquivo']))
+    for resumo in resumos:
+        for chave_mes, quantidade, ultima_alteracao in resumo:
+            total, ultima = meses.get(chave_mes, (0, None))
+            if ultima is None or (ultima_alteracao is not None and ultima_alteracao > ultima):
+                ultima = ultima_alteracao
+            meses[chave_mes] = (total + quantidade, ultima)
+
+    schema = pa.schema([(n, tipo) for n, _, tipo in definicao['colunas']])
+    escritos = []
+    for chave_mes, (quantidade, ultima_alteracao) in sorted(meses.items()):
+        ultima_alteracao = ultima_alteracao.isoformat() if isinstance(ultima_alteracao, datetime) else ultima_alteracao
+        anterior = manifesto.get(chave_mes)
+        if anterior and anterior['linhas'] == quantidade and anterior['atualizado_ate'] == ultima_alteracao:
+            continue
+
+        pasta_mes = os.path.join(pasta, f'mes={chave_mes}')
+        os.makedirs(pasta_mes, exist_ok=True)
+        caminho = os.path.join(pasta_mes, f'{nome}{FORMATOS[formato]}')
+        inicio = datetime.strptime(chave_mes, '%Y-%m')
+        fim = datetime(inicio.year + inicio.month // 12, inicio.month % 12 + 1, 1)
+        linhas = _gravar(caminho, formato, schema, _lotes_do_mes(definicao, inicio, fim, tamanho_lote, incluir_arquivo), compressao)
+
+        manifesto[chave_mes] = {'linhas': linhas, 'atualizado_ate': ultima_alteracao}
+        escritos.append(caminho)
+
+    # Só some do manifesto o mês que não tem mais linha nem no banco principal nem no arquivo.
+    for chave_mes in list(manifesto):
+        if chave_mes not in meses:
+            caminho = os.path.join(pasta, f'mes={chave_mes}', f'{nome}{FORMATOS[formato]}')
+            if os.path.exists(caminho):
+                os.remove(caminho)
+            del manifesto[chave_mes]
+
+    _salvar_manifesto(pasta, formato, manifesto)
+    return escritos
+
+
+# Escreve arquivos e o manifesto: nunca duas exportações ao mesmo tempo, nem entre o app e a CLI.
+@coalescer(entre_processos=True)
+def exportar_analytics(formato='parquet', tabelas=None, completo=False, compressao='zstd', tamanho_lote=10000):
+    """Exporta pedidos, pagamentos e clientes em formato colunar.
+
+    Pedidos e pagamentos são particionados por mês (`mes=AAAA-MM`), incluindo
+    os já arquivados; somente as partições com linhas novas ou alteradas são
+    regravadas, a menos que `completo=True`. Clientes são exportados como um único arquivo.
+    Retorna os caminhos dos arquivos escritos.
+    """
+    if pa is None:
+        raise RuntimeError('pyarrow não está instalado. Instale-o para usar a exportação Parquet/Arrow.')
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato inválido: {formato}. Use 'parquet' ou 'arrow'.")
+
+    definicoes = _tabelas()
+    tabelas = tabelas or list(definicoes)
+    escritos = []
+
+    for nome in tabelas:
+        if nome not in definicoes:
+            raise ValueError(f'Tabela desconhecida para exportação: {nome}.')
+        definicao = definicoes[nome]
+        pasta = os.path.join(ANALYTICS_FOLDER, nome)
+        os.makedirs(pasta, exist_ok=True)
+
+        if definicao['coluna_data'] is None:
+            schema = pa.schema([(n, tipo) for n, _, tipo in definicao['colunas']])
+            caminho = os.path.join(pasta, f'{nome}{FORMATOS[formato]}')
+            _gravar(caminho, formato, schema, _lotes(definicao, [], tamanho_lote), compressao)
+            escritos.append(caminho)
+        else:
+            escritos.extend(_exportar_particionado(nome, definicao, pasta, formato, compressao, tamanho_lote, completo))
+
+    return escritos
@@ -0,0 +1,197 @@
+from flask import current_app
+from backend.models.database import db
+from backend.models.manutencao import ManutencaoBanco
+from sqlalchemy import event
+from datetime import datetime
+import os
+import sqlite3
+import time
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+def _bancos_sqlite():
+    """Bancos SQLite em arquivo (principal e arquivo), sem repetir o mesmo arquivo nem incluir réplicas."""
+    bancos = {}
+    for bind_key, engine in db.engines.items():
+        if bind_key and bind_key.startswith('replica_'):
+            continue
+        caminho = engine.url.database
+        if engine.dialect.name != 'sqlite' or not caminho or caminho == ':memory:':
+            continue
+        bancos.setdefault(os.path.abspath(caminho), (bind_key or 'principal', engine))
+    return [(nome, engine, caminho) for caminho, (nome, engine) in bancos.items()]
+
+
+def _tamanho(caminho):
+    # Em modo WAL as páginas recentes ficam no -wal até o próximo checkpoint.
+    return sum(os.path.getsize(arquivo) for arquivo in (caminho, caminho + '-wal') if os.path.exists(arquivo))
+
+
+def _pragma(conn, pragma):
+    return conn.exec_driver_sql(f'PRAGMA {pragma}').scalar()
+
+
+def _registrar(banco, operacao, inicio, inicio_monotonic, **dados):
+    registro = ManutencaoBanco(
+        banco=banco,
+        operacao=operacao,
+        inicio=inicio,
+        duracao_ms=int((time.monotonic() - inicio_monotonic) * 1000),
+        **dados
+    )
+    db.session.add(registro)
+    db.session.commit()
+    return registro
+
+
+def configurar_sqlite(app):
+    """Bancos SQLite novos já nascem com auto_vacuum incremental.
+
+    O PRAGMA só tem efeito antes da primeira tabela ser criada; bancos
+    existentes são convertidos uma única vez por `converter_para_vacuum_incremental`.
+    """
+    with app.app_context():
+        for nome, engine, caminho in _bancos_sqlite():
+            event.listen(engine, 'connect', _auto_vacuum_incremental)
+
+
+def _auto_vacuum_incremental(conexao_dbapi, registro_conexao):
+    cursor = conexao_dbapi.cursor()
+    cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    cursor.close()
+
+
+def otimizar_bancos_sqlite(max_paginas=None):
+    """Atualiza as estatísticas do planejador e devolve ao sistema as páginas livres.
+
+    Usa `PRAGMA optimize` (ou `ANALYZE` completo se o banco nunca foi
+    analisado) e `PRAGMA incremental_vacuum` limitado a `max_paginas` por
+    execução, para não segurar o lock de escrita por muito tempo. Nunca roda
+    um VACUUM completo: bancos sem auto_vacuum incremental só são
+    analisados até a conversão manual. Retorna a quantidade de páginas liberadas.
+    """
+    max_paginas = max_paginas or current_app.config.get('SQLITE_VACUUM_MAX_PAGES', 2000)
+    liberadas = 0
+
+    for nome, engine, caminho in _bancos_sqlite():
+        inicio, inicio_monotonic = datetime.now(), time.monotonic()
+        tamanho_antes = _tamanho(caminho)
+
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            livres_antes = _pragma(conn, 'freelist_count')
+
+            analisado = conn.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").first()
+            conn.exec_driver_sql('PRAGMA optimize' if analisado else 'ANALYZE')
+
+            if _pragma(conn, 'auto_vacuum') != AUTO_VACUUM_INCREMENTAL:
+                print(f"Banco '{nome}' sem auto_vacuum incremental: converta uma vez pela CLI (Relatórios > Converter Bancos SQLite).")
+            elif livres_antes:
+                # Pelo cursor do sqlite3 o PRAGMA executa um único passo (uma página); executescript vai até o fim.
+                conn.connection.driver_connection.executescript(f'PRAGMA incremental_vacuum({min(livres_antes, max_paginas)})')
+
+            livres_depois = _pragma(conn, 'freelist_count')
+
+        _registrar(nome, 'otimizacao', inicio, inicio_monotonic,
+                   tamanho_antes_bytes=tamanho_antes, tamanho_depois_bytes=_tamanho(caminho),
+                   paginas_livres_antes=livres_antes, paginas_livres_depois=livres_depois)
+        liberadas += max(livres_antes - livres_depois, 0)
+        print(f"Banco '{nome}' otimizado: {livres_antes - livres_depois} página(s) liberada(s), {_tamanho(caminho)} bytes.")
+
+    return liberadas
+
+
+def bancos_sem_vacuum_incremental():
+    nomes = []
+    for nome, engine, caminho in _bancos_sqlite():
+        with engine.connect() as conn:
+            if _pragma(conn, 'auto_vacuum') != AUTO_VACUUM_INCREMENTAL:
+                nomes.append(nome)
+    return nomes
+
+
+def converter_para_vacuum_incremental():
+    """Troca bancos SQLite existentes para auto_vacuum incremental com um VACUUM completo.
+
+    O VACUUM reescreve o arquivo inteiro, precisa de espaço livre do mesmo
+    tamanho e bloqueia as escritas até terminar: é um comando manual, para
+    rodar uma única vez numa janela sem uso, e não faz parte do job
+    agendado. Retorna os nomes dos bancos convertidos.
+    """
+    convertidos = []
+    for nome, engine, caminho in _bancos_sqlite():
+        inicio, inicio_monotonic = datetime.now(), time.monotonic()
+        tamanho_antes = _tamanho(caminho)
+
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            if _pragma(conn, 'auto_vacuum') == AUTO_VACUUM_INCREMENTAL:
+                continue
+            print(f"Convertendo o banco '{nome}' para auto_vacuum incremental (VACUUM completo)...")
+            livres_antes = _pragma(conn, 'freelist_count')
+            conn.exec_driver_sql('PRAGMA auto_vacuum = INCREMENTAL')
+            conn.exec_driver_sql('VACUUM')
+            livres_depois = _pragma(conn, 'freelist_count')
+
+        _registrar(nome, 'vacuum', inicio, inicio_monotonic,
+                   tamanho_antes_bytes=tamanho_antes, tamanho_depois_bytes=_tamanho(caminho),
+                   paginas_livres_antes=livres_antes, paginas_livres_depois=livres_depois)
+        convertidos.append(nome)
+        print(f"Banco '{nome}' convertido: {_tamanho(caminho)} bytes.")
+    return convertidos
+
+
+def _remover_backups_antigos(pasta, prefixo, manter):
+    backups = sorted(arquivo for arquivo in os.listdir(pasta) if arquivo.startswith(prefixo) and arquivo.endswith('.db'))
+    for arquivo in backups[:-manter] if manter else []:
+        os.remove(os.path.join(pasta, arquivo))
+
+
+def fazer_backup_sqlite(pasta=None):
+    """Copia os bancos SQLite a quente pela API de backup do SQLite.
+
+    A cópia avança `SQLITE_BACKUP_PAGES_PER_STEP` páginas por vez e pausa
+    entre os passos, liberando o banco para as escritas da aplicação. O
+    arquivo é gravado com nome temporário e só renomeado depois de passar
+    no `quick_check`. Retorna a lista de arquivos gerados.
+    """
+    pasta = pasta or current_app.config.get('SQLITE_BACKUP_DIR') or os.path.join(current_app.instance_path, 'backups')
+    paginas_por_passo = current_app.config.get('SQLITE_BACKUP_PAGES_PER_STEP', 256)
+    pausa = current_app.config.get('SQLITE_BACKUP_STEP_PAUSE', 0.005)
+    manter = current_app.config.get('SQLITE_BACKUPS_KEEP', 7)
+    os.makedirs(pasta, exist_ok=True)
+    arquivos = []
+
+    for nome, engine, caminho in _bancos_sqlite():
+        inicio, inicio_monotonic = datetime.now(), time.monotonic()
+        prefixo = os.path.splitext(os.path.basename(caminho))[0] + '-'
+        destino = os.path.join(pasta, f"{prefixo}{inicio.strftime('%Y%m%d-%H%M%S')}.db")
+        temporario = destino + '.parcial'
+
+        conexao = engine.raw_connection()
+        try:
+            copia = sqlite3.connect(temporario)
+            try:
+                conexao.driver_connection.backup(
+                    copia,
+                    pages=paginas_por_passo,
+                    progress=lambda status, restantes, total: time.sleep(pausa)
+                )
+                verificacao = copia.execute('PRAGMA quick_check').fetchone()[0]
+            finally:
+                copia.close()
+        finally:
+            conexao.close()
+
+        if verificacao != 'ok':
+            os.remove(temporario)
+            _registrar(nome, 'backup', inicio, inicio_monotonic, tamanho_antes_bytes=_tamanho(caminho), erro=f'quick_check: {verificacao}')
+            raise RuntimeError(f"Backup do banco '{nome}' falhou na verificação de integridade: {verificacao}")
+
+        os.replace(temporario, destino)
+        _remover_backups_antigos(pasta, prefixo, manter)
+        _registrar(nome, 'backup', inicio, inicio_monotonic,
+                   tamanho_antes_bytes=_tamanho(caminho), tamanho_depois_bytes=os.path.getsize(destino), arquivo=destino)
+        arquivos.append(destino)
+        print(f"Backup do banco '{nome}' gravado em {destino}.")
+
+    return arquivos
@@ -0,0 +1,254 @@
+from flask import current_app
+from backend.models.database import db
+from backend.models.notificacao import Notificacao
+from sqlalchemy import select, update, insert, and_
+from email.message import EmailMessage
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import asyncio
+import json
+import smtplib
+import threading
+import time
+import urllib.request
+
+
+class LimiteDeTaxa:
+    """Token bucket assíncrono: no máximo `por_segundo` envios por segundo."""
+
+    def __init__(self, por_segundo):
+        self.intervalo = 1.0 / por_segundo if por_segundo else 0
+        self._proximo = 0.0
+        self._trava = asyncio.Lock()
+
+    async def aguardar(self):
+        if not self.intervalo:
+            return
+        async with self._trava:
+            agora = time.monotonic()
+            espera = self._proximo - agora
+            self._proximo = max(agora, self._proximo) + self.intervalo
+        if espera > 0:
+            await asyncio.sleep(espera)
+
+
+class CanalEmail:
+    """Envio por SMTP com uma conexão por thread, reaproveitada durante o lote.
+
+    O handshake (STARTTLS e login) é feito uma vez por thread e não a cada
+    mensagem; `fechar()` encerra as conexões no fim do despacho.
+    """
+    nome = 'email'
+
+    def __init__(self, config):
+        self.host = config.get('SMTP_HOST')
+        self.porta = config.get('SMTP_PORT', 587)
+        self.usuario = config.get('SMTP_USER')
+        self.senha = config.get('SMTP_PASSWORD')
+        self.remetente = config.get('SMTP_FROM') or self.usuario or 'assistente@localhost'
+        self.usar_tls = config.get('SMTP_USE_TLS', True)
+        self._local = threading.local()
+        self._conexoes = []
+        self._trava = threading.Lock()
+
+    def _conectar(self):
+        smtp = smtplib.SMTP(self.host, self.porta, timeout=30)
+        if self.usar_tls:
+            smtp.starttls()
+        if self.usuario:
+            smtp.login(self.usuario, self.senha)
+        with self._trava:
+            self._conexoes.append(smtp)
+        self._local.smtp = smtp
+        return smtp
+
+    def _enviar(self, destino, assunto, conteudo):
+        mensagem = EmailMessage()
+        mensagem['From'] = self.remetente
+        mensagem['To'] = destino
+        mensagem['Subject'] = assunto or 'Assistente Comercial'
+        mensagem.set_content(conteudo)
+
+        smtp = getattr(self._local, 'smtp', None)
+        if smtp is None:
+            self._conectar().send_message(mensagem)
+            return
+        try:
+            smtp.send_message(mensagem)
+        except smtplib.SMTPServerDisconnected:
+            # O servidor encerrou a conexão ociosa: reconecta uma vez.
+            self._conectar().send_message(mensagem)
+
+    async def enviar(self, destino, assunto, conteudo):
+        await asyncio.to_thread(self._enviar, destino, assunto, conteudo)
+
+    def fechar(self):
+        with self._trava:
+            conexoes, self._conexoes = self._conexoes, []
+        for smtp in conexoes:
+            try:
+                smtp.quit()
+            except smtplib.SMTPException:
+                smtp.close()
+
+
+class CanalWhatsApp:
+    nome = 'whatsapp'
+
+    def __init__(self, config):
+        self.url = config.get('WHATSAPP_API_URL')
+        self.token = config.get('WHATSAPP_API_TOKEN')
+
+    def _enviar(self, destino, assunto, conteudo):
+        corpo = json.dumps({'to': destino, 'message': conteudo}).encode('utf-8')
+        requisicao = urllib.request.Request(self.url, data=corpo, method='POST', headers={'Content-Type': 'application/json'})
+        if self.token:
+            requisicao.add_header('Authorization', f'Bearer {self.token}')
+        with urllib.request.urlopen(requisicao, timeout=30) as resposta:
+            if resposta.status >= 300:
+                raise RuntimeError(f'API do WhatsApp respondeu {resposta.status}')
+
+    async def enviar(self, destino, assunto, conteudo):
+        await asyncio.to_thread(self._enviar, destino, assunto, conteudo)
+
+    def fechar(self):
+        pass
+
+
+class CanalConsole:
+    """Substituto local usado quando o canal real não está configurado."""
+
+    def __init__(self, nome):
+        self.nome = nome
+
+    async def enviar(self, destino, assunto, conteudo):
+        print(f"[{self.nome} -> {destino}] {assunto or ''} {conteudo[:80]}")
+
+    def fechar(self):
+        pass
+
+
+def criar_canais(config):
+    return {
+        'email': CanalEmail(config) if config.get('SMTP_HOST') else CanalConsole('email'),
+        'whatsapp': CanalWhatsApp(config) if config.get('WHATSAPP_API_URL') else CanalConsole('whatsapp'),
+    }
+
+
+def enfileirar_notificacoes(notificacoes):
+    """Grava notificações no outbox; as que já têm a mesma `chave` são ignoradas."""
+    chaves = [n['chave'] for n in notificacoes if n.get('chave')]
+    existentes = set()
+    for inicio in range(0, len(chaves), 500):
+        existentes.update(db.session.execute(
+            select(Notificacao.chave).where(Notificacao.chave.in_(chaves[inicio:inicio + 500]))
+        ).scalars())
+
+    agora = datetime.now()
+    novas = [
+        {'assunto': None, 'chave': None, **n, 'status': 'pendente', 'tentativas': 0, 'proxima_tentativa_em': agora, 'criado_em': agora}
+        for n in notificacoes
+        if not n.get('chave') or n['chave'] not in existentes
+    ]
+    if novas:
+        db.session.execute(insert(Notificacao), novas)
+    db.session.commit()
+    return len(novas)
+
+
+async def _enviar_lote(lote, canais, limites, concorrencia):
+    # O executor padrão do asyncio.to_thread tem no máximo min(32, CPUs + 4) threads.
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=concorrencia))
+    semaforo = asyncio.Semaphore(concorrencia)
+
+    async def enviar(notificacao_id, canal, destino, assunto, conteudo):
+        async with semaforo:
+            await limites[canal].aguardar()
+            try:
+                await canais[canal].enviar(destino, assunto, conteudo)
+                return notificacao_id, None
+            except Exception as e:
+                return notificacao_id, str(e) or e.__class__.__name__
+
+    return await asyncio.gather(*(enviar(*linha) for linha in lote))
+
+
+def despachar_notificacoes(limite=None):
+    """Envia as notificações pendentes vencidas, em paralelo e com limite de taxa por canal.
+
+    O acesso ao banco fica fora do loop assíncrono: o lote é lido de uma vez,
+    reservado (status 'enviando'), enviado concorrentemente e os resultados
+    são gravados em massa. Só as linhas que este processo conseguiu reservar
+    são enviadas, então execuções simultâneas (outro worker, o job e a CLI)
+    não mandam a mesma mensagem duas vezes. Uma reserva que passa de
+    `NOTIFICACOES_PRAZO_ENVIO_SEGUNDOS` volta para a fila. Falhas são
+    reagendadas com backoff exponencial até `NOTIFICACOES_MAX_TENTATIVAS`.
+    Retorna (enviadas, falhas).
+    """
+    config = current_app.config
+    limite = limite or config.get('NOTIFICACOES_LOTE', 5000)
+    canais = criar_canais(config)
+    taxas = config.get('NOTIFICACOES_TAXA_POR_SEGUNDO', {})
+
+    agora = datetime.now()
+    vencidas = and_(Notificacao.status.in_(('pendente', 'enviando')), Notificacao.proxima_tentativa_em <= agora)
+    lote = db.session.execute(
+        select(Notificacao.id, Notificacao.canal, Notificacao.destino, Notificacao.assunto, Notificacao.conteudo, Notificacao.tentativas)
+        .where(vencidas, Notificacao.canal.in_(list(canais)))
+        .order_by(Notificacao.proxima_tentativa_em)
+        .limit(limite)
+    ).all()
+    if not lote:
+        db.session.rollback()
+        return 0, 0
+
+    # A reserva repete a condição da leitura: quem chegar depois não encontra mais as linhas vencidas.
+    prazo_envio = config.get('NOTIFICACOES_PRAZO_ENVIO_SEGUNDOS', 600)
+    reservadas = set(db.session.execute(
+        update(Notificacao).where(Notificacao.id.in_([linha[0] for linha in lote]), vencidas)
+        .values(status='enviando', proxima_tentativa_em=agora + timedelta(seconds=prazo_envio))
+        .returning(Notificacao.id)
+        .execution_options(synchronize_session=False)
+    ).scalars())
+    db.session.commit()
+
+    tentativas = {linha[0]: linha[5] for linha in lote}
+    lote = [tuple(linha[:5]) for linha in lote if linha[0] in reservadas]
+    if not lote:
+        return 0, 0
+
+    async def executar():
+        limites = {nome: LimiteDeTaxa(taxas.get(nome, 0)) for nome in canais}
+        return await _enviar_lote(lote, canais, limites, config.get('NOTIFICACOES_CONCORRENCIA', 50))
+
+    try:
+        resultados = asyncio.run(executar())
+    finally:
+        for canal in canais.values():
+            canal.fechar()
+
+    agora = datetime.now()
+    max_tentativas = config.get('NOTIFICACOES_MAX_TENTATIVAS', 5)
+    backoff = config.get('NOTIFICACOES_BACKOFF_SEGUNDOS', 30)
+
+    enviadas = [notificacao_id for notificacao_id, erro in resultados if erro is None]
+    if enviadas:
+        db.session.execute(
+            update(Notificacao).where(Notificacao.id.in_(enviadas))
+            .values(status='enviada', enviado_em=agora, erro=None, tentativas=Notificacao.tentativas + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+    falhas = [(notificacao_id, erro) for notificacao_id, erro in resultados if erro is not None]
+    for notificacao_id, erro in falhas:
+        tentativa = tentativas.get(notificacao_id, 0) + 1
+        db.session.execute(
+            update(Notificacao).where(Notificacao.id == notificacao_id).values(
+                tentativas=tentativa,
+                erro=erro[:1000],
+                status='falhou' if tentativa >= max_tentativas else 'pendente',
+                proxima_tentativa_em=agora + timedelta(seconds=backoff * 2 ** (tentativa - 1))
+            ).execution_options(synchronize_session=False)
+        )
+    db.session.commit()
+    return len(enviadas), len(falhas)
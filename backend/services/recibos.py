@@ -0,0 +1,167 @@
+from flask import current_app
+from backend.models.database import db
+from backend.models.pagamento import Pagamento
+from backend.models.pedido import Pedido
+from backend.models.cliente import Cliente
+from concurrent.futures import ProcessPoolExecutor
+from html import escape
+import hashlib
+import io
+import json
+import os
+
+try:
+    from reportlab.lib.pagesizes import A5
+    from reportlab.lib.units import mm
+    from reportlab.pdfgen import canvas
+except ImportError:
+    canvas = None
+
+RECIBOS_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'output', 'recibos')
+FORMATOS = ('pdf', 'html')
+# Mudanças no layout devem incrementar a versão para invalidar o cache.
+VERSAO_LAYOUT = 1
+
+
+def _consulta_recibos():
+    return db.session.query(
+        Pagamento.id, Pagamento.valor_pago, Pagamento.forma_pagamento, Pagamento.data_pagamento,
+        Pedido.id, Pedido.servicos, Pedido.valor_total,
+        Cliente.nome, Cliente.telefone, Cliente.email, Cliente.endereco
+    ).join(Pedido, Pedido.id == Pagamento.pedido_id).join(Cliente, Cliente.id == Pedido.cliente_id)
+
+
+def _dados(linha):
+    (pagamento_id, valor_pago, forma_pagamento, data_pagamento,
+     pedido_id, servicos, valor_total, nome, telefone, email, endereco) = linha
+    return {
+        'numero': f'REC-{pagamento_id:05d}',
+        'pagamento_id': pagamento_id,
+        'pedido_id': pedido_id,
+        'cliente_nome': nome,
+        'cliente_telefone': telefone,
+        'cliente_email': email or 'Não informado',
+        'cliente_endereco': endereco or 'Não informado',
+        'servicos': servicos,
+        'valor_pedido': f'{valor_total:.2f}',
+        'valor_pago': f'{valor_pago:.2f}',
+        'forma_pagamento': forma_pagamento,
+        'data_pagamento': data_pagamento.strftime('%d/%m/%Y %H:%M:%S') if data_pagamento else '',
+    }
+
+
+def dados_recibo(pagamento_id):
+    linha = _consulta_recibos().filter(Pagamento.id == pagamento_id).first()
+    return _dados(linha) if linha else None
+
+
+def chave_recibo(dados, formato):
+    conteudo = json.dumps({'dados': dados, 'formato': formato, 'versao': VERSAO_LAYOUT}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+
+def caminho_cache(chave, formato):
+    return os.path.join(RECIBOS_FOLDER, chave[:2], f'{chave}.{formato}')
+
+
+def renderizar_html(dados):
+    linhas = ''.join(
+        f'<tr><th>{escape(rotulo)}</th><td>{escape(str(valor))}</td></tr>'
+        for rotulo, valor in _campos(dados)
+    )
+    return (
+        '<!DOCTYPE html><html lang="pt-BR"><head><meta charset="utf-8">'
+        f'<title>Recibo {escape(dados["numero"])}</title>'
+        '<style>body{font-family:sans-serif;margin:2em}th{text-align:left;padding-right:1em}</style>'
+        f'</head><body><h1>Recibo {escape(dados["numero"])}</h1><table>{linhas}</table></body></html>'
+    ).encode('utf-8')
+
+
+def renderizar_pdf(dados):
+    if canvas is None:
+        raise RuntimeError('reportlab não está instalado. Instale-o para gerar recibos em PDF.')
+
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A5, invariant=1)
+    largura, altura = A5
+    y = altura - 20 * mm
+    pdf.setFont('Helvetica-Bold', 14)
+    pdf.drawString(15 * mm, y, f'Recibo {dados["numero"]}')
+    y -= 12 * mm
+    for rotulo, valor in _campos(dados):
+        pdf.setFont('Helvetica-Bold', 9)
+        pdf.drawString(15 * mm, y, f'{rotulo}:')
+        pdf.setFont('Helvetica', 9)
+        pdf.drawString(55 * mm, y, str(valor)[:70])
+        y -= 7 * mm
+    pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+def _campos(dados):
+    return [
+        ('Cliente', dados['cliente_nome']),
+        ('Telefone', dados['cliente_telefone']),
+        ('E-mail', dados['cliente_email']),
+        ('Endereço', dados['cliente_endereco']),
+        ('Pedido', dados['pedido_id']),
+        ('Serviços', dados['servicos']),
+        ('Valor do Pedido', f'R$ {dados["valor_pedido"]}'),
+        ('Valor Pago', f'R$ {dados["valor_pago"]}'),
+        ('Forma de Pagamento', dados['forma_pagamento']),
+        ('Data do Pagamento', dados['data_pagamento']),
+    ]
+
+
+def _renderizar_arquivo(dados, formato, caminho):
+    # Executada nos processos do pool: precisa ser uma função de módulo.
+    conteudo = renderizar_pdf(dados) if formato == 'pdf' else renderizar_html(dados)
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    temporario = f'{caminho}.{os.getpid()}.tmp'
+    with open(temporario, 'wb') as arquivo:
+        arquivo.write(conteudo)
+    os.replace(temporario, caminho)
+    return caminho
+
+
+def renderizar_recibos(lista_dados, formato='pdf'):
+    """Garante que os recibos existam no cache e devolve [(dados, caminho)].
+
+    O cache é endereçado pelo hash dos dados do recibo: um recibo cujos dados
+    não mudaram nunca é renderizado de novo. Os que faltam são renderizados
+    em um pool de processos quando o lote é grande o bastante.
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato inválido: {formato}. Use 'pdf' ou 'html'.")
+
+    resultado = []
+    pendentes = []
+    for dados in lista_dados:
+        caminho = caminho_cache(chave_recibo(dados, formato), formato)
+        resultado.append((dados, caminho))
+        if not os.path.exists(caminho):
+            pendentes.append((dados, caminho))
+
+    minimo_pool = current_app.config.get('RECIBOS_MINIMO_POOL', 16)
+    if len(pendentes) >= minimo_pool:
+        with ProcessPoolExecutor(max_workers=current_app.config.get('RECIBOS_WORKERS')) as pool:
+            futuros = [pool.submit(_renderizar_arquivo, dados, formato, caminho) for dados, caminho in pendentes]
+            for futuro in futuros:
+                futuro.result()
+    else:
+        for dados, caminho in pendentes:
+            _renderizar_arquivo(dados, formato, caminho)
+
+    return resultado
+
+
+def recibos_do_periodo(data_inicio=None, data_fim=None, limite=None):
+    query = _consulta_recibos().order_by(Pagamento.data_pagamento.asc())
+    if data_inicio:
+        query = query.filter(Pagamento.data_pagamento >= data_inicio)
+    if data_fim:
+        query = query.filter(Pagamento.data_pagamento < data_fim)
+    if limite:
+        query = query.limit(limite)
+    return [_dados(linha) for linha in query.all()]
@@ -0,0 +1,186 @@
+from flask import current_app
+from backend.models.database import db
+from backend.models.cliente import Cliente
+from backend.models.pedido import Pedido
+from backend.models.pagamento import Pagamento
+from backend.models.metrica_cliente import MetricaCliente
+from backend.models.arquivo import PedidoArquivado
+from backend.services.arquivamento import arquivo_necessario_pedidos
+from sqlalchemy import select, func, and_, union
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+QUANTIS = [0.2, 0.4, 0.6, 0.8]
+
+
+def _primeiras_compras_arquivadas(cliente_ids):
+    # Os contadores de Cliente não guardam a primeira compra arquivada; o arquivo pode estar em outro banco.
+    query = select(
+        PedidoArquivado.cliente_id, func.min(PedidoArquivado.data_pedido).label('primeira_compra_arquivada')
+    ).where(PedidoArquivado.status != 'cancelado').group_by(PedidoArquivado.cliente_id)
+    if cliente_ids is not None:
+        query = query.where(PedidoArquivado.cliente_id.in_(cliente_ids))
+    with db.engines['arquivo'].connect() as conn:
+        return pd.read_sql(query, conn, index_col='cliente_id', parse_dates=['primeira_compra_arquivada'])
+
+
+def _agregados_por_cliente(cliente_ids=None):
+    """Frequência, valor e datas de compra por cliente, somando os pedidos já arquivados."""
+    query = select(
+        Cliente.id.label('cliente_id'),
+        func.count(Pedido.id).label('frequencia'),
+        func.coalesce(func.sum(Pagamento.valor_pago), 0).label('valor_monetario'),
+        func.min(Pedido.data_pedido).label('primeira_compra'),
+        func.max(Pedido.data_pedido).label('ultima_compra'),
+        Cliente.pedidos_arquivados,
+        Cliente.gasto_arquivado,
+        Cliente.ultimo_pedido_arquivado_em
+    ).select_from(Cliente).outerjoin(
+        Pedido, and_(Pedido.cliente_id == Cliente.id, Pedido.status != 'cancelado')
+    ).outerjoin(
+        Pagamento, Pagamento.pedido_id == Pedido.id
+    ).group_by(Cliente.id, Cliente.pedidos_arquivados, Cliente.gasto_arquivado, Cliente.ultimo_pedido_arquivado_em)
+
+    if cliente_ids is not None:
+        query = query.where(Cliente.id.in_(cliente_ids))
+
+    dados = pd.read_sql(query, db.session.connection(), parse_dates=['primeira_compra', 'ultima_compra', 'ultimo_pedido_arquivado_em'])
+    dados['frequencia'] += dados.pop('pedidos_arquivados').fillna(0).astype(np.int64)
+    dados['valor_monetario'] += dados.pop('gasto_arquivado').fillna(0)
+    dados['ultima_compra'] = _escolher(dados['ultima_compra'], dados.pop('ultimo_pedido_arquivado_em'), maior=True)
+
+    if arquivo_necessario_pedidos():
+        arquivadas = _primeiras_compras_arquivadas(cliente_ids)
+        dados['primeira_compra'] = _escolher(dados['primeira_compra'], dados['cliente_id'].map(arquivadas['primeira_compra_arquivada']), maior=False)
+    return dados
+
+
+def _escolher(datas, outras, maior):
+    # Comparação elemento a elemento: min/max(axis=1) passa por float e perde os microssegundos.
+    trocar = datas.isna() | ((outras > datas) if maior else (outras < datas))
+    return outras.where(trocar & outras.notna(), datas)
+
+
+def _cortes(valores):
+    valores = valores[valores > 0]
+    if len(valores) == 0:
+        return np.zeros(len(QUANTIS))
+    return np.quantile(valores, QUANTIS)
+
+
+def _pontuar(valores, cortes, invertido=False):
+    # Pontua de 1 a 5 pelo quintil; 0 para quem nunca comprou.
+    pontos = np.searchsorted(cortes, valores, side='right') + 1
+    if invertido:
+        pontos = 6 - pontos
+    return np.where(np.isnan(valores) if invertido else valores <= 0, 0, pontos)
+
+
+def _segmentar(r, f):
+    condicoes = [
+        f == 0,
+        (r >= 4) & (f >= 4),
+        (r >= 3) & (f >= 4),
+        (r <= 2) & (f >= 3),
+        (r >= 4) & (f <= 1),
+        r <= 2,
+    ]
+    segmentos = ['sem_compras', 'campeoes', 'leais', 'em_risco', 'novos', 'hibernando']
+    return np.select(condicoes, segmentos, default='promissores')
+
+
+def calcular_metricas_clientes(cliente_ids=None):
+    """Calcula RFM e LTV em uma única passada vetorizada e grava em `metricas_cliente`.
+
+    Sem `cliente_ids` todos os clientes são recalculados; com `cliente_ids` só
+    esses são atualizados, usando os quintis da base já calculada para que as
+    pontuações continuem comparáveis. Retorna a quantidade de clientes gravados.
+    """
+    agora = datetime.now()
+    dados = _agregados_por_cliente(cliente_ids)
+    if dados.empty:
+        return 0
+
+    dados = dados.set_index('cliente_id')
+    if cliente_ids is not None:
+        # Os quintis vêm da base inteira; os clientes recalculados substituem seus valores antigos.
+        base = pd.read_sql(
+            select(MetricaCliente.cliente_id, MetricaCliente.frequencia, MetricaCliente.valor_monetario, MetricaCliente.ultima_compra),
+            db.session.connection(), index_col='cliente_id', parse_dates=['ultima_compra']
+        )
+        base = base.drop(index=dados.index, errors='ignore')
+        referencia = pd.concat([base, dados[['frequencia', 'valor_monetario', 'ultima_compra']]])
+    else:
+        referencia = dados
+
+    frequencia = dados['frequencia'].to_numpy(dtype=np.float64)
+    valor = dados['valor_monetario'].to_numpy(dtype=np.float64)
+    recencia = ((agora - dados['ultima_compra']).dt.days).to_numpy(dtype=np.float64)
+    recencia_referencia = ((agora - referencia['ultima_compra']).dt.days).to_numpy(dtype=np.float64)
+    recencia_referencia = recencia_referencia[~np.isnan(recencia_referencia)]
+
+    cortes_r = np.quantile(recencia_referencia, QUANTIS) if len(recencia_referencia) else np.zeros(len(QUANTIS))
+    pontuacao_r = _pontuar(recencia, cortes_r, invertido=True)
+    pontuacao_f = _pontuar(frequencia, _cortes(referencia['frequencia'].to_numpy(dtype=np.float64)))
+    pontuacao_m = _pontuar(valor, _cortes(referencia['valor_monetario'].to_numpy(dtype=np.float64)))
+
+    ticket_medio = np.divide(valor, frequencia, out=np.zeros_like(valor), where=frequencia > 0)
+    anos_ativo = ((dados['ultima_compra'] - dados['primeira_compra']).dt.days).to_numpy(dtype=np.float64) / 365.25
+    anos_ativo = np.maximum(np.nan_to_num(anos_ativo), 1 / 12)
+    compras_por_ano = frequencia / anos_ativo
+    horizonte = current_app.config.get('LTV_HORIZONTE_ANOS', 3)
+    ltv = np.round(valor + ticket_medio * compras_por_ano * horizonte, 2)
+
+    segmento = _segmentar(pontuacao_r, pontuacao_f)
+
+    linhas = pd.DataFrame({
+        'cliente_id': dados.index.to_numpy(),
+        'recencia_dias': recencia,
+        'frequencia': frequencia.astype(np.int64),
+        'valor_monetario': np.round(valor, 2),
+        'ticket_medio': np.round(ticket_medio, 2),
+        'ltv': ltv,
+        'primeira_compra': dados['primeira_compra'].to_numpy(),
+        'ultima_compra': dados['ultima_compra'].to_numpy(),
+        'pontuacao_r': pontuacao_r.astype(np.int64),
+        'pontuacao_f': pontuacao_f.astype(np.int64),
+        'pontuacao_m': pontuacao_m.astype(np.int64),
+        'segmento': segmento,
+        'calculado_em': agora,
+    })
+    registros = linhas.astype(object).where(linhas.notna(), None).to_dict('records')
+    for registro in registros:
+        if registro['recencia_dias'] is not None:
+            registro['recencia_dias'] = int(registro['recencia_dias'])
+        for campo in ('primeira_compra', 'ultima_compra'):
+            if registro[campo] is not None:
+                registro[campo] = pd.Timestamp(registro[campo]).to_pydatetime()
+
+    tabela = MetricaCliente.__table__
+    if cliente_ids is None:
+        db.session.execute(tabela.delete())
+    else:
+        db.session.execute(tabela.delete().where(tabela.c.cliente_id.in_(dados.index.tolist())))
+    db.session.execute(tabela.insert(), registros)
+    db.session.commit()
+    return len(registros)
+
+
+def clientes_com_atividade_desde(marca):
+    pedidos_alterados = select(Pedido.cliente_id).where(Pedido.atualizado_em > marca)
+    pagamentos_alterados = select(Pedido.cliente_id).join(Pagamento, Pagamento.pedido_id == Pedido.id).where(Pagamento.atualizado_em > marca)
+    clientes_novos = select(Cliente.id).where(Cliente.criado_em > marca)
+    return [linha[0] for linha in db.session.execute(union(pedidos_alterados, pagamentos_alterados, clientes_novos)).all()]
+
+
+def atualizar_metricas_incrementais():
+    """Recalcula apenas os clientes com pedidos ou pagamentos desde o último cálculo."""
+    marca = db.session.query(func.max(MetricaCliente.calculado_em)).scalar()
+    if marca is None:
+        return calcular_metricas_clientes()
+
+    cliente_ids = clientes_com_atividade_desde(marca)
+    if not cliente_ids:
+        return 0
+    return calcular_metricas_clientes(cliente_ids)
@@ -1,78 +1,384 @@
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from apscheduler.events import EVENT_JOB_MISSED, EVENT_JOB_MAX_INSTANCES
 from flask import current_app 
+from sqlalchemy import func
 from backend.controllers.relatorios import calcular_metricas_semanais
 from backend.models.pedido import Pedido
 from backend.models.cliente import Cliente
+from backend.models.evento import EventoOutbox
+from backend.models.execucao_job import ExecucaoJob
+from backend.models.database import db
+from backend.services.exportacao_colunar import exportar_analytics
+from backend.services.rfm import calcular_metricas_clientes, atualizar_metricas_incrementais
+from backend.services.contadores import verificar_contadores
+from backend.services.arquivamento import arquivar_pedidos
+from backend.services.notificacoes import enfileirar_notificacoes, despachar_notificacoes
+from backend.services.manutencao_sqlite import otimizar_bancos_sqlite, fazer_backup_sqlite
+from backend.services.deduplicacao_clientes import mesclar_clientes_duplicados
+from backend.models.usuario import Usuario
 from backend.config import Config
 from datetime import datetime, timedelta
 import os
 import atexit
 import decimal
 import functools
+import time
 
 scheduler = BackgroundScheduler()
 
+# Os jobs ficam no banco e precisam ser serializáveis: guardamos só o id da tarefa
+# e a aplicação Flask fica aqui, definida em start_scheduler.
+_app = None
 
-def enviar_relatorio_semanal_agendado(app): 
-    with app.app_context():
-        print("Executando tarefa agendada: Envio de Relatório Semanal...")
-        
+
+def enviar_relatorio_semanal_agendado():
+    print("Executando tarefa agendada: Envio de Relatório Semanal...")
+
+    metricas = calcular_metricas_semanais()
+    servicos = "\n".join(f"- {servico}: {contagem} vendas" for servico, contagem in metricas['servicos_mais_vendidos']) or "Nenhum serviço vendido nesta semana."
+    conteudo = (
+        f"Período: {metricas['data_inicio']} a {metricas['data_fim']}\n"
+        f"Total de Vendas: R$ {metricas['total_vendas']}\n"
+        f"Clientes Atendidos: {metricas['clientes_atendidos_count']}\n"
+        f"Lucro Estimado: R$ {metricas['lucro_estimado']}\n\n"
+        f"Serviços Mais Vendidos:\n{servicos}"
+    )
+
+    destinos = db.session.query(Usuario.report_email).filter(Usuario.report_email.isnot(None)).all()
+    enfileiradas = enfileirar_notificacoes([{
+        'canal': 'email',
+        'destino': report_email,
+        'assunto': f"Relatório Semanal {metricas['data_inicio']} a {metricas['data_fim']}",
+        'conteudo': conteudo,
+        'chave': f"relatorio:{metricas['data_inicio']}:{report_email}"
+    } for (report_email,) in destinos])
+    enviadas, falhas = despachar_notificacoes()
+    print(f"Relatório semanal: {enfileiradas} e-mail(s) enfileirado(s), {enviadas} enviado(s), {falhas} falha(s).")
+    return enfileiradas
+
+
+def enviar_lembretes_pagamento():
+    print("Executando tarefa agendada: Envio de Lembretes de Pagamento...")
+
+    dias_limite_lembrete = 3
+    data_limite = datetime.now() - timedelta(days=dias_limite_lembrete)
+    hoje = datetime.now().strftime('%Y-%m-%d')
+
+    pedidos_pendentes_para_lembrete = db.session.query(
+        Pedido.id, Pedido.servicos, Pedido.valor_total, Cliente.nome, Cliente.telefone, Cliente.email
+    ).join(Cliente, Cliente.id == Pedido.cliente_id).filter(
+        Pedido.status == 'pendente',
+        Pedido.data_pedido <= data_limite,
+        Cliente.excluido_em.is_(None)
+    ).all()
+
+    notificacoes = []
+    for pedido_id, servicos, valor_total, nome, telefone, email in pedidos_pendentes_para_lembrete:
+        conteudo = f"Olá, {nome}! Lembramos que o pedido {pedido_id} ({servicos[:60]}) no valor de R$ {valor_total:.2f} está aguardando pagamento."
+        if telefone:
+            notificacoes.append({'canal': 'whatsapp', 'destino': telefone, 'conteudo': conteudo, 'chave': f"lembrete:whatsapp:{pedido_id}:{hoje}"})
+        if email:
+            notificacoes.append({'canal': 'email', 'destino': email, 'assunto': 'Lembrete de pagamento', 'conteudo': conteudo, 'chave': f"lembrete:email:{pedido_id}:{hoje}"})
+
+    enfileiradas = enfileirar_notificacoes(notificacoes)
+    enviadas, falhas = despachar_notificacoes()
+    print(f"Lembretes de pagamento: {enfileiradas} enfileirado(s), {enviadas} enviado(s), {falhas} falha(s).")
+    return enfileiradas
+
+
+def despachar_notificacoes_agendado():
+    enviadas, falhas = despachar_notificacoes()
+    if enviadas or falhas:
+        print(f"Notificações: {enviadas} enviada(s), {falhas} falha(s).")
+    return enviadas + falhas
+
+
+def limpar_eventos_outbox():
+    dias_retencao = current_app.config.get('OUTBOX_RETENTION_DAYS', 7)
+    data_limite = datetime.now() - timedelta(days=dias_retencao)
+
+    removidos = EventoOutbox.query.filter(EventoOutbox.criado_em < data_limite).delete(synchronize_session=False)
+    db.session.commit()
+    print(f"Limpeza do outbox de eventos: {removidos} eventos removidos.")
+    return removidos
+
+
+def limpar_historico_jobs():
+    dias_retencao = current_app.config.get('JOB_RUNS_RETENTION_DAYS', 30)
+    data_limite = datetime.now() - timedelta(days=dias_retencao)
+
+    removidas = ExecucaoJob.query.filter(ExecucaoJob.inicio < data_limite).delete(synchronize_session=False)
+    db.session.commit()
+    print(f"Limpeza do histórico de jobs: {removidas} execuções removidas.")
+    return removidas
+
+
+def exportar_analytics_agendado():
+    print("Executando tarefa agendada: Exportação analítica incremental...")
+
+    arquivos = exportar_analytics(formato=current_app.config.get('ANALYTICS_EXPORT_FORMAT', 'parquet'))
+    print(f"Exportação analítica concluída: {len(arquivos)} arquivo(s) escrito(s).")
+    return len(arquivos)
+
+
+def recalcular_metricas_clientes(incremental=True):
+    if incremental:
+        atualizados = atualizar_metricas_incrementais()
+    else:
+        atualizados = calcular_metricas_clientes()
+    if atualizados:
+        print(f"Métricas RFM/LTV atualizadas para {atualizados} cliente(s).")
+    return atualizados
+
+
+def verificar_contadores_clientes():
+    divergentes = verificar_contadores(reparar=True)
+    if divergentes:
+        print(f"Contadores de {len(divergentes)} cliente(s) estavam divergentes e foram corrigidos.")
+    return len(divergentes)
+
+
+def arquivar_pedidos_agendado():
+    print("Executando tarefa agendada: Arquivamento de pedidos encerrados...")
+
+    arquivados = arquivar_pedidos()
+    print(f"Arquivamento concluído: {arquivados} pedido(s) movido(s) para o arquivo.")
+    return arquivados
+
+
+def otimizar_bancos_agendado():
+    print("Executando tarefa agendada: Manutenção dos bancos SQLite...")
+    return otimizar_bancos_sqlite()
+
+
+def backup_bancos_agendado():
+    return len(fazer_backup_sqlite())
+
+
+def mesclar_clientes_duplicados_agendado():
+    grupos = mesclar_clientes_duplicados()
+    mesclados = sum(len(duplicados) for duplicados in grupos.values())
+    if mesclados:
+        print(f"Deduplicação de clientes: {mesclados} cadastro(s) mesclado(s) em {len(grupos)} cliente(s).")
+    return mesclados
+
+
+# id do job -> função executada. Cada função devolve quantas linhas processou.
+TAREFAS = {
+    'relatorio_semanal': enviar_relatorio_semanal_agendado,
+    'lembretes_pagamento': enviar_lembretes_pagamento,
+    'despacho_notificacoes': despachar_notificacoes_agendado,
+    'limpeza_outbox': limpar_eventos_outbox,
+    'limpeza_historico_jobs': limpar_historico_jobs,
+    'metricas_clientes_completo': functools.partial(recalcular_metricas_clientes, incremental=False),
+    'metricas_clientes_incremental': recalcular_metricas_clientes,
+    'verificacao_contadores': verificar_contadores_clientes,
+    'arquivamento_pedidos': arquivar_pedidos_agendado,
+    'exportacao_analytics': exportar_analytics_agendado,
+    'manutencao_sqlite': otimizar_bancos_agendado,
+    'backup_sqlite': backup_bancos_agendado,
+    'deduplicacao_clientes': mesclar_clientes_duplicados_agendado,
+}
+
+
+def _finalizar_execucao(execucao_id, status, linhas=None, erro=None, inicio_monotonic=None):
+    execucao = db.session.get(ExecucaoJob, execucao_id)
+    execucao.status = status
+    execucao.fim = datetime.now()
+    execucao.duracao_ms = int((time.monotonic() - inicio_monotonic) * 1000) if inicio_monotonic is not None else None
+    execucao.linhas_processadas = linhas
+    execucao.erro = erro
+    db.session.commit()
+
+
+def executar_job(job_id):
+    """Ponto de entrada de todos os jobs: executa a tarefa e registra a execução em job_runs."""
+    with _app.app_context():
         try:
-            metricas = calcular_metricas_semanais()
+            execucao = ExecucaoJob(job_id=job_id, status='executando', inicio=datetime.now())
+            db.session.add(execucao)
+            db.session.commit()
+            execucao_id = execucao.id
+            inicio = time.monotonic()
 
-            print("Envio agendado de relatório por e-mail foi desativado. Relatório gerado no sistema CLI.")
+            try:
+                linhas = TAREFAS[job_id]()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Erro na tarefa agendada '{job_id}': {e}")
+                _finalizar_execucao(execucao_id, 'erro', erro=str(e), inicio_monotonic=inicio)
+                return
 
+            _finalizar_execucao(execucao_id, 'sucesso', linhas=linhas, inicio_monotonic=inicio)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Erro ao registrar execução do job '{job_id}': {e}")
+        finally:
+            db.session.remove()
+
+
+def _registrar_execucao_nao_realizada(evento):
+    if evento.code == EVENT_JOB_MISSED:
+        status, agendado_para = 'perdido', evento.scheduled_run_time
+    else:
+        status, agendado_para = 'ignorado', min(evento.scheduled_run_times, default=None)
+
+    with _app.app_context():
+        try:
+            agora = datetime.now()
+            db.session.add(ExecucaoJob(
+                job_id=evento.job_id,
+                status=status,
+                agendado_para=agendado_para.replace(tzinfo=None) if agendado_para else None,
+                inicio=agora,
+                fim=agora,
+                duracao_ms=0,
+                linhas_processadas=0
+            ))
+            db.session.commit()
+            print(f"Job '{evento.job_id}' não executado ({status}), previsto para {agendado_para}.")
         except Exception as e:
-            print(f"Erro geral ao enviar relatório semanal agendado: {e}")
+            db.session.rollback()
+            print(f"Erro ao registrar job não executado '{evento.job_id}': {e}")
         finally:
-            pass
+            db.session.remove()
+
+
+def _agendar(job_id, trigger):
+    existente = scheduler.get_job(job_id)
+    # Recriar o job recalcularia a próxima execução e descartaria execuções perdidas
+    # enquanto a aplicação estava parada; só substitui quando o gatilho mudou.
+    if existente is not None and str(existente.trigger) == str(trigger):
+        return
+    scheduler.add_job(
+        func='backend.services.scheduler:executar_job',
+        args=[job_id],
+        trigger=trigger,
+        id=job_id,
+        replace_existing=True,
+        max_instances=1
+    )
+
+
+def _remover_se_agendado(job_id):
+    # O job store é persistente: um job desativado na configuração continuaria lá.
+    if scheduler.get_job(job_id):
+        scheduler.remove_job(job_id)
+
 
+def _jobs_agendados():
+    if scheduler.running:
+        return scheduler.get_jobs()
+    # Processo sem scheduler (CLI, workers da API): lê os jobs direto do job store.
+    url_job_store = current_app.config.get('SCHEDULER_JOBSTORE_URL')
+    job_store = SQLAlchemyJobStore(url=url_job_store, tablename='apscheduler_jobs') if url_job_store else SQLAlchemyJobStore(engine=db.engine, tablename='apscheduler_jobs')
+    job_store.start(scheduler, 'default')
+    try:
+        return job_store.get_all_jobs()
+    finally:
+        if url_job_store:
+            job_store.shutdown()
 
-def enviar_lembretes_pagamento(app):
-    with app.app_context():
-        print("Executando tarefa agendada: Envio de Lembretes de Pagamento...")
-        
-        dias_limite_lembrete = 3
-        data_limite = datetime.now() - timedelta(days=dias_limite_lembrete)
 
-        pedidos_pendentes_para_lembrete = Pedido.query.filter(
-            Pedido.status == 'pendente',
-            Pedido.data_pedido <= data_limite
-        ).all()
+def listar_jobs():
+    """Jobs agendados com a próxima execução e o resultado da última."""
+    ultimas = db.session.query(
+        ExecucaoJob.job_id, func.max(ExecucaoJob.id).label('ultimo_id')
+    ).group_by(ExecucaoJob.job_id).subquery()
+    ultimas_execucoes = {
+        execucao.job_id: execucao
+        for execucao in ExecucaoJob.query.join(ultimas, ExecucaoJob.id == ultimas.c.ultimo_id).all()
+    }
 
-        for pedido in pedidos_pendentes_para_lembrete:
-            cliente = Cliente.query.get(pedido.cliente_id)
-            if cliente and cliente.telefone:
-                print(f"Lembrete para o pedido {pedido.id} não enviado (sem integração WhatsApp ou sem telefone).")
-            else:
-                print(f"Nenhum método de lembrete configurado para o pedido {pedido.id}.")
+    jobs = []
+    for job in _jobs_agendados():
+        ultima = ultimas_execucoes.get(job.id)
+        jobs.append({
+            'id': job.id,
+            'gatilho': str(job.trigger),
+            'proxima_execucao': job.next_run_time.isoformat() if job.next_run_time else None,
+            'ultima_execucao': {
+                'status': ultima.status,
+                'inicio': ultima.inicio.isoformat(),
+                'duracao_ms': ultima.duracao_ms,
+                'linhas_processadas': ultima.linhas_processadas,
+                'erro': ultima.erro
+            } if ultima else None
+        })
+    return jobs
 
 
 def start_scheduler(app_instance):
-    global scheduler
+    global scheduler, _app
+    _app = app_instance
     if not scheduler.running:
+        url_job_store = app_instance.config.get('SCHEDULER_JOBSTORE_URL')
+        if not url_job_store:
+            # A URL do engine já vem resolvida pelo Flask-SQLAlchemy (SQLite relativo fica em instance/).
+            with app_instance.app_context():
+                url_job_store = db.engine.url.render_as_string(hide_password=False)
+        scheduler.configure(
+            jobstores={'default': SQLAlchemyJobStore(url=url_job_store, tablename='apscheduler_jobs')},
+            job_defaults={
+                # Execuções perdidas (app parado, por exemplo) rodam uma única vez ao voltar.
+                'coalesce': True,
+                'misfire_grace_time': app_instance.config.get('SCHEDULER_MISFIRE_GRACE_SECONDS', 3600)
+            }
+        )
+        # O scheduler é do módulo e pode ser reiniciado (vários create_app no processo): um listener só.
+        scheduler.remove_listener(_registrar_execucao_nao_realizada)
+        scheduler.add_listener(_registrar_execucao_nao_realizada, EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES)
         scheduler.start()
     
     
-    scheduler.add_job(
-        func=functools.partial(enviar_relatorio_semanal_agendado, app_instance),
-        trigger=CronTrigger(day_of_week='mon', hour=9, minute='0'),
-        id='relatorio_semanal',
-        replace_existing=True,
-        max_instances=1
-    )
+    _agendar('relatorio_semanal', CronTrigger(day_of_week='mon', hour=9, minute='0'))
     print("Job de Relatório Semanal agendado para toda segunda-feira às 09:00.")
 
-    scheduler.add_job(
-        func=functools.partial(enviar_lembretes_pagamento, app_instance),
-        trigger=CronTrigger(hour=10, minute='0'),
-        id='lembretes_pagamento',
-        replace_existing=True,
-        max_instances=1
-    )
+    _agendar('lembretes_pagamento', CronTrigger(hour=10, minute='0'))
     print("Job de Lembretes de Pagamento agendado para todo dia às 10:00.")
 
+    _agendar('despacho_notificacoes', IntervalTrigger(minutes=1))
+    print("Job de Despacho de Notificações (novas tentativas) agendado a cada minuto.")
+
+    _agendar('limpeza_outbox', CronTrigger(hour=3, minute='0'))
+    print("Job de Limpeza do Outbox de Eventos agendado para todo dia às 03:00.")
+
+    _agendar('limpeza_historico_jobs', CronTrigger(hour=3, minute='15'))
+    print("Job de Limpeza do Histórico de Jobs agendado para todo dia às 03:15.")
+
+    _agendar('metricas_clientes_completo', CronTrigger(hour=1, minute='0'))
+    _agendar('metricas_clientes_incremental', IntervalTrigger(minutes=app_instance.config.get('RFM_INTERVALO_MINUTOS', 15)))
+    print("Jobs de Métricas RFM/LTV agendados (completo às 01:00, incremental periódico).")
+
+    _agendar('verificacao_contadores', CronTrigger(hour=4, minute='0'))
+    print("Job de Verificação dos Contadores de Clientes agendado para todo dia às 04:00.")
+
+    _agendar('deduplicacao_clientes', CronTrigger(hour=4, minute='30'))
+    print("Job de Deduplicação de Clientes por telefone agendado para todo dia às 04:30.")
+
+    if app_instance.config.get('ARCHIVE_ENABLED'):
+        _agendar('arquivamento_pedidos', CronTrigger(hour=0, minute='30'))
+        print("Job de Arquivamento de Pedidos agendado para todo dia às 00:30.")
+    else:
+        _remover_se_agendado('arquivamento_pedidos')
+
+    if app_instance.config.get('ANALYTICS_EXPORT_ENABLED'):
+        _agendar('exportacao_analytics', CronTrigger(hour=2, minute='0'))
+        print("Job de Exportação Analítica agendado para todo dia às 02:00.")
+    else:
+        _remover_se_agendado('exportacao_analytics')
+
+    if app_instance.config.get('SQLITE_MAINTENANCE_ENABLED'):
+        _agendar('manutencao_sqlite', CronTrigger(hour=3, minute='30'))
+        _agendar('backup_sqlite', IntervalTrigger(hours=app_instance.config.get('SQLITE_BACKUP_INTERVAL_HOURS', 6)))
+        print("Jobs de Manutenção do SQLite agendados (otimização às 03:30, backup periódico).")
+    else:
+        _remover_se_agendado('manutencao_sqlite')
+        _remover_se_agendado('backup_sqlite')
+
 def stop_scheduler():
     if scheduler.running:
         scheduler.shutdown()
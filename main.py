@@ -4,24 +4,71 @@ from datetime import datetime, timedelta, date
 import decimal
 import csv
 import re
+from collections import OrderedDict
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
 
+# A CLI não roda os jobs agendados: eles ficam com a API ou com `python -m backend.agendador`.
+os.environ.setdefault('SCHEDULER_ENABLED', 'false')
 
 from backend.app import app
 from backend.models.database import db
 from backend.models.usuario import Usuario
-from backend.models.cliente import Cliente, AnotacaoCliente
+from backend.models.cliente import Cliente, AnotacaoCliente, comeca_com
 from backend.models.pedido import Pedido
 from backend.models.pagamento import Pagamento
 from backend.config import Config
-from backend.controllers.relatorios import calcular_metricas_semanais
+from backend.controllers.relatorios import calcular_metricas_semanais, calcular_contas_a_receber, contas_a_receber_csv
+from backend.services.exportacao_colunar import exportar_analytics
+from backend.services.contadores import atualizar_contadores_clientes
+from backend.services.exclusao_clientes import excluir_cliente
+from backend.services.recibos import dados_recibo, renderizar_recibos
+from backend.services.conciliacao import conciliar_extrato, aplicar_conciliacao
+from backend.services.scheduler import listar_jobs
+from backend.services.manutencao_sqlite import bancos_sem_vacuum_incremental, converter_para_vacuum_incremental
+from backend.controllers.jobs import listar_execucoes
+from backend.services.concorrencia import salvar_com_nova_tentativa
 from werkzeug.security import check_password_hash
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
 
 
 _logged_in_user = None 
 
+TAMANHO_PAGINA = 20
+
+
+class CacheLRU:
+    def __init__(self, capacidade=50):
+        self.capacidade = capacidade
+        self._itens = OrderedDict()
+
+    def get(self, chave):
+        if chave not in self._itens:
+            return None
+        self._itens.move_to_end(chave)
+        return self._itens[chave]
+
+    def put(self, chave, valor):
+        self._itens[chave] = valor
+        self._itens.move_to_end(chave)
+        if len(self._itens) > self.capacidade:
+            self._itens.popitem(last=False)
+
+    def discard(self, chave):
+        self._itens.pop(chave, None)
+
+    def discard_if(self, predicado):
+        for chave in [chave for chave, valor in self._itens.items() if predicado(valor)]:
+            del self._itens[chave]
+
+    def recentes(self, limite=5):
+        return list(reversed(self._itens.values()))[:limite]
+
+
+_clientes_recentes = CacheLRU()
+_pedidos_recentes = CacheLRU()
+
 
 def clear_screen():
    os.system('cls' if os.name == 'nt' else 'clear')
@@ -55,6 +102,155 @@ def get_input(prompt, type=str, optional=False, default=None):
             print(f"Entrada inválida. Por favor, insira um(a) {type.__name__} válido(a).")
 
 
+def _lembrar_cliente(cliente):
+    _clientes_recentes.put(cliente.id, (cliente.id, cliente.nome, cliente.telefone))
+
+def _lembrar_pedido(pedido):
+    cliente_nome = pedido.cliente.nome if pedido.cliente else 'N/A'
+    _pedidos_recentes.put(pedido.id, (pedido.id, cliente_nome, pedido.servicos, pedido.valor_total, pedido.status, pedido.cliente_id))
+
+def _esquecer_cliente(cliente_id):
+    # Os pedidos lembrados guardam o nome do cliente: saem junto.
+    _clientes_recentes.discard(cliente_id)
+    _pedidos_recentes.discard_if(lambda pedido: pedido[5] == cliente_id)
+
+def _alteracoes(registro, novos_valores):
+    return {campo: valor for campo, valor in novos_valores.items() if valor != getattr(registro, campo)}
+
+def _aplicar_alteracoes(registro, alteracoes):
+    for campo, valor in alteracoes.items():
+        setattr(registro, campo, valor)
+
+def _avisar_edicao_concorrente(registro, versao_exibida, descricao):
+    # Cada commit incrementa a versão uma vez; mais que isso, houve outra gravação durante a edição.
+    if registro.versao > versao_exibida + 1:
+        print(f"Aviso: {descricao} foi alterado em outra sessão durante a edição; só os campos que você mudou foram gravados sobre a versão mais recente.")
+
+def navegar_paginas(buscar_pagina, exibir_pagina, permitir_escolha=False):
+    """Mostra uma página por vez usando paginação por cursor (id).
+
+    `buscar_pagina(termo, cursor, limite)` devolve no máximo `limite` linhas
+    cuja primeira coluna é o id. Retorna o id escolhido ou None.
+    """
+    termo = None
+    cursores = [None]
+
+    while True:
+        linhas = buscar_pagina(termo, cursores[-1], TAMANHO_PAGINA + 1)
+        tem_proxima = len(linhas) > TAMANHO_PAGINA
+        linhas = linhas[:TAMANHO_PAGINA]
+
+        if linhas:
+            exibir_pagina(linhas)
+        else:
+            print("Nenhum registro encontrado.")
+        print(f"\nPágina {len(cursores)}" + (f" | Busca: '{termo}'" if termo else "") + ("" if tem_proxima else " | Última página"))
+
+        opcoes = "[Enter] próxima | p anterior | /texto buscar"
+        if permitir_escolha:
+            opcoes += " | ID para escolher"
+        comando = input(f"{opcoes} | 0 sair: ").strip()
+
+        if comando in ('', 'n'):
+            if tem_proxima:
+                cursores.append(linhas[-1][0])
+            else:
+                print("Não há mais páginas.")
+        elif comando == 'p':
+            if len(cursores) > 1:
+                cursores.pop()
+        elif comando.startswith('/'):
+            termo = comando[1:].strip() or None
+            cursores = [None]
+        elif comando == '0':
+            return None
+        elif permitir_escolha and comando.isdigit():
+            return int(comando)
+        else:
+            print("Opção inválida.")
+
+def _pagina_clientes(termo, cursor, limite):
+    query = db.session.query(Cliente.id, Cliente.nome, Cliente.telefone, Cliente.email).filter(Cliente.excluido_em.is_(None))
+    if termo:
+        query = query.filter(
+            comeca_com(Cliente.nome, termo) |
+            comeca_com(Cliente.telefone, termo, ignorar_caixa=False) |
+            comeca_com(Cliente.email, termo)
+        )
+    if cursor:
+        query = query.filter(Cliente.id > cursor)
+    return query.order_by(Cliente.id.asc()).limit(limite).all()
+
+def _exibir_clientes(clientes):
+    print("\n{:<5} {:<25} {:<15} {:<25}".format("ID", "Nome", "Telefone", "Email"))
+    print("-" * 70)
+    for cliente_id, nome, telefone, email in clientes:
+        print(f"{cliente_id:<5} {nome:<25} {telefone:<15} {email or 'N/A':<25}")
+
+def _buscar_pagina_pedidos(status=None, cliente_id=None):
+    def buscar(termo, cursor, limite):
+        query = db.session.query(
+            Pedido.id, Cliente.nome, Pedido.servicos, Pedido.valor_total,
+            Pedido.status, Pedido.data_pedido, Pedido.data_entrega
+        ).outerjoin(Cliente, Cliente.id == Pedido.cliente_id)
+        if status:
+            query = query.filter(Pedido.status == status)
+        if cliente_id:
+            query = query.filter(Pedido.cliente_id == cliente_id)
+        if termo:
+            query = query.filter(comeca_com(Cliente.nome, termo))
+        if cursor:
+            query = query.filter(Pedido.id < cursor)
+        return query.order_by(Pedido.id.desc()).limit(limite).all()
+    return buscar
+
+def _exibir_pedidos(pedidos):
+    print("\n{:<5} {:<25} {:<25} {:<10} {:<12} {:<12} {:<15} {:<15}".format("ID", "Cliente", "Serviços", "Valor", "Status", "Dt. Pedido", "Dt. Entrega", "Dias Rest."))
+    print("-" * 125)
+    hoje = datetime.now().date()
+    for pedido_id, cliente_nome, servicos, valor_total, status, data_pedido, data_entrega in pedidos:
+        dias_restantes = (data_entrega.date() - hoje).days if data_entrega and status not in ['entregue', 'cancelado'] else 'N/A'
+        print(f"{pedido_id:<5} {cliente_nome or 'N/A':<25} {servicos[:22]:<25} R${valor_total:<8.2f} {status:<12} {data_pedido.strftime('%d/%m/%Y'):<12} {data_entrega.strftime('%d/%m/%Y') if data_entrega else 'N/A':<15} {str(dias_restantes):<15}")
+
+def escolher_cliente_cli():
+    recentes = _clientes_recentes.recentes()
+    if recentes:
+        print("Clientes usados recentemente:")
+        for cliente_id, nome, telefone in recentes:
+            print(f"ID: {cliente_id}, Nome: {nome}, Telefone: {telefone}")
+
+    cliente_id = navegar_paginas(_pagina_clientes, _exibir_clientes, permitir_escolha=True)
+    if cliente_id is None:
+        return None
+
+    cliente = db.session.get(Cliente, cliente_id)
+    if not cliente or cliente.excluido_em:
+        _clientes_recentes.discard(cliente_id)
+        print("Cliente não encontrado.")
+        return None
+    _lembrar_cliente(cliente)
+    return cliente
+
+def escolher_pedido_cli(status=None):
+    recentes = [p for p in _pedidos_recentes.recentes() if not status or p[4] == status]
+    if recentes:
+        print("Pedidos usados recentemente:")
+        for pedido_id, cliente_nome, servicos, valor_total, pedido_status, _ in recentes:
+            print(f"ID: {pedido_id}, Cliente: {cliente_nome}, Serviços: {servicos[:30]}..., Valor: R${valor_total:.2f}")
+
+    pedido_id = navegar_paginas(_buscar_pagina_pedidos(status=status), _exibir_pedidos, permitir_escolha=True)
+    if pedido_id is None:
+        return None
+
+    pedido = db.session.get(Pedido, pedido_id)
+    if not pedido:
+        _pedidos_recentes.discard(pedido_id)
+        print("Pedido não encontrado.")
+        return None
+    _lembrar_pedido(pedido)
+    return pedido
+
+
 def login_cli():
     global _logged_in_user
     print("\n--- Login ---")
@@ -113,31 +309,18 @@ def logout_user_cli():
 def list_clientes_cli():
     with app.app_context():
         print("\n--- Lista de Clientes ---")
-        search_term = get_input("Termo de busca (nome/telefone/email, opcional): ", optional=True)
-        
-        clientes_query = db.session.query(Cliente)
-        if search_term:
-            clientes_query = clientes_query.filter(
-                (Cliente.nome.ilike(f'%{search_term}%')) |
-                (Cliente.telefone.ilike(f'%{search_term}%')) |
-                (Cliente.email.ilike(f'%{search_term}%'))
-            )
-        
-        clientes = clientes_query.all()
-        if not clientes:
-            print("Nenhum cliente encontrado.")
-            return
-        
-        print("\n{:<5} {:<25} {:<15} {:<25}".format("ID", "Nome", "Telefone", "Email"))
-        print("-" * 70)
-        for cliente in clientes:
-            print(f"{cliente.id:<5} {cliente.nome:<25} {cliente.telefone:<15} {cliente.email or 'N/A':<25}")
+        print("Use /texto para buscar pelo início do nome, telefone ou e-mail.")
+        navegar_paginas(_pagina_clientes, _exibir_clientes)
 
 def add_cliente_cli():
     with app.app_context():
         print("\n--- Adicionar Novo Cliente ---")
         nome = get_input("Nome: ")
         telefone = get_input("Telefone: ")
+        existente = Cliente.telefone_em_uso(telefone)
+        if existente:
+            print(f"Erro: Telefone já cadastrado para o cliente '{existente.nome}' (ID: {existente.id}).")
+            return
         email = get_input("E-mail (opcional): ", optional=True)
         endereco = get_input("Endereço (opcional): ", optional=True)
         preferencias = get_input("Preferências/Observações (opcional): ", optional=True)
@@ -163,6 +346,7 @@ def view_cliente_details_cli():
         if not cliente:
             print("Cliente não encontrado.")
             return
+        _lembrar_cliente(cliente)
 
         print(f"\n--- Detalhes do Cliente ID: {cliente.id} ---")
         print(f"Nome: {cliente.nome}")
@@ -213,16 +397,33 @@ def update_cliente_cli():
 
         print(f"\nAtualizando Cliente: {cliente.nome}")
         print("Deixe em branco para manter o valor atual.")
+        versao_exibida = cliente.versao
         
-        cliente.nome = get_input(f"Nome ({cliente.nome}): ", optional=True, default=cliente.nome)
-        cliente.telefone = get_input(f"Telefone ({cliente.telefone}): ", optional=True, default=cliente.telefone)
-        cliente.email = get_input(f"E-mail ({cliente.email or 'N/A'}): ", optional=True, default=cliente.email)
-        cliente.endereco = get_input(f"Endereço ({cliente.endereco or 'N/A'}): ", optional=True, default=cliente.endereco)
-        cliente.preferencias = get_input(f"Preferências ({cliente.preferencias or 'N/A'}): ", optional=True, default=cliente.preferencias)
+        nome = get_input(f"Nome ({cliente.nome}): ", optional=True, default=cliente.nome)
+        telefone = get_input(f"Telefone ({cliente.telefone}): ", optional=True, default=cliente.telefone)
+        if Cliente.telefone_em_uso(telefone, ignorar_id=cliente.id):
+            print("Erro: Telefone já cadastrado para outro cliente.")
+            return
+        email = get_input(f"E-mail ({cliente.email or 'N/A'}): ", optional=True, default=cliente.email)
+        endereco = get_input(f"Endereço ({cliente.endereco or 'N/A'}): ", optional=True, default=cliente.endereco)
+        preferencias = get_input(f"Preferências ({cliente.preferencias or 'N/A'}): ", optional=True, default=cliente.preferencias)
+
+        alteracoes = _alteracoes(cliente, {'nome': nome, 'telefone': telefone, 'email': email, 'endereco': endereco, 'preferencias': preferencias})
+        if not alteracoes:
+            print("Nenhuma alteração informada.")
+            return
 
         try:
-            db.session.commit()
+            cliente = salvar_com_nova_tentativa(Cliente, cliente_id, lambda registro: _aplicar_alteracoes(registro, alteracoes))
+            if cliente is None:
+                print("Cliente não encontrado: foi removido durante a edição.")
+                return
+            _esquecer_cliente(cliente.id)
+            _lembrar_cliente(cliente)
+            _avisar_edicao_concorrente(cliente, versao_exibida, 'o cliente')
             print("Cliente atualizado com sucesso!")
+        except StaleDataError:
+            print("Erro: o cliente está sendo alterado em outra sessão. Tente novamente em instantes.")
         except IntegrityError:
             db.session.rollback()
             print("Erro: Telefone ou e-mail já cadastrado para outro cliente.")
@@ -242,10 +443,14 @@ def delete_cliente_cli():
 
         confirm = get_input(f"Tem certeza que deseja deletar o cliente '{cliente.nome}' (ID: {cliente.id})? (s/n): ", default='n').lower()
         if confirm == 's':
+            soft = get_input("Apenas marcar como excluído, mantendo o histórico? (s/n): ", optional=True, default='n').lower() == 's'
             try:
-                db.session.delete(cliente) 
-                db.session.commit()
-                print("Cliente deletado com sucesso!")
+                removidos = excluir_cliente(cliente_id, soft=soft)
+                _esquecer_cliente(cliente_id)
+                if soft:
+                    print("Cliente marcado como excluído.")
+                else:
+                    print(f"Cliente deletado com sucesso! ({removidos.get('pedidos', 0)} pedidos, {removidos.get('pagamentos', 0)} pagamentos e {removidos.get('anotacoes', 0)} anotações removidos)")
             except Exception as e:
                 db.session.rollback()
                 print(f"Erro ao deletar cliente: {e}")
@@ -261,41 +466,22 @@ def list_pedidos_cli():
         
         cliente_id_filter = get_input("Filtrar por ID do Cliente (opcional): ", type=int, optional=True)
 
-        query = db.session.query(Pedido).order_by(Pedido.data_pedido.desc())
-        if status_filter:
-            query = query.filter_by(status=status_filter)
-        if cliente_id_filter:
-            query = query.filter_by(cliente_id=cliente_id_filter)
-        
-        pedidos = query.all()
-
-        if not pedidos:
-            print("Nenhum pedido encontrado com os filtros especificados.")
-            return
-        
-        print("\n{:<5} {:<25} {:<25} {:<10} {:<12} {:<12} {:<15} {:<15}".format("ID", "Cliente", "Serviços", "Valor", "Status", "Dt. Pedido", "Dt. Entrega", "Dias Rest."))
-        print("-" * 125)
-        for pedido in pedidos:
-            cliente_nome = pedido.cliente.nome if pedido.cliente else 'N/A' 
-            dias_restantes = (pedido.data_entrega.date() - datetime.now().date()).days if pedido.data_entrega and pedido.status not in ['entregue', 'cancelado'] else 'N/A'
-            print(f"{pedido.id:<5} {cliente_nome:<25} {pedido.servicos[:22]:<25} R${pedido.valor_total:<8.2f} {pedido.status:<12} {pedido.data_pedido.strftime('%d/%m/%Y'):<12} {pedido.data_entrega.strftime('%d/%m/%Y') if pedido.data_entrega else 'N/A':<15} {str(dias_restantes):<15}")
+        print("Use /texto para buscar pelo início do nome do cliente.")
+        navegar_paginas(_buscar_pagina_pedidos(status=status_filter, cliente_id=cliente_id_filter), _exibir_pedidos)
 
 def add_pedido_cli():
     with app.app_context():
         print("\n--- Adicionar Novo Pedido ---")
-        clientes = db.session.query(Cliente).all()
-        if not clientes:
+        if not db.session.query(Cliente.id).first():
             print("Nenhum cliente cadastrado. Por favor, adicione um cliente primeiro.")
             return
         
-        print("Clientes disponíveis:")
-        for c in clientes:
-            print(f"ID: {c.id}, Nome: {c.nome}")
-        cliente_id = get_input("ID do Cliente: ", type=int)
-        cliente = db.session.get(Cliente, cliente_id)
+        print("Escolha o cliente (digite o ID ou use /texto para buscar):")
+        cliente = escolher_cliente_cli()
         if not cliente:
-            print("Cliente não encontrado.")
+            print("Nenhum cliente selecionado.")
             return
+        cliente_id = cliente.id
 
         servicos = get_input("Descrição dos Serviços: ")
         valor_total = get_input("Valor Total: ", type=float)
@@ -316,6 +502,7 @@ def add_pedido_cli():
         try:
             new_pedido = Pedido(cliente_id=cliente_id, servicos=servicos, valor_total=valor_total, status=status, data_entrega=data_entrega)
             db.session.add(new_pedido)
+            atualizar_contadores_clientes(cliente_id)
             db.session.commit()
             print(f"Pedido para '{cliente.nome}' adicionado com sucesso! ID: {new_pedido.id}")
         except Exception as e:
@@ -331,6 +518,7 @@ def view_update_pedido_cli():
         if not pedido:
             print("Pedido não encontrado.")
             return
+        _lembrar_pedido(pedido)
 
         cliente_nome = pedido.cliente.nome if pedido.cliente else 'N/A'
         print(f"\n--- Detalhes do Pedido ID: {pedido.id} ---")
@@ -357,18 +545,36 @@ def view_update_pedido_cli():
             data_entrega = None
             if data_entrega_str:
                 try:
-                    data_entrega = datetime.strptime(data_entrega_str, '%Y-%m-%d').date()
+                    data_entrega = datetime.strptime(data_entrega_str, '%Y-%m-%d')
                 except ValueError:
                     print("Formato de data de entrega inválido. Mantendo o valor anterior.")
                     data_entrega = pedido.data_entrega
 
+            versao_exibida = pedido.versao
+
+            def aplicar(registro):
+                _aplicar_alteracoes(registro, alteracoes)
+                atualizar_contadores_clientes(registro.cliente_id)
+
             try:
-                pedido.servicos = servicos
-                pedido.valor_total = float(valor_total_str) if valor_total_str else pedido.valor_total
-                pedido.status = status
-                pedido.data_entrega = data_entrega
-                db.session.commit()
+                alteracoes = _alteracoes(pedido, {
+                    'servicos': servicos,
+                    'valor_total': float(valor_total_str) if valor_total_str else pedido.valor_total,
+                    'status': status,
+                    'data_entrega': data_entrega
+                })
+                if not alteracoes:
+                    print("Nenhuma alteração informada.")
+                    return
+                pedido = salvar_com_nova_tentativa(Pedido, pedido_id, aplicar)
+                if pedido is None:
+                    print("Pedido não encontrado: foi removido durante a edição.")
+                    return
+                _avisar_edicao_concorrente(pedido, versao_exibida, 'o pedido')
+                _lembrar_pedido(pedido)
                 print("Pedido atualizado com sucesso!")
+            except StaleDataError:
+                print("Erro: o pedido está sendo alterado em outra sessão. Tente novamente em instantes.")
             except Exception as e:
                 db.session.rollback()
                 print(f"Erro ao atualizar pedido: {e}")
@@ -388,8 +594,11 @@ def delete_pedido_cli():
             try:
                 if pedido.pagamento: 
                     db.session.delete(pedido.pagamento)
+                cliente_id = pedido.cliente_id
                 db.session.delete(pedido)
+                atualizar_contadores_clientes(cliente_id)
                 db.session.commit()
+                _pedidos_recentes.discard(pedido_id)
                 print("Pedido deletado com sucesso!")
             except Exception as e:
                 db.session.rollback()
@@ -431,18 +640,12 @@ def list_pedidos_prazos_cli():
 def register_pagamento_cli():
     with app.app_context():
         print("\n--- Registrar Novo Pagamento ---")
-        pedidos_pendentes = db.session.query(Pedido).filter_by(status='pendente').all()
-        if not pedidos_pendentes:
+        if not db.session.query(Pedido.id).filter_by(status='pendente').first():
             print("Nenhum pedido pendente para registrar pagamento.")
             return
 
-        print("Pedidos Pendentes:")
-        for p in pedidos_pendentes:
-            cliente_nome = p.cliente.nome if p.cliente else 'N/A'
-            print(f"ID: {p.id}, Cliente: {cliente_nome}, Serviços: {p.servicos[:30]}..., Valor: R${p.valor_total:.2f}")
-        
-        pedido_id = get_input("ID do Pedido a Pagar: ", type=int)
-        pedido = db.session.get(Pedido, pedido_id)
+        print("Pedidos Pendentes (digite o ID do pedido a pagar ou use /texto para buscar pelo cliente):")
+        pedido = escolher_pedido_cli(status='pendente')
 
         if not pedido or pedido.status != 'pendente':
             print("Pedido não encontrado ou não está pendente.")
@@ -457,10 +660,12 @@ def register_pagamento_cli():
                 print("O valor pago é menor que o valor total do pedido. (Este módulo espera pagamentos completos).")
                 return
 
-            new_pagamento = Pagamento(pedido_id=pedido_id, valor_pago=valor_pago, forma_pagamento=forma_pagamento)
+            new_pagamento = Pagamento(pedido_id=pedido.id, valor_pago=valor_pago, forma_pagamento=forma_pagamento)
             db.session.add(new_pagamento)
             pedido.status = 'pago'
+            atualizar_contadores_clientes(pedido.cliente_id)
             db.session.commit()
+            _lembrar_pedido(pedido)
             print("Pagamento registrado com sucesso! Pedido marcado como 'pago'.")
         except IntegrityError:
             db.session.rollback()
@@ -526,7 +731,14 @@ def generate_recibo_cli():
         print(f"  Forma de Pagamento: {pagamento.forma_pagamento}")
         print(f"  Data do Pagamento: {pagamento.data_pagamento.strftime('%d/%m/%Y %H:%M:%S')}")
         print(f"\nEmitido por: {_logged_in_user.nome if _logged_in_user else 'Administrador'}")
-        print("\nEste é um recibo para visualização no console. A geração em PDF foi desativada.")
+
+        formato = get_input("\nSalvar o recibo em arquivo? (pdf, html ou vazio para não salvar): ", optional=True)
+        if formato:
+            try:
+                [(_, caminho)] = renderizar_recibos([dados_recibo(pagamento.id)], formato.lower())
+                print(f"Recibo salvo em: {os.path.abspath(caminho)}")
+            except Exception as e:
+                print(f"Erro ao gerar recibo: {e}")
     input("\nPressione Enter para continuar...")
 
 def export_historico_pagamentos_cli():
@@ -571,6 +783,75 @@ def export_historico_pagamentos_cli():
         print(f"Histórico financeiro exportado para: {csv_path}")
     input("\nPressione Enter para continuar...")
 
+def export_analytics_cli():
+    with app.app_context():
+        print("\n--- Exportar Dados Analíticos (Parquet/Arrow) ---")
+        formato = get_input("Formato (parquet ou arrow, padrão parquet): ", optional=True, default='parquet').lower()
+        completo = get_input("Regravar todas as partições? (s/n): ", optional=True, default='n').lower() == 's'
+
+        try:
+            arquivos = exportar_analytics(formato=formato, completo=completo)
+        except Exception as e:
+            print(f"Erro ao exportar dados analíticos: {e}")
+            return
+
+        if not arquivos:
+            print("Nenhuma partição nova ou alterada desde a última exportação.")
+        for caminho in arquivos:
+            print(f"- {caminho}")
+        print(f"{len(arquivos)} arquivo(s) exportado(s).")
+
+def conciliar_extrato_cli():
+    with app.app_context():
+        print("\n--- Conciliar Extrato Bancário (OFX/CSV) ---")
+        caminho = get_input("Caminho do arquivo do extrato: ")
+        if not os.path.isfile(caminho):
+            print("Arquivo não encontrado.")
+            return
+        formato = get_input("Formato (ofx ou csv): ", optional=True, default=os.path.splitext(caminho)[1].lstrip('.').lower())
+        codificacao = get_input("Codificação do arquivo (padrão utf-8; extratos OFX costumam usar latin-1): ", optional=True, default='utf-8')
+
+        try:
+            with open(caminho, encoding=codificacao, errors='replace', newline='') as arquivo:
+                resultado = conciliar_extrato(arquivo, formato)
+        except Exception as e:
+            print(f"Erro ao ler o extrato: {e}")
+            return
+
+        print(f"\n{resultado['lancamentos']} crédito(s) no extrato, {resultado['pedidos_pendentes']} pedido(s) pendente(s).")
+        print(f"Já conciliados anteriormente: {resultado['ja_conciliados']}")
+        print(f"Correspondências automáticas: {len(resultado['automaticas'])}")
+        print(f"Com mais de um pedido possível: {len(resultado['propostas'])}")
+        print(f"Sem pedido correspondente: {len(resultado['sem_correspondencia'])}")
+
+        if resultado['automaticas']:
+            print("\n{:<12} {:>12} {:<35} {:<8}".format("Data", "Valor", "Descrição", "Pedido"))
+            print("-" * 70)
+            for item in resultado['automaticas'][:20]:
+                print(f"{item['data']:<12} {item['valor']:>12} {item['descricao'][:35]:<35} {item['pedido_id']:<8}")
+            if len(resultado['automaticas']) > 20:
+                print(f"... e mais {len(resultado['automaticas']) - 20}.")
+
+        confirmadas = list(resultado['automaticas'])
+        for proposta in resultado['propostas']:
+            opcoes = ', '.join(str(candidato['pedido_id']) for candidato in proposta['candidatos'])
+            escolha = get_input(f"\n{proposta['data']} R$ {proposta['valor']} '{proposta['descricao'][:40]}' -> pedidos {opcoes}. ID do pedido (Enter para pular): ", optional=True)
+            if escolha and escolha in opcoes.split(', '):
+                confirmadas.append(dict(proposta, pedido_id=int(escolha)))
+
+        if not confirmadas:
+            return
+        if get_input(f"\nRegistrar {len(confirmadas)} pagamento(s)? (s/n): ", optional=True, default='n').lower() != 's':
+            return
+        try:
+            pagos = aplicar_conciliacao(confirmadas)
+            for proposta in confirmadas:
+                _pedidos_recentes.discard(proposta['pedido_id'])
+            print(f"{len(pagos)} pagamento(s) registrado(s).")
+        except Exception as e:
+            print(f"Erro ao registrar pagamentos: {e}")
+
+
 def generate_weekly_report_cli():
     with app.app_context():
         print("\n--- Gerar Relatório Semanal ---")
@@ -593,6 +874,103 @@ def generate_weekly_report_cli():
         input("\nPressione Enter para continuar...")
 
 
+def contas_a_receber_cli():
+    with app.app_context():
+        print("\n--- Contas a Receber por Idade ---")
+        relatorio = calcular_contas_a_receber()
+        faixas = list(relatorio['faixas'])
+
+        print(f"Data de referência: {relatorio['data_referencia']}")
+        print("\n{:<5} {:<25} {:<8}".format("ID", "Cliente", "Pedidos") + "".join(f" {nome + ' dias':>12}" for nome in faixas) + f" {'Total':>12}")
+        print("-" * (40 + 13 * (len(faixas) + 1)))
+        for cliente in relatorio['clientes']:
+            print(f"{cliente['cliente_id']:<5} {cliente['cliente_nome'][:25]:<25} {cliente['pedidos']:<8}" + "".join(f" {cliente['faixas'][nome]:>12}" for nome in faixas) + f" {cliente['total']:>12}")
+        print("-" * (40 + 13 * (len(faixas) + 1)))
+        print(f"{'':<5} {'TOTAL':<25} {'':<8}" + "".join(f" {relatorio['faixas'][nome]:>12}" for nome in faixas) + f" {relatorio['total']:>12}")
+
+        exportar = get_input("\nExportar para CSV? (s/n): ", optional=True, default='n').lower()
+        if exportar == 's':
+            csv_filename = f"contas_a_receber_{datetime.now().strftime('%Y%m%d%H%M%S')}.csv"
+            csv_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'output', csv_filename)
+            with open(csv_path, 'w', newline='', encoding='utf-8') as file:
+                file.write(contas_a_receber_csv(relatorio))
+            print(f"Contas a receber exportadas para: {csv_path}")
+
+
+def jobs_agendados_cli():
+    with app.app_context():
+        print("\n--- Jobs Agendados ---")
+        print("\n{:<30} {:<20} {:<10} {:<20} {:>10} {:>8}".format("Job", "Próxima Execução", "Status", "Última Execução", "Duração", "Linhas"))
+        print("-" * 103)
+        for job in listar_jobs():
+            ultima = job['ultima_execucao'] or {}
+            proxima = job['proxima_execucao'][:16].replace('T', ' ') if job['proxima_execucao'] else 'pausado'
+            inicio = ultima['inicio'][:16].replace('T', ' ') if ultima else '-'
+            duracao = f"{ultima['duracao_ms']} ms" if ultima.get('duracao_ms') is not None else '-'
+            linhas = ultima.get('linhas_processadas')
+            print(f"{job['id']:<30} {proxima:<20} {ultima.get('status', '-'):<10} {inicio:<20} {duracao:>10} {linhas if linhas is not None else '-':>8}")
+
+        job_id = get_input("\nVer histórico de um job (ID ou Enter para pular): ", optional=True)
+        so_problemas = get_input("Mostrar apenas erros e execuções perdidas? (s/n): ", optional=True, default='n').lower() == 's'
+        execucoes = listar_execucoes(job_id=job_id or None, status=['erro', 'perdido', 'ignorado'] if so_problemas else None, limite=20)
+
+        print("\n{:<30} {:<20} {:<10} {:>10} {:>8}  {}".format("Job", "Início", "Status", "Duração", "Linhas", "Erro"))
+        print("-" * 103)
+        for execucao in execucoes:
+            duracao = f"{execucao['duracao_ms']} ms" if execucao['duracao_ms'] is not None else '-'
+            linhas = execucao['linhas_processadas']
+            print(f"{execucao['job_id']:<30} {execucao['inicio'][:19].replace('T', ' '):<20} {execucao['status']:<10} {duracao:>10} {linhas if linhas is not None else '-':>8}  {(execucao['erro'] or '')[:40]}")
+        if not execucoes:
+            print("Nenhuma execução registrada.")
+
+
+def converter_bancos_sqlite_cli():
+    with app.app_context():
+        print("\n--- Converter Bancos SQLite para Auto-Vacuum Incremental ---")
+        pendentes = bancos_sem_vacuum_incremental()
+        if not pendentes:
+            print("Todos os bancos SQLite já usam auto_vacuum incremental.")
+            return
+
+        print(f"Bancos a converter: {', '.join(pendentes)}.")
+        print("O VACUUM completo reescreve cada arquivo e bloqueia as escritas até terminar; rode com a aplicação parada.")
+        if get_input("Continuar? (s/n): ", optional=True, default='n').lower() != 's':
+            print("Conversão cancelada.")
+            return
+        try:
+            convertidos = converter_para_vacuum_incremental()
+            print(f"{len(convertidos)} banco(s) convertido(s).")
+        except Exception as e:
+            print(f"Erro ao converter os bancos: {e}")
+
+
+def relatorios_menu():
+    while True:
+        options = {
+            "1": ("Relatório Semanal", generate_weekly_report_cli),
+            "2": ("Contas a Receber por Idade", contas_a_receber_cli),
+            "3": ("Jobs Agendados e Histórico de Execuções", jobs_agendados_cli),
+            "4": ("Converter Bancos SQLite (VACUUM completo, uma única vez)", converter_bancos_sqlite_cli)
+        }
+        print_menu("Relatórios", options)
+        choice = input("Escolha uma opção: ")
+
+        if choice == '1':
+            generate_weekly_report_cli()
+            continue
+        elif choice == '2':
+            contas_a_receber_cli()
+        elif choice == '3':
+            jobs_agendados_cli()
+        elif choice == '4':
+            converter_bancos_sqlite_cli()
+        elif choice == '0':
+            break
+        else:
+            print("Opção inválida.")
+        input("Pressione Enter para continuar...")
+
+
 def clientes_menu():
     while True:
         options = {
@@ -656,7 +1034,9 @@ def pagamentos_menu():
             "1": ("Registrar Pagamento", register_pagamento_cli),
             "2": ("Listar Histórico de Pagamentos", list_historico_pagamentos_cli),
             "3": ("Gerar Recibo (Visualizar)", generate_recibo_cli),
-            "4": ("Exportar Histórico CSV", export_historico_pagamentos_cli)
+            "4": ("Exportar Histórico CSV", export_historico_pagamentos_cli),
+            "5": ("Exportar Dados Analíticos (Parquet/Arrow)", export_analytics_cli),
+            "6": ("Conciliar Extrato Bancário (OFX/CSV)", conciliar_extrato_cli)
         }
         print_menu("Gestão de Pagamentos", options)
         choice = input("Escolha uma opção: ")
@@ -669,6 +1049,10 @@ def pagamentos_menu():
             generate_recibo_cli()
         elif choice == '4':
             export_historico_pagamentos_cli()
+        elif choice == '5':
+            export_analytics_cli()
+        elif choice == '6':
+            conciliar_extrato_cli()
         elif choice == '0':
             break
         else:
@@ -709,7 +1093,7 @@ def main_menu():
                 "1": ("Gestão de Clientes", clientes_menu),
                 "2": ("Gestão de Pedidos", pedidos_menu),
                 "3": ("Gestão de Pagamentos", pagamentos_menu),
-                "4": ("Relatórios", generate_weekly_report_cli),
+                "4": ("Relatórios", relatorios_menu),
                 "5": ("Sair (Logout)", logout_user_cli)
             }
             user_name_display = _logged_in_user.nome if _logged_in_user else "Usuário"
@@ -723,7 +1107,7 @@ def main_menu():
             elif choice == '3':
                 pagamentos_menu()
             elif choice == '4':
-                generate_weekly_report_cli()
+                relatorios_menu()
             elif choice == '5':
                 logout_user_cli()
             elif choice == '0':
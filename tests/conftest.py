@@ -0,0 +1,59 @@
+import os
+
+# Importar backend.app não deve tocar no banco real nem iniciar o scheduler.
+os.environ.setdefault('APP_INIT_ON_IMPORT', 'false')
+
+from functools import partial
+
+import pytest
+
+from backend.app import create_app
+from backend.models.database import db
+from backend.services.banco_modelo import (
+    caminho_banco_modelo, clonar_banco_modelo, config_banco, config_banco_em_memoria,
+    criar_banco_modelo, gerar_dados_exemplo,
+)
+
+CLIENTES_MODELO = 200
+PEDIDOS_POR_CLIENTE = 5
+
+
+def _encerrar(app):
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture(scope='session')
+def banco_modelo():
+    """Banco modelo populado, gerado uma vez e reaproveitado enquanto o esquema não muda."""
+    return criar_banco_modelo(
+        caminho_banco_modelo('testes'),
+        popular=partial(gerar_dados_exemplo, clientes=CLIENTES_MODELO, pedidos_por_cliente=PEDIDOS_POR_CLIENTE),
+    )
+
+
+@pytest.fixture
+def app(banco_modelo):
+    """App com uma cópia em memória do banco modelo, descartada no fim do teste."""
+    conexao = clonar_banco_modelo(banco_modelo)
+    app = create_app(config_banco_em_memoria(conexao))
+    yield app
+    _encerrar(app)
+    conexao.close()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def app_em_arquivo(banco_modelo, tmp_path):
+    """Como `app`, mas com a cópia num arquivo: requisições em threads usam conexões próprias."""
+    caminho = tmp_path / 'banco.db'
+    clonar_banco_modelo(banco_modelo, str(caminho)).close()
+    app = create_app(config_banco(f'sqlite:///{caminho}'))
+    yield app
+    _encerrar(app)
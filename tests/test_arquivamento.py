@@ -0,0 +1,89 @@
+import pyarrow.parquet as pq
+from sqlalchemy import func, select
+
+from backend.models.arquivo import PagamentoArquivado
+from backend.models.database import db
+from backend.models.evento import EventoOutbox
+from backend.models.metrica_cliente import MetricaCliente
+from backend.models.pedido import Pedido
+from backend.models.remocao import RegistroRemovido
+from backend.services import exportacao_colunar
+from backend.services.arquivamento import arquivar_pedidos
+from backend.services.rfm import calcular_metricas_clientes
+
+DIAS = 180
+
+
+def _metricas():
+    return {
+        linha.cliente_id: (linha.frequencia, round(linha.valor_monetario, 2), linha.ultima_compra, linha.primeira_compra, linha.segmento)
+        for linha in db.session.execute(select(MetricaCliente)).scalars()
+    }
+
+
+def _linhas_exportadas(pasta):
+    return {
+        arquivo.parent.name: pq.read_table(arquivo).num_rows
+        for arquivo in pasta.glob('mes=*/pedidos.parquet')
+    }
+
+
+def test_arquivar_registra_saida_como_arquivado_no_sync_e_no_outbox(app):
+    with app.app_context():
+        antigos = set(db.session.scalars(
+            select(Pedido.id).where(Pedido.status.in_(('entregue', 'cancelado')), Pedido.data_pedido < func.datetime('now', f'-{DIAS} days'))
+        ))
+        assert arquivar_pedidos(dias=DIAS) == len(antigos) > 0
+
+        removidos = set(db.session.execute(
+            select(RegistroRemovido.entidade_id, RegistroRemovido.operacao).where(RegistroRemovido.entidade == 'pedido')
+        ))
+        eventos = set(db.session.execute(
+            select(EventoOutbox.entidade_id, EventoOutbox.operacao).where(EventoOutbox.entidade == 'pedido')
+        ))
+        # 'arquivado', não 'delete': os pedidos continuam disponíveis na API.
+        assert removidos == {(pedido_id, 'arquivado') for pedido_id in antigos}
+        assert eventos == {(pedido_id, 'arquivado') for pedido_id in antigos}
+
+
+def test_rfm_conta_os_pedidos_arquivados(app):
+    with app.app_context():
+        calcular_metricas_clientes()
+        antes = _metricas()
+
+        arquivar_pedidos(dias=DIAS)
+        calcular_metricas_clientes()
+
+        assert _metricas() == antes
+
+
+def test_exportacao_mantem_os_meses_arquivados(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(exportacao_colunar, 'ANALYTICS_FOLDER', str(tmp_path))
+    with app.app_context():
+        exportacao_colunar.exportar_analytics(tabelas=['pedidos'])
+        antes = _linhas_exportadas(tmp_path / 'pedidos')
+
+        arquivar_pedidos(dias=DIAS)
+        # Incremental: nada mudou nos meses, então nada é regravado nem removido.
+        assert exportacao_colunar.exportar_analytics(tabelas=['pedidos']) == []
+        assert _linhas_exportadas(tmp_path / 'pedidos') == antes
+
+        exportacao_colunar.exportar_analytics(tabelas=['pedidos'], completo=True)
+        assert _linhas_exportadas(tmp_path / 'pedidos') == antes
+
+
+def test_exportacao_csv_inclui_pagamentos_arquivados(app, client, tmp_path, monkeypatch):
+    from backend.controllers import pagamentos
+
+    monkeypatch.setattr(pagamentos, 'OUTPUT_FOLDER', str(tmp_path))
+    client.get('/api/pagamentos/exportar')
+    antes = (tmp_path / 'historico_financeiro.csv').read_text(encoding='utf-8').splitlines()
+
+    with app.app_context():
+        arquivar_pedidos(dias=DIAS)
+        assert db.session.scalar(select(func.count(PagamentoArquivado.id))) > 0
+    resposta = client.get('/api/pagamentos/exportar')
+
+    assert resposta.status_code == 200
+    depois = (tmp_path / 'historico_financeiro.csv').read_text(encoding='utf-8').splitlines()
+    assert sorted(depois) == sorted(antes)
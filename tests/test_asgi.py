@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('quart')
+pytest.importorskip('aiosqlite')
+pytest.importorskip('a2wsgi')
+httpx = pytest.importorskip('httpx')
+
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from backend import asgi
+
+CAMINHOS_ASSINCRONOS = [
+    '/api/clientes/?page=2&per_page=5',
+    '/api/clientes/?ordenar=total_gasto&ordem=desc',
+    '/api/clientes/3',
+    '/api/pedidos/?status=pendente&per_page=7',
+    '/api/pedidos/10',
+    '/api/pedidos/prazos?dias_futuros=30',
+]
+
+
+def _no_modo_assincrono(app_flask, monkeypatch, caminhos):
+    """Atende `caminhos` pela aplicação ASGI sobre o banco de `app_flask`; devolve as respostas e o pool usado."""
+    monkeypatch.setattr(asgi, 'flask_app', app_flask)
+    hibrida = asgi.AplicacaoHibrida(asgi.api, app_flask, 2)
+
+    async def executar():
+        async with asgi.api.test_app():
+            pool = asgi._sessoes['engine'].pool
+            transporte = httpx.ASGITransport(app=hibrida)
+            async with httpx.AsyncClient(transport=transporte, base_url='http://localhost') as cliente:
+                respostas = await asyncio.gather(*(cliente.get(caminho) for caminho in caminhos))
+            return respostas, pool
+
+    return asyncio.run(executar())
+
+
+def test_views_assincronas_respondem_como_as_sincronas(app_em_arquivo, monkeypatch):
+    respostas, pool = _no_modo_assincrono(app_em_arquivo, monkeypatch, CAMINHOS_ASSINCRONOS)
+
+    sincrono = app_em_arquivo.test_client()
+    for caminho, resposta in zip(CAMINHOS_ASSINCRONOS, respostas):
+        esperado = sincrono.get(caminho)
+        assert resposta.status_code == esperado.status_code, caminho
+        assert resposta.json() == esperado.get_json(), caminho
+    # Conexões reaproveitadas, e não uma conexão (e uma thread do aiosqlite) por requisição.
+    assert isinstance(pool, AsyncAdaptedQueuePool)
+    assert pool.size() == app_em_arquivo.config['ASYNC_SQLITE_POOL_SIZE']
+
+
+def test_rotas_sem_view_assincrona_seguem_para_o_flask(app_em_arquivo, monkeypatch):
+    caminho = '/api/pagamentos/1/recibo'
+    (resposta,), _ = _no_modo_assincrono(app_em_arquivo, monkeypatch, [caminho])
+
+    esperado = app_em_arquivo.test_client().get(caminho)
+    assert resposta.status_code == esperado.status_code == 200
+    assert resposta.json() == esperado.get_json()
@@ -0,0 +1,74 @@
+from datetime import datetime
+
+from backend.models.cliente import AnotacaoCliente
+from backend.models.database import db
+from backend.models.pedido import Pedido
+
+
+def _criar_pedido(app, servicos, status='pendente', data_pedido=datetime(2024, 3, 10)):
+    with app.app_context():
+        pedido = Pedido(cliente_id=1, servicos=servicos, valor_total=100.0, status=status, data_pedido=data_pedido)
+        db.session.add(pedido)
+        db.session.commit()
+        return pedido.id
+
+
+def _ids(client, consulta):
+    resposta = client.get(f'/api/pedidos/busca?{consulta}')
+    assert resposta.status_code == 200
+    return [item['id'] for item in resposta.get_json()]
+
+
+def test_busca_ignora_acentos_e_encontra_plural_e_cao(app, client):
+    pedido_id = _criar_pedido(app, 'Instalação elétrica e pintura de paredes')
+
+    assert _ids(client, 'q=instalacao') == [pedido_id]
+    assert _ids(client, 'q=instalações') == [pedido_id]
+    assert _ids(client, 'q=pinturas') == [pedido_id]
+    assert _ids(client, 'q=PAREDE eletrica') == [pedido_id]
+
+
+def test_busca_filtra_por_status_e_periodo(app, client):
+    pendente = _criar_pedido(app, 'Restauração de móveis', data_pedido=datetime(2024, 3, 10))
+    pago = _criar_pedido(app, 'Restauração de molduras', status='pago', data_pedido=datetime(2024, 5, 20))
+
+    assert sorted(_ids(client, 'q=restauracao')) == sorted([pendente, pago])
+    assert _ids(client, 'q=restauracao&status=pago') == [pago]
+    assert _ids(client, 'q=restauracao&inicio=2024-03-01&fim=2024-03-10') == [pendente]
+    assert _ids(client, 'q=restauracao&inicio=2024-03-11') == [pago]
+    assert client.get('/api/pedidos/busca?q=restauracao&inicio=10/03/2024').status_code == 400
+
+
+def test_trecho_destaca_o_termo_e_escapa_o_html(app, client):
+    _criar_pedido(app, '<img src=x onerror=alert(1)> Pintura de paredes')
+
+    trecho = client.get('/api/pedidos/busca?q=pintura').get_json()[0]['trecho']
+
+    assert trecho == '&lt;img src=x onerror=alert(1)&gt; <mark>Pintura</mark> de paredes'
+
+
+def test_indice_acompanha_alteracao_e_exclusao(app, client):
+    pedido_id = _criar_pedido(app, 'Lavagem de tapetes')
+    with app.app_context():
+        db.session.get(Pedido, pedido_id).servicos = 'Impermeabilização de sofás'
+        db.session.commit()
+
+    assert _ids(client, 'q=tapetes') == []
+    assert _ids(client, 'q=sofa') == [pedido_id]
+
+    with app.app_context():
+        db.session.delete(db.session.get(Pedido, pedido_id))
+        db.session.commit()
+    assert _ids(client, 'q=sofa') == []
+
+
+def test_busca_de_anotacoes(app, client):
+    with app.app_context():
+        db.session.add(AnotacaoCliente(cliente_id=2, texto='Alérgica a esmaltes com formaldeído'))
+        db.session.commit()
+
+    resultados = client.get('/api/clientes/anotacoes/busca?q=alergica&cliente_id=2').get_json()
+
+    assert [r['cliente_id'] for r in resultados] == [2]
+    assert resultados[0]['trecho'].startswith('<mark>Alérgica</mark>')
+    assert client.get('/api/clientes/anotacoes/busca?q=alergica&cliente_id=3').get_json() == []
@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+from backend.controllers.relatorios import calcular_contas_a_receber, calcular_metricas_semanais, calcular_serie_receita
+from backend.models.database import db
+from backend.models.pagamento import Pagamento
+from backend.models.pedido import Pedido
+from backend.services.cache_analitico import atualizar_cache_analitico, cache_analitico
+
+
+@pytest.fixture(autouse=True)
+def cache_ligado(app):
+    app.config.update(ANALYTICS_CACHE_ENABLED=True, ANALYTICS_CACHE_REFRESH_SECONDS=0, SYNC_SAFETY_SECONDS=0)
+
+
+def _relatorios(app, com_cache):
+    app.config['ANALYTICS_CACHE_ENABLED'] = com_cache
+    with app.app_context():
+        fim = db.session.scalar(select(func.max(Pedido.data_pedido))).replace(hour=0, minute=0, second=0, microsecond=0)
+        inicio = fim - timedelta(days=120)
+        if com_cache:
+            assert cache_analitico() is not None
+        return {
+            'semanal': calcular_metricas_semanais(),
+            'contas_a_receber': calcular_contas_a_receber(),
+            **{f'serie_{g}': calcular_serie_receita(inicio, fim, g) for g in ('dia', 'semana', 'mes')},
+        }
+
+
+def _linhas_no_snapshot(app):
+    with app.app_context():
+        snapshot = cache_analitico()
+        esperado = {
+            'pedido': db.session.scalar(select(func.count(Pedido.id))),
+            'pagamento': db.session.scalar(select(func.count(Pagamento.id))),
+        }
+        return {entidade: snapshot.linhas(entidade) for entidade in esperado}, esperado
+
+
+def test_relatorios_iguais_com_e_sem_cache(app):
+    assert _relatorios(app, com_cache=True) == _relatorios(app, com_cache=False)
+
+
+def test_cache_acompanha_insercoes_alteracoes_e_remocoes(app, client):
+    with app.app_context():
+        atualizar_cache_analitico()
+        pedido_id = db.session.scalar(select(Pedido.id).where(Pedido.status == 'pendente').limit(1))
+        pago_id = db.session.scalar(select(Pagamento.pedido_id).limit(1))
+
+    # Um status novo entra na tabela de categorias sem invalidar os códigos antigos.
+    novo = client.post('/api/pedidos/', json={'cliente_id': 1, 'servicos': 'Serviço inédito', 'valor_total': 77.7, 'status': 'orcamento'}).get_json()['pedido']
+    client.put(f'/api/pedidos/{pedido_id}', json={'valor_total': 1234.56, 'status': 'pago'})
+    client.delete(f'/api/pedidos/{pago_id}')
+
+    linhas, esperado = _linhas_no_snapshot(app)
+    assert linhas == esperado
+    with app.app_context():
+        snapshot = cache_analitico()
+        pedidos = snapshot['pedido']
+        assert pago_id not in pedidos['id']
+        assert pedidos['centavos'][pedidos['id'] == pedido_id].tolist() == [123456]
+        assert snapshot.decodificar('status', pedidos['status'][pedidos['id'] == novo['id']]) == ['orcamento']
+        assert snapshot.decodificar('servicos', pedidos['servicos'][pedidos['id'] == novo['id']]) == ['Serviço inédito']
+    assert _relatorios(app, com_cache=True) == _relatorios(app, com_cache=False)
+
+
+def test_acima_do_limite_de_memoria_os_relatorios_vao_ao_banco(app, client):
+    app.config['ANALYTICS_CACHE_MAX_MB'] = 0
+
+    estatisticas = client.get('/api/diagnostico/cache-analitico').get_json()
+
+    assert (estatisticas['ativo'], estatisticas['excedido'], estatisticas['bytes']) == (False, True, 0)
+    with app.app_context():
+        assert cache_analitico() is None
+        assert calcular_contas_a_receber()['clientes']
+
+
+def test_diagnostico_mostra_o_snapshot(app, client):
+    estatisticas = client.get('/api/diagnostico/cache-analitico').get_json()
+
+    linhas, esperado = _linhas_no_snapshot(app)
+    assert estatisticas['ativo'] and not estatisticas['excedido']
+    assert estatisticas['linhas'] == esperado
+    assert 0 < estatisticas['bytes'] <= estatisticas['limite_bytes']
+    assert estatisticas['categorias']['status'] >= 1
+    datetime.fromisoformat(estatisticas['ultima_atualizacao'])
@@ -0,0 +1,34 @@
+import main
+from backend.models.cliente import Cliente
+from backend.models.database import db
+
+
+def test_busca_por_prefixo_ignora_maiusculas(app):
+    with app.app_context():
+        db.session.add(Cliente(nome='Ágata Souza', telefone='(21) 97777-0000', email='Agata@Example.com'))
+        db.session.commit()
+
+        assert [linha.nome for linha in main._pagina_clientes('cliente 12', None, 50)] == \
+            [linha.nome for linha in main._pagina_clientes('CLIENTE 12', None, 50)] != []
+        assert all(linha.nome.startswith('Cliente 12') for linha in main._pagina_clientes('cliente 12', None, 50))
+        assert [linha.nome for linha in main._pagina_clientes('Ágata', None, 50)] == ['Ágata Souza']
+        assert [linha.nome for linha in main._pagina_clientes('agata@', None, 50)] == ['Ágata Souza']
+        assert [linha.nome for linha in main._pagina_clientes('(21) 9777', None, 50)] == ['Ágata Souza']
+
+
+def test_cache_de_recentes_esquece_cliente_e_seus_pedidos(app):
+    main._clientes_recentes.discard_if(lambda _: True)
+    main._pedidos_recentes.discard_if(lambda _: True)
+    with app.app_context():
+        cliente = db.session.get(Cliente, 1)
+        pedido = cliente.pedidos.first()
+        outro = db.session.get(Cliente, 2).pedidos.first()
+        main._lembrar_cliente(cliente)
+        main._lembrar_pedido(pedido)
+        main._lembrar_pedido(outro)
+
+        main._esquecer_cliente(cliente.id)
+
+    assert main._clientes_recentes.get(1) is None
+    assert main._pedidos_recentes.get(pedido.id) is None
+    assert main._pedidos_recentes.get(outro.id) is not None
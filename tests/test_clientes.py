@@ -0,0 +1,87 @@
+import pytest
+from backend.app import create_app
+from sqlalchemy import text
+from backend.models.cliente import normalizar_telefone
+from backend.models.database import db
+from backend.services.banco_modelo import clonar_banco_modelo, config_banco_em_memoria
+from tests.conftest import CLIENTES_MODELO, _encerrar
+
+
+def test_listar_clientes_do_banco_modelo(client):
+    resposta = client.get('/api/clientes/?per_page=5')
+
+    assert resposta.status_code == 200
+    dados = resposta.get_json()
+    assert dados['total_items'] == CLIENTES_MODELO
+    assert len(dados['clientes']) == 5
+
+
+def test_criar_cliente_nao_vaza_entre_testes(client):
+    resposta = client.post('/api/clientes/', json={'nome': 'Cliente Novo', 'telefone': '(11) 98888-7777'})
+    assert resposta.status_code == 201
+    cliente_id = resposta.get_json()['cliente']['id']
+
+    resposta = client.get(f'/api/clientes/{cliente_id}')
+    assert resposta.status_code == 200
+    assert resposta.get_json()['nome'] == 'Cliente Novo'
+    assert resposta.headers['ETag']
+
+    duplicado = client.post('/api/clientes/', json={'nome': 'Outro', 'telefone': '11988887777'})
+    assert duplicado.status_code == 409
+
+
+def test_cada_teste_recebe_uma_copia_limpa(client):
+    assert client.get('/api/clientes/').get_json()['total_items'] == CLIENTES_MODELO
+
+
+def test_resumo_do_dashboard_e_por_app(app, banco_modelo):
+    conexao = clonar_banco_modelo(banco_modelo)
+    outro = create_app(config_banco_em_memoria(conexao))
+    try:
+        with outro.app_context():
+            db.session.execute(text("UPDATE pedidos SET status = 'pendente'"))
+            db.session.commit()
+
+        pendentes = app.test_client().get('/api/dashboard/').get_json()['pedidos_pendentes']
+        pendentes_outro = outro.test_client().get('/api/dashboard/').get_json()['pedidos_pendentes']
+        assert pendentes_outro > pendentes
+    finally:
+        _encerrar(outro)
+        conexao.close()
+
+
+@pytest.mark.parametrize('telefone, esperado', [
+    ('(11) 98888-7777', '+5511988887777'),
+    ('11 3333-4444', '+551133334444'),
+    ('011 98888-7777', '+5511988887777'),
+    ('0 21 11 98888-7777', '+5511988887777'),
+    ('+55 11 98888-7777', '+5511988887777'),
+    ('0055 11 98888-7777', '+5511988887777'),
+    ('+1 415 555 0100', '+14155550100'),
+    ('98888-7777', None),
+    ('', None),
+])
+def test_normalizar_telefone(telefone, esperado):
+    assert normalizar_telefone(telefone) == esperado
+
+
+def test_busca_por_telefone_em_qualquer_formato(client):
+    cliente_id = client.post('/api/clientes/', json={'nome': 'Cliente Telefone', 'telefone': '+55 (21) 97777-6666'}).get_json()['cliente']['id']
+
+    for formato in ('21977776666', '(21) 97777-6666', '0055 21 97777 6666'):
+        resposta = client.get(f'/api/clientes/por-telefone/{formato}')
+        assert resposta.status_code == 200
+        assert (resposta.get_json()['id'], resposta.get_json()['telefone_normalizado']) == (cliente_id, '+5521977776666')
+
+    listagem = client.get('/api/clientes/?search=(21) 97777-6666').get_json()['clientes']
+    assert [cliente['id'] for cliente in listagem] == [cliente_id]
+    assert client.get('/api/clientes/por-telefone/21977770000').status_code == 404
+    assert client.get('/api/clientes/por-telefone/123').status_code == 400
+
+
+def test_editar_para_telefone_de_outro_cliente_em_outro_formato(client):
+    client.post('/api/clientes/', json={'nome': 'Primeiro', 'telefone': '(21) 97777-6666'})
+    segundo = client.post('/api/clientes/', json={'nome': 'Segundo', 'telefone': '(21) 95555-4444'}).get_json()['cliente']['id']
+
+    assert client.put(f'/api/clientes/{segundo}', json={'telefone': '+55 21 977776666'}).status_code == 409
+    assert client.put(f'/api/clientes/{segundo}', json={'telefone': '+55 21 95555-4444'}).status_code == 200
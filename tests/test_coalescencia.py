@@ -0,0 +1,80 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.services.coalescencia import coalescer
+
+CHAMADAS = 10
+
+
+class _Contada:
+    """Função coalescida que conta execuções e só termina quando liberada."""
+
+    def __init__(self):
+        self.execucoes = 0
+        self.liberar = threading.Event()
+        self.funcao = coalescer()(self._executar)
+
+    def _executar(self, valor):
+        self.execucoes += 1
+        self.liberar.wait(5)
+        if valor is None:
+            raise ValueError('sem valor')
+        return {'valor': valor}
+
+
+def _chamar_em_paralelo(contada, argumentos):
+    largada = threading.Barrier(len(argumentos) + 1)
+
+    def chamar(valor):
+        largada.wait()
+        try:
+            return contada.funcao(valor)
+        except ValueError as e:
+            return e
+
+    with ThreadPoolExecutor(len(argumentos)) as executor:
+        futuros = [executor.submit(chamar, valor) for valor in argumentos]
+        largada.wait()
+        # Dá tempo de todas as threads entrarem antes de a primeira execução terminar.
+        time.sleep(0.2)
+        contada.liberar.set()
+        return [futuro.result() for futuro in futuros]
+
+
+def test_chamadas_simultaneas_executam_uma_vez():
+    contada = _Contada()
+
+    resultados = _chamar_em_paralelo(contada, [1] * CHAMADAS)
+
+    assert contada.execucoes == 1
+    assert resultados == [{'valor': 1}] * CHAMADAS
+    # Cada chamador recebe a sua cópia.
+    assert len({id(resultado) for resultado in resultados}) == CHAMADAS
+
+
+def test_argumentos_diferentes_executam_separado():
+    contada = _Contada()
+
+    resultados = _chamar_em_paralelo(contada, [1, 2] * (CHAMADAS // 2))
+
+    assert contada.execucoes == 2
+    assert sorted(r['valor'] for r in resultados) == [1] * (CHAMADAS // 2) + [2] * (CHAMADAS // 2)
+
+
+def test_erro_e_repassado_a_todos():
+    contada = _Contada()
+
+    resultados = _chamar_em_paralelo(contada, [None] * CHAMADAS)
+
+    assert contada.execucoes == 1
+    assert all(isinstance(resultado, ValueError) for resultado in resultados)
+
+
+def test_nada_fica_guardado_depois_da_execucao():
+    contada = _Contada()
+    contada.liberar.set()
+
+    assert contada.funcao(1) == {'valor': 1}
+    assert contada.funcao(1) == {'valor': 1}
+    assert contada.execucoes == 2
@@ -0,0 +1,33 @@
+import gzip
+import json
+import zlib
+
+CLIENTE_ID = 1
+
+
+def test_etag_fica_fraca_na_resposta_comprimida(app, client):
+    app.config['COMPRESSAO_MINIMO_BYTES'] = 0
+    identidade = client.get(f'/api/clientes/{CLIENTE_ID}', headers={'Accept-Encoding': 'identity'})
+    comprimida = client.get(f'/api/clientes/{CLIENTE_ID}', headers={'Accept-Encoding': 'gzip'})
+
+    etag, fraca = identidade.get_etag()
+    assert etag and not fraca
+    assert comprimida.headers['Content-Encoding'] == 'gzip'
+    assert comprimida.get_etag() == (etag, True)
+    assert json.loads(gzip.decompress(comprimida.get_data())) == identidade.get_json()
+
+    # A ETag fraca continua valendo para o 304 e para o If-Match.
+    assert client.get(f'/api/clientes/{CLIENTE_ID}', headers={'If-None-Match': comprimida.headers['ETag']}).status_code == 304
+    assert client.put(f'/api/clientes/{CLIENTE_ID}', json={'nome': 'Novo'}, headers={'If-Match': comprimida.headers['ETag']}).status_code == 200
+
+
+def test_streaming_comprimido_entrega_cada_pedaco_sem_esperar_o_buffer(client):
+    resposta = client.get('/api/sync/?lote=10', headers={'Accept-Encoding': 'gzip'})
+    assert resposta.headers['Content-Encoding'] == 'gzip'
+
+    descompressor = zlib.decompressobj(31)
+    primeiro = descompressor.decompress(next(iter(resposta.response))).decode('utf-8')
+    resposta.close()
+
+    assert primeiro.endswith('\n')
+    assert json.loads(primeiro.splitlines()[0])['tipo'] == 'cliente'
@@ -0,0 +1,165 @@
+import io
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import func, select
+
+from backend.models.cliente import Cliente
+from backend.models.database import db
+from backend.models.pagamento import Pagamento
+from backend.models.pedido import Pedido
+from backend.services.conciliacao import conciliar_extrato, ler_csv, ler_ofx
+
+OFX = """OFXHEADER:100
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN>
+<TRNTYPE>CREDIT
+<DTPOSTED>20260312100000[-3:BRT]
+<TRNAMT>4321.17
+<FITID>A1
+<NAME>PIX RECEBIDO
+<MEMO>Joana Teste
+</STMTTRN>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20260313
+<TRNAMT>-50.00
+<FITID>A2
+</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+
+def _cliente(nome, telefone):
+    cliente = Cliente(nome=nome, telefone=telefone)
+    db.session.add(cliente)
+    db.session.flush()
+    return cliente
+
+
+def _pedido(cliente, valor, data):
+    pedido = Pedido(cliente_id=cliente.id, servicos='Teste', valor_total=valor, status='pendente', data_pedido=data)
+    db.session.add(pedido)
+    db.session.flush()
+    return pedido.id
+
+
+def _csv(*linhas):
+    return io.StringIO('\n'.join(('Data;Histórico;Valor;Documento',) + linhas) + '\n')
+
+
+def test_ofx_le_creditos_e_debitos_com_identificador():
+    lancamentos = list(ler_ofx(io.StringIO(OFX)))
+
+    assert [(l.referencia, l.data, l.valor) for l in lancamentos] == [
+        ('ofx:A1', datetime(2026, 3, 12), Decimal('4321.17')),
+        ('ofx:A2', datetime(2026, 3, 13), Decimal('-50.00')),
+    ]
+    assert lancamentos[0].descricao == 'PIX RECEBIDO Joana Teste'
+
+
+def test_csv_aceita_valores_brasileiros_e_gera_referencia_sem_identificador():
+    lancamentos = list(ler_csv(_csv(
+        '12/03/2026;PIX Joana;1.234,56;D1',
+        '2026-03-13;TED;99.90;',
+        '2026-03-13;TED;99.90;',
+    )))
+
+    assert [(l.data, l.valor) for l in lancamentos] == [
+        (datetime(2026, 3, 12), Decimal('1234.56')),
+        (datetime(2026, 3, 13), Decimal('99.90')),
+        (datetime(2026, 3, 13), Decimal('99.90')),
+    ]
+    assert lancamentos[0].referencia == 'csv:D1'
+    # Lançamentos idênticos sem identificador recebem referências distintas e estáveis.
+    assert lancamentos[1].referencia != lancamentos[2].referencia
+    assert [l.referencia for l in ler_csv(_csv('2026-03-13;TED;99.90;'))] == [lancamentos[1].referencia]
+
+
+def test_csv_com_linha_incompleta_responde_400(client):
+    extrato = (io.BytesIO('Data;Histórico;Valor\n12/03/2026;PIX\n'.encode('utf-8')), 'extrato.csv')
+
+    resposta = client.post('/api/pagamentos/conciliacao', data={'extrato': extrato, 'formato': 'csv'})
+
+    assert resposta.status_code == 400
+    assert 'Linha 2' in resposta.get_json()['error']
+
+
+def test_nome_do_cliente_desempata_pedidos_de_mesmo_valor(app):
+    with app.app_context():
+        joana = _cliente('Joana Conciliada', '+5511900000001')
+        pedro = _cliente('Pedro Conciliado', '+5511900000002')
+        pedido_joana = _pedido(joana, 4321.17, datetime(2026, 3, 10))
+        pedido_pedro = _pedido(pedro, 4321.17, datetime(2026, 3, 11))
+        db.session.commit()
+
+        resultado = conciliar_extrato(_csv(
+            '12/03/2026;PIX JOANA CONCILIADA;4.321,17;R1',
+            '12/03/2026;PIX RECEBIDO;4.321,17;R2',
+        ), 'csv', janela_dias=30)
+
+    # Com o pedido da Joana reservado, o segundo crédito fica com o único candidato restante.
+    assert [(item['referencia'], item['pedido_id']) for item in resultado['automaticas']] == [
+        ('csv:R1', pedido_joana), ('csv:R2', pedido_pedro),
+    ]
+    assert resultado['propostas'] == []
+
+
+def test_lancamento_ambiguo_vira_proposta(app):
+    with app.app_context():
+        pedidos = {_pedido(_cliente(f'Cliente Ambíguo {i}', f'+551190000001{i}'), 4321.17, datetime(2026, 3, 10)) for i in range(2)}
+        db.session.commit()
+
+        resultado = conciliar_extrato(_csv('12/03/2026;PIX RECEBIDO;4.321,17;R1'), 'csv', janela_dias=30)
+
+    assert resultado['automaticas'] == []
+    assert {c['pedido_id'] for c in resultado['propostas'][0]['candidatos']} == pedidos
+
+
+def test_aplicar_duas_vezes_paga_uma_so(app, client):
+    with app.app_context():
+        pedido_id = _pedido(_cliente('Joana Conciliada', '+5511900000001'), 4321.17, datetime(2026, 3, 10))
+        db.session.commit()
+
+    def enviar():
+        return client.post('/api/pagamentos/conciliacao', data={
+            'extrato': (io.BytesIO(OFX.encode('utf-8')), 'extrato.ofx'), 'aplicar': 'true', 'janela_dias': '30',
+        })
+
+    primeira, segunda = enviar().get_json(), enviar().get_json()
+
+    assert (primeira['aplicados'], primeira['ja_conciliados']) == (1, 0)
+    assert (segunda['aplicados'], segunda['ja_conciliados']) == (0, 1)
+    with app.app_context():
+        pagamentos = db.session.scalars(select(Pagamento).where(Pagamento.pedido_id == pedido_id)).all()
+        assert [(p.referencia_extrato, p.forma_pagamento) for p in pagamentos] == [('ofx:A1', 'PIX')]
+        assert db.session.get(Pedido, pedido_id).status == 'pago'
+
+
+def test_confirmar_referencia_ja_conciliada_nao_paga_outro_pedido(app, client):
+    with app.app_context():
+        cliente = _cliente('Joana Conciliada', '+5511900000001')
+        primeiro, segundo = (_pedido(cliente, 4321.17, datetime(2026, 3, 10)) for _ in range(2))
+        db.session.commit()
+    item = {'valor': '4321.17', 'data': '2026-03-12T00:00:00', 'referencia': 'csv:R1'}
+
+    def confirmar(pedido_id):
+        resposta = client.post('/api/pagamentos/conciliacao/confirmar', json={'correspondencias': [{**item, 'pedido_id': pedido_id}]})
+        return resposta.get_json()['pedidos_pagos']
+
+    assert confirmar(primeiro) == [primeiro]
+    # O mesmo lançamento do extrato não pode quitar um segundo pedido.
+    assert confirmar(segundo) == []
+    with app.app_context():
+        assert db.session.scalar(select(func.count(Pagamento.id)).where(Pagamento.referencia_extrato == 'csv:R1')) == 1
+        assert db.session.get(Pedido, segundo).status == 'pendente'
+
+
+def test_extrato_maior_que_um_lote(app):
+    linhas = [f'12/03/2026;TED {i};0,{i % 90 + 10:02d};L{i}' for i in range(2500)]
+
+    with app.app_context():
+        resultado = conciliar_extrato(_csv(*linhas), 'csv', janela_dias=1)
+
+    assert resultado['lancamentos'] == 2500
+    assert len(resultado['sem_correspondencia']) == 2500
@@ -0,0 +1,28 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+CLIENTE_ID = 1
+REQUISICOES = 8
+
+
+def test_puts_paralelos_com_mesma_etag_gravam_uma_vez(app_em_arquivo):
+    resposta = app_em_arquivo.test_client().get(f'/api/clientes/{CLIENTE_ID}')
+    etag = resposta.headers['ETag']
+    largada = threading.Barrier(REQUISICOES)
+
+    def atualizar(i):
+        client = app_em_arquivo.test_client()
+        largada.wait()
+        return client.put(f'/api/clientes/{CLIENTE_ID}', json={'nome': f'Nome {i}'}, headers={'If-Match': etag})
+
+    with ThreadPoolExecutor(REQUISICOES) as executor:
+        respostas = list(executor.map(atualizar, range(REQUISICOES)))
+
+    codigos = sorted(r.status_code for r in respostas)
+    assert codigos == [200] + [409] * (REQUISICOES - 1)
+    vencedora = next(r.get_json()['cliente'] for r in respostas if r.status_code == 200)
+
+    final = app_em_arquivo.test_client().get(f'/api/clientes/{CLIENTE_ID}')
+    assert final.get_json()['nome'] == vencedora['nome']
+    assert final.get_json()['versao'] == vencedora['versao']
+    assert all(r.get_json()['versao_atual'] == vencedora['versao'] for r in respostas if r.status_code == 409)
@@ -0,0 +1,84 @@
+from sqlalchemy import select, text
+
+from backend.models.cliente import Cliente
+from backend.models.database import db
+from backend.models.pagamento import Pagamento
+from backend.models.pedido import Pedido
+from backend.services.contadores import atualizar_contadores_clientes, verificar_contadores
+
+
+def _contadores(app, *cliente_ids):
+    with app.app_context():
+        return {
+            cliente_id: (total_pedidos, round(total_gasto, 2), ultimo_pedido_em)
+            for cliente_id, total_pedidos, total_gasto, ultimo_pedido_em in db.session.execute(
+                select(Cliente.id, Cliente.total_pedidos, Cliente.total_gasto, Cliente.ultimo_pedido_em).where(Cliente.id.in_(cliente_ids))
+            )
+        }
+
+
+def _recalculados(app, *cliente_ids):
+    """Os contadores refeitos do zero a partir dos pedidos e pagamentos."""
+    with app.app_context():
+        esperado = {}
+        for cliente_id in cliente_ids:
+            pedidos = db.session.scalars(select(Pedido).where(Pedido.cliente_id == cliente_id, Pedido.status != 'cancelado')).all()
+            esperado[cliente_id] = (
+                len(pedidos),
+                round(sum(pedido.pagamento.valor_pago for pedido in pedidos if pedido.pagamento), 2),
+                max((pedido.data_pedido for pedido in pedidos), default=None),
+            )
+        return esperado
+
+
+def test_banco_modelo_sem_divergencias(app):
+    with app.app_context():
+        assert verificar_contadores(reparar=False) == []
+
+
+def test_contadores_acompanham_pedidos_pagamentos_e_cancelamentos(app, client):
+    cliente_id = 1
+    pedido = client.post('/api/pedidos/', json={'cliente_id': cliente_id, 'servicos': 'Teste', 'valor_total': 150}).get_json()['pedido']
+    assert _contadores(app, cliente_id) == _recalculados(app, cliente_id)
+
+    client.post('/api/pagamentos/', json={'pedido_id': pedido['id'], 'valor_pago': 150, 'forma_pagamento': 'PIX'})
+    assert _contadores(app, cliente_id) == _recalculados(app, cliente_id)
+
+    client.put(f'/api/pedidos/{pedido["id"]}', json={'status': 'cancelado'})
+    assert _contadores(app, cliente_id) == _recalculados(app, cliente_id)
+
+    with app.app_context():
+        assert verificar_contadores(reparar=False) == []
+
+
+def test_pedido_movido_atualiza_os_dois_clientes(app, client):
+    with app.app_context():
+        pedido_id = db.session.scalar(select(Pedido.id).join(Pagamento).where(Pedido.cliente_id == 1, Pedido.status != 'cancelado').limit(1))
+
+    resposta = client.put(f'/api/pedidos/{pedido_id}', json={'cliente_id': 2})
+
+    assert resposta.status_code == 200
+    assert _contadores(app, 1, 2) == _recalculados(app, 1, 2)
+
+
+def test_verificacao_encontra_e_repara_divergencias(app):
+    with app.app_context():
+        db.session.execute(text('UPDATE clientes SET total_pedidos = total_pedidos + 1 WHERE id = 3'))
+        db.session.execute(text('UPDATE clientes SET total_gasto = total_gasto + 0.01 WHERE id = 4'))
+        db.session.execute(text('UPDATE clientes SET ultimo_pedido_em = NULL WHERE id = 5'))
+        db.session.commit()
+
+        assert sorted(verificar_contadores(reparar=False)) == [3, 4, 5]
+        assert sorted(verificar_contadores()) == [3, 4, 5]
+        assert verificar_contadores(reparar=False) == []
+    assert _contadores(app, 3, 4, 5) == _recalculados(app, 3, 4, 5)
+
+
+def test_atualizacao_na_mesma_transacao_da_alteracao(app):
+    with app.app_context():
+        db.session.add(Pedido(cliente_id=6, servicos='Teste', valor_total=10.0))
+        atualizar_contadores_clientes(6)
+        db.session.rollback()
+
+    # O rollback desfaz o pedido e os contadores juntos.
+    assert _contadores(app, 6) == _recalculados(app, 6)
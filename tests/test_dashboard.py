@@ -0,0 +1,79 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import select
+
+from backend.controllers.dashboard import resumo_dashboard
+from backend.models.database import db
+from backend.models.pagamento import Pagamento
+from backend.models.pedido import Pedido
+
+
+def _dinheiro(valores):
+    return str(sum((Decimal(str(valor)) for valor in valores), Decimal('0')).quantize(Decimal('0.01')))
+
+
+def test_resumo_confere_com_os_pedidos(app, client):
+    app.config['DASHBOARD_CACHE_SECONDS'] = 0
+    hoje = datetime.now().date()
+    inicio_mes = datetime(hoje.year, hoje.month, 1)
+    with app.app_context():
+        # Garante movimento no mês corrente e um pedido atrasado, seja qual for a data do banco modelo.
+        db.session.add_all([
+            Pedido(cliente_id=1, servicos='Corte', valor_total=50.0, status='pago', data_pedido=datetime.now()),
+            Pedido(cliente_id=2, servicos='Corte', valor_total=55.0, status='entregue', data_pedido=datetime.now()),
+            Pedido(cliente_id=3, servicos='Escova', valor_total=40.0, status='pendente',
+                   data_pedido=datetime.now(), data_entrega=datetime.combine(hoje - timedelta(days=2), datetime.min.time())),
+        ])
+        db.session.commit()
+        pedidos = db.session.scalars(select(Pedido)).all()
+        pagamentos = db.session.scalars(select(Pagamento)).all()
+
+        pendentes = [p for p in pedidos if p.status == 'pendente']
+        do_mes = [p for p in pedidos if p.status in ('pago', 'entregue') and p.data_pedido >= inicio_mes]
+        em_aberto = [p for p in pedidos if p.status in ('pendente', 'pago') and p.data_entrega]
+        servicos = Counter(p.servicos for p in do_mes)
+        recentes = sorted(pagamentos, key=lambda p: (p.data_pagamento, p.id), reverse=True)[:5]
+        esperado = {
+            'pedidos_pendentes': len(pendentes),
+            'valor_pendente': _dinheiro(p.valor_total for p in pendentes),
+            'pedidos_atrasados': sum(p.data_entrega.date() < hoje for p in em_aberto),
+            'pedidos_mes': len(do_mes),
+            'receita_mes': _dinheiro(p.valor_total for p in do_mes),
+            'recebido_mes': _dinheiro(p.valor_pago for p in pagamentos if p.data_pagamento >= inicio_mes),
+            'servicos_mais_vendidos': [servico for servico, _ in sorted(servicos.items(), key=lambda item: (-item[1], item[0]))[:5]],
+            'pagamentos_recentes': [p.id for p in recentes],
+        }
+
+    resumo = client.get('/api/dashboard/').get_json()
+
+    obtido = {chave: resumo[chave] for chave in esperado}
+    obtido['servicos_mais_vendidos'] = [item['servicos'] for item in resumo['servicos_mais_vendidos']]
+    obtido['pagamentos_recentes'] = [item['id'] for item in resumo['pagamentos_recentes']]
+    assert obtido == esperado
+    # Os mesmos critérios das rotas de pedidos.
+    assert resumo['pedidos_pendentes'] == client.get('/api/pedidos/?status=pendente').get_json()['total_items']
+    assert resumo['pedidos_vencendo_na_semana'] == len(client.get('/api/pedidos/prazos?dias_futuros=7').get_json())
+
+
+def test_resumo_reaproveitado_dentro_da_validade(app, client):
+    app.config['DASHBOARD_CACHE_SECONDS'] = 60
+    antes = client.get('/api/dashboard/').get_json()
+
+    client.post('/api/pedidos/', json={'cliente_id': 1, 'servicos': 'Corte', 'valor_total': 10})
+    assert client.get('/api/dashboard/').get_json() == antes
+
+    app.config['DASHBOARD_CACHE_SECONDS'] = 0
+    assert client.get('/api/dashboard/').get_json()['pedidos_pendentes'] == antes['pedidos_pendentes'] + 1
+
+
+def test_resumo_devolvido_e_uma_copia(app):
+    app.config['DASHBOARD_CACHE_SECONDS'] = 60
+    with app.app_context():
+        original = resumo_dashboard()
+        alterado = resumo_dashboard()
+        alterado['servicos_mais_vendidos'].clear()
+        alterado['pedidos_pendentes'] = -1
+
+        assert resumo_dashboard() == original
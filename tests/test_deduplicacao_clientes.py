@@ -0,0 +1,81 @@
+from datetime import datetime
+
+from sqlalchemy import select
+
+from backend.models.cliente import AnotacaoCliente, Cliente
+from backend.models.database import db
+from backend.models.pagamento import Pagamento
+from backend.models.pedido import Pedido
+from backend.models.remocao import RegistroRemovido
+from backend.services.contadores import verificar_contadores
+from backend.services.deduplicacao_clientes import preencher_telefones_normalizados
+
+
+def _cliente(nome, telefone, **campos):
+    cliente = Cliente(nome=nome, telefone=telefone, **campos)
+    db.session.add(cliente)
+    db.session.flush()
+    return cliente.id
+
+
+def _pedido(cliente_id, valor, pago=False):
+    pedido = Pedido(cliente_id=cliente_id, servicos='Teste', valor_total=valor, status='pago' if pago else 'pendente', data_pedido=datetime.now())
+    db.session.add(pedido)
+    db.session.flush()
+    if pago:
+        db.session.add(Pagamento(pedido_id=pedido.id, valor_pago=valor, forma_pagamento='PIX'))
+    return pedido.id
+
+
+def _duplicados(app):
+    """Três cadastros do mesmo telefone, gravados direto no banco como antes da checagem da API."""
+    with app.app_context():
+        mantido = _cliente('Maria Duplicada', '(31) 98888-1111')
+        outro = _cliente('Maria D.', '31988881111', email='maria@example.com')
+        terceiro = _cliente('Maria', '+55 31 98888-1111', endereco='Rua A, 1')
+        pedidos = [_pedido(mantido, 10, pago=True), _pedido(outro, 20, pago=True), _pedido(terceiro, 40)]
+        db.session.add(AnotacaoCliente(cliente_id=terceiro, texto='Prefere retirar à tarde'))
+        db.session.commit()
+    return mantido, [outro, terceiro], pedidos
+
+
+def test_simulacao_so_lista_os_grupos(app, client):
+    mantido, duplicados, _ = _duplicados(app)
+
+    resposta = client.post('/api/clientes/duplicados/mesclar?simular=true')
+
+    assert resposta.status_code == 200
+    assert resposta.get_json()['grupos'] == [{'cliente_id': mantido, 'duplicados': duplicados}]
+    assert client.get('/api/clientes/por-telefone/31988881111').get_json()['duplicados'] == duplicados
+
+
+def test_mesclar_move_o_historico_para_o_cadastro_mais_antigo(app, client):
+    mantido, duplicados, pedidos = _duplicados(app)
+
+    resposta = client.post('/api/clientes/duplicados/mesclar')
+
+    assert resposta.get_json()['grupos'] == [{'cliente_id': mantido, 'duplicados': duplicados}]
+    with app.app_context():
+        assert db.session.scalars(select(Cliente.id).where(Cliente.id.in_(duplicados))).all() == []
+        assert set(db.session.scalars(select(Pedido.cliente_id).where(Pedido.id.in_(pedidos)))) == {mantido}
+        assert db.session.scalar(select(AnotacaoCliente.cliente_id).where(AnotacaoCliente.texto == 'Prefere retirar à tarde')) == mantido
+
+        cliente = db.session.get(Cliente, mantido)
+        # O cadastro mantido fica com o nome dele e recebe o que só os duplicados tinham.
+        assert (cliente.nome, cliente.email, cliente.endereco) == ('Maria Duplicada', 'maria@example.com', 'Rua A, 1')
+        assert (cliente.total_pedidos, cliente.total_gasto) == (3, 30)
+        assert verificar_contadores(reparar=False) == []
+        assert set(db.session.scalars(select(RegistroRemovido.entidade_id).where(RegistroRemovido.entidade == 'cliente'))) >= set(duplicados)
+
+    assert client.get('/api/clientes/por-telefone/31988881111').get_json()['duplicados'] == []
+    assert client.post('/api/clientes/duplicados/mesclar').get_json()['grupos'] == []
+
+
+def test_preenche_telefones_cadastrados_antes_da_coluna(app):
+    with app.app_context():
+        cliente_id = _cliente('Sem Normalizado', '(41) 3222-1111')
+        db.session.execute(Cliente.__table__.update().where(Cliente.id == cliente_id).values(telefone_normalizado=None))
+        db.session.commit()
+
+        assert preencher_telefones_normalizados(tamanho_lote=2) >= 1
+        assert db.session.scalar(select(Cliente.telefone_normalizado).where(Cliente.id == cliente_id)) == '+554132221111'
@@ -0,0 +1,145 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from backend.controllers.eventos import _notificadores
+from backend.models.cliente import Cliente
+from backend.models.database import db
+from backend.models.evento import EventoOutbox
+from backend.models.pedido import Pedido
+from backend.services.contadores import atualizar_contadores_clientes
+from backend.services.deduplicacao_clientes import mesclar_clientes_duplicados
+from backend.services.exclusao_clientes import excluir_cliente
+
+
+def _configurar(app):
+    app.config.update(SSE_POLL_INTERVAL=0.05, SSE_KEEPALIVE_SECONDS=0.2, SSE_MAX_CONNECTION_SECONDS=0.6)
+
+
+def _maior_id(app):
+    with app.app_context():
+        return db.session.query(db.func.max(EventoOutbox.id)).scalar() or 0
+
+
+def test_conexao_encerra_no_prazo_com_o_ultimo_id(app_em_arquivo):
+    _configurar(app_em_arquivo)
+    inicio = _maior_id(app_em_arquivo)
+    with app_em_arquivo.app_context():
+        db.session.add(Cliente(nome='Evento Antigo', telefone='(11) 90000-0001'))
+        db.session.commit()
+    criado = _maior_id(app_em_arquivo)
+
+    corpo = app_em_arquivo.test_client().get('/api/events/', headers={'Last-Event-ID': str(inicio)}).get_data(as_text=True)
+
+    assert corpo.startswith('retry: 50\n\n')
+    assert f'id: {criado}\nevent: cliente.insert\n' in corpo
+    # Última linha atualiza o Last-Event-ID para a reconexão.
+    assert corpo.endswith(f'id: {criado}\n\n')
+
+
+def test_conexoes_abertas_compartilham_um_notificador(app_em_arquivo):
+    _configurar(app_em_arquivo)
+    app_em_arquivo.config['SSE_MAX_CONNECTION_SECONDS'] = 2
+    inicio = _maior_id(app_em_arquivo)
+    cliente_http = app_em_arquivo.test_client()
+    corpos = []
+
+    def ouvir():
+        resposta = cliente_http.get('/api/events/?entidades=cliente', headers={'Last-Event-ID': str(inicio)})
+        for pedaco in resposta.response:
+            corpos.append(pedaco.decode())
+            if 'event: cliente.insert' in pedaco.decode():
+                break
+        resposta.close()
+
+    threads = [threading.Thread(target=ouvir) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    prazo = time.monotonic() + 2
+    while (app_em_arquivo not in _notificadores or _notificadores[app_em_arquivo]._assinantes < 3) and time.monotonic() < prazo:
+        time.sleep(0.01)
+    notificador = _notificadores[app_em_arquivo]
+    assert notificador._assinantes == 3
+    assert [t.name for t in threading.enumerate()].count('sse-notificador') == 1
+
+    with app_em_arquivo.app_context():
+        db.session.add(Cliente(nome='Evento Novo', telefone='(11) 90000-0002'))
+        db.session.commit()
+    for thread in threads:
+        thread.join()
+
+    criado = _maior_id(app_em_arquivo)
+    assert sum(f'id: {criado}\nevent: cliente.insert\n' in corpo for corpo in corpos) == 3
+    assert notificador._assinantes == 0
+
+
+def _eventos_desde(app, inicio):
+    with app.app_context():
+        return [
+            (evento.entidade, evento.entidade_id, evento.operacao)
+            for evento in db.session.scalars(select(EventoOutbox).where(EventoOutbox.id > inicio).order_by(EventoOutbox.id))
+        ]
+
+
+def test_buraco_recente_segura_o_cursor_ate_a_carencia(app_em_arquivo):
+    _configurar(app_em_arquivo)
+    app_em_arquivo.config['SSE_MAX_CONNECTION_SECONDS'] = 0.3
+    inicio = _maior_id(app_em_arquivo)
+    with app_em_arquivo.app_context():
+        # inicio + 2 ainda não confirmado: o evento seguinte não pode passar na frente dele.
+        for evento_id, criado_em in ((inicio + 1, datetime.now()), (inicio + 3, datetime.now())):
+            db.session.add(EventoOutbox(id=evento_id, entidade='cliente', entidade_id=1, operacao='update', payload='{}', criado_em=criado_em))
+        db.session.commit()
+    cliente_http = app_em_arquivo.test_client()
+
+    corpo = cliente_http.get('/api/events/', headers={'Last-Event-ID': str(inicio)}).get_data(as_text=True)
+    assert f'id: {inicio + 1}\nevent:' in corpo
+    assert f'id: {inicio + 3}' not in corpo
+    assert corpo.endswith(f'id: {inicio + 1}\n\n')
+
+    with app_em_arquivo.app_context():
+        db.session.get(EventoOutbox, inicio + 3).criado_em = datetime.now() - timedelta(seconds=10)
+        db.session.commit()
+    corpo = cliente_http.get('/api/events/', headers={'Last-Event-ID': str(inicio + 1)}).get_data(as_text=True)
+    assert f'id: {inicio + 3}\nevent:' in corpo
+
+
+def test_atualizacoes_em_lote_gravam_eventos(app):
+    inicio = _maior_id(app)
+    with app.app_context():
+        atualizar_contadores_clientes(5)
+        db.session.commit()
+        excluir_cliente(6, soft=True)
+
+    assert _eventos_desde(app, inicio) == [('cliente', 5, 'update'), ('cliente', 6, 'delete')]
+
+
+def test_mesclagem_grava_eventos_dos_pedidos_movidos(app):
+    with app.app_context():
+        mantido = Cliente(nome='Original', telefone='(11) 93333-0000')
+        db.session.add(mantido)
+        db.session.commit()
+        duplicado = Cliente(nome='Duplicado', telefone='11933330000')
+        db.session.add(duplicado)
+        db.session.flush()
+        pedido = Pedido(cliente_id=duplicado.id, servicos='Escova', valor_total=50.0)
+        db.session.add(pedido)
+        db.session.commit()
+        mantido_id, duplicado_id, pedido_id = mantido.id, duplicado.id, pedido.id
+    inicio = _maior_id(app)
+
+    with app.app_context():
+        assert mesclar_clientes_duplicados() == {mantido_id: [duplicado_id]}
+
+    eventos = _eventos_desde(app, inicio)
+    assert ('pedido', pedido_id, 'update') in eventos
+    assert ('cliente', duplicado_id, 'delete') in eventos
+    assert ('cliente', mantido_id, 'update') in eventos
+    with app.app_context():
+        payload = json.loads(db.session.scalar(
+            select(EventoOutbox.payload).where(EventoOutbox.id > inicio, EventoOutbox.entidade == 'pedido')
+        ))
+    assert payload['cliente_id'] == mantido_id
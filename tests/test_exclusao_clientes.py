@@ -0,0 +1,70 @@
+from sqlalchemy import func, select, text
+
+from backend.models.cliente import AnotacaoCliente, Cliente
+from backend.models.database import db
+from backend.models.evento import EventoOutbox
+from backend.models.metrica_cliente import MetricaCliente
+from backend.models.pagamento import Pagamento
+from backend.models.pedido import Pedido
+from backend.models.remocao import RegistroRemovido
+from backend.services.rfm import calcular_metricas_clientes
+from tests.conftest import CLIENTES_MODELO
+
+
+def _cliente_com_pagamentos():
+    return db.session.scalar(
+        select(Pedido.cliente_id).join(Pagamento, Pagamento.pedido_id == Pedido.id)
+        .join(AnotacaoCliente, AnotacaoCliente.cliente_id == Pedido.cliente_id).limit(1)
+    )
+
+
+def _tombstones(entidade):
+    return set(db.session.scalars(select(RegistroRemovido.entidade_id).where(RegistroRemovido.entidade == entidade)))
+
+
+def test_exclusao_remove_o_historico_na_ordem_das_dependencias(app, client):
+    with app.app_context():
+        calcular_metricas_clientes()
+        cliente_id = _cliente_com_pagamentos()
+        pedidos = set(db.session.scalars(select(Pedido.id).where(Pedido.cliente_id == cliente_id)))
+        pagamentos = set(db.session.scalars(select(Pagamento.id).where(Pagamento.pedido_id.in_(pedidos))))
+        anotacoes = set(db.session.scalars(select(AnotacaoCliente.id).where(AnotacaoCliente.cliente_id == cliente_id)))
+        db.session.commit()
+        # Com as chaves estrangeiras ligadas, um DELETE fora de ordem falharia.
+        db.session.execute(text('PRAGMA foreign_keys = ON'))
+
+    resposta = client.delete(f'/api/clientes/{cliente_id}')
+
+    assert resposta.status_code == 200
+    assert resposta.get_json()['removidos'] == {
+        'pagamentos': len(pagamentos), 'pedidos': len(pedidos), 'anotacoes': len(anotacoes), 'clientes': 1
+    }
+    with app.app_context():
+        db.session.execute(text('PRAGMA foreign_keys = OFF'))
+        assert db.session.get(Cliente, cliente_id) is None
+        assert db.session.scalar(select(func.count()).where(MetricaCliente.cliente_id == cliente_id)) == 0
+        assert _tombstones('pedido') == pedidos
+        assert _tombstones('pagamento') == pagamentos
+        assert _tombstones('anotacao') == anotacoes
+        assert _tombstones('cliente') == {cliente_id}
+
+
+def test_exclusao_logica_esconde_o_cliente_e_avisa_sync_e_eventos(app, client):
+    with app.app_context():
+        cliente_id = _cliente_com_pagamentos()
+        maior_evento = db.session.scalar(select(func.max(EventoOutbox.id))) or 0
+
+    assert client.delete(f'/api/clientes/{cliente_id}?soft=true').status_code == 200
+
+    assert client.get(f'/api/clientes/{cliente_id}').status_code == 404
+    listagem = client.get('/api/clientes/?per_page=500').get_json()
+    assert listagem['total_items'] == CLIENTES_MODELO - 1
+    assert cliente_id not in {cliente['id'] for cliente in listagem['clientes']}
+    with app.app_context():
+        # O histórico continua no banco.
+        assert db.session.scalar(select(func.count()).where(Pedido.cliente_id == cliente_id)) > 0
+        assert _tombstones('cliente') == {cliente_id}
+        eventos = db.session.execute(
+            select(EventoOutbox.entidade, EventoOutbox.entidade_id, EventoOutbox.operacao).where(EventoOutbox.id > maior_evento)
+        ).all()
+        assert [tuple(evento) for evento in eventos] == [('cliente', cliente_id, 'delete')]
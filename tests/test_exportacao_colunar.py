@@ -0,0 +1,80 @@
+from decimal import Decimal
+
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+
+import pyarrow.compute as pc
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+from sqlalchemy import func, select
+
+from backend.models.cliente import Cliente
+from backend.models.database import db
+from backend.models.pedido import Pedido
+from backend.services import exportacao_colunar
+
+
+@pytest.fixture(autouse=True)
+def pasta_analytics(tmp_path, monkeypatch):
+    monkeypatch.setattr(exportacao_colunar, 'ANALYTICS_FOLDER', str(tmp_path))
+    return tmp_path
+
+
+def _pedidos_por_mes():
+    mes = func.strftime('%Y-%m', Pedido.data_pedido)
+    return dict(db.session.execute(select(mes, func.count(Pedido.id)).group_by(mes)).all())
+
+
+def test_pedidos_particionados_por_mes_com_tipos_colunares(app, pasta_analytics):
+    with app.app_context():
+        exportacao_colunar.exportar_analytics(tabelas=['pedidos', 'clientes'])
+        esperado = _pedidos_por_mes()
+        total_clientes = db.session.scalar(select(func.count(Cliente.id)))
+        primeiro = db.session.get(Pedido, 1)
+
+    particoes = {arquivo.parent.name[len('mes='):]: pq.read_table(arquivo) for arquivo in (pasta_analytics / 'pedidos').glob('mes=*/pedidos.parquet')}
+    assert {mes: tabela.num_rows for mes, tabela in particoes.items()} == esperado
+
+    tabela = particoes[primeiro.data_pedido.strftime('%Y-%m')]
+    assert tabela.schema.field('valor_total').type == pa.decimal128(12, 2)
+    assert pa.types.is_dictionary(tabela.schema.field('status').type)
+    linha = tabela.filter(pc.equal(tabela['id'], 1)).to_pylist()[0]
+    assert linha['valor_total'] == Decimal(str(primeiro.valor_total)).quantize(Decimal('0.01'))
+    assert linha['data_pedido'] == primeiro.data_pedido
+
+    assert pq.read_table(pasta_analytics / 'clientes' / 'clientes.parquet').num_rows == total_clientes
+
+
+def test_exportacao_incremental_regrava_so_o_mes_alterado(app, pasta_analytics):
+    with app.app_context():
+        exportacao_colunar.exportar_analytics(tabelas=['pedidos'])
+        assert exportacao_colunar.exportar_analytics(tabelas=['pedidos']) == []
+
+        pedido = db.session.get(Pedido, 1)
+        pedido.valor_total = 1234.5
+        db.session.commit()
+        mes = pedido.data_pedido.strftime('%Y-%m')
+
+        escritos = exportacao_colunar.exportar_analytics(tabelas=['pedidos'])
+
+    assert escritos == [str(pasta_analytics / 'pedidos' / f'mes={mes}' / 'pedidos.parquet')]
+    tabela = pq.read_table(escritos[0])
+    assert tabela.filter(pc.equal(tabela['id'], 1))['valor_total'].to_pylist() == [Decimal('1234.50')]
+
+
+def test_formato_arrow(app, pasta_analytics):
+    with app.app_context():
+        escritos = exportacao_colunar.exportar_analytics(formato='arrow', tabelas=['pagamentos'])
+
+    assert escritos and all(caminho.endswith('pagamentos.arrow') for caminho in escritos)
+    with pa.memory_map(escritos[0]) as arquivo:
+        assert ipc.open_file(arquivo).read_all().schema.field('valor_pago').type == pa.decimal128(12, 2)
+
+
+def test_endpoint_recusa_formato_e_tabela_invalidos(client):
+    assert client.get('/api/pagamentos/exportar/analytics?formato=csv').status_code == 400
+    resposta = client.get('/api/pagamentos/exportar/analytics?tabelas=pedidos,estoque')
+
+    assert resposta.status_code == 400
+    assert 'estoque' in resposta.get_json()['error']
@@ -0,0 +1,38 @@
+import sqlite3
+
+from sqlalchemy import select
+
+from backend.models.database import db
+from backend.models.manutencao import ManutencaoBanco
+from backend.services.manutencao_sqlite import (
+    AUTO_VACUUM_INCREMENTAL, bancos_sem_vacuum_incremental, converter_para_vacuum_incremental, otimizar_bancos_sqlite,
+)
+
+
+def _auto_vacuum(caminho):
+    conexao = sqlite3.connect(caminho)
+    try:
+        return conexao.execute('PRAGMA auto_vacuum').fetchone()[0]
+    finally:
+        conexao.close()
+
+
+def test_job_nao_faz_vacuum_completo_e_a_conversao_e_manual(app_em_arquivo):
+    with app_em_arquivo.app_context():
+        caminho = db.engine.url.database
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            conn.exec_driver_sql('PRAGMA auto_vacuum = NONE')
+            conn.exec_driver_sql('VACUUM')
+        assert _auto_vacuum(caminho) != AUTO_VACUUM_INCREMENTAL
+
+        otimizar_bancos_sqlite()
+        assert _auto_vacuum(caminho) != AUTO_VACUUM_INCREMENTAL
+        # O bind 'arquivo' aponta para o mesmo arquivo: um banco só.
+        pendentes = bancos_sem_vacuum_incremental()
+        assert len(pendentes) == 1
+        assert set(db.session.scalars(select(ManutencaoBanco.operacao))) == {'otimizacao'}
+
+        assert converter_para_vacuum_incremental() == pendentes
+        assert _auto_vacuum(caminho) == AUTO_VACUUM_INCREMENTAL
+        assert bancos_sem_vacuum_incremental() == []
+        assert converter_para_vacuum_incremental() == []
@@ -0,0 +1,214 @@
+import asyncio
+import json
+import socketserver
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from email import message_from_bytes
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from sqlalchemy import select, update
+
+from backend.models.cliente import Cliente
+from backend.models.database import db
+from backend.models.notificacao import Notificacao
+from backend.models.pedido import Pedido
+from backend.services.notificacoes import CanalConsole, LimiteDeTaxa, _enviar_lote, despachar_notificacoes, enfileirar_notificacoes
+from backend.services.scheduler import enviar_lembretes_pagamento
+
+
+class _SMTPFalso(socketserver.StreamRequestHandler):
+    """Servidor SMTP mínimo: aceita qualquer mensagem e guarda em `server.mensagens`."""
+
+    def _responder(self, linha):
+        self.wfile.write(f'{linha}\r\n'.encode('ascii'))
+
+    def handle(self):
+        self.server.conexoes += 1
+        self._responder('220 smtp-falso')
+        while True:
+            linha = self.rfile.readline()
+            if not linha:
+                return
+            comando = linha.decode('ascii').strip().upper()
+            if comando.startswith(('EHLO', 'HELO')):
+                self._responder('250 smtp-falso')
+            elif comando == 'DATA':
+                self._responder('354 fim com <CRLF>.<CRLF>')
+                corpo = []
+                for linha_dados in iter(self.rfile.readline, b''):
+                    if linha_dados == b'.\r\n':
+                        break
+                    corpo.append(linha_dados)
+                self.server.mensagens.append(message_from_bytes(b''.join(corpo)))
+                self._responder('250 ok')
+            elif comando == 'QUIT':
+                self._responder('221 tchau')
+                return
+            else:
+                self._responder('250 ok')
+
+
+class _WhatsAppFalso(BaseHTTPRequestHandler):
+    def do_POST(self):
+        corpo = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        with self.server.trava:
+            self.server.recebidas.append(corpo)
+        self.send_response(self.server.status)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def smtp():
+    servidor = socketserver.ThreadingTCPServer(('127.0.0.1', 0), _SMTPFalso)
+    servidor.mensagens = []
+    servidor.conexoes = 0
+    threading.Thread(target=servidor.serve_forever, args=(0.05,), daemon=True).start()
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+class _ServidorHTTP(ThreadingHTTPServer):
+    # Cada despacho abre até NOTIFICACOES_CONCORRENCIA conexões de uma vez.
+    request_queue_size = 256
+
+
+@pytest.fixture
+def whatsapp():
+    servidor = _ServidorHTTP(('127.0.0.1', 0), _WhatsAppFalso)
+    servidor.recebidas = []
+    servidor.trava = threading.Lock()
+    servidor.status = 200
+    threading.Thread(target=servidor.serve_forever, args=(0.05,), daemon=True).start()
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def _configurar_canais(app, smtp, whatsapp):
+    app.config.update(
+        SMTP_HOST='127.0.0.1', SMTP_PORT=smtp.server_address[1], SMTP_USER=None, SMTP_USE_TLS=False,
+        SMTP_FROM='loja@example.com',
+        WHATSAPP_API_URL=f'http://127.0.0.1:{whatsapp.server_address[1]}/mensagens',
+        NOTIFICACOES_TAXA_POR_SEGUNDO={},
+    )
+
+
+def _status():
+    return dict(db.session.execute(select(Notificacao.chave, Notificacao.status)).all())
+
+
+def test_envia_por_smtp_e_http(app, smtp, whatsapp):
+    _configurar_canais(app, smtp, whatsapp)
+    with app.app_context():
+        enfileirar_notificacoes([
+            {'canal': 'email', 'destino': 'ana@example.com', 'assunto': 'Recibo', 'conteudo': 'Obrigado!', 'chave': 'email-1'},
+            {'canal': 'whatsapp', 'destino': '11999990000', 'conteudo': 'Seu pedido está pronto.', 'chave': 'whatsapp-1'},
+        ])
+
+        assert despachar_notificacoes() == (2, 0)
+        assert _status() == {'email-1': 'enviada', 'whatsapp-1': 'enviada'}
+
+    [mensagem] = smtp.mensagens
+    assert mensagem['To'] == 'ana@example.com'
+    assert mensagem['Subject'] == 'Recibo'
+    assert mensagem.get_payload().strip() == 'Obrigado!'
+    assert whatsapp.recebidas == [{'to': '11999990000', 'message': 'Seu pedido está pronto.'}]
+
+
+def test_falha_no_http_reagenda(app, smtp, whatsapp):
+    _configurar_canais(app, smtp, whatsapp)
+    whatsapp.status = 500
+    with app.app_context():
+        enfileirar_notificacoes([{'canal': 'whatsapp', 'destino': '11999990000', 'conteudo': 'Oi', 'chave': 'whatsapp-1'}])
+
+        assert despachar_notificacoes() == (0, 1)
+        notificacao = db.session.execute(select(Notificacao)).scalar_one()
+        assert (notificacao.status, notificacao.tentativas) == ('pendente', 1)
+        assert notificacao.proxima_tentativa_em > datetime.now()
+        # Ainda não venceu o backoff: nada a enviar.
+        assert despachar_notificacoes() == (0, 0)
+
+
+def test_notificacao_reservada_por_outro_processo_nao_e_reenviada(app, smtp, whatsapp):
+    _configurar_canais(app, smtp, whatsapp)
+    with app.app_context():
+        enfileirar_notificacoes([{'canal': 'whatsapp', 'destino': f'1199999{i:04d}', 'conteudo': 'Oi', 'chave': f'w-{i}'} for i in range(3)])
+        db.session.execute(update(Notificacao).where(Notificacao.chave == 'w-0').values(
+            status='enviando', proxima_tentativa_em=datetime.now() + timedelta(minutes=5)))
+        # Reserva vencida: o processo que a fez caiu antes de gravar o resultado.
+        db.session.execute(update(Notificacao).where(Notificacao.chave == 'w-1').values(
+            status='enviando', proxima_tentativa_em=datetime.now() - timedelta(seconds=1)))
+        db.session.commit()
+
+        assert despachar_notificacoes() == (2, 0)
+        assert _status() == {'w-0': 'enviando', 'w-1': 'enviada', 'w-2': 'enviada'}
+
+
+def test_despachos_simultaneos_enviam_cada_notificacao_uma_vez(app_em_arquivo, smtp, whatsapp):
+    _configurar_canais(app_em_arquivo, smtp, whatsapp)
+    quantidade = 40
+    with app_em_arquivo.app_context():
+        enfileirar_notificacoes([{'canal': 'whatsapp', 'destino': f'119{i:08d}', 'conteudo': 'Oi', 'chave': f'w-{i}'} for i in range(quantidade)])
+
+    largada = threading.Barrier(4)
+
+    def despachar():
+        with app_em_arquivo.app_context():
+            largada.wait()
+            return despachar_notificacoes()
+
+    with ThreadPoolExecutor(4) as executor:
+        resultados = list(executor.map(lambda _: despachar(), range(4)))
+
+    assert sum(enviadas for enviadas, _ in resultados) == quantidade
+    assert sorted(r['to'] for r in whatsapp.recebidas) == sorted(f'119{i:08d}' for i in range(quantidade))
+
+
+def test_lembretes_ignoram_clientes_excluidos(app):
+    app.config['NOTIFICACOES_TAXA_POR_SEGUNDO'] = {}
+    with app.app_context():
+        antigo = datetime.now() - timedelta(days=10)
+        pedidos = db.session.execute(select(Pedido.id, Pedido.cliente_id).where(Pedido.status == 'pendente', Pedido.data_pedido <= antigo)).all()
+        excluido = pedidos[0].cliente_id
+        db.session.execute(update(Cliente).where(Cliente.id == excluido).values(excluido_em=datetime.now()))
+        db.session.commit()
+
+        assert enviar_lembretes_pagamento() > 0
+        lembrados = {int(chave.split(':')[2]) for chave in db.session.scalars(select(Notificacao.chave))}
+        assert {pedido_id for pedido_id, cliente_id in pedidos if cliente_id != excluido} <= lembrados
+        assert not {pedido_id for pedido_id, cliente_id in pedidos if cliente_id == excluido} & lembrados
+
+
+def test_email_reaproveita_a_conexao_smtp_no_lote(app, smtp, whatsapp):
+    _configurar_canais(app, smtp, whatsapp)
+    app.config['NOTIFICACOES_CONCORRENCIA'] = 2
+    with app.app_context():
+        enfileirar_notificacoes([
+            {'canal': 'email', 'destino': f'cliente{i}@example.com', 'conteudo': 'Oi', 'chave': f'e-{i}'} for i in range(10)
+        ])
+        assert despachar_notificacoes() == (10, 0)
+
+    assert len(smtp.mensagens) == 10
+    assert smtp.conexoes <= 2
+
+
+def test_concorrencia_nao_fica_presa_ao_executor_padrao():
+    concorrencia = 40
+    largada = threading.Barrier(concorrencia, timeout=5)
+
+    class CanalBloqueante(CanalConsole):
+        async def enviar(self, destino, assunto, conteudo):
+            # Só passa se as `concorrencia` chamadas estiverem em threads ao mesmo tempo.
+            await asyncio.to_thread(largada.wait)
+
+    async def executar():
+        lote = [(i, 'email', 'x', None, 'Oi') for i in range(concorrencia)]
+        return await _enviar_lote(lote, {'email': CanalBloqueante('email')}, {'email': LimiteDeTaxa(0)}, concorrencia)
+
+    assert [erro for _, erro in asyncio.run(executar())] == [None] * concorrencia
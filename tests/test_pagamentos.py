@@ -0,0 +1,71 @@
+import io
+import zipfile
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+from backend.models.database import db
+from backend.models.pagamento import Pagamento
+from backend.services import recibos
+
+
+@pytest.fixture(autouse=True)
+def pasta_recibos(tmp_path, monkeypatch):
+    monkeypatch.setattr(recibos, 'RECIBOS_FOLDER', str(tmp_path))
+
+
+def _periodo(app, dias):
+    with app.app_context():
+        fim = db.session.scalar(select(func.max(Pagamento.data_pagamento)))
+    return (fim - timedelta(days=dias)).strftime('%Y-%m-%d'), fim.strftime('%Y-%m-%d')
+
+
+def test_recibo_em_json_mantem_as_chaves_antigas(app, client):
+    with app.app_context():
+        pagamento = db.session.scalars(select(Pagamento).limit(1)).one()
+        esperado = {
+            'id_pagamento': pagamento.id,
+            'valor_pago': str(pagamento.valor_pago),
+            'forma_pagamento': pagamento.forma_pagamento,
+            'data_pagamento': pagamento.data_pagamento.isoformat(),
+            'servico_descricao': pagamento.pedido.servicos,
+        }
+
+    resposta = client.get(f'/api/pagamentos/{esperado["id_pagamento"]}/recibo')
+
+    assert resposta.status_code == 200
+    recibo = resposta.get_json()['recibo_data']
+    assert {chave: recibo[chave] for chave in esperado} == esperado
+    assert recibo['cliente_nome']
+    datetime.fromisoformat(recibo['data_pagamento'])
+
+
+def test_zip_exige_periodo(client):
+    assert client.get('/api/pagamentos/recibos/zip?formato=html').status_code == 400
+    assert client.get('/api/pagamentos/recibos/zip?formato=html&start_date=2024-01-01').status_code == 400
+
+
+def test_zip_recusa_periodo_acima_do_maximo(app, client):
+    app.config['RECIBOS_ZIP_MAXIMO'] = 5
+    inicio, fim = _periodo(app, 365)
+
+    resposta = client.get(f'/api/pagamentos/recibos/zip?formato=html&start_date={inicio}&end_date={fim}')
+
+    assert resposta.status_code == 400
+    assert '5' in resposta.get_json()['error']
+
+
+def test_zip_do_periodo(app, client):
+    app.config['RECIBOS_MINIMO_POOL'] = 10 ** 6
+    inicio, fim = _periodo(app, 10)
+    with app.app_context():
+        quantidade = db.session.scalar(select(func.count(Pagamento.id)).where(
+            Pagamento.data_pagamento >= datetime.strptime(inicio, '%Y-%m-%d'),
+            Pagamento.data_pagamento < datetime.strptime(fim, '%Y-%m-%d') + timedelta(days=1)))
+
+    resposta = client.get(f'/api/pagamentos/recibos/zip?formato=html&start_date={inicio}&end_date={fim}')
+
+    assert resposta.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(resposta.data)) as pacote:
+        assert len(pacote.namelist()) == quantidade > 0
@@ -0,0 +1,140 @@
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import func, select
+
+from backend.models.cliente import Cliente
+from backend.models.database import db
+from backend.models.pagamento import Pagamento
+from backend.models.pedido import Pedido
+
+
+@pytest.fixture(autouse=True)
+def sem_login(app):
+    # O app não registra um LoginManager; as rotas com @login_required só respondem com o login desligado.
+    app.config['LOGIN_DISABLED'] = True
+
+
+def _ultimo_dia(app):
+    with app.app_context():
+        ultimo = db.session.scalar(select(func.max(Pedido.data_pedido)))
+    return datetime(ultimo.year, ultimo.month, ultimo.day)
+
+
+def _receita_esperada(app, inicio, fim, periodo_de):
+    receita, pedidos, formas = defaultdict(Decimal), defaultdict(int), defaultdict(lambda: defaultdict(Decimal))
+    with app.app_context():
+        for pedido in db.session.scalars(select(Pedido).where(
+            Pedido.data_pedido >= inicio, Pedido.data_pedido < fim + timedelta(days=1), Pedido.status.in_(('pago', 'entregue'))
+        )):
+            periodo = periodo_de(pedido.data_pedido)
+            receita[periodo] += Decimal(str(pedido.valor_total))
+            pedidos[periodo] += 1
+        for pagamento in db.session.scalars(select(Pagamento).where(
+            Pagamento.data_pagamento >= inicio, Pagamento.data_pagamento < fim + timedelta(days=1)
+        )):
+            formas[periodo_de(pagamento.data_pagamento)][pagamento.forma_pagamento] += Decimal(str(pagamento.valor_pago))
+    return receita, pedidos, formas
+
+
+@pytest.mark.parametrize('granularidade, periodo_de', [
+    ('dia', lambda data: data.strftime('%Y-%m-%d')),
+    ('semana', lambda data: (data - timedelta(days=data.weekday())).strftime('%Y-%m-%d')),
+    ('mes', lambda data: data.strftime('%Y-%m-01')),
+])
+def test_serie_de_receita_por_periodo(app, client, granularidade, periodo_de):
+    fim = _ultimo_dia(app)
+    inicio = fim - timedelta(days=90)
+    receita, pedidos, formas = _receita_esperada(app, inicio, fim, periodo_de)
+
+    resposta = client.get(f'/api/relatorios/serie?granularidade={granularidade}&inicio={inicio:%Y-%m-%d}&fim={fim:%Y-%m-%d}')
+
+    assert resposta.status_code == 200
+    dados = resposta.get_json()
+    serie = {item['periodo']: item for item in dados['serie']}
+    # Períodos sem vendas também aparecem, zerados.
+    assert list(serie) == sorted(serie) and set(receita) <= set(serie)
+    assert dados['total_pedidos'] == sum(pedidos.values())
+    assert Decimal(dados['total_receita']) == sum(receita.values()).quantize(Decimal('0.01'))
+    for periodo, item in serie.items():
+        assert Decimal(item['receita']) == receita[periodo].quantize(Decimal('0.01'))
+        assert item['pedidos'] == pedidos[periodo]
+        if pedidos[periodo]:
+            assert Decimal(item['ticket_medio']) == (receita[periodo] * 100 // pedidos[periodo]) / 100
+        assert {forma: Decimal(valor) for forma, valor in item['formas_pagamento'].items()} == {
+            forma: valor.quantize(Decimal('0.01')) for forma, valor in formas[periodo].items() if valor
+        }
+
+
+def test_serie_recusa_parametros_invalidos(client):
+    assert client.get('/api/relatorios/serie?granularidade=ano').status_code == 400
+    assert client.get('/api/relatorios/serie?inicio=01/01/2024').status_code == 400
+    assert client.get('/api/relatorios/serie?inicio=2024-02-01&fim=2024-01-01').status_code == 400
+
+
+def test_serie_padrao_cobre_os_ultimos_30_dias(client):
+    dados = client.get('/api/relatorios/serie').get_json()
+
+    assert len(dados['serie']) == 30
+    assert dados['data_fim'] == datetime.now().strftime('%Y-%m-%d')
+
+
+def _pedido_pendente(cliente_id, valor, data_pedido):
+    db.session.add(Pedido(cliente_id=cliente_id, servicos='Teste', valor_total=valor, status='pendente', data_pedido=data_pedido))
+
+
+def test_contas_a_receber_por_faixa_de_idade(app, client):
+    hoje = datetime.now()
+    inicio_hoje = datetime(hoje.year, hoje.month, hoje.day)
+    with app.app_context():
+        cliente = Cliente(nome='Cliente Aging', telefone='+5511900000077')
+        db.session.add(cliente)
+        db.session.flush()
+        # Uma hora depois do início de cada dia: o pedido tem exatamente `dias` dias.
+        for dias, valor in [(0, 1), (7, 2), (8, 4), (30, 8), (31, 16), (60, 32), (61, 64), (400, 128)]:
+            _pedido_pendente(cliente.id, valor, inicio_hoje - timedelta(days=dias, hours=-1))
+        db.session.commit()
+        cliente_id = cliente.id
+        total_pendente = db.session.scalar(select(func.sum(Pedido.valor_total)).where(Pedido.status == 'pendente'))
+
+    relatorio = client.get('/api/relatorios/contas-a-receber').get_json()
+
+    linha = next(c for c in relatorio['clientes'] if c['cliente_id'] == cliente_id)
+    assert linha['faixas'] == {'0-7': '3.00', '8-30': '12.00', '31-60': '48.00', '60+': '192.00'}
+    assert (linha['pedidos'], linha['total']) == (8, '255.00')
+    assert linha['pedido_mais_antigo'] == (inicio_hoje - timedelta(days=400, hours=-1)).isoformat()
+    assert Decimal(relatorio['total']) == Decimal(str(total_pendente)).quantize(Decimal('0.01'))
+    assert sum(Decimal(valor) for valor in relatorio['faixas'].values()) == Decimal(relatorio['total'])
+    totais = [Decimal(c['total']) for c in relatorio['clientes']]
+    assert totais == sorted(totais, reverse=True)
+
+
+def test_contas_a_receber_em_csv(client):
+    relatorio = client.get('/api/relatorios/contas-a-receber').get_json()
+
+    resposta = client.get('/api/relatorios/contas-a-receber?formato=csv')
+
+    assert resposta.mimetype == 'text/csv'
+    linhas = resposta.get_data(as_text=True).splitlines()
+    assert linhas[0].startswith('ID Cliente,Nome Cliente,Pedidos Pendentes,0-7 dias')
+    assert len(linhas) == len(relatorio['clientes']) + 2
+    assert linhas[-1].endswith(f",{relatorio['total']}")
+
+
+def test_data_do_pedido_e_calculada_a_cada_insercao(app):
+    with app.app_context():
+        cliente_id = db.session.scalar(select(Cliente.id).limit(1))
+        primeiro = Pedido(cliente_id=cliente_id, servicos='Teste', valor_total=1.0)
+        db.session.add(primeiro)
+        db.session.commit()
+        time.sleep(0.01)
+        segundo = Pedido(cliente_id=cliente_id, servicos='Teste', valor_total=1.0)
+        db.session.add(segundo)
+        db.session.commit()
+
+        # Um default fixo (datetime.now() na importação) daria a mesma data a todos os pedidos.
+        assert primeiro.data_pedido < segundo.data_pedido
+        assert datetime.now() - segundo.data_pedido < timedelta(seconds=5)
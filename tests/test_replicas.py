@@ -0,0 +1,97 @@
+import sqlite3
+
+import pytest
+
+from backend.app import create_app
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
+from backend.models.cliente import Cliente
+from backend.models.database import db, _saude_replicas
+from backend.services.banco_modelo import clonar_banco_modelo, config_banco
+from tests.conftest import _encerrar
+
+CLIENTE_ID = 1
+
+
+@pytest.fixture
+def bancos(banco_modelo, tmp_path):
+    """Primário e réplica em dois arquivos SQLite; o nome do cliente mostra de qual deles veio a leitura."""
+    primario = tmp_path / 'primario.db'
+    replica = tmp_path / 'replica.db'
+    clonar_banco_modelo(banco_modelo, str(primario)).close()
+    conexao = clonar_banco_modelo(banco_modelo, str(replica))
+    conexao.execute('UPDATE clientes SET nome = ? WHERE id = ?', ('Na réplica', CLIENTE_ID))
+    conexao.commit()
+    conexao.close()
+    return primario, replica
+
+
+@pytest.fixture
+def app_com_replica(bancos):
+    primario, replica = bancos
+    config = config_banco(f'sqlite:///{primario}')
+    config['SQLALCHEMY_BINDS'] = {**config['SQLALCHEMY_BINDS'], 'replica_1': f'sqlite:///{replica}'}
+    app = create_app(config)
+    yield app
+    _encerrar(app)
+
+
+def _nome(client):
+    resposta = client.get(f'/api/clientes/{CLIENTE_ID}')
+    assert resposta.status_code == 200
+    return resposta.get_json()['nome']
+
+
+def test_get_le_da_replica(app_com_replica):
+    assert _nome(app_com_replica.test_client()) == 'Na réplica'
+
+
+def test_leitura_apos_escrita_fica_no_primario(app_com_replica):
+    client = app_com_replica.test_client()
+    resposta = client.put(f'/api/clientes/{CLIENTE_ID}', json={'nome': 'Atualizado'})
+    assert resposta.status_code == 200
+
+    assert _nome(client) == 'Atualizado'
+    # Outro usuário, sem escrita recente, continua lendo a réplica.
+    assert _nome(app_com_replica.test_client()) == 'Na réplica'
+
+
+def test_falha_na_replica_tira_a_replica_do_rodizio(app_com_replica, bancos):
+    _, replica = bancos
+    conexao = sqlite3.connect(replica)
+    conexao.execute('ALTER TABLE clientes RENAME TO clientes_fora')
+    conexao.commit()
+    conexao.close()
+    client = app_com_replica.test_client()
+
+    # A leitura que falhou não é repetida; as seguintes já vão para o primário.
+    with pytest.raises(OperationalError):
+        client.get(f'/api/clientes/{CLIENTE_ID}')
+    with app_com_replica.app_context():
+        disponivel, _ = _saude_replicas[db.engines['replica_1']]
+    assert disponivel is False
+    assert _nome(client) != 'Na réplica'
+
+
+def test_falha_na_replica_preserva_objetos_pendentes_da_sessao(app_com_replica, bancos):
+    _, replica = bancos
+    conexao = sqlite3.connect(replica)
+    conexao.execute('ALTER TABLE clientes RENAME TO clientes_fora')
+    conexao.commit()
+    conexao.close()
+
+    with app_com_replica.test_request_context(f'/api/clientes/{CLIENTE_ID}'):
+        pendente = Cliente(nome='Pendente', telefone='(11) 95555-0000')
+        db.session.add(pendente)
+        with pytest.raises(OperationalError):
+            db.session.execute(select(Cliente.nome).where(Cliente.id == CLIENTE_ID).execution_options(autoflush=False)).scalar()
+        assert pendente in db.session.new
+
+
+def test_cliente_sem_cookie_nao_fica_fixado_no_primario(app_com_replica):
+    client = app_com_replica.test_client(use_cookies=False)
+    assert client.put(f'/api/clientes/{CLIENTE_ID}', json={'nome': 'Atualizado'}).status_code == 200
+
+    # Sem o cookie de sessão não há como reconhecer o autor da escrita: a leitura seguinte vai à réplica.
+    assert _nome(client) == 'Na réplica'
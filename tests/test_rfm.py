@@ -0,0 +1,76 @@
+from datetime import datetime
+
+from sqlalchemy import func, select
+
+from backend.models.cliente import Cliente
+from backend.models.database import db
+from backend.models.metrica_cliente import MetricaCliente
+from backend.models.pagamento import Pagamento
+from backend.models.pedido import Pedido
+from backend.services.rfm import atualizar_metricas_incrementais, calcular_metricas_clientes
+
+
+def _agregado(cliente_id):
+    pedidos = db.session.scalars(select(Pedido).where(Pedido.cliente_id == cliente_id, Pedido.status != 'cancelado')).all()
+    valor = sum(pedido.pagamento.valor_pago for pedido in pedidos if pedido.pagamento)
+    return len(pedidos), round(valor, 2), max(pedido.data_pedido for pedido in pedidos)
+
+
+def test_calculo_completo_grava_uma_metrica_por_cliente(app):
+    with app.app_context():
+        sem_compras = Cliente(nome='Sem Compras', telefone='+5511900000099')
+        db.session.add(sem_compras)
+        db.session.commit()
+
+        gravados = calcular_metricas_clientes()
+
+        assert gravados == db.session.scalar(select(func.count(Cliente.id)))
+        cliente_id = db.session.scalar(select(Pedido.cliente_id).where(Pedido.status != 'cancelado').limit(1))
+        metrica = db.session.get(MetricaCliente, cliente_id)
+        assert (metrica.frequencia, round(metrica.valor_monetario, 2), metrica.ultima_compra) == _agregado(cliente_id)
+        assert metrica.ltv >= metrica.valor_monetario
+        assert 1 <= metrica.pontuacao_f <= 5 and 1 <= metrica.pontuacao_r <= 5
+
+        vazio = db.session.get(MetricaCliente, sem_compras.id)
+        assert (vazio.segmento, vazio.frequencia, vazio.recencia_dias, vazio.ltv) == ('sem_compras', 0, None, 0)
+        assert (vazio.pontuacao_r, vazio.pontuacao_f, vazio.pontuacao_m) == (0, 0, 0)
+
+
+def test_atualizacao_incremental_recalcula_so_quem_comprou(app):
+    with app.app_context():
+        calcular_metricas_clientes()
+        cliente_id = db.session.scalar(select(Pedido.cliente_id).where(Pedido.status != 'cancelado').limit(1))
+        antes = {m.cliente_id: m.calculado_em for m in db.session.scalars(select(MetricaCliente))}
+        frequencia = db.session.get(MetricaCliente, cliente_id).frequencia
+
+        pedido = Pedido(cliente_id=cliente_id, servicos='Teste', valor_total=80.0, status='pago', data_pedido=datetime.now())
+        db.session.add(pedido)
+        db.session.flush()
+        db.session.add(Pagamento(pedido_id=pedido.id, valor_pago=80.0, forma_pagamento='PIX', data_pagamento=datetime.now()))
+        db.session.commit()
+
+        assert atualizar_metricas_incrementais() == 1
+        assert atualizar_metricas_incrementais() == 0
+
+        db.session.expire_all()
+        metrica = db.session.get(MetricaCliente, cliente_id)
+        assert (metrica.frequencia, metrica.recencia_dias, metrica.pontuacao_r) == (frequencia + 1, 0, 5)
+        depois = {m.cliente_id: m.calculado_em for m in db.session.scalars(select(MetricaCliente))}
+        assert {c for c in depois if depois[c] != antes[c]} == {cliente_id}
+
+
+def test_endpoint_de_segmentos(app, client):
+    app.config['LOGIN_DISABLED'] = True
+    with app.app_context():
+        total = calcular_metricas_clientes()
+
+    dados = client.get('/api/relatorios/clientes/segmentos?limite=500').get_json()
+    assert sum(item['clientes'] for item in dados['segmentos']) == total
+    assert len(dados['clientes']) == min(total, 200)
+
+    segmento = max(dados['segmentos'], key=lambda item: item['clientes'])['segmento']
+    filtrado = client.get(f'/api/relatorios/clientes/segmentos?segmento={segmento}&limite=5').get_json()['clientes']
+    assert 0 < len(filtrado) <= 5
+    assert {item['segmento'] for item in filtrado} == {segmento}
+    ltvs = [float(item['ltv']) for item in filtrado]
+    assert ltvs == sorted(ltvs, reverse=True)
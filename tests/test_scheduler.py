@@ -0,0 +1,27 @@
+from backend.models.database import db
+from backend.services.scheduler import _registrar_execucao_nao_realizada, listar_jobs, scheduler, start_scheduler, stop_scheduler
+
+
+def test_job_store_usa_o_banco_do_app_e_e_lido_sem_scheduler(app_em_arquivo):
+    app_em_arquivo.config.update(SQLITE_MAINTENANCE_ENABLED=False, ARCHIVE_ENABLED=False, ANALYTICS_EXPORT_ENABLED=False)
+    with app_em_arquivo.app_context():
+        start_scheduler(app_em_arquivo)
+        try:
+            assert scheduler._jobstores['default'].engine.url == db.engine.url
+            agendados = {job.id for job in scheduler.get_jobs()}
+        finally:
+            stop_scheduler()
+
+        # Processo sem scheduler (CLI, worker da API) lê os mesmos jobs do banco.
+        assert {job['id'] for job in listar_jobs()} == agendados
+        assert 'relatorio_semanal' in agendados
+
+
+def test_reiniciar_o_scheduler_nao_duplica_o_listener(app_em_arquivo):
+    app_em_arquivo.config.update(SQLITE_MAINTENANCE_ENABLED=False, ARCHIVE_ENABLED=False, ANALYTICS_EXPORT_ENABLED=False)
+    with app_em_arquivo.app_context():
+        for _ in range(2):
+            start_scheduler(app_em_arquivo)
+            stop_scheduler()
+
+    assert [callback for callback, _ in scheduler._listeners].count(_registrar_execucao_nao_realizada) == 1
@@ -0,0 +1,97 @@
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, text
+
+from backend.models.cliente import AnotacaoCliente, Cliente
+from backend.models.database import db
+from backend.models.migracoes import atualizar_esquema
+from backend.models.pagamento import Pagamento
+from tests.conftest import CLIENTES_MODELO
+
+
+def _sincronizar(client, token=None, **parametros):
+    if token:
+        parametros['since'] = token
+    resposta = client.get('/api/sync/', query_string=parametros)
+    assert resposta.status_code == 200
+    return [json.loads(linha) for linha in resposta.get_data(as_text=True).splitlines()]
+
+
+def _registros(linhas, tipo, operacao='upsert'):
+    return [linha for linha in linhas if linha['tipo'] == tipo and linha.get('operacao') == operacao]
+
+
+def test_token_retoma_apenas_as_alteracoes(app, client):
+    app.config['SYNC_SAFETY_SECONDS'] = 0
+    completa = _sincronizar(client)
+    assert len(_registros(completa, 'cliente')) == CLIENTES_MODELO
+    assert completa[-1]['tipo'] == 'fim'
+
+    assert _registros(_sincronizar(client, completa[-1]['token']), 'cliente') == []
+
+    with app.app_context():
+        db.session.get(Cliente, 7).endereco = 'Rua Nova, 10'
+        db.session.commit()
+    alteracoes = _sincronizar(client, completa[-1]['token'])
+
+    assert [(linha['dados']['id'], linha['dados']['endereco']) for linha in _registros(alteracoes, 'cliente')] == [(7, 'Rua Nova, 10')]
+
+
+def test_checkpoint_retoma_sincronizacao_interrompida(app, client):
+    app.config['SYNC_SAFETY_SECONDS'] = 0
+    linhas = _sincronizar(client, lote=50)
+    primeiro_checkpoint = next(linha for linha in linhas if linha['tipo'] == 'checkpoint')
+
+    restante = _sincronizar(client, primeiro_checkpoint['token'], lote=50)
+
+    ids_completos = [linha['dados']['id'] for linha in _registros(linhas, 'cliente')]
+    assert [linha['dados']['id'] for linha in _registros(restante, 'cliente')] == ids_completos[50:]
+
+
+def test_remocoes_chegam_como_tombstones(app, client):
+    app.config['SYNC_SAFETY_SECONDS'] = 0
+    token = _sincronizar(client)[-1]['token']
+    with app.app_context():
+        pagamento = db.session.scalars(select(Pagamento).limit(1)).one()
+        pagamento_id = pagamento.id
+        db.session.delete(pagamento)
+        db.session.commit()
+
+    alteracoes = _sincronizar(client, token)
+
+    assert [linha['id'] for linha in _registros(alteracoes, 'pagamento', 'delete')] == [pagamento_id]
+
+
+def test_janela_de_seguranca_adia_alteracoes_recentes(app, client):
+    app.config['SYNC_SAFETY_SECONDS'] = 0
+    token = _sincronizar(client)[-1]['token']
+    with app.app_context():
+        db.session.get(Cliente, 3).endereco = 'Rua Recente, 1'
+        db.session.commit()
+
+    app.config['SYNC_SAFETY_SECONDS'] = 60
+    adiada = _sincronizar(client, token)
+    assert _registros(adiada, 'cliente') == []
+
+    # O token devolvido não pode ter passado da alteração adiada.
+    app.config['SYNC_SAFETY_SECONDS'] = 0
+    assert [linha['dados']['id'] for linha in _registros(_sincronizar(client, adiada[-1]['token']), 'cliente')] == [3]
+
+
+def test_colunas_novas_sao_preenchidas_com_o_relogio_da_aplicacao(app):
+    with app.app_context():
+        indice = db.session.scalar(text(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'anotacoes_cliente' AND sql LIKE '%atualizado_em%'"
+        ))
+        db.session.execute(text(f'DROP INDEX {indice}'))
+        db.session.execute(text('ALTER TABLE anotacoes_cliente DROP COLUMN atualizado_em'))
+        db.session.commit()
+
+        antes = datetime.now()
+        atualizar_esquema()
+        depois = datetime.now()
+
+        preenchidos = set(db.session.scalars(select(AnotacaoCliente.atualizado_em)))
+        assert len(preenchidos) == 1
+        assert antes <= preenchidos.pop() <= depois + timedelta(seconds=1)